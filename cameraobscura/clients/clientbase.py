@@ -90,7 +90,8 @@ class BaseClient(BaseClass):
         user = "Username: {0}".format(self.username)
         host = "Hostname: {0}".format(self.hostname)
         port = "Port: {0}".format(self.port)
-        if hasattr(self, 'password'):
+        # not hasattr -- that would go through __getattr__ and connect the client
+        if 'password' in vars(self):
             output = [user, host, port, "Password: {0}".format(self.password)]
         elif 'password' in self.kwargs:
             output = [user, host, port, "Password: {0}".format(self.kwargs['password'])]
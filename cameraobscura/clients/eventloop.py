@@ -0,0 +1,639 @@
+
+# python standard library
+from abc import ABCMeta, abstractmethod
+from collections import deque
+import logging
+import os
+import select
+import socket
+import time
+
+# this package
+from cameraobscura.clients.telnetclient import TelnetOutput
+from cameraobscura.clients.localclient import LocalOutput
+from cameraobscura.utilities.latency import TimedOutput
+
+EOF = EMPTY_STRING = ''
+# bytes to read at a time
+CHUNK_SIZE = 65536
+
+class Pending(object):
+    """
+    The eventual result of work on the event loop
+    """
+    def __init__(self, name=None):
+        """
+        Pending constructor
+
+        :param:
+
+         - `name`: identifier for the logging (e.g. the command)
+        """
+        self.name = name
+        self.done = False
+        self.result = None
+        self.error = None
+        self.callbacks = []
+        return
+
+    def add_callback(self, callback):
+        """
+        Adds a function to call (with this Pending) once the result is set
+
+        :param:
+
+         - `callback`: function that takes a Pending
+        """
+        if self.done:
+            callback(self)
+        else:
+            self.callbacks.append(callback)
+        return
+
+    def set_result(self, result=None, error=None):
+        """
+        Sets the result (or the error) and calls the callbacks
+
+        :param:
+
+         - `result`: the outcome of the work
+         - `error`: the exception raised by the work (if it failed)
+        """
+        self.result = result
+        self.error = error
+        self.done = True
+        callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback(self)
+        return
+
+    def value(self):
+        """
+        The result
+
+        :raise: the error if the work failed
+        """
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def __str__(self):
+        return "Pending: {0}".format(self.name)
+# end class Pending
+
+class EventLoopOutput(object):
+    """
+    A file-like object for the output read by the event loop
+    """
+    def __init__(self, output, error=None):
+        """
+        EventLoopOutput constructor
+
+        :param:
+
+         - `output`: string of output
+         - `error`: exception to raise after the last line (or None)
+        """
+        self.lines = output.splitlines(True)
+        self.error = error
+        self.index = 0
+        return
+
+    def readline(self):
+        """
+        :return: the next line (EOF after the last)
+        :raise: the error (if there is one) after the last line
+        """
+        if self.index < len(self.lines):
+            self.index += 1
+            return self.lines[self.index - 1]
+        if self.error is not None:
+            raise self.error
+        return EOF
+
+    def readlines(self):
+        """
+        :return: list of the remaining lines
+        """
+        return [line for line in self]
+
+    def read(self):
+        """
+        :return: the remaining output as one string
+        """
+        return EMPTY_STRING.join(self.readlines())
+
+    def __iter__(self):
+        """
+        Traverses the output line by line
+        """
+        line = self.readline()
+        while line:
+            yield line
+            line = self.readline()
+        return
+# end class EventLoopOutput
+
+class OutputReader(object):
+    """
+    Abstract Base Class for the readers of a command's output (the readers override `read`)
+    """
+    __metaclass__ = ABCMeta
+    def __init__(self):
+        self.finished = False
+        return
+
+    @property
+    def filenos(self):
+        """
+        list of file-descriptors to wait on
+        """
+        return []
+
+    @property
+    def buffered(self):
+        """
+        True if there's output to read without waiting
+        """
+        return False
+
+    def timeout_error(self, timeout):
+        """
+        :return: exception for when the output times out (None to just stop)
+        """
+        return socket.timeout("No output within {0} seconds".format(timeout))
+
+    @abstractmethod
+    def read(self, fileno=None):
+        """
+        Reads what's ready (doesn't block)
+
+        :param:
+
+         - `fileno`: the file descriptor select found ready (None if buffered)
+
+        :return: stdout text, stderr text
+        """
+        return
+# end class OutputReader
+
+class PipeReader(OutputReader):
+    """
+    Reads a LocalClient's stdout and stderr pipes
+    """
+    def __init__(self, stdout, stderr):
+        """
+        PipeReader constructor
+
+        :param:
+
+         - `stdout`: LocalOutput for standard out
+         - `stderr`: LocalOutput for standard error
+        """
+        super(PipeReader, self).__init__()
+        self.stdout = stdout
+        self.stderr = stderr
+        self.open = {stdout.pipe.fileno(): stdout, stderr.pipe.fileno(): stderr}
+        return
+
+    @property
+    def filenos(self):
+        """
+        the pipes that haven't been closed
+        """
+        return self.open.keys()
+
+    @property
+    def buffered(self):
+        """
+        True if the LocalOutputs already read something
+        """
+        return self.stdout.buffered or self.stderr.buffered
+
+    def read(self, fileno=None):
+        """
+        Reads the ready pipe
+
+        :return: stdout text, stderr text
+        """
+        if fileno is None:
+            return self.stdout.available(), self.stderr.available()
+        chunk = os.read(fileno, CHUNK_SIZE)
+        output = self.open[fileno]
+        if not chunk:
+            del self.open[fileno]
+            self.finished = not self.open
+        if output is self.stdout:
+            return chunk, EMPTY_STRING
+        return EMPTY_STRING, chunk
+# end class PipeReader
+
+class ChannelReader(OutputReader):
+    """
+    Reads a paramiko channel's stdout and stderr
+    """
+    def __init__(self, channel):
+        """
+        ChannelReader constructor
+
+        :param:
+
+         - `channel`: the paramiko Channel the command is running on
+        """
+        super(ChannelReader, self).__init__()
+        self.channel = channel
+        return
+
+    @property
+    def filenos(self):
+        """
+        the channel's pipe (it's readable if either stream has output)
+        """
+        return [self.channel.fileno()]
+
+    def read(self, fileno=None):
+        """
+        Reads what's been received on either stream
+
+        :return: stdout text, stderr text
+        """
+        stdout = []
+        stderr = []
+        while self.channel.recv_ready():
+            stdout.append(self.channel.recv(CHUNK_SIZE))
+        while self.channel.recv_stderr_ready():
+            stderr.append(self.channel.recv_stderr(CHUNK_SIZE))
+        if ((self.channel.eof_received or self.channel.closed) and
+            not (self.channel.recv_ready() or self.channel.recv_stderr_ready())):
+            self.finished = True
+        return EMPTY_STRING.join(stdout), EMPTY_STRING.join(stderr)
+# end class ChannelReader
+
+class TelnetReader(OutputReader):
+    """
+    Reads a TelnetOutput up to the prompt
+    """
+    def __init__(self, output):
+        """
+        TelnetReader constructor
+
+        :param:
+
+         - `output`: the TelnetOutput from the TelnetClient's exec_command
+        """
+        super(TelnetReader, self).__init__()
+        self.output = output
+        return
+
+    @property
+    def filenos(self):
+        """
+        the telnet socket
+        """
+        return [self.output.client.fileno()]
+
+    @property
+    def buffered(self):
+        """
+        True if telnetlib has output that hasn't been taken yet
+        """
+        return bool(self.output.client.rawq or self.output.client.cookedq)
+
+    def timeout_error(self, timeout):
+        """
+        The TelnetOutput just stops at the timeout so this does too
+
+        :return: None
+        """
+        self.output.logger.warning("Output timed out without reaching the prompt")
+        return None
+
+    def read(self, fileno=None):
+        """
+        Reads the output and returns the finished lines
+
+        :return: stdout text, stderr text (always empty)
+        """
+        client = self.output.client
+        try:
+            if fileno is None:
+                client.process_rawq()
+                chunk = client.read_very_lazy()
+            else:
+                chunk = self.output.read_socket()
+        except EOFError as error:
+            self.output.logger.debug(error)
+            chunk = None
+        if chunk is None:
+            # the connection closed so the unfinished line is the last line
+            self.output.add(self.output.end_of_line)
+            self.finished = True
+        else:
+            self.output.add(chunk)
+            self.finished = self.output.prompted
+        return self.output.read_available(), EMPTY_STRING
+# end class TelnetReader
+
+class FileReader(OutputReader):
+    """
+    Reads file-like outputs all at once
+    """
+    def __init__(self, stdout, stderr):
+        """
+        FileReader constructor
+
+        :param:
+
+         - `stdout`: file-like standard output
+         - `stderr`: file-like standard error
+        """
+        super(FileReader, self).__init__()
+        self.stdout = stdout
+        self.stderr = stderr
+        return
+
+    @property
+    def buffered(self):
+        """
+        Always True until it's been read
+        """
+        return not self.finished
+
+    def read(self, fileno=None):
+        """
+        Reads all the output
+
+        :return: stdout text, stderr text
+        """
+        self.finished = True
+        stderr = EMPTY_STRING if self.stderr is None else EMPTY_STRING.join(self.stderr)
+        return EMPTY_STRING.join(self.stdout), stderr
+# end class FileReader
+
+def reader(stdout, stderr):
+    """
+    Picks the reader for a command's output
+
+    :param:
+
+     - `stdout`, `stderr`: the outputs from a client's exec_command
+
+    :return: OutputReader
+    """
+    if isinstance(stdout, TimedOutput):
+        # the loop reads the output itself so the host's latency timer is skipped
+        stdout = stdout.output
+    if isinstance(stdout, TelnetOutput):
+        return TelnetReader(stdout)
+    if isinstance(stdout, LocalOutput):
+        return PipeReader(stdout, stderr)
+    if hasattr(getattr(stdout, 'channel', None), 'recv_stderr_ready'):
+        return ChannelReader(stdout.channel)
+    return FileReader(stdout, stderr)
+
+class CommandTask(object):
+    """
+    A command submitted to the event loop
+    """
+    def __init__(self, connection, command, timeout=None, parse=None, lines=None):
+        """
+        CommandTask constructor
+
+        :param:
+
+         - `connection`: object with an exec_command (e.g. TheHost)
+         - `command`: string to send to the connection
+         - `timeout`: seconds to wait for output (None means wait forever)
+         - `parse`: function to call with the stdout and stderr (or None)
+         - `lines`: function to call with each line of stdout as it arrives (or None)
+        """
+        self.connection = connection
+        self.command = command
+        self.timeout = timeout
+        self.parse = parse
+        self.lines = lines
+        self.pending = Pending(command)
+        self.reader = None
+        self.output = None
+        self.stdout = []
+        self.stderr = []
+        self.partial_line = EMPTY_STRING
+        self.deadline = None
+        return
+
+    def start(self):
+        """
+        Sends the command to the connection
+
+        :postcondition: self.reader set to the reader for the output
+        """
+        stdin, stdout, stderr = self.connection.exec_command(self.command,
+                                                             timeout=self.timeout)
+        # kept so a multiplexed host's channel permit can be given back at the end
+        self.output = stdout
+        self.reader = reader(stdout, stderr)
+        self.reset_deadline()
+        return
+
+    def reset_deadline(self):
+        """
+        Sets the time the output times out
+        """
+        if self.timeout is not None:
+            self.deadline = time.time() + self.timeout
+        return
+
+    def read(self, fileno=None):
+        """
+        Reads the output that's ready
+
+        :param:
+
+         - `fileno`: the file descriptor that select found ready (None if buffered)
+
+        :postcondition: the pending result is set if the output is finished (or failed)
+        """
+        try:
+            stdout, stderr = self.reader.read(fileno)
+        except socket.error as error:
+            self.finish(error)
+            return
+        if stdout or stderr:
+            self.reset_deadline()
+        if stdout:
+            self.stdout.append(stdout)
+            if self.lines is not None:
+                lines = (self.partial_line + stdout).splitlines(True)
+                self.partial_line = EMPTY_STRING
+                if not lines[-1].endswith('\n'):
+                    self.partial_line = lines.pop()
+                for line in lines:
+                    self.lines(line)
+        if stderr:
+            self.stderr.append(stderr)
+        if self.reader.finished:
+            self.finish()
+        return
+
+    def expired(self, now):
+        """
+        :return: True if the output timed out
+        """
+        return self.deadline is not None and now > self.deadline
+
+    def finish(self, error=None):
+        """
+        Parses the output and sets the pending result
+
+        :param:
+
+         - `error`: exception to raise after the last line of stdout (or None)
+        """
+        release = getattr(self.output, 'release', None)
+        if release is not None:
+            release()
+        self.output = None
+        if self.lines is not None and self.partial_line:
+            self.lines(self.partial_line)
+        stdout = EventLoopOutput(EMPTY_STRING.join(self.stdout), error)
+        stderr = EventLoopOutput(EMPTY_STRING.join(self.stderr))
+        if self.parse is None:
+            self.pending.set_result((None, stdout, stderr))
+            return
+        try:
+            result = self.parse(stdout, stderr)
+        except Exception as error:
+            self.pending.set_result(error=error)
+            return
+        self.pending.set_result(result)
+        return
+# end class CommandTask
+
+class EventLoop(object):
+    """
+    Runs commands and reads their output in one thread
+    """
+    def __init__(self):
+        """
+        EventLoop constructor
+        """
+        super(EventLoop, self).__init__()
+        self._logger = None
+        self.waiting = deque()
+        self.running = []
+        return
+
+    @property
+    def logger(self):
+        """
+        :return: A logging object.
+        """
+        if self._logger is None:
+            self._logger = logging.getLogger("{0}.{1}".format(self.__module__,
+                                  self.__class__.__name__))
+        return self._logger
+
+    def submit(self, connection, command, timeout=None, parse=None, lines=None):
+        """
+        Queues a command to run
+
+        :param:
+
+         - `connection`: object with an exec_command (e.g. TheHost)
+         - `command`: string to send to the connection
+         - `timeout`: seconds to wait for output (None means wait forever)
+         - `parse`: function to call with the stdout and stderr (or None)
+         - `lines`: function to call with each line of stdout as it arrives (or None)
+
+        :return: Pending for the command's result
+        """
+        task = CommandTask(connection=connection, command=command, timeout=timeout,
+                           parse=parse, lines=lines)
+        self.waiting.append(task)
+        return task.pending
+
+    def gather(self, pendings):
+        """
+        Combines the pendings into one
+
+        :param:
+
+         - `pendings`: list of Pending objects
+
+        :return: Pending whose result is the list of their results
+        """
+        pendings = list(pendings)
+        gathered = Pending("gather ({0})".format(len(pendings)))
+
+        def check(pending):
+            if gathered.done:
+                return
+            if pending.error is not None:
+                gathered.set_result(error=pending.error)
+            elif all(other.done for other in pendings):
+                gathered.set_result([other.result for other in pendings])
+            return
+
+        if not pendings:
+            gathered.set_result([])
+        for pending in pendings:
+            pending.add_callback(check)
+        return gathered
+
+    def start(self):
+        """
+        Starts the waiting commands whose connections are free
+        """
+        busy = set(id(task.connection) for task in self.running
+                   if getattr(task.connection, 'multiplexed', False) is not True)
+        for task in list(self.waiting):
+            if id(task.connection) in busy:
+                continue
+            self.waiting.remove(task)
+            if getattr(task.connection, 'multiplexed', False) is not True:
+                busy.add(id(task.connection))
+            try:
+                task.start()
+            except Exception as error:
+                self.logger.error("{0}: Error starting '{1}' on {2}".format(type(error),
+                                                                          task.command,
+                                                                          task.connection))
+                task.pending.set_result(error=error)
+                continue
+            self.running.append(task)
+        return
+
+    def run(self):
+        """
+        Runs until all the submitted commands are finished
+        """
+        while self.waiting or self.running:
+            self.start()
+            # output that's already been read doesn't wake up select
+            for task in [task for task in self.running if task.reader.buffered]:
+                task.read()
+            self.running = [task for task in self.running if not task.pending.done]
+            if not self.running:
+                continue
+
+            tasks = {}
+            for task in self.running:
+                for fileno in task.reader.filenos:
+                    tasks[fileno] = task
+            deadlines = [task.deadline for task in self.running if task.deadline is not None]
+            wait = None
+            if deadlines:
+                wait = max(0, min(deadlines) - time.time())
+            readable, writeable, exceptional = select.select(tasks.keys(), [], [], wait)
+            for fileno in readable:
+                if not tasks[fileno].pending.done:
+                    tasks[fileno].read(fileno)
+
+            now = time.time()
+            for task in self.running:
+                if not task.pending.done and task.expired(now):
+                    self.logger.debug("'{0}' timed out".format(task.command))
+                    task.finish(task.reader.timeout_error(task.timeout))
+            self.running = [task for task in self.running if not task.pending.done]
+        return
+# end class EventLoop
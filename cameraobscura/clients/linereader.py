@@ -0,0 +1,165 @@
+
+# this package
+from theape import BaseClass
+
+NEWLINE = '\n'
+EOF = EMPTY_STRING = ''
+NOT_FOUND = -1
+
+class ChunkedLineReader(BaseClass):
+    """
+    A file-like reader that splits chunks of output into lines
+    """
+    def __init__(self, read_chunk, newline=NEWLINE):
+        """
+        ChunkedLineReader constructor
+
+        :param:
+
+         - `read_chunk`: callable that returns the next chunk (empty or None at the end)
+         - `newline`: the string that ends a line
+        """
+        super(ChunkedLineReader, self).__init__()
+        self.read_chunk = read_chunk
+        self.newline = newline
+        self.buffer = bytearray()
+        # where the next line starts
+        self.position = 0
+        # how far the buffer's been searched for a newline
+        self.searched = 0
+        self.finished = False
+        return
+
+    def add(self, chunk):
+        """
+        Adds a chunk to the buffer
+
+        :param:
+
+         - `chunk`: string of output
+
+        :postcondition: the lines already read are removed from the buffer
+        """
+        del self.buffer[:self.position]
+        self.searched -= self.position
+        self.position = 0
+        self.buffer.extend(chunk)
+        return
+
+    def feed(self, chunk):
+        """
+        Adds a chunk to the buffer or finishes the output if it's empty
+
+        :param:
+
+         - `chunk`: string of output (empty or None if there's no more)
+
+        :return: False if the output is finished
+        """
+        if not chunk:
+            self.finished = True
+            return False
+        self.add(chunk)
+        return True
+
+    def fill(self):
+        """
+        Reads the next chunk into the buffer
+
+        :return: False if there was no more output
+        """
+        return self.feed(self.read_chunk())
+
+    def span(self):
+        """
+        Finds the next line in the buffer (reading more if needed)
+
+        :return: (start, end) of the next line or None if there aren't any more
+        """
+        while True:
+            index = self.buffer.find(self.newline, self.searched)
+            if index != NOT_FOUND:
+                start = self.position
+                self.position = self.searched = index + len(self.newline)
+                return start, self.position
+            # the newline might be split between this chunk and the next one
+            self.searched = max(self.position, len(self.buffer) - len(self.newline) + 1)
+            if self.finished or not self.fill():
+                break
+        # the last line might not end with a newline
+        if self.position < len(self.buffer):
+            start = self.position
+            self.position = self.searched = len(self.buffer)
+            return start, self.position
+        return
+
+    def lines(self):
+        """
+        Generates the lines as read-only views of the buffer (without copying them)
+
+        The regular expressions can search the views but each one is only good
+        until the next line is read (use ``str(line)`` to keep a line)
+
+        :yield: buffer of the next line
+        """
+        span = self.span()
+        while span is not None:
+            start, end = span
+            yield buffer(self.buffer, start, end - start)
+            span = self.span()
+        return
+
+    def readline(self):
+        """
+        Reads a single line of output
+
+        :return: the next line (EOF once there's no more output)
+        """
+        span = self.span()
+        if span is None:
+            return EOF
+        start, end = span
+        return str(buffer(self.buffer, start, end - start))
+
+    def readlines(self):
+        """
+        Reads all the lines
+
+        :return: list of lines
+        """
+        return list(self)
+
+    def read(self):
+        """
+        Reads all the output
+
+        :return: the output as a single string
+        """
+        while not self.finished and self.fill():
+            pass
+        return self.available()
+
+    @property
+    def buffered(self):
+        """
+        True if the buffer has output that hasn't been read yet
+        """
+        return self.position < len(self.buffer)
+
+    def available(self):
+        """
+        Takes the output that's already in the buffer (doesn't read any more)
+
+        :return: the unread part of the buffer
+        """
+        output = str(buffer(self.buffer, self.position))
+        del self.buffer[:]
+        self.position = self.searched = 0
+        return output
+
+    def __iter__(self):
+        """
+        Traverses the output line by line
+        """
+        return iter(self.readline, EOF)
+# end class ChunkedLineReader
@@ -0,0 +1,189 @@
+
+# python standard library
+import os
+import select
+import socket
+import subprocess
+
+# this package
+from cameraobscura.clients.clientbase import BaseClient
+from cameraobscura.clients.linereader import ChunkedLineReader
+
+NEWLINE = '\n'
+EMPTY_STRING = ''
+# bytes to read from the pipes at a time
+CHUNK_SIZE = 65536
+TIMEOUT = 10
+
+class LocalClient(BaseClient):
+    """
+    A client that runs commands as local sub-processes
+    """
+    def __init__(self, hostname='localhost', username=None, timeout=TIMEOUT,
+                 chunk_size=CHUNK_SIZE, **kwargs):
+        """
+        LocalClient constructor
+
+        :param:
+
+         - `hostname`: not used (kept for compatibility with the other clients)
+         - `username`: not used (commands are run as the current user)
+         - `timeout`: default readline timeout for the output
+         - `chunk_size`: bytes to read from the output pipes at a time
+         - `kwargs`: ignored (e.g. the password)
+        """
+        super(LocalClient, self).__init__(hostname=hostname,
+                                          username=username,
+                                          timeout=timeout,
+                                          **kwargs)
+        self.chunk_size = int(chunk_size)
+        self._client = None
+        return
+
+    @property
+    def client(self):
+        """
+        The list of started processes (there is no connection to make)
+
+        :return: list of Popen instances
+        """
+        if self._client is None:
+            self._client = []
+        return self._client
+
+    @property
+    def port(self):
+        """
+        There is no port, this is always None
+        """
+        return None
+
+    @port.setter
+    def port(self, new_port):
+        """
+        Ignores the port (the BaseClient sets it)
+        """
+        self._port = None
+        return
+
+    def exec_command(self, command, timeout=TIMEOUT):
+        """
+        Runs the command in a sub-process
+
+        :param:
+
+         - `command`: A string to send to the shell
+         - `timeout`: readline timeout (None means block until there is output)
+
+        :rtype: tuple
+        :return: stdin, stdout, stderr (stdout and stderr are LocalOutput)
+        """
+        command = command.rstrip(NEWLINE)
+        self.logger.debug("Running locally -- '{0}', timeout={1}".format(command,
+                                                                        timeout))
+        # forget the processes that have already finished
+        self._client = [process for process in self.client if process.poll() is None]
+        process = subprocess.Popen(command, shell=True,
+                                   bufsize=self.chunk_size,
+                                   stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE,
+                                   close_fds=True)
+        self.client.append(process)
+        stderr = LocalOutput(pipe=process.stderr, timeout=timeout,
+                             chunk_size=self.chunk_size)
+        # each one drains the other's pipe while it waits
+        stdout = LocalOutput(pipe=process.stdout, timeout=timeout,
+                             chunk_size=self.chunk_size, partner=stderr)
+        return process.stdin, stdout, stderr
+
+    def close(self):
+        """
+        Kills the processes that are still running
+
+        :postcondition: self._client is None
+        """
+        if self._client is not None:
+            for process in self._client:
+                if process.poll() is None:
+                    self.logger.debug("Killing process {0}".format(process.pid))
+                    try:
+                        process.kill()
+                        process.wait()
+                    except OSError as error:
+                        # it finished on its own in the meantime
+                        self.logger.debug(error)
+            self._client = None
+        return
+
+    def __str__(self):
+        """
+        :return: string identifying this as a local client
+        """
+        return "Local (sub-process) Client"
+# end class LocalClient
+
+class LocalOutput(ChunkedLineReader):
+    """
+    A file-like reader of sub-process output with a readline timeout
+    """
+    def __init__(self, pipe, timeout=None, chunk_size=CHUNK_SIZE, partner=None):
+        """
+        LocalOutput constructor
+
+        :param:
+
+         - `pipe`: file opened for reading (e.g. Popen.stdout)
+         - `timeout`: seconds to wait for output (None means wait forever)
+         - `chunk_size`: maximum bytes to read at a time
+         - `partner`: LocalOutput for the process's other pipe (drained while this one waits)
+        """
+        super(LocalOutput, self).__init__(read_chunk=self.read_chunk)
+        self.pipe = pipe
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.partner = partner
+        if partner is not None:
+            partner.partner = self
+        return
+
+    def receive(self):
+        """
+        Reads a chunk from the pipe (which has to be readable)
+
+        :return: the chunk read (empty string at end of file)
+        """
+        return os.read(self.pipe.fileno(), self.chunk_size)
+
+    def read_chunk(self):
+        """
+        Waits for the next chunk of output and reads it
+
+        Whatever arrives on the partner's pipe in the meantime goes into the
+        partner's buffer, so the process can't block on a full pipe nobody's reading.
+
+        :return: the chunk read (empty string at end of file)
+        :raise: socket.timeout if nothing arrives within the timeout
+        """
+        while True:
+            outputs = dict((output.pipe, output) for output in (self, self.partner)
+                           if output is not None and not output.finished)
+            if self.pipe not in outputs:
+                return EMPTY_STRING
+            readable, writeable, exceptional = select.select(list(outputs), [], [],
+                                                             self.timeout)
+            if not readable:
+                raise socket.timeout("No output within {0} seconds".format(self.timeout))
+            if self.partner is not None and self.partner.pipe in readable:
+                self.partner.feed(self.partner.receive())
+            if self.pipe in readable:
+                return self.receive()
+        return
+
+    def close(self):
+        """
+        Closes the pipe
+        """
+        self.pipe.close()
+        return
+# end class LocalOutput
@@ -0,0 +1,268 @@
+
+# python standard library
+from collections import Counter
+import logging
+import random
+import threading
+import time
+
+# this package
+from cameraobscura import CameraobscuraError
+
+class ReconnectConstants(object):
+    """
+    Constants for the reconnect policy and circuit breaker
+    """
+    __slots__ = ()
+    # re-sends after the first failure
+    retries = 2
+    # seconds to wait before the first re-send (doubled for each one after)
+    initial_delay = 0.5
+    maximum_delay = 4
+    # failures in a row that open the circuit
+    failure_threshold = 3
+    # seconds an open circuit waits before it lets a command try the host again
+    cool_down = 30
+    # counter names
+    attempts = 'attempts'
+    failures = 'failures'
+    retried = 'retries'
+    reconnects = 'reconnects'
+    trips = 'trips'
+    rejected = 'rejected'
+# end class ReconnectConstants
+
+class CircuitOpenError(CameraobscuraError):
+    """
+    Raised instead of trying a host whose circuit is open
+    """
+# end class CircuitOpenError
+
+class CircuitBreaker(object):
+    """
+    Tracks a host's failures and turns commands away while it's failing
+    """
+    closed = 'closed'
+    open = 'open'
+    half_open = 'half-open'
+    # the breakers for the process (host name: CircuitBreaker)
+    breakers = {}
+    breakers_lock = threading.Lock()
+
+    def __init__(self, name, threshold=ReconnectConstants.failure_threshold,
+                 cool_down=ReconnectConstants.cool_down):
+        """
+        CircuitBreaker constructor
+
+        :param:
+
+         - `name`: the host's name (for the log and statistics)
+         - `threshold`: failures in a row that open the circuit
+         - `cool_down`: seconds to stay open before trying the host again
+        """
+        super(CircuitBreaker, self).__init__()
+        self._logger = None
+        self.name = name
+        self.threshold = threshold
+        self.cool_down = cool_down
+        self.consecutive_failures = 0
+        self.opened = None
+        self.counters = Counter()
+        self.lock = threading.Lock()
+        return
+
+    @classmethod
+    def get(cls, name):
+        """
+        Gets the breaker for the host (creating it the first time)
+
+        :param:
+
+         - `name`: the host's name
+
+        :return: CircuitBreaker
+        """
+        with cls.breakers_lock:
+            if name not in cls.breakers:
+                cls.breakers[name] = cls(name)
+            return cls.breakers[name]
+
+    @classmethod
+    def statistics(cls):
+        """
+        The counters for all the hosts
+
+        :return: dict of host name: dict of counter name: count
+        """
+        with cls.breakers_lock:
+            return dict((name, dict(breaker.counters))
+                        for name, breaker in cls.breakers.items())
+
+    @classmethod
+    def clear(cls):
+        """
+        Removes all the breakers (and their counts)
+        """
+        with cls.breakers_lock:
+            cls.breakers.clear()
+        return
+
+    @property
+    def logger(self):
+        """
+        :return: A logging object.
+        """
+        if self._logger is None:
+            self._logger = logging.getLogger("{0}.{1}".format(self.__module__,
+                                  self.__class__.__name__))
+        return self._logger
+
+    @property
+    def state(self):
+        """
+        closed, open or half-open
+        """
+        if self.opened is None:
+            return self.closed
+        if time.time() - self.opened < self.cool_down:
+            return self.open
+        return self.half_open
+
+    def count(self, counter):
+        """
+        Adds one to a counter
+
+        :param:
+
+         - `counter`: one of the ReconnectConstants counter names
+        """
+        with self.lock:
+            self.counters[counter] += 1
+        return
+
+    def check(self):
+        """
+        Checks that the host can be tried
+
+        :raise: CircuitOpenError if the circuit is open
+        """
+        if self.state == self.open:
+            self.count(ReconnectConstants.rejected)
+            raise CircuitOpenError("{0} failed {1} times in a row, not trying it for {2:.0f} more seconds".format(self.name,
+                                                                                                            self.consecutive_failures,
+                                                                                                            self.opened + self.cool_down - time.time()))
+        return
+
+    def success(self):
+        """
+        Records a command that got through (closing the circuit)
+        """
+        with self.lock:
+            if self.opened is not None:
+                self.logger.info("{0} is back, closing its circuit".format(self.name))
+            self.consecutive_failures = 0
+            self.opened = None
+        return
+
+    def failure(self):
+        """
+        Records a failure (opening the circuit if there have been too many in a row)
+        """
+        with self.lock:
+            self.counters[ReconnectConstants.failures] += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.threshold and self.state != self.open:
+                self.opened = time.time()
+                self.counters[ReconnectConstants.trips] += 1
+                self.logger.warning("{0} failed {1} times in a row, failing fast for {2} seconds".format(self.name,
+                                                                                                     self.consecutive_failures,
+                                                                                                     self.cool_down))
+        return
+# end class CircuitBreaker
+
+class ReconnectPolicy(object):
+    """
+    Re-sends commands that failed to get to the device
+    """
+    def __init__(self, retries=ReconnectConstants.retries,
+                 initial_delay=ReconnectConstants.initial_delay,
+                 maximum_delay=ReconnectConstants.maximum_delay):
+        """
+        ReconnectPolicy constructor
+
+        :param:
+
+         - `retries`: most re-sends after the first failure
+         - `initial_delay`: seconds to wait before the first re-send
+         - `maximum_delay`: longest wait between re-sends
+        """
+        super(ReconnectPolicy, self).__init__()
+        self._logger = None
+        self.retries = retries
+        self.initial_delay = initial_delay
+        self.maximum_delay = maximum_delay
+        return
+
+    @property
+    def logger(self):
+        """
+        :return: A logging object.
+        """
+        if self._logger is None:
+            self._logger = logging.getLogger("{0}.{1}".format(self.__module__,
+                                  self.__class__.__name__))
+        return self._logger
+
+    def delay(self, retry):
+        """
+        The wait before a re-send
+
+        :param:
+
+         - `retry`: how many re-sends came before this one
+
+        :return: seconds between half and all of the backed-off delay
+        """
+        delay = min(self.maximum_delay, self.initial_delay * 2**retry)
+        return random.uniform(delay/2.0, delay)
+
+    def __call__(self, breaker, send, errors, disconnect):
+        """
+        Sends the command, reconnecting and re-sending if the connection fails
+
+        :param:
+
+         - `breaker`: the host's CircuitBreaker
+         - `send`: function that sends the command (and returns what the caller gets)
+         - `errors`: tuple of the exceptions that mean the connection failed
+         - `disconnect`: function that throws the broken connection away
+
+        :return: what `send` returns
+        :raise: CircuitOpenError if the host is failing, or the last connection error
+        """
+        breaker.check()
+        retry = 0
+        while True:
+            breaker.count(ReconnectConstants.attempts)
+            try:
+                output = send()
+            except CircuitOpenError:
+                raise
+            except errors as error:
+                breaker.failure()
+                disconnect()
+                breaker.count(ReconnectConstants.reconnects)
+                if retry >= self.retries or breaker.state == breaker.open:
+                    raise
+                delay = self.delay(retry)
+                self.logger.warning("{0} ({1}), re-sending in {2:.2f} seconds".format(breaker.name,
+                                                                                   error,
+                                                                                   delay))
+                breaker.count(ReconnectConstants.retried)
+                time.sleep(delay)
+                retry += 1
+                continue
+            breaker.success()
+            return output
+        return
+# end class ReconnectPolicy
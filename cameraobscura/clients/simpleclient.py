@@ -1,12 +1,17 @@
 
 # python standard library
 import socket
+import threading
 
 # third party
 import paramiko
 
 # this package
 from cameraobscura.clients.clientbase import BaseClient
+from cameraobscura.clients.linereader import ChunkedLineReader
+from cameraobscura.clients.sshbroker import BrokerClient, BrokeredStdin
+from cameraobscura.clients.reconnect import CircuitBreaker, ReconnectPolicy
+from cameraobscura.utilities.latency import LatencyTimer
 from cameraobscura import CameraobscuraError
 
 class ConnectionError(CameraobscuraError):
@@ -15,10 +20,19 @@ class ConnectionError(CameraobscuraError):
     """
 # end ConnectionError
 
+class UnreachableError(CameraobscuraError):
+    """
+    A CameraobscuraError child for a host that can't be reached (or dropped the connection)
+    """
+# end UnreachableError
+
 PORT = 22
 TIMEOUT = 10
 NEWLINE = '\n'
 SPACE_JOIN = "{prefix} {command}"
+EOF = EMPTY_STRING = ''
+# bytes to ask the channel for at a time
+CHUNK_SIZE = 32768
 
 class SimpleClient(BaseClient):
     """
@@ -38,8 +52,64 @@ class SimpleClient(BaseClient):
         """
         super(SimpleClient, self).__init__(*args, **kwargs)
         self._client = None
+        # so the threads sharing the client don't each build one
+        self.client_lock = threading.RLock()
+        self.broker = BrokerClient()
+        self.policy = ReconnectPolicy()
         return
 
+    @property
+    def breaker(self):
+        """
+        The host's circuit breaker (shared by all the clients for the host)
+        """
+        return CircuitBreaker.get(self.hostname)
+
+    @property
+    def brokered(self):
+        """
+        True if the commands will be run by the ssh broker (so there's no need to connect)
+
+        A client with a password always makes its own connection (the password isn't sent to the broker).
+        """
+        return self.kwargs.get('password') is None and self.broker.available
+
+    def connect(self):
+        """
+        Makes the connection (re-trying it like a command) unless the broker has one
+
+        :raise: UnreachableError if the host can't be reached, CircuitOpenError if the host keeps failing
+        """
+        if not self.brokered:
+            self.policy(self.breaker,
+                        send=lambda: self.client,
+                        errors=(UnreachableError,),
+                        disconnect=self.disconnect)
+        return
+
+    def disconnect(self):
+        """
+        Throws the connection away if it's broken (the reconnect policy's `disconnect`)
+
+        Other threads' channels may be running on the transport, so one that's still active is kept.
+        """
+        with self.client_lock:
+            if self._client is None:
+                return
+            transport = self._client.get_transport()
+            if transport is None or not transport.is_active():
+                self.close()
+        return
+
+    def close(self):
+        """
+        Closes and removes the client (if it exists)
+        """
+        with self.client_lock:
+            super(SimpleClient, self).close()
+        return
+
+
     @property
     def client(self):
         """
@@ -47,18 +117,20 @@ class SimpleClient(BaseClient):
 
         :rtype: paramiko.SSHClient
         :return: An instance of SSHClient connected to remote host.
-        :raise: ClientError if the connection fails.
+        :raise: CameraobscuraError if the login fails, UnreachableError if the host can't be reached
         """
-        if self._client is None:
-            self._client = paramiko.SSHClient()
-            self._client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            self._client.load_system_host_keys()
+        with self.client_lock:
+            if self._client is not None:
+                return self._client
+            client = paramiko.SSHClient()
+            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            client.load_system_host_keys()
             try:
-                self._client.connect(hostname=self.hostname,
-                                     username=self.username,
-                                     timeout=self.timeout,
-                                     port=self.port,
-                                     **self.kwargs)
+                client.connect(hostname=self.hostname,
+                               username=self.username,
+                               timeout=self.timeout,
+                               port=self.port,
+                               **self.kwargs)
 
             # these are fatal exceptions, no one but the main program should catch them
             except paramiko.AuthenticationException as error:
@@ -72,14 +144,15 @@ class SimpleClient(BaseClient):
 
             except socket.timeout as error:
                 self.logger.error(error)
-                raise CameraobscuraError("Paramiko is unable to connect to \n{0}".format(self))
+                raise UnreachableError("Paramiko is unable to connect to \n{0}".format(self))
             
             except socket.error as error:
                 self.logger.error(error)
                 if 'Connection refused' in error: 
-                    raise CameraobscuraError("SSH Server Not responding: check setup:\n {0}".format(self))
-                raise CameraobscuraError("Problem with connection to:\n {0}".format(self))
-        return self._client
+                    raise UnreachableError("SSH Server Not responding: check setup:\n {0}".format(self))
+                raise UnreachableError("Problem with connection to:\n {0}".format(self))
+            self._client = client
+            return client
 
     @property
     def port(self):
@@ -114,6 +187,8 @@ class SimpleClient(BaseClient):
         """
         A pass-through to the SSHClient's exec_command.
 
+        Re-connects and re-sends the command if it couldn't be sent
+
         :param:
 
          - `command`: A string to send to the client.
@@ -122,15 +197,51 @@ class SimpleClient(BaseClient):
         :rtype: tuple
         :return: stdin, stdout, stderr
 
-        :raise: ConnectionError for paramiko or socket exceptions
+        :raise: ConnectionError on a timeout, UnreachableError for other paramiko or socket exceptions, CircuitOpenError if the host keeps failing
         """
         if not command.endswith(NEWLINE):
             command += NEWLINE
+        return self.policy(self.breaker,
+                           send=lambda: self.send(command, timeout),
+                           errors=(ConnectionError, UnreachableError),
+                           disconnect=self.disconnect)
+
+    def send(self, command, timeout=TIMEOUT):
+        """
+        Sends the command (once)
+
+        :param:
+
+         - `command`: A string (ending with a newline) to send to the client.
+         - `timeout`: Set non-blocking timeout.
+
+        :rtype: tuple
+        :return: stdin, stdout, stderr
+
+        :raise: ConnectionError on a timeout, UnreachableError for other paramiko or socket exceptions
+        """
+        timer = LatencyTimer()
         try:
             self.logger.debug("({0}) Sending to paramiko -- '{1}', timeout={2}".format(self,
                                                                                        command,
                                                                                        timeout))
-            return self.client.exec_command(command, timeout=timeout)
+            channel = None
+            if self.brokered:
+                channel = self.broker.exec_command(command, hostname=self.hostname,
+                                                   username=self.username,
+                                                   port=self.port,
+                                                   timeout=timeout,
+                                                   key_filename=self.kwargs.get('key_filename'),
+                                                   connect_timeout=self.timeout)
+            if channel is None:
+                # no broker, use this client's own connection
+                stdin, stdout, stderr = self.client.exec_command(command, timeout=timeout)
+                channel = stdout.channel
+            else:
+                stdin = BrokeredStdin(channel)
+            return (stdin, ChannelOutput(channel, timer=timer),
+                    ChannelOutput(channel, stderr=True))
+
 
         except socket.timeout:
             self.logger.debug("socket timed out")
@@ -139,12 +250,50 @@ class SimpleClient(BaseClient):
         # this catches other socket errors so it should go after any other socket exceptions
         except (socket.error, paramiko.SSHException, AttributeError) as error:
             # the AttributeError is raised if no connection was actually made (probably the wrong IP address)
-            self._client = None
             self.logger.error(error)
-            raise CameraobscuraError("Problem with connection to:\n {0}".format(self))
+            raise UnreachableError("Problem with connection to:\n {0}".format(self))
         return
 # end class SimpleClient
 
+class ChannelOutput(ChunkedLineReader):
+    """
+    A file-like reader of a paramiko channel's output that reads it in large chunks
+    """
+    def __init__(self, channel, stderr=False, chunk_size=CHUNK_SIZE, timer=None):
+        """
+        ChannelOutput constructor
+
+        :param:
+
+         - `channel`: the paramiko Channel the command is running on
+         - `stderr`: if True read the channel's standard error instead of its output
+         - `chunk_size`: the most bytes to ask the channel for at a time
+         - `timer`: LatencyTimer to tell about the output's arrival and end
+        """
+        super(ChannelOutput, self).__init__(read_chunk=self.read_chunk)
+        self.channel = channel
+        self.stderr = stderr
+        self.chunk_size = chunk_size
+        self.timer = timer
+        self.receive = channel.recv_stderr if stderr else channel.recv
+        return
+
+    def read_chunk(self):
+        """
+        Reads a chunk from the channel
+
+        :return: string of output (empty once the channel has no more output)
+        :raise: socket.timeout if nothing arrived within the channel's timeout
+        """
+        chunk = self.receive(self.chunk_size)
+        if self.timer is not None:
+            if chunk:
+                self.timer.received()
+            else:
+                self.timer.finished()
+        return chunk
+# end class ChannelOutput
+
 if __name__ == '__main__':
     import pudb;pudb.set_trace()
     client = SimpleClient('abc', 'def')
\ No newline at end of file
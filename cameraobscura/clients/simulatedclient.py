@@ -0,0 +1,566 @@
+
+# python standard library
+import Queue
+import random
+import re
+import socket
+import StringIO
+import threading
+import time
+
+# this package
+from cameraobscura.clients.clientbase import BaseClient
+
+NEWLINE = '\n'
+EMPTY_STRING = ''
+TIMEOUT = 10
+
+class ChannelModelConstants(object):
+    """
+    Defaults for the channel model
+    """
+    __slots__ = ()
+    # dBm
+    transmit_power = 20
+    # dB lost besides the attenuator
+    path_loss = 40
+    # dBm -- the link is lost below this
+    sensitivity = -82
+    # dBm -- the throughput is at its maximum above this
+    saturation = -50
+    # Mbits/sec
+    maximum_throughput = 300
+    # standard deviation as a fraction of the throughput
+    noise = 0.05
+    # round-trip time for the pings (ms)
+    round_trip_time = 2.0
+# end class ChannelModelConstants
+
+class ChannelModel(object):
+    """
+    A path-loss/throughput curve with noise
+    """
+    def __init__(self, transmit_power=ChannelModelConstants.transmit_power,
+                 path_loss=ChannelModelConstants.path_loss,
+                 sensitivity=ChannelModelConstants.sensitivity,
+                 saturation=ChannelModelConstants.saturation,
+                 maximum_throughput=ChannelModelConstants.maximum_throughput,
+                 noise=ChannelModelConstants.noise,
+                 seed=None):
+        """
+        ChannelModel constructor
+
+        :param:
+
+         - `transmit_power`: transmitted power (dBm)
+         - `path_loss`: loss besides the attenuation (dB)
+         - `sensitivity`: weakest signal that keeps the link (dBm)
+         - `saturation`: weakest signal that gets the maximum throughput (dBm)
+         - `maximum_throughput`: best throughput (Mbits/sec)
+         - `noise`: standard deviation of the samples as a fraction of the throughput
+         - `seed`: seed for the noise (None means it's different every time)
+        """
+        super(ChannelModel, self).__init__()
+        self.transmit_power = transmit_power
+        self.path_loss = path_loss
+        self.sensitivity = sensitivity
+        self.saturation = saturation
+        self.maximum_throughput = maximum_throughput
+        self.noise = noise
+        self.random = random.Random(seed)
+        return
+
+    def rssi(self, attenuation):
+        """
+        The received signal strength
+
+        :param:
+
+         - `attenuation`: the attenuator's setting (dB)
+
+        :return: received signal strength (dBm)
+        """
+        return self.transmit_power - self.path_loss - attenuation
+
+    def connected(self, attenuation):
+        """
+        :return: True if the signal is strong enough to keep the link
+        """
+        return self.rssi(attenuation) >= self.sensitivity
+
+    def throughput(self, attenuation):
+        """
+        The expected (noise-free) throughput
+
+        :return: Mbits/sec (0 if the link is lost)
+        """
+        rssi = self.rssi(attenuation)
+        if rssi < self.sensitivity:
+            return 0.0
+        if rssi >= self.saturation:
+            return float(self.maximum_throughput)
+        return (self.maximum_throughput * (rssi - self.sensitivity)/
+                float(self.saturation - self.sensitivity))
+
+    def sample(self, attenuation):
+        """
+        A noisy throughput
+
+        :return: Mbits/sec (never negative)
+        """
+        expected = self.throughput(attenuation)
+        return max(0.0, self.random.gauss(expected, expected * self.noise))
+# end class ChannelModel
+
+class SimulatedChannel(object):
+    """
+    The process-wide channel that the simulated clients use
+    """
+    model = ChannelModel()
+    attenuator = None
+    # each iperf client puts its (threads, host, reports) here for a server
+    connections = Queue.Queue()
+
+    @classmethod
+    def attach(cls, attenuator, model=None):
+        """
+        Sets the attenuator (and model) the clients use
+
+        :param:
+
+         - `attenuator`: object with an `attenuation` attribute (e.g. MockAttenuator)
+         - `model`: ChannelModel (keeps the current one if None)
+        """
+        cls.attenuator = attenuator
+        if model is not None:
+            cls.model = model
+        return
+
+    @classmethod
+    def attenuation(cls):
+        """
+        The attenuator's current setting (0 if there isn't an attenuator)
+        """
+        return getattr(cls.attenuator, 'attenuation', 0)
+# end class SimulatedChannel
+
+class SimulatedClientConstants(object):
+    """
+    Constants for the simulated client
+    """
+    __slots__ = ()
+    operating_system = 'Linux'
+    iperf_version = 'iperf version 2.0.5 (08 Jul 2010) pthreads'
+    interface = 'wlan0'
+    # a failed ping waits this long (`-W 1`)
+    ping_timeout = 1
+    # iperf's default session time
+    default_time = 10
+    iperf_port = 5001
+    # (real) seconds the server waits to hear from a client
+    server_timeout = 60
+
+    # the iperf options
+    client = re.compile(r'--client\s+(?P<server>\S+)')
+    server = re.compile(r'--server')
+    time = re.compile(r'--time\s+(?P<time>[\d.]+)')
+    interval = re.compile(r'--interval\s+(?P<interval>[\d.]+)')
+    parallel = re.compile(r'--parallel\s+(?P<parallel>\d+)')
+    udp = re.compile(r'--udp')
+    target = re.compile(r'(?P<target>\S+)\s*$')
+
+    header = ('------------------------------------------------------------',
+              '{0}',
+              '------------------------------------------------------------')
+    connected = '[{0:3d}] local {1} port {2} connected with {3} port {4}'
+    columns = '[ ID] Interval       Transfer     Bandwidth'
+    line = '[{0}] {1:4.1f}-{2:4.1f} sec  {3:.1f} MBytes  {4:.1f} Mbits/sec'
+    udp_line = '{0}  0.020 ms    0/{1:5d} (0%)'
+    ping = ('PING {0} ({0}) 56(84) bytes of data.',
+            '64 bytes from {0}: icmp_req=1 ttl=64 time={1:.2f} ms')
+    ping_statistics = ('--- {0} ping statistics ---',
+                       '1 packets transmitted, {1} received, {2}% packet loss, time 0ms')
+    iwconfig = ('{0}     IEEE 802.11abgn  ESSID:"simulated"',
+                '          Bit Rate={1:.1f} Mb/s   Tx-Power={2} dBm',
+                '          Link Quality={3}/70  Signal level={4} dBm')
+# end class SimulatedClientConstants
+
+class SimulatedClient(BaseClient):
+    """
+    A client whose output comes from the simulated channel
+    """
+    def __init__(self, hostname='simulated', username=None, timeout=TIMEOUT, **kwargs):
+        """
+        SimulatedClient constructor
+
+        :param:
+
+         - `hostname`: name used in the output
+         - `username`: not used
+         - `timeout`: not used (kept for compatibility with the other clients)
+         - `kwargs`: ignored (e.g. the password)
+        """
+        super(SimulatedClient, self).__init__(hostname=hostname,
+                                              username=username,
+                                              timeout=timeout,
+                                              **kwargs)
+        self._commands = None
+        return
+
+    @property
+    def client(self):
+        """
+        The channel the output comes from (there is no connection to make)
+        """
+        return SimulatedChannel
+
+    @property
+    def port(self):
+        """
+        There is no port, this is always None
+        """
+        return None
+
+    @port.setter
+    def port(self, new_port):
+        """
+        Ignores the port (the BaseClient sets it)
+        """
+        self._port = None
+        return
+
+    @property
+    def commands(self):
+        """
+        (compiled expression, method) pairs to answer the commands
+        """
+        if self._commands is None:
+            self._commands = [(re.compile(expression), method) for expression, method in
+                              ((r'^echo\s+(?P<text>.*)$', self.echo),
+                               (r'^uname', self.uname),
+                               (r'^which\s+(?P<program>\S+)', self.which),
+                               (r'^iperf\s+--version', self.version),
+                               (r'^iperf\s+--help', self.silent),
+                               (r'^iperf\s', self.iperf),
+                               (r'^pkill\s+(-\d+\s+)?iperf', self.kill_iperf),
+                               (r'^ping\s', self.ping),
+                               (r'^iwconfig', self.iwconfig))]
+        return self._commands
+
+    def exec_command(self, command, timeout=TIMEOUT):
+        """
+        Answers the command
+
+        :param:
+
+         - `command`: A string like the ones sent to the real hosts
+         - `timeout`: not used
+
+        :rtype: tuple
+        :return: stdin, stdout, stderr (stdout and stderr are SimulatedOutput)
+        """
+        command = command.strip()
+        self.logger.debug("Simulating '{0}'".format(command))
+        for expression, method in self.commands:
+            match = expression.search(command)
+            if match:
+                lines = method(command, match)
+                break
+        else:
+            lines = self.silent(command, None)
+        return StringIO.StringIO(), SimulatedOutput(lines), SimulatedOutput(())
+
+    def silent(self, command, match):
+        """
+        :return: no output
+        """
+        return ()
+
+    def echo(self, command, match):
+        """
+        :return: the text to echo
+        """
+        return (match.group('text'),)
+
+    def uname(self, command, match):
+        """
+        :return: the operating system
+        """
+        return (SimulatedClientConstants.operating_system,)
+
+    def which(self, command, match):
+        """
+        :return: a path to the program (every program is installed)
+        """
+        return ('/usr/bin/{0}'.format(match.group('program')),)
+
+    def version(self, command, match):
+        """
+        :return: iperf's version string
+        """
+        return (SimulatedClientConstants.iperf_version,)
+
+    def ping(self, command, match):
+        """
+        A single ping to the target
+
+        :return: the ping's output (without the reply if the link is lost)
+        """
+        target = SimulatedClientConstants.target.search(command).group('target')
+        model = SimulatedChannel.model
+        lines = [SimulatedClientConstants.ping[0].format(target)]
+        if model.connected(SimulatedChannel.attenuation()):
+            time.sleep(ChannelModelConstants.round_trip_time/1000.)
+            lines.append(SimulatedClientConstants.ping[1].format(target,
+                                                                 ChannelModelConstants.round_trip_time))
+            received, loss = 1, 0
+        else:
+            time.sleep(SimulatedClientConstants.ping_timeout)
+            received, loss = 0, 100
+        lines.append(EMPTY_STRING)
+        lines.append(SimulatedClientConstants.ping_statistics[0].format(target))
+        lines.append(SimulatedClientConstants.ping_statistics[1].format(target,
+                                                                        received,
+                                                                        loss))
+        return lines
+
+    def iwconfig(self, command, match):
+        """
+        The wireless interface's state (the RSSI and bit-rate come from the model)
+
+        :return: iwconfig-like output
+        """
+        model = SimulatedChannel.model
+        attenuation = SimulatedChannel.attenuation()
+        rssi = int(round(model.rssi(attenuation)))
+        quality = max(0, min(70, rssi + 110))
+        return [line.format(SimulatedClientConstants.interface,
+                            model.throughput(attenuation) * 2,
+                            model.transmit_power,
+                            quality,
+                            rssi) for line in SimulatedClientConstants.iwconfig]
+
+    def iperf(self, command, match):
+        """
+        An iperf client or server session
+
+        :return: generator of the session's output lines
+        """
+        def option(expression, default, cast=float):
+            found = expression.search(command)
+            return cast(found.groups()[0]) if found else default
+
+        udp = SimulatedClientConstants.udp.search(command) is not None
+        protocol = 'UDP' if udp else 'TCP'
+        if SimulatedClientConstants.server.search(command):
+            return self.server_session(protocol, udp)
+        duration = (option(SimulatedClientConstants.time, None) or
+                    SimulatedClientConstants.default_time)
+        return self.client_session(server=option(SimulatedClientConstants.client, 'server', str),
+                                   protocol=protocol,
+                                   duration=duration,
+                                   interval=option(SimulatedClientConstants.interval, None),
+                                   threads=option(SimulatedClientConstants.parallel, 1, int))
+
+    def connected_lines(self, title, threads, peer):
+        """
+        The lines at the start of a session
+
+        :return: list of the header and the lines for the connected threads
+        """
+        lines = [line.format(title) for line in SimulatedClientConstants.header]
+        lines.extend([SimulatedClientConstants.connected.format(thread + 3, self.hostname,
+                                                                50000 + thread, peer,
+                                                                SimulatedClientConstants.iperf_port)
+                      for thread in xrange(threads)])
+        lines.append(SimulatedClientConstants.columns)
+        return lines
+
+    def client_session(self, server, protocol, duration, interval, threads):
+        """
+        The client's output (it reports the bandwidths to the server)
+
+        :param:
+
+         - `server`: the server's address
+         - `protocol`: 'TCP' or 'UDP'
+         - `duration`: seconds of traffic
+         - `interval`: seconds between reports (None for only the summary)
+         - `threads`: number of parallel threads
+
+        :yield: the next line of output
+        :raise: socket.timeout if the link is lost
+        """
+        reports = Queue.Queue()
+        title = "Client connecting to {0}, {1} port {2}".format(server, protocol,
+                                                               SimulatedClientConstants.iperf_port)
+        SimulatedChannel.connections.put((threads, self.hostname, reports))
+        try:
+            for line in self.connected_lines(title, threads, server):
+                yield line
+
+            step = interval or duration
+            start, total = 0.0, 0.0
+            while start < duration:
+                end = min(start + step, duration)
+                # the client's output takes as long as the session
+                time.sleep(end - start)
+                attenuation = SimulatedChannel.attenuation()
+                if not SimulatedChannel.model.connected(attenuation):
+                    raise socket.timeout("Simulated link lost at attenuation {0}".format(attenuation))
+                bandwidth = SimulatedChannel.model.sample(attenuation)
+                total += bandwidth * (end - start)
+                if interval is not None:
+                    reports.put((start, end, bandwidth))
+                    for line in self.interval_lines(start, end, bandwidth, threads):
+                        yield line
+                start = end
+            reports.put((0.0, duration, total/duration))
+        finally:
+            # the server stops however the client does (even if its output isn't read)
+            reports.put(None)
+        for line in self.interval_lines(0.0, duration, total/duration, threads):
+            yield line
+        return
+
+    def server_session(self, protocol, udp):
+        """
+        The server's output (the bandwidths the client reports)
+
+        :param:
+
+         - `protocol`: 'TCP' or 'UDP'
+         - `udp`: if True, add the jitter and loss columns
+
+        :yield: the next line of output
+        """
+        title = "Server listening on {0} port {1}".format(protocol,
+                                                         SimulatedClientConstants.iperf_port)
+        try:
+            threads, peer, reports = SimulatedChannel.connections.get(timeout=SimulatedClientConstants.server_timeout)
+        except Queue.Empty:
+            self.logger.debug("The simulated server didn't hear from a client")
+            return
+        for line in self.connected_lines(title, threads, peer):
+            yield line
+        # the reports block without a timeout -- in python 2 a timed wait polls
+        # (up to 50 milliseconds late) which adds up over thousands of intervals
+        report = reports.get()
+        while report is not None:
+            for line in self.interval_lines(*report, threads=threads, udp=udp):
+                yield line
+            report = reports.get()
+        return
+
+    def kill_iperf(self, command, match):
+        """
+        Throws away the connections from clients that no server answered
+
+        :return: no output
+        """
+        while True:
+            try:
+                SimulatedChannel.connections.get_nowait()
+            except Queue.Empty:
+                return ()
+
+    def interval_lines(self, start, end, bandwidth, threads, udp=False):
+        """
+        The lines for one interval
+
+        :param:
+
+         - `start`, `end`: the interval (seconds)
+         - `bandwidth`: the total bandwidth (Mbits/sec)
+         - `threads`: number of parallel threads
+         - `udp`: if True, add the (server's) jitter and loss columns
+
+        :return: list of lines (with a [SUM] line if there's more than one thread)
+        """
+        per_thread = bandwidth/threads
+        transfer = per_thread * (end - start)/8
+        identifiers = ['{0:3d}'.format(thread + 3) for thread in xrange(threads)]
+        if threads > 1:
+            identifiers.append('SUM')
+        lines = []
+        for identifier in identifiers:
+            scale = threads if identifier == 'SUM' else 1
+            line = SimulatedClientConstants.line.format(identifier, start, end,
+                                                        transfer * scale,
+                                                        per_thread * scale)
+            if udp:
+                line = SimulatedClientConstants.udp_line.format(line, int(transfer * scale * 713))
+            lines.append(line)
+        return lines
+
+    def close(self):
+        """
+        There's nothing to close
+        """
+        return
+
+    def __str__(self):
+        """
+        :return: string identifying this as a simulated client
+        """
+        return "Simulated Client ({0})".format(self.hostname)
+# end class SimulatedClient
+
+class SimulatedOutput(object):
+    """
+    A file-like reader of simulated output
+    """
+    def __init__(self, lines):
+        """
+        SimulatedOutput constructor
+
+        :param:
+
+         - `lines`: iterable of lines (without newlines)
+        """
+        super(SimulatedOutput, self).__init__()
+        self.lines = iter(lines)
+        self.lock = threading.Lock()
+        return
+
+    def readline(self):
+        """
+        Reads a single line of output
+
+        :return: the next line (empty string at the end)
+        """
+        with self.lock:
+            for line in self.lines:
+                return line + NEWLINE
+        return EMPTY_STRING
+
+    def readlines(self):
+        """
+        :return: list of the remaining lines
+        """
+        return [line for line in self]
+
+    def read(self):
+        """
+        :return: the remaining output as a single string
+        """
+        return EMPTY_STRING.join(self.readlines())
+
+    def __iter__(self):
+        """
+        Traverses the output line by line
+
+        :yield: the next line
+        """
+        line = self.readline()
+        while line:
+            yield line
+            line = self.readline()
+        return
+
+    def close(self):
+        """
+        Does nothing (kept for compatibility)
+        """
+        return
+# end class SimulatedOutput
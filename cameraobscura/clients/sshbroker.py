@@ -0,0 +1,559 @@
+
+# python standard library
+import errno
+import json
+import logging
+import os
+import select
+import socket
+import SocketServer
+import stat
+import struct
+import threading
+
+# third party
+import paramiko
+
+# this package
+from cameraobscura import CameraobscuraError
+
+class BrokerConstants(object):
+    """
+    Constants for the ssh broker
+    """
+    __slots__ = ()
+    environment = 'CAMERAOBSCURA_SSH_BROKER'
+    # the socket's directory goes in the runtime directory (or the home directory)
+    runtime_environment = 'XDG_RUNTIME_DIR'
+    directory = '.cameraobscura'
+    socket_name = 'ssh_broker.sock'
+    directory_permissions = stat.S_IRWXU
+    permissions = stat.S_IRUSR | stat.S_IWUSR
+    # so the socket is created without group or other permissions
+    umask = stat.S_IXUSR | stat.S_IRWXG | stat.S_IRWXO
+    shared = stat.S_IRWXG | stat.S_IRWXO
+    chunk_size = 32768
+    # seconds to wait for the broker to start a command
+    start_timeout = 60
+    # frame kinds
+    request = 'r'
+    started = 's'
+    error = 'e'
+    stdin = '0'
+    stdout = '1'
+    stderr = '2'
+    close_stdin = 'c'
+    exit_status = 'x'
+    header = struct.Struct('!cI')
+# end class BrokerConstants
+
+def broker_path():
+    """
+    The path to the broker's socket
+
+    :return: path from the environment (or the default for this user)
+    """
+    path = os.environ.get(BrokerConstants.environment)
+    if path is not None:
+        return path
+    parent = (os.environ.get(BrokerConstants.runtime_environment) or
+              os.path.expanduser('~'))
+    return os.path.join(parent, BrokerConstants.directory, BrokerConstants.socket_name)
+
+def private(path):
+    """
+    Checks that only this user can get to the path
+
+    :param:
+
+     - `path`: file or directory to check (a symbolic link isn't followed)
+
+    :return: True if the path belongs to this user and has no group or other permissions
+    """
+    try:
+        status = os.lstat(path)
+    except OSError:
+        return False
+    return (status.st_uid == os.getuid() and
+            not status.st_mode & BrokerConstants.shared)
+
+def make_private_directory(path):
+    """
+    Creates the directory for the socket if it isn't there
+
+    :param:
+
+     - `path`: the directory
+
+    :raise: CameraobscuraError if the directory belongs to someone else or others can get into it
+    """
+    try:
+        os.makedirs(path, BrokerConstants.directory_permissions)
+    except OSError as error:
+        if error.errno != errno.EEXIST:
+            raise
+    if not (os.path.isdir(path) and private(path)):
+        raise CameraobscuraError("'{0}' has to be a directory only this user can use".format(path))
+    return
+
+def send_frame(connection, kind, data=''):
+    """
+    Sends a frame
+
+    :param:
+
+     - `connection`: socket to send the frame on
+     - `kind`: one of the BrokerConstants frame kinds
+     - `data`: string to send with it
+    """
+    connection.sendall(BrokerConstants.header.pack(kind, len(data)) + data)
+    return
+
+def receive_exactly(connection, size):
+    """
+    Receives `size` bytes
+
+    :return: string of data (shorter than size if the socket was closed)
+    """
+    chunks = []
+    while size:
+        chunk = connection.recv(size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size -= len(chunk)
+    return ''.join(chunks)
+
+def receive_frame(connection):
+    """
+    Receives a frame
+
+    :param:
+
+     - `connection`: socket to receive the frame from
+
+    :return: (kind, data) -- kind is None if the socket was closed
+    """
+    header = receive_exactly(connection, BrokerConstants.header.size)
+    if len(header) < BrokerConstants.header.size:
+        return None, ''
+    kind, size = BrokerConstants.header.unpack(header)
+    data = receive_exactly(connection, size)
+    if len(data) < size:
+        return None, ''
+    return kind, data
+
+class SSHBroker(SocketServer.ThreadingUnixStreamServer):
+    """
+    A local server that shares one ssh transport per host between processes
+    """
+    daemon_threads = True
+
+    def __init__(self, path=None):
+        """
+        SSHBroker constructor
+
+        :param:
+
+         - `path`: path for the Unix socket (default is broker_path())
+
+        :postcondition: the socket is bound (a stale socket file is replaced)
+        :raise: CameraobscuraError if the directory or an old socket isn't this user's alone
+        """
+        self.path = path if path is not None else broker_path()
+        make_private_directory(os.path.dirname(os.path.abspath(self.path)))
+        if os.path.lexists(self.path):
+            if not (private(self.path) and stat.S_ISSOCK(os.lstat(self.path).st_mode)):
+                raise CameraobscuraError("'{0}' isn't a socket this user's broker left behind".format(self.path))
+            os.remove(self.path)
+        mask = os.umask(BrokerConstants.umask)
+        try:
+            SocketServer.ThreadingUnixStreamServer.__init__(self, self.path, BrokerHandler)
+        finally:
+            os.umask(mask)
+        os.chmod(self.path, BrokerConstants.permissions)
+        self._logger = None
+        self.clients = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+        self.transports = 0
+        self.channels = 0
+        return
+
+    @property
+    def logger(self):
+        """
+        :return: A logging object.
+        """
+        if self._logger is None:
+            self._logger = logging.getLogger("{0}.{1}".format(self.__module__,
+                                  self.__class__.__name__))
+        return self._logger
+
+    def client(self, request):
+        """
+        Gets the connected SSHClient for the request's host
+
+        :param:
+
+         - `request`: dict with hostname, port, username and (optionally) key_filename and timeout
+
+        :return: SSHClient with an active transport
+        """
+        key = (request['hostname'], request['port'], request['username'])
+        with self.lock:
+            lock = self.locks.setdefault(key, threading.Lock())
+        with lock:
+            client = self.clients.get(key)
+            transport = client.get_transport() if client is not None else None
+            if transport is None or not transport.is_active():
+                self.logger.info("Connecting to {2}@{0}:{1}".format(*key))
+                client = paramiko.SSHClient()
+                client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+                client.load_system_host_keys()
+                client.connect(hostname=request['hostname'],
+                               port=request['port'],
+                               username=request['username'],
+                               key_filename=request.get('key_filename'),
+                               timeout=request.get('timeout'))
+                self.clients[key] = client
+                self.transports += 1
+            self.channels += 1
+        return client
+
+    def close(self):
+        """
+        Closes the transports and removes the socket
+        """
+        self.server_close()
+        with self.lock:
+            for client in self.clients.values():
+                client.close()
+            self.clients = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.logger.info("The broker opened {0} transport(s) for {1} channel(s)".format(self.transports,
+                                                                                        self.channels))
+        return
+# end class SSHBroker
+
+class BrokerHandler(SocketServer.BaseRequestHandler):
+    """
+    Runs one command for a client process
+    """
+    def handle(self):
+        """
+        Starts the requested command and relays its frames
+        """
+        kind, data = receive_frame(self.request)
+        if kind != BrokerConstants.request:
+            return
+        request = json.loads(data)
+        try:
+            channel = self.server.client(request).get_transport().open_session()
+            if request.get('get_pty'):
+                channel.get_pty()
+            channel.exec_command(request['command'])
+        # the connections raise socket, paramiko and key-file errors
+        except Exception as error:
+            self.server.logger.warning("{0} failed ({1})".format(request['hostname'], error))
+            send_frame(self.request, BrokerConstants.error,
+                       "{0}: {1}".format(type(error).__name__, error))
+            return
+        send_frame(self.request, BrokerConstants.started)
+        try:
+            self.relay(channel)
+        except socket.error as error:
+            # the client went away
+            self.server.logger.debug(error)
+        finally:
+            channel.close()
+        return
+
+    def relay(self, channel):
+        """
+        Passes the frames between the client and the channel until the command is done
+
+        :param:
+
+         - `channel`: paramiko Channel the command is running on
+        """
+        while True:
+            readable = select.select([self.request, channel], [], [])[0]
+            while channel.recv_ready():
+                send_frame(self.request, BrokerConstants.stdout,
+                           channel.recv(BrokerConstants.chunk_size))
+            while channel.recv_stderr_ready():
+                send_frame(self.request, BrokerConstants.stderr,
+                           channel.recv_stderr(BrokerConstants.chunk_size))
+            if channel.eof_received and not (channel.recv_ready() or
+                                             channel.recv_stderr_ready()):
+                send_frame(self.request, BrokerConstants.exit_status,
+                           str(channel.recv_exit_status()))
+                return
+            if self.request in readable:
+                kind, data = receive_frame(self.request)
+                if kind is None:
+                    return
+                if kind == BrokerConstants.stdin:
+                    channel.sendall(data)
+                elif kind == BrokerConstants.close_stdin:
+                    channel.shutdown_write()
+        return
+# end class BrokerHandler
+
+class BrokeredChannel(object):
+    """
+    A channel-like view of a command the broker is running
+    """
+    def __init__(self, connection, timeout=None):
+        """
+        BrokeredChannel constructor
+
+        :param:
+
+         - `connection`: socket connected to the broker (with the command started)
+         - `timeout`: seconds to wait for output (None means wait forever)
+        """
+        self.connection = connection
+        self.connection.settimeout(timeout)
+        self.buffers = {BrokerConstants.stdout: '', BrokerConstants.stderr: ''}
+        self.exit_status = None
+        self.eof_received = False
+        self.closed = False
+        return
+
+    def settimeout(self, timeout):
+        """
+        Sets the time to wait for output
+        """
+        self.connection.settimeout(timeout)
+        return
+
+    def fileno(self):
+        """
+        The socket's file number (so the channel can be selected)
+        """
+        return self.connection.fileno()
+
+    def read_frame(self):
+        """
+        Reads a frame from the broker into the buffers
+
+        :raise: socket.timeout if nothing arrives within the timeout
+        """
+        kind, data = receive_frame(self.connection)
+        if kind in self.buffers:
+            self.buffers[kind] += data
+        elif kind == BrokerConstants.exit_status:
+            self.exit_status = int(data)
+            self.eof_received = True
+        elif kind is None:
+            # the broker went away
+            self.eof_received = True
+        return
+
+    def poll(self):
+        """
+        Reads the frames that have already arrived
+        """
+        while (not self.eof_received and
+               select.select([self.connection], [], [], 0)[0]):
+            self.read_frame()
+        return
+
+    def receive(self, stream, size):
+        """
+        Receives up to `size` bytes of a stream (waiting for some if there aren't any)
+
+        :return: string of output (empty once the command is done)
+        """
+        while not self.buffers[stream] and not self.eof_received:
+            self.read_frame()
+        data = self.buffers[stream][:size]
+        self.buffers[stream] = self.buffers[stream][size:]
+        return data
+
+    def recv(self, size):
+        """
+        Receives up to `size` bytes of standard output
+        """
+        return self.receive(BrokerConstants.stdout, size)
+
+    def recv_stderr(self, size):
+        """
+        Receives up to `size` bytes of standard error
+        """
+        return self.receive(BrokerConstants.stderr, size)
+
+    def recv_ready(self):
+        """
+        True if there's standard output to receive without waiting
+        """
+        self.poll()
+        return bool(self.buffers[BrokerConstants.stdout])
+
+    def recv_stderr_ready(self):
+        """
+        True if there's standard error to receive without waiting
+        """
+        self.poll()
+        return bool(self.buffers[BrokerConstants.stderr])
+
+    def recv_exit_status(self):
+        """
+        Waits for the command to finish
+
+        :return: the command's exit status (-1 if the broker went away)
+        """
+        while not self.eof_received:
+            self.read_frame()
+        return self.exit_status if self.exit_status is not None else -1
+
+    def sendall(self, data):
+        """
+        Sends data to the command's standard input
+        """
+        send_frame(self.connection, BrokerConstants.stdin, data)
+        return
+
+    def shutdown_write(self):
+        """
+        Closes the command's standard input
+        """
+        send_frame(self.connection, BrokerConstants.close_stdin)
+        return
+
+    def close(self):
+        """
+        Closes the socket (the broker closes the channel)
+        """
+        if not self.closed:
+            self.connection.close()
+            self.closed = True
+        return
+# end class BrokeredChannel
+
+class BrokeredStdin(object):
+    """
+    A file-like standard input for a brokered command
+    """
+    def __init__(self, channel):
+        """
+        BrokeredStdin constructor
+
+        :param:
+
+         - `channel`: the BrokeredChannel
+        """
+        self.channel = channel
+        return
+
+    def write(self, data):
+        """
+        Sends the data to the command
+        """
+        self.channel.sendall(data)
+        return
+
+    def flush(self):
+        """
+        Does nothing (the data is sent when it's written)
+        """
+        return
+
+    def close(self):
+        """
+        Closes the command's standard input
+        """
+        if not self.channel.closed:
+            self.channel.shutdown_write()
+        return
+# end class BrokeredStdin
+
+class BrokerClient(object):
+    """
+    Runs commands through the ssh broker
+    """
+    def __init__(self, path=None):
+        """
+        BrokerClient constructor
+
+        :param:
+
+         - `path`: path to the broker's socket (default is broker_path())
+        """
+        self.path = path if path is not None else broker_path()
+        self._logger = None
+        return
+
+    @property
+    def logger(self):
+        """
+        :return: A logging object.
+        """
+        if self._logger is None:
+            self._logger = logging.getLogger("{0}.{1}".format(self.__module__,
+                                  self.__class__.__name__))
+        return self._logger
+
+    @property
+    def available(self):
+        """
+        True if the broker's socket exists and only this user can get to it (and its directory)
+        """
+        if not self.path:
+            return False
+        try:
+            status = os.lstat(self.path)
+        except OSError:
+            return False
+        if not (stat.S_ISSOCK(status.st_mode) and private(self.path) and
+                private(os.path.dirname(os.path.abspath(self.path)))):
+            self.logger.warning("Not using '{0}', it (or its directory) isn't this user's alone".format(self.path))
+            return False
+        return True
+
+    def exec_command(self, command, hostname, username, port, timeout=None,
+                     key_filename=None, connect_timeout=None, get_pty=False):
+        """
+        Has the broker run the command (the broker logs in with its own keys, never a password)
+
+        :param:
+
+         - `command`: the command to run
+         - `hostname`, `username`, `port`, `key_filename`: the ssh login
+         - `timeout`: seconds to wait for output
+         - `connect_timeout`: seconds the broker waits to connect (if it isn't already)
+         - `get_pty`: if True, run the command in a pseudo-terminal
+
+        :return: BrokeredChannel or None if the broker isn't running
+        :raise: socket.error if the broker couldn't run the command
+        """
+        if not self.available:
+            return None
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            connection.connect(self.path)
+        except socket.error as error:
+            # a socket left behind by a broker that isn't running
+            connection.close()
+            if error.errno in (errno.ECONNREFUSED, errno.ENOENT):
+                self.logger.debug("The ssh broker isn't answering ({0})".format(error))
+                return None
+            raise
+        request = dict(command=command, hostname=hostname, username=username,
+                       port=port, key_filename=key_filename,
+                       timeout=connect_timeout, get_pty=get_pty)
+        try:
+            connection.settimeout(BrokerConstants.start_timeout)
+            send_frame(connection, BrokerConstants.request, json.dumps(request))
+            kind, data = receive_frame(connection)
+        except socket.error:
+            connection.close()
+            raise
+        if kind != BrokerConstants.started:
+            connection.close()
+            raise socket.error(data or "The ssh broker closed the connection")
+        return BrokeredChannel(connection, timeout=timeout)
+# end class BrokerClient
@@ -31,6 +31,8 @@ import paramiko
 # this package
 from theape import BaseClass
 from cameraobscura import CameraobscuraError
+from cameraobscura.clients.simpleclient import ChannelOutput
+from cameraobscura.clients.sshbroker import BrokerClient, BrokeredStdin
 
 SEMICOLON_JOIN = "{0};{1}"
 SUDO = "sudo {0}"
@@ -65,6 +67,7 @@ class SSHConnection(BaseClass):
         self.timeout = timeout
         self._client = None
         self._lock = None
+        self.broker = BrokerClient()
         return
 
     @property
@@ -150,6 +153,19 @@ class SSHConnection(BaseClass):
         """
         if self.prefix is not None:
             command = SPACE_JOIN.format(self.prefix, command)
+        # the broker's transports aren't compressed and the password isn't sent to it
+        if not self.compress and self.password is None:
+            channel = self.broker.exec_command(command, hostname=self.hostname,
+                                               username=self.username,
+                                               port=self.port,
+                                               timeout=timeout,
+                                               key_filename=self.key_filename,
+                                               connect_timeout=self.timeout,
+                                               get_pty=get_pty)
+            if channel is not None:
+                return InOutError(input=BrokeredStdin(channel),
+                                  output=ChannelOutput(channel),
+                                  error=ChannelOutput(channel, stderr=True))
         with self.lock:
             stdin, stdout, stderr = self.client.exec_command(command, bufsize=bufsize,
                                                              timeout=timeout,
@@ -0,0 +1,235 @@
+
+# python standard library
+import argparse
+from collections import namedtuple
+import logging
+import SocketServer
+import telnetlib
+import threading
+import time
+
+# this package
+from cameraobscura.clients.telnetclient import TelnetOutput
+
+class TelnetBenchmarkConstants(object):
+    """
+    Constants for the telnet benchmark
+    """
+    __slots__ = ()
+    default_lines = 20000
+    # bytes per write (a console server passes on a little at a time)
+    default_write_size = 128
+    line = '[  3]  0.0- 0.5 sec  5.62 MBytes  94.4 Mbits/sec'
+    prompt = 'benchmark#'
+    end_of_line = '\r\n'
+    command = 'iperf -c 192.168.20.1 -i 0.5'
+    host = '127.0.0.1'
+    timeout = 5
+    # the readers
+    expect = 'expect'
+    chunked = 'chunked'
+# end class TelnetBenchmarkConstants
+
+TelnetBenchmarkResult = namedtuple('TelnetBenchmarkResult', 'lines seconds lines_per_second')
+
+class FakeTelnetHandler(SocketServer.BaseRequestHandler):
+    """
+    Answers each command with the server's output
+    """
+    def handle(self):
+        """
+        Waits for a command then sends the output in small writes
+        """
+        received = ''
+        while TelnetBenchmarkConstants.end_of_line[-1] not in received:
+            data = self.request.recv(1024)
+            if not data:
+                return
+            received += data
+        output = self.server.output(received.strip())
+        size = self.server.write_size
+        for start in xrange(0, len(output), size):
+            self.request.sendall(output[start:start + size])
+        # a console doesn't hang up after the prompt
+        while self.request.recv(1024):
+            pass
+        return
+# end class FakeTelnetHandler
+
+class FakeTelnetServer(SocketServer.ThreadingTCPServer):
+    """
+    A telnet server on localhost that answers a command with lines and the prompt
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, lines=TelnetBenchmarkConstants.default_lines,
+                 write_size=TelnetBenchmarkConstants.default_write_size):
+        """
+        FakeTelnetServer constructor (binds to a free port)
+
+        :param:
+
+         - `lines`: number of lines to send for each command
+         - `write_size`: bytes to send at a time
+        """
+        SocketServer.ThreadingTCPServer.__init__(self, (TelnetBenchmarkConstants.host, 0),
+                                                 FakeTelnetHandler)
+        self.lines = lines
+        self.write_size = write_size
+        return
+
+    @property
+    def port(self):
+        """
+        The port the server is listening on
+        """
+        return self.server_address[1]
+
+    def output(self, command):
+        """
+        The output for the command (the echoed command, the lines and the prompt)
+        """
+        end_of_line = TelnetBenchmarkConstants.end_of_line
+        line = TelnetBenchmarkConstants.line + end_of_line
+        return command + end_of_line + line * self.lines + TelnetBenchmarkConstants.prompt
+# end class FakeTelnetServer
+
+def expect_lines(client, prompt, end_of_line, timeout):
+    """
+    Reads the lines with one expect call per line
+
+    :return: count of lines read before the prompt
+    """
+    endings = [end_of_line, prompt]
+    lines = 0
+    while True:
+        index, match, text = client.expect(endings, timeout)
+        if index != 0:
+            return lines
+        lines += 1
+
+def chunked_lines(client, prompt, end_of_line, timeout):
+    """
+    Reads the lines with the TelnetOutput
+
+    :return: count of lines read before the prompt
+    """
+    output = TelnetOutput(client=client, prompt=prompt, end_of_line=end_of_line,
+                          timeout=timeout)
+    return sum(1 for line in output if line)
+
+class TelnetBenchmark(object):
+    """
+    Times the telnet readers against a fake telnet server
+    """
+    def __init__(self, lines=TelnetBenchmarkConstants.default_lines,
+                 write_size=TelnetBenchmarkConstants.default_write_size):
+        """
+        TelnetBenchmark constructor
+
+        :param:
+
+         - `lines`: number of lines for the server to send
+         - `write_size`: bytes for the server to send at a time
+        """
+        super(TelnetBenchmark, self).__init__()
+        self._logger = None
+        self.lines = lines
+        self.write_size = write_size
+        return
+
+    @property
+    def logger(self):
+        """
+        :return: A logging object.
+        """
+        if self._logger is None:
+            self._logger = logging.getLogger("{0}.{1}".format(self.__module__,
+                                  self.__class__.__name__))
+        return self._logger
+
+    @property
+    def readers(self):
+        """
+        dict of name: reader function
+        """
+        return {TelnetBenchmarkConstants.expect: expect_lines,
+                TelnetBenchmarkConstants.chunked: chunked_lines}
+
+    def run(self, reader, port):
+        """
+        Sends the command and times the reader
+
+        :param:
+
+         - `reader`: function to read the lines (see expect_lines)
+         - `port`: the fake server's port
+
+        :return: TelnetBenchmarkResult
+        """
+        client = telnetlib.Telnet(TelnetBenchmarkConstants.host, port,
+                                  TelnetBenchmarkConstants.timeout)
+        try:
+            client.write(TelnetBenchmarkConstants.command + TelnetBenchmarkConstants.end_of_line)
+            # eat the echoed command the way the TelnetClient does
+            client.read_until(TelnetBenchmarkConstants.end_of_line,
+                              TelnetBenchmarkConstants.timeout)
+            start = time.time()
+            lines = reader(client, TelnetBenchmarkConstants.prompt,
+                           TelnetBenchmarkConstants.end_of_line,
+                           TelnetBenchmarkConstants.timeout)
+            seconds = time.time() - start
+        finally:
+            client.close()
+        return TelnetBenchmarkResult(lines=lines, seconds=seconds,
+                                     lines_per_second=lines/max(seconds, 1e-9))
+
+    def __call__(self):
+        """
+        Runs the readers
+
+        :return: dict of name: TelnetBenchmarkResult
+        """
+        server = FakeTelnetServer(lines=self.lines, write_size=self.write_size)
+        thread = threading.Thread(target=server.serve_forever,
+                                  name='fake_telnet_server')
+        thread.daemon = True
+        thread.start()
+        results = {}
+        try:
+            for name, reader in sorted(self.readers.iteritems()):
+                results[name] = self.run(reader, server.port)
+                self.logger.info("{0}: {1} lines in {2:.3f} seconds ({3:.0f} lines/second)".format(name,
+                                                                                                  *results[name]))
+                if results[name].lines != self.lines:
+                    self.logger.error("{0} read {1} of {2} lines".format(name,
+                                                                        results[name].lines,
+                                                                        self.lines))
+        finally:
+            server.shutdown()
+            server.server_close()
+        return results
+# end class TelnetBenchmark
+
+def main():
+    """
+    Runs the benchmark from the command-line
+    """
+    parser = argparse.ArgumentParser(description="Telnet read benchmark")
+    parser.add_argument('-l', '--lines', type=int,
+                        default=TelnetBenchmarkConstants.default_lines,
+                        help="Lines for the server to send (default=%(default)s)")
+    parser.add_argument('-w', '--write-size', type=int,
+                        default=TelnetBenchmarkConstants.default_write_size,
+                        help="Bytes for the server to send at a time (default=%(default)s)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    results = TelnetBenchmark(lines=args.lines, write_size=args.write_size)()
+    expect = results[TelnetBenchmarkConstants.expect]
+    chunked = results[TelnetBenchmarkConstants.chunked]
+    print("chunked reader speedup: {0:.1f}x".format(chunked.lines_per_second/expect.lines_per_second))
+    return
+
+if __name__ == '__main__':
+    main()
@@ -2,20 +2,33 @@
 # python Libraries
 import telnetlib
 import re
+import select
+import socket
+import time
 from cStringIO import StringIO
 import random
 import string
 
 # this package
-from theape import BaseClass
 from cameraobscura import CameraobscuraError
 from clientbase import BaseClient
+from cameraobscura.clients.reconnect import CircuitBreaker, ReconnectPolicy
+from cameraobscura.clients.linereader import ChunkedLineReader
+from cameraobscura.utilities.latency import LatencyTimer
 
 NEWLINE = '\n'
 EOF = EMPTY_STRING = ''
 TIMEOUT = -1
 MATCH = 0
 OUTPUT_STRING = 2
+# bytes to read from the socket at a time
+CHUNK_SIZE = 65536
+# telnetlib has to cook blocks with these (IAC, NUL and XON)
+COOKED_CHARACTERS = (telnetlib.IAC, telnetlib.theNULL, '\021')
+# the quotes are split so the echoed command-line doesn't match the echo's output
+SENTINEL = "{0}_{1}"
+ECHO_SENTINEL = "{0}; echo '{1}''_{2}'"
+SEMICOLON_JOIN = '; '
 
 class TelnetClient(BaseClient):
     """
@@ -41,8 +54,16 @@ class TelnetClient(BaseClient):
         self.end_of_line = end_of_line
         self.password_prompt = password_prompt
         self.login_prompt = login_prompt
+        self.policy = ReconnectPolicy()
         return
 
+    @property
+    def breaker(self):
+        """
+        The host's circuit breaker (shared by all the clients for the host)
+        """
+        return CircuitBreaker.get(self.hostname)
+
     @property
     def prompt(self):
         """
@@ -206,11 +227,14 @@ class TelnetClient(BaseClient):
          - `timeout`: The readline timeout
 
         :return: TelnetOutput with the this object's as client
+        :raise: socket.error or EOFError if the command couldn't be sent, CircuitOpenError if the host keeps failing
         """
-        self.client.timeout = timeout
         command = command.rstrip('\n')
-        self.logger.debug("Existing output: " + self.client.read_very_eager())
-        self.writeline(command)
+        timer = LatencyTimer()
+        self.policy(self.breaker,
+                    send=lambda: self.send(command, timeout),
+                    errors=(socket.error, EOFError),
+                    disconnect=self.close)
 
         # eat up the command itself so it's not in the output
 
@@ -226,8 +250,58 @@ class TelnetClient(BaseClient):
         output = self.client.expect([expression, '\r\n'], timeout=timeout)
         self.logger.debug(output)
         return (None, TelnetOutput(client=self.client, prompt=self.prompt,
-                                   timeout=timeout, end_of_line=self.end_of_line),
+                                   timeout=timeout, end_of_line=self.end_of_line,
+                                   timer=timer),
                                    StringIO(''))
+
+    def send(self, command, timeout=None):
+        """
+        Flushes the existing output and sends the command (once)
+
+        :param:
+
+         - `command`: The command to execute on the device
+         - `timeout`: The readline timeout
+        """
+        self.client.timeout = timeout
+        self.logger.debug("Existing output: " + self.client.read_very_eager())
+        self.writeline(command)
+        return
+
+    def exec_batch(self, commands, timeout=None):
+        """
+        Sends the commands as one line and splits the output back up
+
+        Each command is followed by an echo of a sentinel so the output can be
+        split at the sentinels (a command that's missing its sentinel gets
+        whatever output was read before the prompt or timeout)
+
+        :param:
+
+         - `commands`: list of commands to execute on the device
+         - `timeout`: The readline timeout
+
+        :return: list of (None, stdout, stderr) tuples (in the order of the commands)
+        """
+        token = "".join(random.choice(string.letters) for character in xrange(12))
+        line = SEMICOLON_JOIN.join(ECHO_SENTINEL.format(command.rstrip('\n'), token, index)
+                                   for index, command in enumerate(commands))
+        stdin, stdout, stderr = self.exec_command(line, timeout=timeout)
+        outputs = [[] for command in commands]
+        index = 0
+        # this reads to the prompt even after the last sentinel so the next command starts clean
+        for output_line in stdout:
+            if index == len(commands):
+                continue
+            if output_line.rstrip() == SENTINEL.format(token, index):
+                index += 1
+            else:
+                outputs[index].append(output_line)
+        if index < len(commands):
+            self.logger.warning("Only {0} of {1} batched commands finished".format(index,
+                                                                                 len(commands)))
+        return [(None, StringIO(EMPTY_STRING.join(output)), StringIO(''))
+                for output in outputs]
                                    
     def writeline(self, message=""):
         """
@@ -248,69 +322,140 @@ class TelnetClient(BaseClient):
 
 # end class TelnetClient
 
-MATCH_INDEX = 0
-MATCHING_STRING = 2
-TIMEOUT_INDEX = -1
-
-class TelnetOutput(BaseClass):
+class TelnetOutput(ChunkedLineReader):
     """
     The TelnetOutput converts the telnet output to a file-like object
     """
-    def __init__(self, client, prompt="#", end_of_line='\r\n',timeout=10):
+    def __init__(self, client, prompt="#", end_of_line='\r\n',timeout=10, timer=None):
         """
         :param:
 
          - `client` : a connected telnet client
-         - `prompt`: The current prompt on the client
+         - `prompt`: The current prompt on the client (a regular expression)
          - `end_of_line`: Then end of line character
-         - `timeout`: The readline timeout
+         - `timeout`: The readline timeout (None means wait forever)
+         - `timer`: LatencyTimer to tell about the output's arrival and end
         """
-        super(TelnetOutput, self).__init__()
+        super(TelnetOutput, self).__init__(read_chunk=self.read_chunk,
+                                           newline=end_of_line)
         self.client = client
         self.prompt = prompt
         self.end_of_line = end_of_line
         self.timeout = timeout
-        self.endings = [end_of_line, prompt]
-        self.line_ending_index = 0
-        self.prompt_index = 1
-        self.finished = False
+        self.prompt_expression = re.compile(prompt)
+        # where the un-terminated last line in the buffer starts
+        self.line_start = 0
+        self.prompted = False
+        self.timer = timer
         return
 
-    def readline(self):
+    def read_socket(self):
         """
-        Reads a single line of output
-        
-        :param:
+        Reads a block of output straight from the socket
 
-         - `timeout`: The readline timeout
-         
-        :return: The next line of text
+        telnetlib reads 50 bytes at a time and cooks the output one character at
+        a time, so it only gets the blocks with telnet commands (or characters it strips) in them
+
+        :return: string of output (may be empty if it was all telnet negotiation)
+        :raise: EOFError if the connection was closed
+        """
+        chunk = self.client.sock.recv(CHUNK_SIZE)
+        if not chunk:
+            raise EOFError("telnet connection closed")
+        # a telnet command can be split between blocks
+        if (self.client.iacseq or self.client.sb or
+            any(character in chunk for character in COOKED_CHARACTERS)):
+            self.client.rawq += chunk
+            self.client.process_rawq()
+            return self.client.read_very_lazy()
+        return chunk
+
+    def read_chunk(self):
         """
-        self.logger.debug("calling expect with endings: {0} and timeout: {1}".format(self.endings,
-                                                                                         self.timeout))
+        Reads whatever output has arrived (waiting up to the timeout for some)
+
+        :return: string of output or None if it timed out or the connection closed
+        """
+        if self.timeout is not None:
+            end_time = time.time() + self.timeout
         try:
-            output = self.client.expect(self.endings, self.timeout)
-        except AttributeError as error:
+            # first whatever telnetlib has already read (e.g. after the command's echo)
+            self.client.process_rawq()
+            chunk = self.client.read_very_lazy()
+            while not chunk:
+                if self.timeout is None:
+                    wait = None
+                else:
+                    wait = end_time - time.time()
+                    if wait <= 0:
+                        self.logger.warning("Output timed out without reaching the prompt")
+                        return None
+                if select.select([self.client], [], [], wait)[0]:
+                    chunk = self.read_socket()
+        except (AttributeError, TypeError, ValueError, EOFError,
+                socket.error, select.error) as error:
+            # the client was closed
             self.logger.debug(error)
             self.logger.debug('client already closed?')
-            return EOF
-
-        if output[MATCH_INDEX] == self.prompt_index:
-            # matched the prompt, this output is finished
-            self.logger.debug("Stopping on : " + output[MATCHING_STRING])
-            return EOF
-        if output[MATCH_INDEX] == self.line_ending_index:
-            self.logger.debug("Matched line ending")
-            return output[MATCHING_STRING]
-        if output[MATCH_INDEX] == TIMEOUT_INDEX:
-            # should this be an end of file?
-            self.logger.warning("Output timed out without reaching the prompt")
-            return EOF
-        else:
-            # this should never be reached -- something bad has happened
-            self.logger.error(output)
-            raise CameraobscuraError("There is a bug in the TelnetOutput. So sad.")
-        return 
+            return None
+        return chunk
+
+    def feed(self, chunk):
+        """
+        Adds a chunk to the buffer and tells the timer about it
+
+        If the output stops (timed out or closed) before the prompt, the
+        unfinished last line is dropped (it's probably a prompt that didn't match)
+
+        :param:
+
+         - `chunk`: string of output (None if there's no more)
+
+        :return: False if the output is finished
+        """
+        if not chunk:
+            del self.buffer[self.line_start:]
+            self.searched = min(self.searched, self.line_start)
+        fed = super(TelnetOutput, self).feed(chunk)
+        if self.timer is not None:
+            if fed:
+                self.timer.received()
+            if self.finished:
+                self.timer.finished()
+        return fed
+
+    def add(self, chunk):
+        """
+        Adds output to the buffer and checks if the last (partial) line is the prompt
+
+        :param:
+
+         - `chunk`: string of output read from the connection
+
+        :postcondition: finished and prompted are True if the prompt came
+        """
+        self.line_start -= self.position
+        super(TelnetOutput, self).add(chunk)
+        line_start = self.buffer.rfind(self.end_of_line, self.line_start)
+        if line_start != -1:
+            self.line_start = line_start + len(self.end_of_line)
+        if self.prompt_expression.search(str(self.buffer[self.line_start:])):
+            # the prompt's line isn't part of the output
+            del self.buffer[self.line_start:]
+            self.searched = min(self.searched, self.line_start)
+            self.prompted = self.finished = True
+        return
+
+    def read_available(self):
+        """
+        Reads the complete lines that are in the buffer (without reading the connection)
+
+        :return: string of lines (EOF if there aren't any)
+        """
+        output = str(self.buffer[self.position:self.line_start])
+        self.position = self.line_start
+        self.searched = max(self.searched, self.position)
+        return output
 
     def next(self):
         """
@@ -324,31 +469,9 @@ class TelnetOutput(BaseClass):
             yield line
         return
 
-    def readlines(self):
-        """
-        Reads all the lines
-        
-        :return: A list of lines
-        """
-        lines = []
-        line = None
-        while line is not EOF:
-            line = self.readline()
-            lines.append(line)
-        return lines
-
-    def read(self):
-        """
-        Same as readlines but joins the lines into a string
-        
-        :return: String of output
-        
-        """
-        return EMPTY_STRING.join(self.readlines())
-
     def __iter__(self):
         """
         The main interface, traverses output line by line
         """
         return self.next()
-# end class TelnetOutput
\ No newline at end of file
+# end class TelnetOutput
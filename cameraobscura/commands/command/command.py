@@ -5,6 +5,7 @@ import socket
 
 # this package
 from cameraobscura import CameraobscuraError
+from cameraobscura.clients.simpleclient import ChannelOutput
 from theape import BaseClass
 
 START_OF_STRING = r'^'
@@ -209,7 +210,38 @@ class TheCommand(BaseClass):
         """
         stdin, stdout, stderr = self.connection.exec_command(self.command_arguments,
                                                              timeout=self.timeout)
+        return self.parse(stdout, stderr)
+
+    def submit(self, loop):
+        """
+        Submits the command to an event loop instead of waiting for it
+
+        :param:
+
+         - `loop`: EventLoop to run the command on
+
+        :return: Pending whose result is the data (like the __call__'s return value)
+        """
+        return loop.submit(self.connection, self.command_arguments,
+                           timeout=self.timeout, parse=self.parse)
+
+    @socketerrors
+    def parse(self, stdout, stderr):
+        """
+        Extracts the data from the command's output (e.g. from a batch of commands)
+
+        :param:
+
+         - `stdout`: file-like iterator of output lines
+         - `stderr`: file-like iterator of error lines
+
+        :raise: CameraobscuraError if data matched but no group found
+        """
         data = self.not_available
+        # an ssh host's ChannelOutput comes wrapped in a PermitOutput
+        if isinstance(getattr(stdout, 'output', stdout), ChannelOutput):
+            # search the lines in the channel's buffer without copying them
+            stdout = stdout.lines()
         for line in stdout:
             self.logger.debug(line)
             match = self.data_expression.search(line)
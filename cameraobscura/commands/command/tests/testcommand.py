@@ -12,6 +12,7 @@ from mock import Mock
 # this package
 from cameraobscura import CameraobscuraError
 from cameraobscura.commands.command.command import TheCommand, CommandConstants
+from cameraobscura.clients.simpleclient import ChannelOutput
 from cameraobscura.tests.helpers import random_string_of_letters
 
 
@@ -190,4 +191,16 @@ class TestTheCommand(unittest.TestCase):
         self.command.trap_errors = True
         self.assertEqual(self.not_available, self.command())
         return
+
+    def test_channel_output(self):
+        """
+        Does it search an ssh channel's lines and return a copy of the match?
+        """
+        channel = Mock()
+        channel.recv.side_effect = ['noise\nSignal lev', 'el=-64 dBm\n', '']
+        self.command.data_expression = r'level=(-\d+)'
+        result = self.command.parse(ChannelOutput(channel), StringIO(''))
+        self.assertEqual('-64', result)
+        self.assertIsInstance(result, str)
+        return
 # end TestTheCommand    
@@ -21,7 +21,9 @@ from iperflexer import MAXIMUM_BANDWITH
 from cameraobscura import BLUE_BOLD_RESET
 from cameraobscura import CameraobscuraError
 from iperfsettings import IperfConstants, IperfServerSettings, IperfClientSettings
+from stepresult import StepResult
 import cameraobscura.utilities.file_writer
+from cameraobscura.utilities.phasetimer import PhaseTimer, PhaseConstants
 from cameraobscura.common.baseconfiguration import BaseConfiguration
 from cameraobscura.common.errors import ConfigurationError
 
@@ -30,6 +32,9 @@ WRITEABLE = 'w'
 IPERF = 'iperf {0}'
 CLIENT_PREFIX = 'client_'
 SERVER_PREFIX = 'server_'
+# seconds to wait for the server's output to be parsed after it's closed
+SERVER_JOIN_TIMEOUT = 5
+SERVER_THREAD = 'server_thread'
 
 ClientServer = namedtuple('ClientServer', 'client server'.split())
 
@@ -38,7 +43,7 @@ class Iperf(object):
     A runner of iperf tests
     """
     def __init__(self, dut, traffic_server, client_settings, server_settings,
-                 parser=None, summary=None):
+                 parser=None, summary=None, timer=None, post_processor=None):
         """
         Iperf Constructor
 
@@ -50,6 +55,8 @@ class Iperf(object):
          - `server_settings: an IperfServerSettings instance
          - `parser`: parser for the iperf output
          - `summary` : converter for bandwidths
+         - `timer`: PhaseTimer to record the time spent in each phase
+         - `post_processor`: PostProcessor to save the parsed values in the background
         """
         super(Iperf, self).__init__()
         self._logger = None
@@ -64,7 +71,15 @@ class Iperf(object):
         self.parser = parser
         self.client_summary = None
         self.server_summary = None
+        self.client_result = None
+        self.server_result = None
         self.summary = summary
+        self.writer_statistics = {}
+        self._timer = timer
+        self.post_processor = post_processor
+        # set when the client's command has been sent (e.g. to start an attenuation ramp)
+        self.client_started = threading.Event()
+        self.server_thread = None
         return
 
     @property
@@ -78,6 +93,15 @@ class Iperf(object):
         return self._logger
 
 
+    @property
+    def timer(self):
+        """
+        A PhaseTimer to record how long the phases of the session take
+        """
+        if self._timer is None:
+            self._timer = PhaseTimer()
+        return self._timer
+
     @property
     def event_timer(self):
         """
@@ -103,6 +127,13 @@ class Iperf(object):
                                                                server=self.traffic_server)}
         return self._client_server
 
+    @property
+    def server_finished(self):
+        """
+        True if the server's output has been parsed (its thread isn't still running)
+        """
+        return self.server_thread is None or not self.server_thread.is_alive()
+
     @property
     def udp(self):
         """
@@ -132,14 +163,19 @@ class Iperf(object):
         """
         # get the client and server for the given directon
         client_server = self.client_server[direction]
+        self.client_started.clear()
+        # so a session that doesn't finish can't leave the last one's values behind
+        self.client_summary = self.server_summary = None
+        self.client_result = self.server_result = None
 
         # this could be done with tuple-unpacking but I'm trying to get rid of ordering mix-ups
         client, server = client_server.client, client_server.server
         
         # try to kill all the iperf sessions
         self.logger.info(BLUE_BOLD_RESET.format("** Killing Iperf Processes **"))
-        client.kill_all('iperf')
-        server.kill_all('iperf')
+        with self.timer.span('kill_all'):
+            client.kill_all('iperf')
+            server.kill_all('iperf')
 
         # add the direction and protocol to the filename
         if self.udp:
@@ -160,7 +196,8 @@ class Iperf(object):
         else:
             self.logger.info("Traffic Server (client) -> DUT (iperf server)")
         self.logger.info(BLUE_BOLD_RESET.format("** Starting the Server **"))
-        self.start_server(server, filename)
+        with self.timer.span('start_server'):
+            self.start_server(server, filename)
         self.logger.info(BLUE_BOLD_RESET.format("** Starting the Client **"))
         self.run_client(client, filename)
 
@@ -170,12 +207,18 @@ class Iperf(object):
         self.logger.info("Closing the connection ({0}) so interactive connections won't block input".format(server))
 
         # there seems to be a race condition with the telnet client running in a thread and the closing of the server
-        self.logger.info('sleeping for 1 second to let the server output finish')
-        time.sleep(1)
-        self.stop = True
-        self.logger.info('sleeping for a second so the server finishes')
-        time.sleep(1)        
-        server.close()
+        with self.timer.span('teardown'):
+            self.logger.info('sleeping for 1 second to let the server output finish')
+            time.sleep(1)
+            self.stop = True
+            self.logger.info('sleeping for a second so the server finishes')
+            time.sleep(1)        
+            server.close()
+            # the server's summary is set by its thread once its output is parsed
+            if self.server_thread is not None:
+                self.server_thread.join(SERVER_JOIN_TIMEOUT)
+            if self.server_thread is not None and self.server_thread.is_alive():
+                self.logger.warning("The server's output wasn't finished after {0} seconds".format(SERVER_JOIN_TIMEOUT))
         return
 
     def downstream(self, filename):
@@ -214,6 +257,7 @@ class Iperf(object):
          - `verbose`: if True, emit output as it appears
          - `timeout`: readline timeout -- set to None for servers or it will raise an error
 
+        :return: StepResult with the parsed output
         :raise: socket.timeout if the readline timeout is exceeded
         """
         # the parser is created here so that the client and server don't clash with each other
@@ -231,50 +275,70 @@ class Iperf(object):
                                               maximum=MAXIMUM_BANDWITH,
                                               threads=int(self.client_settings.parallel))
     
+        # the per-thread values are only kept if there's more than one thread
+        result = StepResult(name=os.path.basename(filename))
+        per_thread = int(self.client_settings.parallel) > 1
+
         folder, base_filename = os.path.split(filename)
         self.stop = False
 
+        # the raw output is logged (at debug) and saved by the writer's thread
+        # so that a slow disk doesn't slow down the reading of the output
         with open(filename, WRITEABLE) as opened:
-            writer = cameraobscura.utilities.file_writer.LogWriter(logger=self.logger.debug,
-                                                                    open_file=opened,
-                                                                    expression=None)
-            command = IPERF.format(settings)
-            self.logger.info(command)
-
-            stdin, stdout, stderr = host.exec_command(command, timeout=timeout)
-
-            for line in stdout:
-                writer.write(line)
-                self.logger.debug(line)                
-                bandwidth = parser(line)
-                if bandwidth and verbose:
-                    self.logger.info("Bandwidth: {0} {1}".format(bandwidth, parser.units))
-                sums(line)
-
-                if self.stop:
-                    writer.write(line)            
-                    break
+            with cameraobscura.utilities.file_writer.QueuedLogWriter(logger=self.logger.debug,
+                                                                     open_file=opened,
+                                                                     expression=None) as writer:
+                command = IPERF.format(settings)
+                self.logger.info(command)
+
+                result.started = time.time()
+                stdin, stdout, stderr = host.exec_command(command, timeout=timeout)
+                if settings is self.client_settings:
+                    self.client_started.set()
+
+                for line in stdout:
+                    writer.write(line)
+                    bandwidth = parser(line)
+                    if bandwidth and verbose:
+                        self.logger.info("Bandwidth: {0} {1}".format(bandwidth, parser.units))
+                    sums(line)
+                    if per_thread:
+                        result.add_thread(parser, parser.search(line))
+
+                    if self.stop:
+                        break
+        self.log_writer_statistics(settings, writer.statistics)
 
         # so many hacks...
         folder = folder.replace('raw', 'parsed')
         if not os.path.isdir(folder):
             os.makedirs(folder)
 
-        output = os.path.join(folder, '{0}.csv'.format(base_filename))
-        with open(output, 'w') as csv_output:
-            bandwidths = []
-            for bandwidth in parser.bandwidths:
-                csv_output.write('{0}\n'.format(bandwidth))
-                bandwidths.append(bandwidth)
+        result = StepResult.from_parser(name=base_filename,
+                                        parser=parser,
+                                        result=result)
         if self.summary:
-            summary = self.summary(bandwidths)
+            result.summary = self.summary(result.bandwidths)
+        else:
+            result.summary = sums.last_line_bandwidth
+        # the parsed values are saved once, as a single binary file
+        # (by the post-processor, if there is one, so the next step doesn't wait for it)
+        if self.post_processor is not None:
+            self.post_processor.submit(result.save, os.path.join(folder, base_filename))
         else:
-            summary = sums.last_line_bandwidth
-            
+            result.save(os.path.join(folder, base_filename))
+
         if "Client" in settings.__class__.__name__:
-            self.client_summary = summary
+            self.client_summary = result.summary
+            self.client_result = result
         elif "Server" in settings.__class__.__name__:
-            self.server_summary = summary
+            current = threading.current_thread()
+            if current.name == SERVER_THREAD and current is not self.server_thread:
+                # a server thread left over from an earlier session
+                self.logger.warning("Discarding a late server summary ({0})".format(result.summary))
+                return result
+            self.server_summary = result.summary
+            self.server_result = result
         else:
             raise CameraobscuraError('unknown settings type: {0}'.format(settings.__class__.__name__))
 
@@ -284,6 +348,26 @@ class Iperf(object):
                 # so it's changed to debug until a solution is found
                 # (the errors are because closing the client doesn't seem to send a EOF)
                 self.logger.debug("Iperf.run ({0}) error: {1}".format(settings, line))
+        return result
+
+    def log_writer_statistics(self, settings, statistics):
+        """
+        Logs the raw-output writer's counts (as a warning if the reader had to wait for the writer)
+
+        :param:
+
+         - `settings`: the settings used for the iperf session
+         - `statistics`: WriterStatistics from the writer
+        """
+        message = "Raw output ({0}) -- lines: {1}, blocked: {2}, maximum queue depth: {3}".format(settings.__class__.__name__,
+                                                                                                 statistics.lines,
+                                                                                                 statistics.blocked,
+                                                                                                 statistics.maximum_depth)
+        if statistics.blocked:
+            self.logger.warning(message)
+        else:
+            self.logger.debug(message)
+        self.writer_statistics[settings.__class__.__name__] = statistics
         return
 
     def start_server(self, server, filename):
@@ -303,7 +387,7 @@ class Iperf(object):
 
         # start the thread
         self.server_thread = threading.Thread(target=self.run,
-                                              name='server_thread',
+                                              name=SERVER_THREAD,
                                               kwargs={'host':server,
                                                       'settings':self.server_settings,
                                                       'filename':filename,
@@ -331,7 +415,8 @@ class Iperf(object):
         filename = os.path.join(path, CLIENT_PREFIX + filename)
 
         # run it
-        self.event_timer.wait()
+        with self.timer.span('wait_for_server'):
+            self.event_timer.wait()
         # for slow connections (especially on telnet and serial -- the timeout has to be longer than the interval)
         # but sometimes the user doesn't set it -- so this has gotten convoluted
         # why doesn't everyone implement ssh?
@@ -345,18 +430,24 @@ class Iperf(object):
         else:
             timeout = max(self.client_settings.get('time'), 10) *1.5
         self.logger.info("Setting client's readline timeout to {0} seconds".format(timeout))
-        self.run(host=client, filename=filename,
-                 settings=self.client_settings,
-                 timeout=timeout,
-                 verbose=not self.udp)
+        # this is the only part of the session that is traffic
+        with self.timer.span('run_client', category=PhaseConstants.traffic):
+            self.run(host=client, filename=filename,
+                     settings=self.client_settings,
+                     timeout=timeout,
+                     verbose=not self.udp)
         return
 
     def version(self, connection):
         """
-        Runs iperf with the version flag
+        Runs iperf with the version flag (or gets it from the host-facts)
 
         :return: whatever iperf outputs
         """
+        facts = getattr(connection, 'facts', None)
+        if facts is not None and facts.iperf_version:
+            return facts.iperf_version
+
         stdin, stdout, stderr = connection.exec_command(IPERF.format('--version'))
 
         output = "".join([line for line in stdout])
@@ -0,0 +1,208 @@
+
+# python standard library
+from collections import namedtuple
+
+# third party
+import numpy
+from iperflexer.iperfexpressions import ParserKeys
+
+# numpy adds this to the filename if it isn't there
+EXTENSION = '.npz'
+UNITS = 'Mbits'
+
+StepStatistics = namedtuple('StepStatistics',
+                            'count minimum maximum mean median standard_deviation')
+
+class StepResult(object):
+    """
+    A holder of the parsed iperf output for one step
+    """
+    def __init__(self, name, units=UNITS, summary=None, intervals=(),
+                 bandwidths=(), transfers=(), thread_ids=(),
+                 thread_intervals=(), thread_bandwidths=(), started=None):
+        """
+        StepResult constructor
+
+        :param:
+
+         - `name`: identifier for the result (e.g. the raw-output file's name)
+         - `units`: the units for the bandwidths
+         - `summary`: the single value used for the step (e.g. iperf's final sum)
+         - `intervals`: sequence of interval start times
+         - `bandwidths`: sequence of bandwidths (one for each interval)
+         - `transfers`: sequence of transfers (one for each interval)
+         - `thread_ids`: sequence of thread-ids for the per-thread values
+         - `thread_intervals`: sequence of interval start times for the thread values
+         - `thread_bandwidths`: sequence of per-thread bandwidths
+         - `started`: time (seconds since the epoch) the iperf session was started
+        """
+        super(StepResult, self).__init__()
+        self.name = name
+        self.units = units
+        self.summary = summary
+        self.intervals = numpy.array(intervals, dtype=float)
+        self.bandwidths = numpy.array(bandwidths, dtype=float)
+        self.transfers = numpy.array(transfers, dtype=float)
+        self._thread_ids = list(thread_ids)
+        self._thread_intervals = list(thread_intervals)
+        self._thread_bandwidths = list(thread_bandwidths)
+        self.started = started
+        self._threads = None
+        self._statistics = None
+        return
+
+    @classmethod
+    def from_parser(cls, name, parser, summary=None, result=None):
+        """
+        Creates (or fills) a StepResult using the parser's intervals
+
+        :param:
+
+         - `name`: identifier for the result
+         - `parser`: IperfParser that has finished parsing the output
+         - `summary`: value to use as the step's summary
+         - `result`: StepResult with thread-values already added (optional)
+
+        :return: StepResult with the parser's sums
+        """
+        if result is None:
+            result = cls(name=name)
+        result.name = name
+        result.units = parser.units
+        result.summary = summary
+        intervals = sorted(parser.intervals)
+        result.intervals = numpy.array(intervals, dtype=float)
+        result.bandwidths = numpy.fromiter((parser.intervals[interval]
+                                            for interval in intervals),
+                                           dtype=float, count=len(intervals))
+        result.transfers = numpy.fromiter((parser.transfer_intervals[interval]
+                                           for interval in intervals),
+                                          dtype=float, count=len(intervals))
+        result._statistics = None
+        return result
+
+    def add_thread(self, parser, match):
+        """
+        Adds a single thread's interval value
+
+        :param:
+
+         - `parser`: the IperfParser (to validate and convert the match)
+         - `match`: groupdict returned by parser.search
+        """
+        if match is None or not parser.valid(match):
+            return
+        self._thread_ids.append(int(match[ParserKeys.thread]))
+        self._thread_intervals.append(float(match[ParserKeys.start]))
+        self._thread_bandwidths.append(parser.bandwidth(match))
+        self._threads = None
+        return
+
+    @property
+    def threads(self):
+        """
+        The per-thread bandwidths
+
+        :return: dict of thread-id: array of bandwidths (in interval order)
+        """
+        if self._threads is None:
+            self._threads = {}
+            for thread in sorted(set(self._thread_ids)):
+                values = sorted((interval, bandwidth)
+                                for thread_id, interval, bandwidth in zip(self._thread_ids,
+                                                                          self._thread_intervals,
+                                                                          self._thread_bandwidths)
+                                if thread_id == thread)
+                self._threads[thread] = numpy.array([bandwidth for interval, bandwidth in values],
+                                                    dtype=float)
+        return self._threads
+
+    @property
+    def statistics(self):
+        """
+        Summary statistics for the interval bandwidths
+
+        :rtype: StepStatistics
+        :return: the statistics (all None if there were no intervals)
+        """
+        if self._statistics is None:
+            if not len(self.bandwidths):
+                self._statistics = StepStatistics(count=0, minimum=None,
+                                                  maximum=None, mean=None,
+                                                  median=None,
+                                                  standard_deviation=None)
+            else:
+                self._statistics = StepStatistics(count=len(self.bandwidths),
+                                                  minimum=self.bandwidths.min(),
+                                                  maximum=self.bandwidths.max(),
+                                                  mean=self.bandwidths.mean(),
+                                                  median=numpy.median(self.bandwidths),
+                                                  standard_deviation=self.bandwidths.std())
+        return self._statistics
+
+    def save(self, filename):
+        """
+        Saves the values to a single binary (numpy) file
+
+        :param:
+
+         - `filename`: path to the file (`.npz` is added if it's missing)
+
+        :return: the name of the file that was saved
+        """
+        if not filename.endswith(EXTENSION):
+            filename += EXTENSION
+        summary = numpy.nan if self.summary is None else self.summary
+        started = numpy.nan if self.started is None else self.started
+        numpy.savez(filename,
+                    name=numpy.array(self.name),
+                    units=numpy.array(self.units),
+                    summary=numpy.array(summary, dtype=float),
+                    intervals=self.intervals,
+                    bandwidths=self.bandwidths,
+                    transfers=self.transfers,
+                    thread_ids=numpy.array(self._thread_ids, dtype=int),
+                    thread_intervals=numpy.array(self._thread_intervals, dtype=float),
+                    thread_bandwidths=numpy.array(self._thread_bandwidths, dtype=float),
+                    started=numpy.array(started, dtype=float))
+        return filename
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Loads a saved StepResult
+
+        :param:
+
+         - `filename`: path to a file created by `save`
+
+        :return: StepResult with the saved values
+        """
+        loaded = numpy.load(filename)
+        try:
+            summary = float(loaded['summary'])
+            if numpy.isnan(summary):
+                summary = None
+            # files saved before the start-time was kept don't have it
+            started = None
+            if 'started' in loaded.files and not numpy.isnan(loaded['started']):
+                started = float(loaded['started'])
+            return cls(name=str(loaded['name']),
+                       units=str(loaded['units']),
+                       summary=summary,
+                       intervals=loaded['intervals'],
+                       bandwidths=loaded['bandwidths'],
+                       transfers=loaded['transfers'],
+                       thread_ids=loaded['thread_ids'].tolist(),
+                       thread_intervals=loaded['thread_intervals'].tolist(),
+                       thread_bandwidths=loaded['thread_bandwidths'].tolist(),
+                       started=started)
+        finally:
+            loaded.close()
+
+    def __str__(self):
+        """
+        :return: the name and the summary
+        """
+        return "{0}: {1} {2}".format(self.name, self.summary, self.units)
+# end class StepResult
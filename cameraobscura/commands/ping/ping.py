@@ -1,16 +1,18 @@
 
 # python standard library
 import re
+import socket
 import time
 import logging
 
 # third-party
 from theape.parts.connections.clientbase import handlesocketerrors
-from theape.parts.command.command import TheCommand
 
 
 # this package
 from cameraobscura import CameraobscuraError
+from cameraobscura.commands.command.command import TheCommand
+from cameraobscura.clients.eventloop import Pending
 
 class Ping(object):
     """
@@ -116,11 +118,17 @@ class Ping(object):
     @handlesocketerrors
     def operating_system(self):
         """
-        If this isn't set, tries to use `uname` to discover the operating system
+        If this isn't set, uses the connection's host-facts or tries to use `uname` to discover the operating system
         
         :return: string representing the operating system        
         """
         if self._operating_system is None:
+            # the host-facts are cached so this saves a trip to the device
+            facts = getattr(self.connection, 'facts', None)
+            if facts is not None and facts.operating_system in PingConstants.known_operating_systems:
+                self._operating_system = facts.operating_system
+                self.logger.info("Setting Operating System to: '{0}' (from the host-facts)".format(self._operating_system))
+                return self._operating_system
             # I don't like this, but it was the way the old code was doing it
             stdin, stdout, stderr = self.connection.exec_command('uname', timeout=1)
             
@@ -147,22 +155,103 @@ class Ping(object):
         successes = 0
 
         while time.time() < stop_time:
-            match = self.command()
-            if match:
-                successes += 1
-                self.logger.info("{d} pinged target ({t}) -- {s} out of {total} rtt: {r} ms".format(t=self.target,
-                                                                                                    d=self.connection.test_interface,
-                                                                                                    s=successes,
-                                                                                                    total=self.threshold,
-                                                                                                    r=match))
-                
-            if successes == self.threshold:
-                return True
-            if match is None:
-                self.logger.info("Failed ping attempt, setting successes to 0")
-                successes = 0
+            for match in self.pings(self.threshold - successes):
+                successes = self.tally(match, successes)
+                if successes == self.threshold:
+                    return True
         return False
 
+    def tally(self, match, successes):
+        """
+        Counts a ping
+
+        :param:
+
+         - `match`: the ping command's output (the rtt if it succeeded)
+         - `successes`: the consecutive successes before this ping
+
+        :return: the consecutive successes including this ping
+        """
+        if match:
+            successes += 1
+            self.logger.info("{d} pinged target ({t}) -- {s} out of {total} rtt: {r} ms".format(t=self.target,
+                                                                                                d=self.connection.test_interface,
+                                                                                                s=successes,
+                                                                                                total=self.threshold,
+                                                                                                r=match))
+        if match is None:
+            self.logger.info("Failed ping attempt, setting successes to 0")
+            successes = 0
+        return successes
+
+    def submit(self, loop):
+        """
+        Submits the pings to an event loop (each one is submitted when the last is done)
+
+        :param:
+
+         - `loop`: EventLoop to run the pings on
+
+        :return: Pending whose result is True if the threshold was reached
+        """
+        stop_time = time.time() + self.timeout
+        pinged = Pending("ping {0}".format(self.target))
+        counter = {'successes': 0}
+
+        def ping(pending=None):
+            if pending is not None:
+                if pending.error is not None:
+                    pinged.set_result(error=pending.error)
+                    return
+                counter['successes'] = self.tally(pending.result, counter['successes'])
+                if counter['successes'] == self.threshold:
+                    pinged.set_result(True)
+                    return
+            if time.time() >= stop_time:
+                pinged.set_result(False)
+                return
+            self.command.submit(loop).add_callback(ping)
+            return
+        ping()
+        return pinged
+
+    def pings(self, count):
+        """
+        Sends the pings (all at once if the connection is batched, otherwise just one)
+
+        :param:
+
+         - `count`: the number of pings still needed
+
+        :return: list of matches (not_available for the failed pings)
+        :raise: CameraobscuraError on a socket error if not trapping errors
+        """
+        if count < 2 or getattr(self.connection, 'batched', False) is not True:
+            return [self.command()]
+        try:
+            outputs = self.connection.exec_batch([self.command.command_arguments] * count,
+                                                 timeout=self.timeout)
+        except socket.error as error:
+            self.logger.error("{0}: Error with connection to {1}".format(type(error),
+                                                                        self.connection))
+            if not self.trap_errors:
+                raise CameraobscuraError("Problem with connection executing '{0}'".format(self.command.command_arguments))
+            return [self.command.not_available]
+        return [self.command.parse(stdout, stderr) for stdin, stdout, stderr in outputs]
+
+    def probe(self):
+        """
+        Sends a single ping (doesn't wait for the threshold)
+
+        :return: True if the target answered
+        """
+        match = self.command()
+        if match:
+            self.logger.debug("{d} pinged target ({t}) -- rtt: {r} ms".format(t=self.target,
+                                                                            d=self.connection.test_interface,
+                                                                            r=match))
+        return bool(match)
+
     def check_rep(self):
         """
         Does a check of parameters
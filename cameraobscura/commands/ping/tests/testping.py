@@ -100,6 +100,20 @@ class TestPing(unittest.TestCase):
             self.ping()
         return
 
+    def test_probe(self):
+        """
+        Does the probe send just one ping?
+        """
+        self.ping._logger = Mock()
+        test_line = '64 bytes from pc-in-f147.1e100.net (74.125.28.147): icmp_req=1 ttl=44 time=13.7 ms'
+        self.connection.exec_command.return_value = None, [test_line], StringIO('')
+        self.assertTrue(self.ping.probe())
+        self.assertEqual(1, self.connection.exec_command.call_count)
+
+        self.connection.exec_command.return_value = None, '', ''
+        self.assertFalse(self.ping.probe())
+        return
+
     def test_command(self):
         """
         Does it construct a valid command?
@@ -0,0 +1,183 @@
+
+# python standard library
+import logging
+import pipes
+import random
+import re
+import socket
+import string
+from cStringIO import StringIO
+
+# this package
+from cameraobscura import CameraobscuraError
+
+class AgentConstants(object):
+    """
+    Constants for the sampling agent
+    """
+    __slots__ = ()
+    request = 'sample\n'
+    quit = 'quit\n'
+    token_length = 12
+    # the parts of the script
+    start = ('errors=$(mktemp 2>/dev/null || echo /tmp/cameraobscura_agent_$$)\n'
+             'while read request; do\n'
+             '  [ "$request" = "quit" ] && break\n')
+    command = ("  printf '\\n{t} out {i}\\n'\n"
+               "  {{ {c}\n  }} </dev/null 2>\"$errors\"\n"
+               "  printf '\\n{t} err {i}\\n'\n"
+               "  cat \"$errors\"\n")
+    end = ("  printf '\\n{t} end\\n'\n"
+           'done\n'
+           'rm -f "$errors"\n')
+    run = 'sh -c {0}'
+    marker = r'\n{0} (out|err|end) ?(\d*)\n'
+    end_line = '{0} end\n'
+    out = 'out'
+    err = 'err'
+# end class AgentConstants
+
+class SamplingAgent(object):
+    """
+    A shell loop on the device that runs the query commands on request
+    """
+    def __init__(self, connection, commands, timeout=None):
+        """
+        SamplingAgent constructor
+
+        :param:
+
+         - `connection`: connection whose exec_command returns a writeable stdin
+         - `commands`: dict of field: command string
+         - `timeout`: readline timeout for the agent's output
+        """
+        super(SamplingAgent, self).__init__()
+        self._logger = None
+        self._script = None
+        self.connection = connection
+        self.commands = commands
+        self.timeout = timeout
+        self.token = "".join(random.choice(string.letters)
+                             for character in xrange(AgentConstants.token_length))
+        self.marker = re.compile(AgentConstants.marker.format(self.token))
+        self.stdin = None
+        self.stdout = None
+        return
+
+    @property
+    def logger(self):
+        """
+        :return: A logging object.
+        """
+        if self._logger is None:
+            self._logger = logging.getLogger("{0}.{1}".format(self.__module__,
+                                  self.__class__.__name__))
+        return self._logger
+
+    @property
+    def fields(self):
+        """
+        The fields in the order the agent runs their commands
+        """
+        return sorted(self.commands)
+
+    @property
+    def script(self):
+        """
+        The agent's shell script
+        """
+        if self._script is None:
+            commands = "".join(AgentConstants.command.format(t=self.token, i=index,
+                                                              c=self.commands[field].strip())
+                               for index, field in enumerate(self.fields))
+            self._script = (AgentConstants.start + commands +
+                            AgentConstants.end.format(t=self.token))
+        return self._script
+
+    @property
+    def running(self):
+        """
+        True if the agent has been started (and not stopped)
+        """
+        return self.stdout is not None
+
+    def start(self):
+        """
+        Starts the agent on the connection
+
+        :raise: CameraobscuraError if the connection has no stdin to send requests on
+        """
+        self.logger.debug("Starting the sampling agent for {0}".format(", ".join(self.fields)))
+        stdin, stdout, stderr = self.connection.exec_command(AgentConstants.run.format(pipes.quote(self.script)),
+                                                             timeout=self.timeout)
+        if stdin is None:
+            raise CameraobscuraError("The sampling agent needs a connection with a stdin")
+        self.stdin, self.stdout = stdin, stdout
+        return
+
+    def request(self):
+        """
+        Asks the agent to run the commands
+
+        :return: dict of field: (stdout, stderr) file-like outputs
+        :raise: socket.error if the agent fails (it's stopped so the next request restarts it)
+        """
+        if not self.running:
+            self.start()
+        end_line = AgentConstants.end_line.format(self.token)
+        lines = []
+        try:
+            self.stdin.write(AgentConstants.request)
+            self.stdin.flush()
+            line = self.stdout.readline()
+            while line != end_line:
+                if not line:
+                    raise socket.error("The sampling agent stopped before the end of the sample")
+                lines.append(line)
+                line = self.stdout.readline()
+        except (socket.error, IOError) as error:
+            self.stop()
+            if not isinstance(error, socket.error):
+                error = socket.error(error)
+            raise error
+        return self.split("".join(lines) + end_line)
+
+    def split(self, output):
+        """
+        Splits the agent's output up by command
+
+        :param:
+
+         - `output`: one sample's output, from the first marker to the end marker
+
+        :return: dict of field: (stdout, stderr) file-like outputs
+        """
+        outputs = dict((field, {}) for field in self.fields)
+        fields = self.fields
+        # split gives [before the first marker, stream, index, text, stream, index, text...]
+        parts = self.marker.split(output)
+        for stream, index, text in zip(parts[1::3], parts[2::3], parts[3::3]):
+            if index:
+                outputs[fields[int(index)]][stream] = text
+        return dict((field, (StringIO(outputs[field].get(AgentConstants.out, '')),
+                             StringIO(outputs[field].get(AgentConstants.err, ''))))
+                    for field in fields)
+
+    def stop(self):
+        """
+        Tells the agent to quit and closes its channel
+        """
+        if self.stdin is not None:
+            try:
+                self.stdin.write(AgentConstants.quit)
+                self.stdin.flush()
+                self.stdin.close()
+            except (socket.error, IOError, ValueError) as error:
+                self.logger.debug(error)
+        if self.stdout is not None:
+            channel = getattr(self.stdout, 'channel', None)
+            if channel is not None:
+                channel.close()
+        self.stdin = self.stdout = None
+        return
+# end class SamplingAgent
@@ -3,13 +3,17 @@
 import logging
 import time
 import textwrap
-from threading import RLock
+from threading import Lock, RLock, BoundedSemaphore
 
 # this package
-from theape.parts.connections.fakeclient import FakeClient
-from theape.parts.connections.simpleclient import SimpleClient
-from theape.parts.connections.telnetclient import TelnetClient
-
+from cameraobscura.clients.fakeclient import FakeClient
+from cameraobscura.clients.simpleclient import SimpleClient
+from cameraobscura.clients.telnetclient import TelnetClient
+from cameraobscura.clients.localclient import LocalClient
+from cameraobscura.clients.simulatedclient import SimulatedClient
+from cameraobscura.hosts.hostfacts import HostFactsProbe, HostFactsCache, HostFactsConstants
+from cameraobscura.hosts.agent import SamplingAgent
+from cameraobscura.utilities.latency import EXEC_LATENCY, LatencyTimer
 from cameraobscura import CameraobscuraError
 from cameraobscura.common.baseconfiguration import BaseConfiguration
 
@@ -22,17 +26,130 @@ class HostConstants(object):
     ssh = 'ssh'
     telnet = 'telnet'
     fake = 'fake'
+    local = 'local'
+    simulated = 'simulated'
+
+    # these can run commands on separate channels over one connection
+    multiplexed = (ssh,)
+    default_max_channels = 8
+    # these can send a batch of commands in one round-trip
+    batched = (telnet,)
 
     prefix_command = '{p} {c}'
+    identity = '{t}:{u}@{h}:{p}'
 # end HostConstants
 
+class PermitOutput(object):
+    """
+    A file-like output that gives back its host's channel permit once it's been read to the end
+    """
+    def __init__(self, output, release):
+        """
+        PermitOutput constructor
+
+        :param:
+
+         - `output`: the command's stdout
+         - `release`: function that gives back the permit (called once)
+        """
+        self.output = output
+        self._release = release
+        self.released = False
+        self.lock = Lock()
+        return
+
+    def release(self):
+        """
+        Gives back the permit (if it hasn't been already)
+        """
+        with self.lock:
+            if self.released:
+                return
+            self.released = True
+        self._release()
+        return
+
+    def readline(self):
+        """
+        Reads a line (giving back the permit at the end of the output or on an error)
+
+        :return: the next line (empty string at the end of the output)
+        """
+        try:
+            line = self.output.readline()
+        except:
+            self.release()
+            raise
+        if not line:
+            self.release()
+        return line
+
+    def readlines(self):
+        """
+        Reads all the lines
+        """
+        return list(self)
+
+    def read(self):
+        """
+        Reads all of the output
+        """
+        try:
+            return self.output.read()
+        finally:
+            self.release()
+
+    def __iter__(self):
+        """
+        Traverses the output line by line
+        """
+        line = self.readline()
+        while line:
+            yield line
+            line = self.readline()
+        return
+
+    def lines(self):
+        """
+        Traverses the lines with the wrapped output's `lines` (e.g. ChannelOutput.lines)
+        """
+        try:
+            for line in self.output.lines():
+                yield line
+        finally:
+            self.release()
+        return
+
+    def close(self):
+        """
+        Gives back the permit and closes the output (if it can be closed)
+        """
+        self.release()
+        close = getattr(self.output, 'close', None)
+        if close is not None:
+            close()
+        return
+
+    def __getattr__(self, attribute):
+        """
+        Gets anything else from the wrapped output
+        """
+        return getattr(self.output, attribute)
+
+    def __del__(self):
+        # an output that was dropped before it was finished
+        self.release()
+        return
+# end class PermitOutput
+
 class TheHost(object):
     """
     The main host used to build the other hosts
     """
     def __init__(self, hostname, test_interface, username=None, timeout=1, prefix=None, 
                  operating_system='linux', connection_type=HostConstants.ssh,
-                 **kwargs):
+                 facts_ttl=HostFactsConstants.default_ttl,
+                 max_channels=HostConstants.default_max_channels, **kwargs):
         """
         TheHost Constructor
 
@@ -45,6 +162,8 @@ class TheHost(object):
          - `prefix`: string to add to every command sent to the connection
          - `operating_system`: os to help commands predict syntax
          - `connection_type`: Identifier for the connection (see HostConstants)
+         - `facts_ttl`: seconds to keep the probed host-facts (0 means always probe)
+         - `max_channels`: most commands to run at once on a multiplexed (ssh) connection
          - `kwargs`: extra parameters for connections other than the SimpleClient
         """
         super(TheHost, self).__init__()
@@ -56,12 +175,18 @@ class TheHost(object):
         self.prefix = prefix
         self.operating_system = operating_system
         self.connection_type = connection_type
+        self.facts_ttl = facts_ttl
+        self.max_channels = max_channels
         self.kwargs = kwargs
+        self.latencies = EXEC_LATENCY
 
         # properties
         self._client = None
         self._client_constructors = None
         self._lock = None
+        self._channels = None
+        self._facts = None
+        self._agents = {}
 
         # backward compatibility
         self.ControlInterface = hostname
@@ -83,12 +208,35 @@ class TheHost(object):
     @property
     def lock(self):
         """
-        A re-entrant lock to protect the exec-command calls
+        A re-entrant lock to protect the exec-command calls (only the connecting, if multiplexed)
         """
         if self._lock is None:
             self._lock = RLock()
         return self._lock
 
+    @property
+    def multiplexed(self):
+        """
+        True if the connection can run commands on separate channels at the same time
+        """
+        return self.connection_type in HostConstants.multiplexed
+
+    @property
+    def batched(self):
+        """
+        True if the connection has an `exec_batch` to send many commands at once
+        """
+        return self.connection_type in HostConstants.batched
+
+    @property
+    def channels(self):
+        """
+        A semaphore that limits the commands running at once to `max_channels`
+        """
+        if self._channels is None:
+            self._channels = BoundedSemaphore(self.max_channels)
+        return self._channels
+
     @property
     def client(self):
         """
@@ -101,6 +249,36 @@ class TheHost(object):
                                                                           **self.kwargs)
         return self._client
 
+    @property
+    def identity(self):
+        """
+        A string to identify the host in the facts-cache
+        """
+        return HostConstants.identity.format(t=self.connection_type,
+                                             u=self.username,
+                                             h=self.hostname,
+                                             p=self.kwargs.get('port', self.prefix))
+
+    @property
+    def facts(self):
+        """
+        The (cached) HostFacts for this host
+
+        :return: HostFacts from the cache or a probe of the host
+        """
+        if self._facts is None:
+            probe = HostFactsProbe(cache=HostFactsCache(ttl=self.facts_ttl))
+            self._facts = probe.facts(self)
+        return self._facts
+
+    @facts.setter
+    def facts(self, facts):
+        """
+        Sets the facts (e.g. when the warm-up probed several hosts at once)
+        """
+        self._facts = facts
+        return
+
     @property
     def client_constructors(self):
         """
@@ -109,8 +287,10 @@ class TheHost(object):
         :return: dict of type:class definition objects
         """
         if self._client_constructors is None:
-            self._client_constructors = dict(zip((HostConstants.ssh, HostConstants.telnet, HostConstants.fake),
-                                                 (SimpleClient, TelnetClient, FakeClient)))
+            self._client_constructors = dict(zip((HostConstants.ssh, HostConstants.telnet, HostConstants.fake,
+                                                  HostConstants.local, HostConstants.simulated),
+                                                 (SimpleClient, TelnetClient, FakeClient, LocalClient,
+                                                  SimulatedClient)))
         return self._client_constructors
 
     def exec_command(self, command, timeout=1):
@@ -123,35 +303,174 @@ class TheHost(object):
          - `timeout`: Timeout for reading from the socket (set to None for output that will be empty for a while)
 
         :rtype: Tuple
-        :return: Stdin, Stdout, Stderr
+        :return: Stdin, Stdout, Stderr (the stdout's latencies are recorded once it's read)
         """
+        name = self.latencies.name(command)
         if self.prefix is not None:
             command = HostConstants.prefix_command.format(p=self.prefix,
                                                           c=command)
+        if self.multiplexed:
+            self.channels.acquire()
+            try:
+                self.connect()
+                timer = LatencyTimer()
+                # each command opens its own channel on the shared transport
+                outputs = self.timed(name, timer, self.client.exec_command(command,
+                                                                           timeout=timeout))
+            except:
+                self.channels.release()
+                raise
+            if not (isinstance(outputs, tuple) and len(outputs) == 3):
+                self.channels.release()
+                return outputs
+            # the channel counts against max_channels until its output is finished
+            stdin, stdout, stderr = outputs
+            return stdin, PermitOutput(stdout, self.channels.release), stderr
         with self.lock:
-            return self.client.exec_command(command,
-                                        timeout=timeout)
+            timer = LatencyTimer()
+            return self.timed(name, timer, self.client.exec_command(command,
+                                                                    timeout=timeout))
+
+    def timed(self, name, timer, outputs):
+        """
+        Has the exec latencies of the command's stdout recorded
+
+        :param:
+
+         - `name`: the command's name
+         - `timer`: LatencyTimer started when the command was sent
+         - `outputs`: the client's (stdin, stdout, stderr)
+
+        :return: (stdin, stdout, stderr) with the stdout timed (anything else is returned as is)
+        """
+        if not (isinstance(outputs, tuple) and len(outputs) == 3):
+            return outputs
+        stdin, stdout, stderr = outputs
+        return stdin, self.latencies.watch(self.identity, name, stdout, timer), stderr
 
     # backwards compatibility
     Run = exec_command
+
+    def exec_batch(self, commands, timeout=1):
+        """
+        Sends the commands (with the prefix) in one round-trip (only for batched connections)
+
+        :param:
+
+         - `commands`: list of command strings
+         - `timeout`: readline timeout
+
+        :return: list of (stdin, stdout, stderr) tuples in the order of the commands
+        """
+        if self.prefix is not None:
+            commands = [HostConstants.prefix_command.format(p=self.prefix, c=command)
+                        for command in commands]
+        with self.lock:
+            # the output's all read before the lock is released
+            return self.client.exec_batch(commands, timeout=timeout)
+
+    def connect(self):
+        """
+        Makes the client's connection if it hasn't been made
+
+        The client connects on first use, so this serializes the transport set-up
+        for threads that share the host (the channels are opened without the lock)
+        """
+        with self.lock:
+            if self.multiplexed:
+                # the ssh client re-tries (and skips connecting if the broker has the connection)
+                self.client.connect()
+            else:
+                self.client.client
+        return
+
+    def clone(self):
+        """
+        Builds a host with the same parameters but its own connection (and lock)
+
+        :return: TheHost (not connected until it's used)
+        """
+        host = TheHost(hostname=self.hostname,
+                       test_interface=self.test_interface,
+                       username=self.username,
+                       timeout=self.timeout,
+                       prefix=self.prefix,
+                       operating_system=self.operating_system,
+                       connection_type=self.connection_type,
+                       facts_ttl=self.facts_ttl,
+                       max_channels=self.max_channels,
+                       **self.kwargs)
+        host.facts = self._facts
+        return host
     
     def close(self):
         """
         Closes the client and sets it to None
         """
+        for agent in self._agents.values():
+            agent.stop()
+        self._agents = {}
         if self._client is not None:
             # so it doesn't create it by mistake
             self.client.close()
             self._client = None
         return
 
+    def agent(self, commands, timeout=None):
+        """
+        Gets the sampling agent for the commands (the same agent each time)
+
+        :param:
+
+         - `commands`: dict of field: command string
+         - `timeout`: readline timeout for the agent's output
+
+        :return: SamplingAgent (started when it's first asked for a sample)
+        """
+        key = tuple(sorted(commands.items()))
+        with self.lock:
+            if key not in self._agents:
+                self._agents[key] = SamplingAgent(connection=self, commands=commands,
+                                                  timeout=timeout)
+            return self._agents[key]
+
     def kill_all(self, process):
         """
         Kills all the process instances on the remote client. 
 
+        Uses `pkill` if the host-facts say the host has it, otherwise kills each process-id found with `ps`
+
         :postcondition: kill command on all process id's that match 'process' string on remote host.
         :raise: CameraobscuraError if couldn't kill process
         """
+        if self.facts.pkill:
+            # one command instead of one per process
+            command = 'pkill -9 {0}'.format(process)
+            self.logger.debug(command)
+            stdin, stdout, stderr = self.exec_command(command)
+            self.check_stderr(stderr)
+        else:
+            self.kill_each(process)
+        stdin, stdout, stderr = self.exec_command("ps -e | grep {0}".format(process))
+        for line in stdout:
+            self.logger.debug(line)
+            if process in line and 'grep' not in line:
+                self.logger.error(line)                
+                raise CameraobscuraError("Unable to kill process '{0}' on '{1}'".format(process,
+                                                                                     self.client))
+        self.check_stderr(stderr)
+        return
+
+    def kill_each(self, process):
+        """
+        Finds the process-ids with `ps` and kills them one at a time
+
+        :param:
+
+         - `process`: name of the process to kill
+
+        :raise: CameraobscuraError if the kill isn't permitted
+        """
         stdin, stdout, stderr = self.exec_command("ps -e | grep {0}".format(process))
         
         for line in stdout:
@@ -167,14 +486,6 @@ class TheHost(object):
                 raise CameraobscuraError("Unable to kill process '{0}' on {1}".format(process,
                                                                                    self.client))
         self.check_stderr(stderr)
-        stdin, stdout, stderr = self.exec_command("ps -e | grep {0}".format(process))
-        for line in stdout:
-            self.logger.debug(line)
-            if process in line and 'grep' not in line:
-                self.logger.error(line)                
-                raise CameraobscuraError("Unable to kill process '{0}' on '{1}'".format(process,
-                                                                                     self.client))
-        self.check_stderr(stderr)
         return
 
     def check_stderr(self, stderr):
@@ -215,14 +526,18 @@ class HostEnum(object):
     timeout = 'timeout'
     prefix = 'prefix'
     operating_system = 'operating_system'
+    facts_ttl = 'facts_ttl'
+    max_channels = 'max_channels'
 
     options = (control_ip, password, connection_type, test_ip, username,
-               port, timeout, prefix, operating_system)
+               port, timeout, prefix, operating_system, facts_ttl, max_channels)
     # defaults
     default_port = 22
     default_type = 'ssh'
     default_timeout = 1
     default_operating_system = 'linux'
+    default_facts_ttl = HostFactsConstants.default_ttl
+    default_max_channels = HostConstants.default_max_channels
 # end HostEnum
 
 class HostConfiguration(BaseConfiguration):
@@ -251,6 +566,8 @@ class HostConfiguration(BaseConfiguration):
         self._timeout = None
         self._prefix = None
         self._operating_system = None
+        self._facts_ttl = None
+        self._max_channels = None
         self._kwargs = None
         return
 
@@ -271,7 +588,8 @@ class HostConfiguration(BaseConfiguration):
             # address of the control-interface 
             control_ip = 192.168.10.34
 
-            # this identifies the type (only 'telnet', 'ssh', or 'fake')
+            # this identifies the type (only 'telnet', 'ssh', 'local', 'simulated' or 'fake')
+            # use 'local' if the device is the machine running this code
             #connection_type = {connection_type}
 
             # address of the interface to test
@@ -290,6 +608,15 @@ class HostConfiguration(BaseConfiguration):
             
             # operating_system = {operating_system}
 
+            # the operating system, iperf version, etc. are checked once and
+            # kept for this many seconds (set it to 0 to check every time)
+            #facts_ttl = {facts_ttl}
+
+            # ssh connections run commands (e.g. the queries) at the same time
+            # on separate channels -- this is the most at once
+            #max_channels = {max_channels}
+
+
             # there are too many options for the different connection-types
             # so you can add necessary parameters but make sure the name
             # matches the parameter name
@@ -298,7 +625,9 @@ class HostConfiguration(BaseConfiguration):
             """.format(section=self.section,
                        connection_type=HostEnum.default_type,
                        timeout=HostEnum.default_timeout,
-                       operating_system=HostEnum.default_operating_system))
+                       operating_system=HostEnum.default_operating_system,
+                       facts_ttl=HostEnum.default_facts_ttl,
+                       max_channels=HostEnum.default_max_channels))
         return self._example
 
     @property
@@ -333,7 +662,7 @@ class HostConfiguration(BaseConfiguration):
     @property
     def connection_type(self):
         """
-        One of 'ssh' or'telnet'
+        One of 'ssh', 'telnet', 'local', 'simulated' or 'fake'
 
         """
         if self._connection_type is None:
@@ -386,11 +715,13 @@ class HostConfiguration(BaseConfiguration):
         """
         Gets the login username for the device
 
-        :raise: ConfigParser.NoOptionError if option not in configuration
+        :raise: ConfigParser.NoOptionError if option not in configuration (and not a local connection)
         """
         if self._username is None:
+            # local connections don't log in
             self._username = self.configuration.get(section=self.section,
-                                                    option=HostEnum.username)
+                                                    option=HostEnum.username,
+                                                    optional=self.connection_type == HostConstants.local)
         return self._username
 
     @property
@@ -405,6 +736,35 @@ class HostConfiguration(BaseConfiguration):
                                                             default=HostEnum.default_operating_system)
         return self._operating_system
 
+    @property
+    def facts_ttl(self):
+        """
+        Gets the seconds to keep the probed host-facts
+
+        :rtype: Float
+        :return: time-to-live for the cached facts (0 means don't cache)
+        """
+        if self._facts_ttl is None:
+            self._facts_ttl = self.configuration.getfloat(section=self.section,
+                                                          option=HostEnum.facts_ttl,
+                                                          optional=True,
+                                                          default=HostEnum.default_facts_ttl)
+        return self._facts_ttl
+
+    @property
+    def max_channels(self):
+        """
+        Gets the most commands to run at once on an ssh connection
+
+        :rtype: Integer
+        """
+        if self._max_channels is None:
+            self._max_channels = self.configuration.getint(section=self.section,
+                                                           option=HostEnum.max_channels,
+                                                           optional=True,
+                                                           default=HostEnum.default_max_channels)
+        return self._max_channels
+
     @property
     def kwargs(self):
         """
@@ -421,6 +781,8 @@ class HostConfiguration(BaseConfiguration):
         Sets the properties to None
         """
         self._operating_system = None
+        self._facts_ttl = None
+        self._max_channels = None
         self._prefix = None
         self._timeout = None
         self._port = None
@@ -441,6 +803,7 @@ class HostConfiguration(BaseConfiguration):
         if self.timeout is not None:
             # a timeout of 0 or less will timeout before you can get output
             assert self.timeout > 0, "Timeout must be greater than 0, not {0}".format(self.timeout)
+        assert self.max_channels > 0, "max_channels must be greater than 0, not {0}".format(self.max_channels)
         if self.connection_type in "ssh telnet".split():
             assert self.control_ip is not None, "If not using serial, the control_ip needs to be set"
         return
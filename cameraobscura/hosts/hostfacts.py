@@ -0,0 +1,272 @@
+
+# python standard library
+from collections import namedtuple
+import json
+import logging
+import os
+import re
+import socket
+import tempfile
+import threading
+import time
+
+# this package
+from cameraobscura import CameraobscuraError
+
+
+class HostFactsConstants(object):
+    """
+    Constants for the host-facts
+    """
+    __slots__ = ()
+    # the cache
+    default_filename = os.path.join(os.path.expanduser('~'), '.cameraobscura',
+                                    'host_facts.json')
+    # seconds (one day)
+    default_ttl = 86400
+    timestamp = 'timestamp'
+
+    # the probes
+    uname = 'uname'
+    iperf_version = 'iperf --version'
+    iperf_help = 'iperf --help'
+    pkill = 'which pkill'
+    iperf3 = 'iperf 3'
+    # what `iperf --version` starts with if iperf is there (iperf 2 says 'iperf version 2...')
+    version_expression = re.compile(r'^iperf\s+(version\s+)?\d', re.IGNORECASE)
+    enhanced_reports = '--enhancedreports'
+    timeout = 5
+# end class HostFactsConstants
+
+HostFacts = namedtuple('HostFacts', ['identity', 'operating_system',
+                                     'iperf_version', 'iperf3',
+                                     'enhanced_reports', 'pkill',
+                                     'timestamp'])
+
+class HostFactsCache(object):
+    """
+    A file-backed store of host-facts
+    """
+    def __init__(self, filename=HostFactsConstants.default_filename,
+                 ttl=HostFactsConstants.default_ttl):
+        """
+        HostFactsCache constructor
+
+        :param:
+
+         - `filename`: path to the JSON file to keep the facts in
+         - `ttl`: seconds before the facts for a host have to be probed again
+        """
+        super(HostFactsCache, self).__init__()
+        self._logger = None
+        self.filename = filename
+        self.ttl = ttl
+        self._facts = None
+        self.lock = threading.RLock()
+        return
+
+    @property
+    def logger(self):
+        """
+        :return: A logging object.
+        """
+        if self._logger is None:
+            self._logger = logging.getLogger("{0}.{1}".format(self.__module__,
+                                  self.__class__.__name__))
+        return self._logger
+
+    @property
+    def facts(self):
+        """
+        The cached facts (loaded from the file the first time)
+
+        :return: dict of identity: HostFacts
+        """
+        if self._facts is None:
+            self._facts = {}
+            if self.ttl and os.path.isfile(self.filename):
+                try:
+                    with open(self.filename) as opened:
+                        loaded = json.load(opened)
+                    for identity, facts in loaded.iteritems():
+                        self._facts[identity] = HostFacts(**facts)
+                except (IOError, ValueError, TypeError) as error:
+                    self.logger.warning("Unable to load '{0}' ({1}), ignoring it".format(self.filename,
+                                                                                        error))
+                    self._facts = {}
+        return self._facts
+
+    def get(self, identity):
+        """
+        Gets the facts if they haven't expired
+
+        :param:
+
+         - `identity`: the host's identity string
+
+        :return: HostFacts or None if they aren't cached or are too old
+        """
+        with self.lock:
+            facts = self.facts.get(identity)
+        if facts is None or time.time() - facts.timestamp > self.ttl:
+            return None
+        return facts
+
+    def set(self, facts):
+        """
+        Adds the facts and saves the cache
+
+        :param:
+
+         - `facts`: HostFacts to store
+        """
+        with self.lock:
+            self.facts[facts.identity] = facts
+            self.save()
+        return
+
+    def save(self):
+        """
+        Writes the facts to the file, keeping hosts it doesn't know about
+        """
+        with self.lock:
+            folder = os.path.dirname(self.filename)
+            try:
+                if not os.path.isdir(folder):
+                    os.makedirs(folder)
+                # other caches (or runs) might have added hosts since this was loaded
+                saved = {}
+                if os.path.isfile(self.filename):
+                    try:
+                        with open(self.filename) as opened:
+                            saved = json.load(opened)
+                    except ValueError:
+                        pass
+                saved.update(dict((identity, facts._asdict())
+                                  for identity, facts in self.facts.iteritems()))
+                descriptor, temporary = tempfile.mkstemp(dir=folder)
+                with os.fdopen(descriptor, 'w') as opened:
+                    json.dump(saved, opened, indent=2)
+                os.rename(temporary, self.filename)
+            except (IOError, OSError) as error:
+                self.logger.warning("Unable to save the host-facts to '{0}' ({1})".format(self.filename,
+                                                                                        error))
+        return
+# end class HostFactsCache
+
+class HostFactsError(CameraobscuraError):
+    """
+    Raised if a host couldn't be probed
+    """
+# end class HostFactsError
+
+class HostFactsProbe(object):
+    """
+    Gets (and caches) facts about hosts
+    """
+    def __init__(self, cache=None, timeout=HostFactsConstants.timeout):
+        """
+        HostFactsProbe constructor
+
+        :param:
+
+         - `cache`: HostFactsCache (a default one is created if not given)
+         - `timeout`: readline timeout for the probe commands
+        """
+        super(HostFactsProbe, self).__init__()
+        self._logger = None
+        self._cache = cache
+        self.timeout = timeout
+        return
+
+    @property
+    def logger(self):
+        """
+        :return: A logging object.
+        """
+        if self._logger is None:
+            self._logger = logging.getLogger("{0}.{1}".format(self.__module__,
+                                  self.__class__.__name__))
+        return self._logger
+
+    @property
+    def cache(self):
+        """
+        The store of facts
+        """
+        if self._cache is None:
+            self._cache = HostFactsCache()
+        return self._cache
+
+    def output(self, host, command):
+        """
+        Runs the command and gets its output
+
+        :param:
+
+         - `host`: TheHost (or something with exec_command)
+         - `command`: string to send to the host
+
+        :return: combined stdout and stderr
+        :raise: HostFactsError if the host couldn't be reached or timed out
+        """
+        try:
+            stdin, stdout, stderr = host.exec_command(command, timeout=self.timeout)
+            return ''.join(stdout.readlines() + stderr.readlines())
+        except (socket.timeout, socket.error, EnvironmentError, CameraobscuraError) as error:
+            raise HostFactsError("'{0}' failed on {1}: {2}".format(command, host.identity,
+                                                                   error))
+        return
+
+    def probe(self, host):
+        """
+        Asks the host for its facts (doesn't use the cache)
+
+        :param:
+
+         - `host`: TheHost to probe
+
+        :return: HostFacts for the host
+        :raise: HostFactsError if any of the commands couldn't be sent
+        """
+        operating_system = self.output(host, HostFactsConstants.uname).strip()
+        operating_system = operating_system.splitlines()[0].lower() if operating_system else None
+        version = self.output(host, HostFactsConstants.iperf_version).strip()
+        version = version.splitlines()[0] if version else None
+        if version is not None and not HostFactsConstants.version_expression.search(version):
+            # e.g. 'iperf: command not found'
+            self.logger.warning("{0} didn't give an iperf version ({1})".format(host.identity,
+                                                                                version))
+            version = None
+        iperf_help = self.output(host, HostFactsConstants.iperf_help)
+        # `which` prints the path (some print 'no pkill in ...' if it's not there)
+        pkill = self.output(host, HostFactsConstants.pkill).strip().startswith(os.sep)
+        facts = HostFacts(identity=host.identity,
+                          operating_system=operating_system,
+                          iperf_version=version,
+                          iperf3=version is not None and version.startswith(HostFactsConstants.iperf3),
+                          enhanced_reports=HostFactsConstants.enhanced_reports in iperf_help,
+                          pkill=pkill,
+                          timestamp=time.time())
+        self.logger.debug("Probed {0}: {1}".format(host.identity, facts))
+        return facts
+
+    def facts(self, host):
+        """
+        Gets the facts from the cache or probes the host
+
+        :param:
+
+         - `host`: TheHost to get the facts for
+
+        :return: HostFacts for the host
+        :raise: HostFactsError if the host had to be probed and the probe failed (nothing is cached)
+        """
+        facts = self.cache.get(host.identity)
+        if facts is None:
+            facts = self.probe(host)
+            self.cache.set(facts)
+        else:
+            self.logger.debug("Using cached facts for {0}".format(host.identity))
+        return facts
+# end class HostFactsProbe
@@ -0,0 +1,104 @@
+
+# python standard library
+import logging
+import threading
+
+# this package
+from cameraobscura.hosts.host import TheHost, HostConstants
+
+class HostPoolConstants(object):
+    """
+    Constants for the host pool
+    """
+    __slots__ = ()
+    # the command to check that a connection still works
+    token = 'cameraobscura_host_check'
+    check_command = 'echo {0}'.format(token)
+    # readline timeout for the check
+    timeout = 5
+    # connections that have nothing to check
+    unchecked = (HostConstants.fake,)
+# end class HostPoolConstants
+
+class HostPool(object):
+    """
+    A process-wide store of hosts
+    """
+    _hosts = {}
+    _lock = threading.RLock()
+    _logger = None
+
+    @classmethod
+    def logger(cls):
+        """
+        :return: A logging object.
+        """
+        if cls._logger is None:
+            cls._logger = logging.getLogger("{0}.{1}".format(cls.__module__,
+                                                             cls.__name__))
+        return cls._logger
+
+    @classmethod
+    def get_host(cls, **parameters):
+        """
+        Gets the host built with the parameters (building it if needed)
+
+        :param:
+
+         - `parameters`: keyword arguments for TheHost
+
+        :return: TheHost (checked, if it was already in the pool)
+        """
+        key = tuple(sorted(parameters.items()))
+        with cls._lock:
+            host = cls._hosts.get(key)
+            if host is None:
+                host = TheHost(**parameters)
+                cls._hosts[key] = host
+                return host
+        cls.check(host)
+        return host
+
+    @classmethod
+    def check(cls, host):
+        """
+        Checks the host's connection and closes it if it's broken
+
+        :param:
+
+         - `host`: TheHost to check
+
+        :return: True if the connection was working (or hasn't been made)
+        """
+        if host._client is None or host.connection_type in HostPoolConstants.unchecked:
+            return True
+        try:
+            stdin, stdout, stderr = host.exec_command(HostPoolConstants.check_command,
+                                                      timeout=HostPoolConstants.timeout)
+            for line in stdout:
+                if HostPoolConstants.token in line:
+                    return True
+            cls.logger().warning("{0} didn't answer the connection check".format(host.hostname))
+        # the clients raise socket, paramiko and telnet errors
+        except Exception as error:
+            cls.logger().warning("{0} failed the connection check ({1})".format(host.hostname,
+                                                                               error))
+        try:
+            host.close()
+        except Exception as error:
+            cls.logger().debug(error)
+            host._client = None
+        cls.logger().info("{0} will reconnect when it's next used".format(host.hostname))
+        return False
+
+    @classmethod
+    def close_all(cls):
+        """
+        Closes the hosts and empties the pool
+        """
+        with cls._lock:
+            for host in cls._hosts.itervalues():
+                host.close()
+            cls._hosts.clear()
+        return
+# end class HostPool
@@ -0,0 +1,345 @@
+
+# python standard library
+from collections import namedtuple
+import ConfigParser
+import gc
+import json
+import logging
+import os
+import resource
+import shutil
+import StringIO
+import tempfile
+import textwrap
+import time
+
+# this package
+from cameraobscura.set_logger import LOG_FORMAT, LOG_TIMESTAMP
+from cameraobscura.hosts.hostpool import HostPool
+from rate_vs_range import RateVsRangeTest
+from journal import JournalConstants
+from simulator import Simulator, SimulatedClock
+
+class BenchmarkConstants(object):
+    """
+    Constants for the benchmark
+    """
+    __slots__ = ()
+    # attenuation steps per traffic direction
+    default_steps = 1000
+    # a metric can grow this fraction past its baseline before it's a regression
+    default_tolerance = 0.25
+    default_baselines = 'benchmark_baselines.json'
+    # added to the tolerance so tiny baselines don't flag noise
+    slack = {'cpu_per_step': 0.5,
+             'objects_per_step': 1,
+             'records_per_step': 0.5,
+             'bytes_per_step': 50}
+    loggers = ('cameraobscura', 'theape')
+    result_folder = 'results'
+
+    configuration = textwrap.dedent("""
+    [dut]
+    control_ip = 192.168.10.1
+    test_ip = 192.168.20.1
+    username = benchmark
+
+    [server]
+    control_ip = 192.168.10.2
+    test_ip = 192.168.20.2
+    username = benchmark
+
+    [attenuation]
+    name = MockAttenuator
+    control_ip = 192.168.10.3
+    start = 0
+    stop = {stop}
+    step_sizes = 1
+
+    [iperf]
+    direction = both
+    time = 10
+    interval = 1
+    parallel = 4
+
+    [query]
+    rssi = iwconfig wlan0,Signal\slevel=(-\d+\sdBm)
+    bitrate = iwconfig wlan0,Bit\sRate=(\d+\.*\d*\sMb/s)
+    noise = wl noise,(.*)
+
+    [dump]
+    dmesg = dmesg -k
+
+    [other]
+    result_location = {result_location}
+    recovery_time = 20
+
+    [simulation]
+    sensitivity = -2000
+    noise = 0
+    seed = 1
+    """)
+# end class BenchmarkConstants
+
+BenchmarkResult = namedtuple('BenchmarkResult', ['steps', 'cpu_per_step',
+                                                 'objects_per_step',
+                                                 'records_per_step',
+                                                 'bytes_per_step',
+                                                 'wall_time'])
+
+class FastForwardClock(SimulatedClock):
+    """
+    A SimulatedClock that skips the sleeps
+    """
+    def time(self):
+        """
+        The simulated time
+
+        :return: the real time plus all the time slept since the start
+        """
+        return self.real_time() + self.slept
+
+    def sleep(self, seconds):
+        """
+        Moves the clock forward by the seconds (without waiting)
+
+        :param:
+
+         - `seconds`: simulated seconds to sleep
+        """
+        with self.lock:
+            self.slept += seconds
+        # let the other threads run
+        self.real_sleep(0)
+        return
+# end class FastForwardClock
+
+class LogCounter(logging.Handler):
+    """
+    A handler that counts the log records and their sizes
+    """
+    def __init__(self, level=logging.DEBUG):
+        """
+        LogCounter constructor
+
+        :param:
+
+         - `level`: lowest level to count
+        """
+        logging.Handler.__init__(self, level=level)
+        self.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=LOG_TIMESTAMP))
+        self.records = 0
+        self.bytes = 0
+        return
+
+    def emit(self, record):
+        """
+        Formats the record and counts it
+        """
+        line = self.format(record)
+        with self.lock:
+            self.records += 1
+            self.bytes += len(line) + 1
+        return
+# end class LogCounter
+
+class Baselines(object):
+    """
+    Saved benchmark results to compare against
+    """
+    def __init__(self, filename=BenchmarkConstants.default_baselines,
+                 tolerance=BenchmarkConstants.default_tolerance):
+        """
+        Baselines constructor
+
+        :param:
+
+         - `filename`: name of the JSON file with the baselines
+         - `tolerance`: fraction a metric can grow past its baseline
+        """
+        super(Baselines, self).__init__()
+        self._logger = None
+        self._baselines = None
+        self.filename = filename
+        self.tolerance = tolerance
+        return
+
+    @property
+    def logger(self):
+        """
+        :return: A logging object.
+        """
+        if self._logger is None:
+            self._logger = logging.getLogger("{0}.{1}".format(self.__module__,
+                                  self.__class__.__name__))
+        return self._logger
+
+    @property
+    def baselines(self):
+        """
+        Dictionary of name: {metric: value} loaded from the file (empty if there isn't one)
+        """
+        if self._baselines is None:
+            self._baselines = {}
+            if os.path.isfile(self.filename):
+                try:
+                    with open(self.filename) as opened:
+                        self._baselines = json.load(opened)
+                except ValueError as error:
+                    self.logger.warning("Ignoring baselines in '{0}' ({1})".format(self.filename,
+                                                                                 error))
+        return self._baselines
+
+    def compare(self, name, result):
+        """
+        Compares the result to the saved baseline
+
+        :param:
+
+         - `name`: name of the baseline
+         - `result`: BenchmarkResult
+
+        :return: list of regression messages (empty if there's no baseline or nothing regressed)
+        """
+        regressions = []
+        baseline = self.baselines.get(name)
+        if baseline is None:
+            self.logger.info("No '{0}' baseline in '{1}'".format(name, self.filename))
+            return regressions
+        for metric, slack in sorted(BenchmarkConstants.slack.items()):
+            if metric not in baseline:
+                continue
+            value = getattr(result, metric)
+            limit = baseline[metric] * (1 + self.tolerance) + slack
+            if value > limit:
+                regressions.append("{0}: {1:.2f} (baseline {2:.2f}, limit {3:.2f})".format(metric,
+                                                                                         value,
+                                                                                         baseline[metric],
+                                                                                         limit))
+        return regressions
+
+    def save(self, name, result):
+        """
+        Saves the result as the new baseline for `name`
+
+        :param:
+
+         - `name`: name of the baseline
+         - `result`: BenchmarkResult
+        """
+        self.baselines[name] = dict((metric, getattr(result, metric))
+                                    for metric in BenchmarkConstants.slack)
+        with open(self.filename, 'w') as opened:
+            json.dump(self.baselines, opened, indent=1, sort_keys=True)
+        self.logger.info("Saved the '{0}' baseline to '{1}'".format(name, self.filename))
+        return
+# end class Baselines
+
+class SweepBenchmark(object):
+    """
+    Measures the framework's cost per step on simulated equipment
+    """
+    def __init__(self, steps=BenchmarkConstants.default_steps, folder=None):
+        """
+        SweepBenchmark constructor
+
+        :param:
+
+         - `steps`: attenuation steps per traffic direction
+         - `folder`: where to put the results (a temporary folder if not given)
+        """
+        super(SweepBenchmark, self).__init__()
+        self._logger = None
+        self.steps = steps
+        self.folder = folder
+        return
+
+    @property
+    def logger(self):
+        """
+        :return: A logging object.
+        """
+        if self._logger is None:
+            self._logger = logging.getLogger("{0}.{1}".format(self.__module__,
+                                  self.__class__.__name__))
+        return self._logger
+
+    @property
+    def name(self):
+        """
+        The name to save the baseline under
+        """
+        return "sweep_{0}".format(self.steps)
+
+    def configuration(self, result_location):
+        """
+        Builds the configuration for the sweep
+
+        :param:
+
+         - `result_location`: folder for the test's output
+
+        :return: SafeConfigParser for a simulated test
+        """
+        configuration = ConfigParser.SafeConfigParser()
+        configuration.readfp(StringIO.StringIO(BenchmarkConstants.configuration.format(stop=self.steps - 1,
+                                                                                       result_location=result_location)))
+        return Simulator.prepare(configuration)
+
+    def run(self, test):
+        """
+        Runs one repetition of the test (the Simulator's runner)
+
+        :param:
+
+         - `test`: RateVsRangeTest built from the benchmark configuration
+        """
+        test.repetition = 1
+        test.journal.start()
+        test()
+        return
+
+    def __call__(self):
+        """
+        Runs the sweep and measures it
+
+        :return: BenchmarkResult
+        """
+        folder = self.folder or tempfile.mkdtemp(prefix='rvr_benchmark_')
+        result_location = os.path.join(folder, BenchmarkConstants.result_folder)
+        counter = LogCounter()
+        loggers = [logging.getLogger(name) for name in BenchmarkConstants.loggers]
+        levels = [logger.level for logger in loggers]
+        try:
+            test = RateVsRangeTest(self.configuration(result_location))
+            simulator = Simulator(runner=self.run, clock=FastForwardClock)
+            for logger in loggers:
+                logger.setLevel(logging.DEBUG)
+                logger.addHandler(counter)
+            gc.collect()
+            objects = len(gc.get_objects())
+            start = resource.getrusage(resource.RUSAGE_SELF)
+            wall_start = time.time()
+            simulator(test)
+            wall_time = time.time() - wall_start
+            end = resource.getrusage(resource.RUSAGE_SELF)
+            HostPool.close_all()
+            gc.collect()
+            objects = len(gc.get_objects()) - objects
+            steps = len([entry for entry in test.journal.entries
+                         if entry.kind == JournalConstants.step])
+        finally:
+            for logger, level in zip(loggers, levels):
+                logger.removeHandler(counter)
+                logger.setLevel(level)
+            if self.folder is None:
+                shutil.rmtree(folder, ignore_errors=True)
+        cpu = (end.ru_utime + end.ru_stime) - (start.ru_utime + start.ru_stime)
+        per_step = float(max(steps, 1))
+        return BenchmarkResult(steps=steps,
+                               cpu_per_step=1000 * cpu/per_step,
+                               objects_per_step=objects/per_step,
+                               records_per_step=counter.records/per_step,
+                               bytes_per_step=counter.bytes/per_step,
+                               wall_time=wall_time)
+# end class SweepBenchmark
@@ -0,0 +1,201 @@
+
+# python standard library
+from collections import namedtuple
+import json
+import logging
+import os
+import threading
+import time
+
+class JournalConstants(object):
+    """
+    Constants for the journal
+    """
+    __slots__ = ()
+    filename = 'journal.jsonl'
+
+    # entry kinds
+    start = 'start'
+    step = 'step'
+    direction = 'direction'
+    repetition = 'repetition'
+
+    # step status
+    measured = 'measured'
+    no_connection = 'no_connection'
+    socket_error = 'socket_error'
+    no_throughput = 'no_throughput'
+# end class JournalConstants
+
+JournalEntry = namedtuple('JournalEntry', ['kind', 'repetition', 'direction',
+                                           'attenuation', 'status',
+                                           'lost_connection', 'state',
+                                           'timestamp'])
+
+class Journal(object):
+    """
+    An append-only record of completed steps
+    """
+    def __init__(self, filename):
+        """
+        Journal constructor
+
+        :param:
+
+         - `filename`: path to the journal file
+        """
+        super(Journal, self).__init__()
+        self._logger = None
+        self.filename = filename
+        self.lock = threading.Lock()
+        return
+
+    @property
+    def logger(self):
+        """
+        :return: A logging object.
+        """
+        if self._logger is None:
+            self._logger = logging.getLogger("{0}.{1}".format(self.__module__,
+                                  self.__class__.__name__))
+        return self._logger
+
+    def append(self, kind, repetition=None, direction=None, attenuation=None,
+               status=None, lost_connection=None, state=None):
+        """
+        Writes an entry to the end of the journal
+
+        :param:
+
+         - `kind`: JournalConstants entry-kind
+         - `repetition`: repetition number (starting at 1)
+         - `direction`: name of the traffic direction
+         - `attenuation`: attenuation for the step
+         - `status`: how the step ended
+         - `lost_connection`: the test's lost-connection flag
+         - `state`: dict of the step-iterator's state
+
+        :return: the JournalEntry that was written
+        """
+        entry = JournalEntry(kind=kind, repetition=repetition,
+                             direction=direction, attenuation=attenuation,
+                             status=status, lost_connection=lost_connection,
+                             state=state, timestamp=time.time())
+        folder = os.path.dirname(self.filename)
+        with self.lock:
+            if folder and not os.path.isdir(folder):
+                os.makedirs(folder)
+            with open(self.filename, 'a') as journal:
+                journal.write(json.dumps(entry._asdict()) + '\n')
+                journal.flush()
+                os.fsync(journal.fileno())
+        return entry
+
+    def start(self, resume=False):
+        """
+        Records the start of a run
+
+        :param:
+
+         - `resume`: if True, this is continuing the last run
+        """
+        return self.append(JournalConstants.start, status='resume' if resume else None)
+
+    def step(self, repetition, direction, attenuation, status,
+             lost_connection, state):
+        """
+        Records a finished step (see `append` for the parameters)
+        """
+        return self.append(JournalConstants.step, repetition=repetition,
+                           direction=direction, attenuation=attenuation,
+                           status=status, lost_connection=lost_connection,
+                           state=state)
+
+    def direction_complete(self, repetition, direction):
+        """
+        Records that all the steps for a direction were finished
+        """
+        return self.append(JournalConstants.direction, repetition=repetition,
+                           direction=direction)
+
+    def repetition_complete(self, repetition):
+        """
+        Records that all the directions for a repetition were finished
+        """
+        return self.append(JournalConstants.repetition, repetition=repetition)
+
+    @property
+    def entries(self):
+        """
+        The entries since the last (non-resume) start
+
+        :return: list of JournalEntry
+        """
+        entries = []
+        if not os.path.isfile(self.filename):
+            return entries
+        with self.lock:
+            with open(self.filename) as journal:
+                lines = journal.readlines()
+        for line in lines:
+            try:
+                entry = JournalEntry(**json.loads(line))
+            except (ValueError, TypeError) as error:
+                self.logger.warning("Skipping journal line '{0}' ({1})".format(line.strip(),
+                                                                             error))
+                continue
+            if entry.kind == JournalConstants.start and entry.status is None:
+                entries = []
+            entries.append(entry)
+        return entries
+
+    def last_step(self, repetition, direction):
+        """
+        Gets the last finished step for a direction
+
+        :param:
+
+         - `repetition`: repetition number
+         - `direction`: name of the traffic direction
+
+        :return: JournalEntry or None if no steps were finished
+        """
+        last = None
+        for entry in self.entries:
+            if (entry.kind == JournalConstants.step and
+                entry.repetition == repetition and
+                entry.direction == direction):
+                last = entry
+        return last
+
+    def completed_directions(self, repetition):
+        """
+        Gets the directions that were finished in a repetition
+
+        :param:
+
+         - `repetition`: repetition number
+
+        :return: set of direction names
+        """
+        return set(entry.direction for entry in self.entries
+                   if entry.kind == JournalConstants.direction and
+                   entry.repetition == repetition)
+
+    @property
+    def last_repetition(self):
+        """
+        The repetition to resume and whether it was finished
+
+        :return: (repetition number, finished) or (None, False) if nothing was journaled
+        """
+        repetition, finished = None, False
+        for entry in self.entries:
+            if entry.repetition is None:
+                continue
+            if entry.repetition != repetition:
+                repetition, finished = entry.repetition, False
+            if entry.kind == JournalConstants.repetition:
+                finished = True
+        return repetition, finished
+# end class Journal
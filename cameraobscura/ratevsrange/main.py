@@ -3,6 +3,7 @@ from __future__ import print_function
 
 # python standard library
 import argparse
+import functools
 import os
 import shutil
 import sys
@@ -22,8 +23,14 @@ from cameraobscura.utilities.query import QueryConfiguration
 from cameraobscura.commands.ping.pingconfiguration import PingConfiguration
 from cameraobscura.commands.iperf.Iperf import IperfConfiguration
 from rvrconfiguration import DutEnum, ServerEnum
+from scheduler import Scheduler, SchedulerConstants
+from simulator import Simulator, SimulationConfiguration
+from benchmark import SweepBenchmark, Baselines, BenchmarkConstants
 from cameraobscura.hosts.host import HostConfiguration
+from cameraobscura.hosts.hostpool import HostPool
 from cameraobscura.utilities.dump import DumpConfiguration
+from cameraobscura.clients.sshbroker import SSHBroker, broker_path
+from cameraobscura.utilities.latency import LatencyRecorder
 
 class ArgumentConstants(object):
     """
@@ -34,6 +41,8 @@ class ArgumentConstants(object):
     # defaults
     default_configuration = 'rvr_configuration.ini'
     default_path = 'rate_vs_range'
+    # the copy of the configuration that the test saves in its result folder
+    saved_configuration = 'automated_rvr.ini'
 
 def parse_arguments(arguments=None):
     """
@@ -71,7 +80,56 @@ def parse_arguments(arguments=None):
     run.add_argument('configurations', default=[ArgumentConstants.default_configuration],
                      help="Configuration file(s) to use. default=%(default)s",
                      nargs='*')
+    run.add_argument('--simulate', action='store_true', default=False,
+                     help="Run on simulated equipment (see the [simulation] section)")
     run.set_defaults(subcommand=run_configuration)
+
+    # resume an interrupted run
+    resume = subparsers.add_parser('resume')
+    resume.add_argument('result_dir',
+                        help="Result folder of the interrupted test (with its journal and {0})".format(ArgumentConstants.saved_configuration))
+    resume.set_defaults(subcommand=resume_configuration)
+
+    # run configurations concurrently
+    schedule = subparsers.add_parser('schedule')
+    schedule.add_argument('configurations', nargs='+',
+                          help="Configuration files to run (those that share equipment are run one at a time)")
+    schedule.add_argument('-w', '--workers', type=int,
+                          default=SchedulerConstants.default_workers,
+                          help="Most tests to run at the same time (default=%(default)s)")
+    schedule.add_argument('-r', '--refresh', type=float,
+                          default=SchedulerConstants.default_refresh,
+                          help="Seconds between progress reports (default=%(default)s)")
+    schedule.add_argument('--simulate', action='store_true', default=False,
+                          help="Run on simulated equipment (see the [simulation] section)")
+    schedule.set_defaults(subcommand=schedule_configurations)
+
+    # benchmark sub-command
+    benchmark = subparsers.add_parser('benchmark')
+    benchmark.add_argument('-s', '--steps', type=int,
+                           default=BenchmarkConstants.default_steps,
+                           help="Attenuation steps per traffic direction (default=%(default)s)")
+    benchmark.add_argument('-b', '--baselines',
+                           default=BenchmarkConstants.default_baselines,
+                           help="JSON file with the baselines (default=%(default)s)")
+    benchmark.add_argument('-t', '--tolerance', type=float,
+                           default=BenchmarkConstants.default_tolerance,
+                           help="Fraction a metric can grow past its baseline (default=%(default)s)")
+    benchmark.add_argument('--save', action='store_true', default=False,
+                           help="Save the result as the new baseline")
+    benchmark.set_defaults(subcommand=run_benchmark)
+
+    # share the ssh connections between rvr processes
+    broker = subparsers.add_parser('broker')
+    broker.add_argument('-p', '--path', default=broker_path(),
+                        help="Path for the broker's Unix socket (default=%(default)s)")
+    broker.set_defaults(subcommand=run_broker)
+
+    # compare the exec latencies of two runs
+    latency = subparsers.add_parser('latency')
+    latency.add_argument('before', help="exec_latency.json from the first run")
+    latency.add_argument('after', help="exec_latency.json from the run to compare to it")
+    latency.set_defaults(subcommand=compare_latencies)
     return parser.parse_args(arguments)
 
 def enable_debugging(args):
@@ -106,7 +164,8 @@ def get_examples():
                 PingConfiguration(None),
                 QueryConfiguration(None),
                 DumpConfiguration(None),                
-                OtherConfiguration(None))
+                OtherConfiguration(None),
+                SimulationConfiguration(None))
     return examples
 
 def fetch_configuration(args):
@@ -136,47 +195,225 @@ def run_configuration(args):
 
     :param:
 
-     - `args`: ConfigParser namespace with args.configurations filenames list
+     - `args`: ConfigParser namespace with args.configurations filenames list (and args.simulate)
+
+    :raise: SystemExit if any of the configurations failed
+    """
+    failed = False
+    runner = run_repetitions
+    if args.simulate:
+        runner = Simulator(run_repetitions)
+    try:
+        for filename in args.configurations:
+            configuration = ConfigParser.SafeConfigParser()
+            try:
+                configuration.readfp(open(filename))
+            except IOError as error:
+                # file-name not found in current working directory
+                print(error)
+                print("try 'rvr fetch' or 'rvr help'")
+                break
+            if args.simulate:
+                Simulator.prepare(configuration)
+            test = RateVsRangeTest(configuration)
+            test.journal.start()
+            if runner(test) is False:
+                failed = True
+    finally:
+        # the hosts are kept between configurations, close them now
+        HostPool.close_all()
+    if failed:
+        sys.exit(1)
+    return
+
+def resume_configuration(args):
+    """
+    Resumes an interrupted test using the journal in its result folder
+
+    :param:
+
+     - `args`: namespace with args.result_dir (the interrupted test's result_location)
+
+    :raise: SystemExit if the test failed
+    """
+    filename = os.path.join(args.result_dir, ArgumentConstants.saved_configuration)
+    configuration = ConfigParser.SafeConfigParser()
+    try:
+        configuration.readfp(open(filename))
+    except IOError as error:
+        print(error)
+        print("'{0}' doesn't look like an rvr result folder".format(args.result_dir))
+        return
+    test = RateVsRangeTest(configuration)
+    # keep writing to the interrupted test's folder (not a new time-stamped one)
+    test.result_location = args.result_dir
+    repetition, finished = test.journal.last_repetition
+    if repetition is None:
+        test.logger.info("No steps were journaled, starting from the beginning")
+        repetition = 1
+    elif finished:
+        repetition += 1
+    test.journal.start(resume=True)
+    try:
+        succeeded = run_repetitions(test, first=repetition, resuming=not finished)
+    finally:
+        HostPool.close_all()
+    if not succeeded:
+        sys.exit(1)
+    return
+
+def schedule_configurations(args):
+    """
+    Runs the configurations concurrently when they don't share equipment
+
+    :param:
+
+     - `args`: namespace with configurations, workers, refresh and simulate
+
+    :raise: SystemExit if any of the jobs failed
     """
+    runner = functools.partial(run_repetitions, move_log=False)
+    if args.simulate:
+        runner = Simulator(runner)
+    scheduler = Scheduler(runner=runner,
+                          workers=args.workers,
+                          refresh=args.refresh)
     for filename in args.configurations:
         configuration = ConfigParser.SafeConfigParser()
         try:
             configuration.readfp(open(filename))
         except IOError as error:
-            # file-name not found in current working directory
             print(error)
             print("try 'rvr fetch' or 'rvr help'")
-            break
-        test = Test(configuration)
-        try:
-            # this is only to replicate the original way it was being run
-            # a better front end should probably replace this
-            repetitions = test.configuration.other.repetitions + 1
-            for repetition in xrange(1, repetitions):
-                test.logger.info(BOLD + "**** Running repetition {0} of {1} ****".format(repetition,
-                                                                        repetitions) + RESET)
-                test()
-                test.reset()
-            # another quick hack
-            source = cameraobscura.set_logger.EVENTLOG
-            target_file = source
-            target_path = os.path.join(test.result_location, 'logs')
-            if not os.path.isdir(target_path):
-                os.makedirs(target_path)
-            count = len([name for name in os.listdir(target_path) if
-                         os.path.isfile(name)])
-
-            if count:
-                base, ext = os.path.splitext(source)
-                base = '{0}_{1}'.format(base, count)
-                target_file = ''.join([base, ext])
-            target = os.path.join(target_path, target_file)
-            shutil.move(source, target)
-        except CameraobscuraError as error:
-            test.logger.error(error)
-            dump_crash()
+            return
+        if args.simulate:
+            Simulator.prepare(configuration)
+        scheduler.add(filename, configuration)
+    failed = scheduler()
+    for job in failed:
+        print("'{0}' failed, see '{1}'".format(job.filename, job.log_filename))
+    if failed:
+        sys.exit(1)
+    return
+
+def run_benchmark(args):
+    """
+    Runs the sweep benchmark and compares it to the baseline
+
+    :param:
+
+     - `args`: namespace with steps, baselines, tolerance and save
+
+    :raise: SystemExit if a metric regressed (and the result wasn't saved)
+    """
+    benchmark = SweepBenchmark(steps=args.steps)
+    result = benchmark()
+    print("Steps: {0} (wall-time {1:.1f} seconds)".format(result.steps,
+                                                          result.wall_time))
+    print("CPU per step: {0:.2f} ms".format(result.cpu_per_step))
+    print("Objects left per step: {0:.1f}".format(result.objects_per_step))
+    print("Log records per step: {0:.1f} ({1:.0f} bytes)".format(result.records_per_step,
+                                                                result.bytes_per_step))
+    baselines = Baselines(filename=args.baselines, tolerance=args.tolerance)
+    if args.save:
+        baselines.save(benchmark.name, result)
+        return
+    regressions = baselines.compare(benchmark.name, result)
+    for regression in regressions:
+        print(RED + "Regression -- " + regression + RESET)
+    if regressions:
+        sys.exit(1)
+    return
+
+def run_broker(args):
+    """
+    Runs the ssh broker until it's interrupted
+
+    :param:
+
+     - `args`: namespace with the socket path
+    """
+    broker = SSHBroker(path=args.path)
+    print("Sharing ssh connections on '{0}' (ctrl-c to stop)".format(args.path))
+    try:
+        broker.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        broker.close()
+    return
+
+def compare_latencies(args):
+    """
+    Prints the exec latency percentiles of two runs side by side
+
+    :param:
+
+     - `args`: namespace with the before and after filenames
+    """
+    before = LatencyRecorder.load(args.before)
+    after = LatencyRecorder.load(args.after)
+    for comparison in before.compare(after):
+        ratio = ("" if comparison.ratio is None
+                 else " ({0:.2f}x)".format(comparison.ratio))
+        print("{0} '{1}' {2} p{3}: {4:.1f} ms -> {5:.1f} ms{6}".format(comparison.host,
+                                                                  comparison.command,
+                                                                  comparison.metric,
+                                                                  comparison.percentile,
+                                                                  comparison.before/1000.0,
+                                                                  comparison.after/1000.0,
+                                                                  ratio))
     return
 
+
+def run_repetitions(test, first=1, resuming=False, move_log=True):
+    """
+    Runs the test's repetitions and moves the log to the result folder
+
+    :param:
+
+     - `test`: RateVsRangeTest to run
+     - `first`: repetition to start with
+     - `resuming`: if True, the first repetition continues from the journal
+     - `move_log`: if False, leave the event-log where it is (the scheduler's jobs have their own)
+
+    :return: True if the repetitions ran, False if the test failed (the error is logged and a crash report written)
+    """
+    try:
+        # this is only to replicate the original way it was being run
+        # a better front end should probably replace this
+        repetitions = test.configuration.other.repetitions + 1
+        for repetition in xrange(first, repetitions):
+            test.logger.info(BOLD + "**** Running repetition {0} of {1} ****".format(repetition,
+                                                                    repetitions) + RESET)
+            test.repetition = repetition
+            test.resuming = resuming and repetition == first
+            test()
+            test.journal.repetition_complete(repetition)
+            test.reset()
+        if not move_log:
+            return True
+        # another quick hack
+        source = cameraobscura.set_logger.EVENTLOG
+        target_file = source
+        target_path = os.path.join(test.result_location, 'logs')
+        if not os.path.isdir(target_path):
+            os.makedirs(target_path)
+        count = len([name for name in os.listdir(target_path) if
+                     os.path.isfile(name)])
+
+        if count:
+            base, ext = os.path.splitext(source)
+            base = '{0}_{1}'.format(base, count)
+            target_file = ''.join([base, ext])
+        target = os.path.join(target_path, target_file)
+        shutil.move(source, target)
+    except CameraobscuraError as error:
+        test.logger.error(error)
+        dump_crash()
+        return False
+    return True
+
 def dump_crash():
     """
     creates a stack-trace file
@@ -0,0 +1,173 @@
+
+# python standard library
+from collections import namedtuple
+import bisect
+import csv
+import logging
+import os
+import threading
+import time
+
+# third party
+import numpy
+
+class RampConstants(object):
+    """
+    Constants for the attenuation ramp
+    """
+    __slots__ = ()
+    # seconds at each attenuation
+    default_dwell = 5
+    # iperf interval to use if the configuration didn't set one
+    default_interval = 1
+    # seconds to wait for the traffic to start
+    start_timeout = 60
+    filename = '{0}_ramp.csv'
+    fields = ('timestamp', 'interval', 'attenuation', 'bandwidth', 'mixed')
+# end class RampConstants
+
+AttenuationChange = namedtuple('AttenuationChange', 'timestamp attenuation')
+RampSample = namedtuple('RampSample', RampConstants.fields)
+
+class AttenuationRamp(object):
+    """
+    A background stepper of the attenuation
+    """
+    def __init__(self, attenuator, attenuations,
+                 dwell=RampConstants.default_dwell, start_event=None):
+        """
+        AttenuationRamp constructor
+
+        :param:
+
+         - `attenuator`: object with a setAttenuation method
+         - `attenuations`: sequence of attenuations to set (in order)
+         - `dwell`: seconds to leave each attenuation set
+         - `start_event`: threading.Event to wait for before starting
+        """
+        super(AttenuationRamp, self).__init__()
+        self._logger = None
+        self.attenuator = attenuator
+        self.attenuations = list(attenuations)
+        self.dwell = dwell
+        self.start_event = start_event
+        self.changes = []
+        self.stopped = threading.Event()
+        self.thread = None
+        return
+
+    @property
+    def logger(self):
+        """
+        :return: A logging object.
+        """
+        if self._logger is None:
+            self._logger = logging.getLogger("{0}.{1}".format(self.__module__,
+                                  self.__class__.__name__))
+        return self._logger
+
+    @property
+    def duration(self):
+        """
+        Seconds the whole ramp takes
+        """
+        return self.dwell * len(self.attenuations)
+
+    def run(self):
+        """
+        Steps through the attenuations (this is what the thread runs)
+        """
+        if self.start_event is not None:
+            if not self.start_event.wait(RampConstants.start_timeout):
+                self.logger.error("The traffic never started, abandoning the ramp")
+                return
+        for attenuation in self.attenuations:
+            if self.stopped.is_set():
+                break
+            self.attenuator.setAttenuation(attenuation)
+            self.changes.append(AttenuationChange(timestamp=time.time(),
+                                                  attenuation=attenuation))
+            self.logger.debug("Attenuation set to {0}".format(attenuation))
+            self.stopped.wait(self.dwell)
+        return
+
+    def start(self):
+        """
+        Starts the ramp in a (daemon) thread
+        """
+        self.changes = []
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, name='attenuation_ramp')
+        self.thread.daemon = True
+        self.thread.start()
+        return
+
+    def stop(self):
+        """
+        Ends the ramp and waits for the thread to finish
+        """
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        return
+
+    def attenuation_at(self, timestamp):
+        """
+        The attenuation that was set at a given time
+
+        :param:
+
+         - `timestamp`: time (seconds since the epoch)
+
+        :return: attenuation or None if it was before the first change
+        """
+        times = [change.timestamp for change in self.changes]
+        index = bisect.bisect_right(times, timestamp)
+        if not index:
+            return None
+        return self.changes[index - 1].attenuation
+
+    def correlate(self, result):
+        """
+        Matches the interval bandwidths to the attenuations
+
+        :param:
+
+         - `result`: StepResult with `started` set
+
+        :return: list of RampSample
+        """
+        if result.started is None or len(result.intervals) < 2:
+            self.logger.warning("Can't correlate {0} -- no start time or too few intervals".format(result.name))
+            return []
+        length = float(numpy.median(numpy.diff(result.intervals)))
+        samples = []
+        for interval, bandwidth in zip(result.intervals, result.bandwidths):
+            start = result.started + interval
+            first, last = self.attenuation_at(start), self.attenuation_at(start + length)
+            samples.append(RampSample(timestamp=start,
+                                      interval=interval,
+                                      attenuation=self.attenuation_at(start + length/2),
+                                      bandwidth=bandwidth,
+                                      mixed=first != last))
+        return samples
+
+    def save(self, samples, filename):
+        """
+        Saves the samples to a csv-file
+
+        :param:
+
+         - `samples`: RampSample collection
+         - `filename`: path to the file to write
+        """
+        folder = os.path.dirname(filename)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+        with open(filename, 'w') as opened:
+            writer = csv.writer(opened)
+            writer.writerow(RampConstants.fields)
+            writer.writerows(samples)
+        self.logger.info("Ramp samples saved to {0}".format(filename))
+        return
+# end class AttenuationRamp
@@ -1,5 +1,6 @@
 
 # python standard library
+import math
 import time
 import shutil
 import os
@@ -7,9 +8,11 @@ import re
 import ConfigParser
 import socket
 import logging
+import csv
+import threading
 
 # third-party
-from theape.infrastructure.composite import TheComposite
+import numpy
 
 # this package
 from cameraobscura import BOLD, RESET, BLUE, RED
@@ -17,16 +20,25 @@ from cameraobscura import NoOp
 from cameraobscura import CameraobscuraError
 from cameraobscura.commands.iperf.Iperf import Iperf
 from cameraobscura.commands.iperf.iperfsettings import IperfConstants
-import cameraobscura.hosts.host
+from cameraobscura.hosts.hostpool import HostPool
+from cameraobscura.hosts.hostfacts import HostFactsProbe, HostFactsCache
+from cameraobscura.clients.reconnect import CircuitBreaker
+from cameraobscura.utilities.latency import EXEC_LATENCY, LatencyConstants
 from cameraobscura.attenuators.attenuator_builder import AttenuatorBuilder
 from cameraobscura.attenuators.attenuator import AttenuatorError
 
 from cameraobscura.utilities.configurationadapter import ConfigurationAdapter
 from rvrconfiguration import RVRConfiguration, TrafficEnum
 from stepiterator import StepIterator
+from journal import Journal, JournalConstants
+from ramp import AttenuationRamp, RampConstants
 from cameraobscura.utilities.query import QueryBuilder, Query
+from cameraobscura.utilities.sampler import QuerySampler
+from cameraobscura.utilities.phasetimer import PhaseTimer
+from cameraobscura.utilities.postprocessor import PostProcessor
+from recovery import BackoffRecovery
 
-from cameraobscura.utilities.dump import TheDump
+from cameraobscura.utilities.dump import TheDump, TheDumpBatch, TheDumpLoop
 from cameraobscura.commands.ping.pingbuilder import PingBuilder
 
 class RateVSRangeEnum(object):
@@ -55,6 +67,7 @@ BOLD_BLUE_RESET = BOLD_BLUE + "{0}" + RESET
 BOLD_RED_RESET = BOLD_RED + "{0}" + RESET
 ZERO = 0
 WRITEABLE = 'w'
+APPENDABLE = 'a'
 DIRECTION_MAP = {TrafficEnum.upstream:(RateVSRangeEnum.upstream,),
                  TrafficEnum.both:(RateVSRangeEnum.upstream,
                                    RateVSRangeEnum.downstream),
@@ -70,6 +83,17 @@ IPERF_FIELDS = {RateVSRangeEnum.upstream:
                  RateVSRangeEnum.dut_downstream,
                  RateVSRangeEnum.server_downstream]}
 
+# for the per-step statistics (saved by the post-processor)
+STATISTICS_FILENAME = '{0}_statistics.csv'
+STATISTICS_FIELDS = ('attenuation', 'field', 'intervals', 'mean', 'median',
+                     'std', 'minimum', 'maximum')
+
+# for the start-up phase
+WARM_UP_DUT = 'dut'
+WARM_UP_SERVER = 'server'
+WARM_UP_ATTENUATOR = 'attenuator'
+UNREACHABLE = "{0} ({1}: {2})"
+
 class RateVsRangeTest(object):
     """
     RateVsRange
@@ -100,6 +124,14 @@ class RateVsRangeTest(object):
         self._attenuations = None
 
         self._dump = None
+        self._timer = None
+        self._journal = None
+        self._post_processor = None
+        self.statistics_lock = threading.Lock()
+
+        # used by the journal to resume an interrupted test
+        self.repetition = 1
+        self.resuming = False
         return
 
     @property
@@ -131,12 +163,21 @@ class RateVsRangeTest(object):
         An iterator of attenuations
         """
         if self._attenuations is None:
-            self._attenuations = StepIterator(start=self.configuration.attenuation.start,
-                                              stop=self.maximum_attenuation,
-                                              step_sizes=self.configuration.attenuation.step_sizes,
-                                              step_change_thresholds=self.configuration.attenuation.step_change_thresholds,
-                                              step_list=self.configuration.attenuation.step_list,
-                                              reversal_limit=self.configuration.attenuation.reversal_limit)
+            if self.configuration.attenuation.adaptive:
+                self._attenuations = StepIterator(adaptive=True,
+                                                  start=self.configuration.attenuation.start,
+                                                  stop=self.maximum_attenuation,
+                                                  coarse_step=self.configuration.attenuation.coarse_step,
+                                                  resolution=self.configuration.attenuation.resolution,
+                                                  step_budget=self.configuration.attenuation.step_budget,
+                                                  change_threshold=self.configuration.attenuation.change_threshold)
+            else:
+                self._attenuations = StepIterator(start=self.configuration.attenuation.start,
+                                                  stop=self.maximum_attenuation,
+                                                  step_sizes=self.configuration.attenuation.step_sizes,
+                                                  step_change_thresholds=self.configuration.attenuation.step_change_thresholds,
+                                                  step_list=self.configuration.attenuation.step_list,
+                                                  reversal_limit=self.configuration.attenuation.reversal_limit)
             self.logger.debug('step iterator built with "{0}"'.format(self._attenuations))
             self._attenuations.check_rep()
         return self._attenuations
@@ -192,18 +233,20 @@ class RateVsRangeTest(object):
         """
         create dut for iperf
 
-        :return: HostSSH Connected to the DUT
+        :return: TheHost (from the HostPool) for the DUT
         """
         if self._dut is None:
-            self._dut = cameraobscura.hosts.host.TheHost(hostname=self.configuration.dut.control_ip,
-                                                      username=self.configuration.dut.username,
-                                                      password=self.configuration.dut.password,
-                                                      test_interface=self.configuration.dut.test_ip,
-                                                      prefix=self.configuration.dut.prefix,
-                                                      timeout=self.configuration.dut.timeout,
-                                                      operating_system=self.configuration.dut.operating_system,
-                                                      connection_type=self.configuration.dut.connection_type,
-                                                      **self.configuration.dut.kwargs)
+            self._dut = HostPool.get_host(hostname=self.configuration.dut.control_ip,
+                                          username=self.configuration.dut.username,
+                                          password=self.configuration.dut.password,
+                                          test_interface=self.configuration.dut.test_ip,
+                                          prefix=self.configuration.dut.prefix,
+                                          timeout=self.configuration.dut.timeout,
+                                          operating_system=self.configuration.dut.operating_system,
+                                          connection_type=self.configuration.dut.connection_type,
+                                          max_channels=self.configuration.dut.max_channels,
+                                          facts_ttl=self.configuration.dut.facts_ttl,
+                                          **self.configuration.dut.kwargs)
         return self._dut
 
     @property
@@ -211,20 +254,50 @@ class RateVsRangeTest(object):
         """
         Connection to the server
 
-        :return: HostSSH connected to the server's control ip
+        :return: TheHost (from the HostPool) for the server
         """
         if self._server is None:
-            self._server = cameraobscura.hosts.host.TheHost(hostname=self.configuration.server.control_ip,
-                                                         username=self.configuration.server.username,
-                                                         password=self.configuration.server.password,
-                                                         test_interface=self.configuration.server.test_ip,
-                                                         prefix=self.configuration.server.prefix,
-                                                         timeout=self.configuration.server.timeout,
-                                                         operating_system=self.configuration.server.operating_system,
-                                                         connection_type=self.configuration.server.connection_type,
-                                                         **self.configuration.server.kwargs)
+            self._server = HostPool.get_host(hostname=self.configuration.server.control_ip,
+                                             username=self.configuration.server.username,
+                                             password=self.configuration.server.password,
+                                             test_interface=self.configuration.server.test_ip,
+                                             prefix=self.configuration.server.prefix,
+                                             timeout=self.configuration.server.timeout,
+                                             operating_system=self.configuration.server.operating_system,
+                                             connection_type=self.configuration.server.connection_type,
+                                             max_channels=self.configuration.server.max_channels,
+                                             facts_ttl=self.configuration.server.facts_ttl,
+                                             **self.configuration.server.kwargs)
         return self._server
 
+    @property
+    def timer(self):
+        """
+        A PhaseTimer to record where the time for each step goes
+        """
+        if self._timer is None:
+            self._timer = PhaseTimer()
+        return self._timer
+
+    @property
+    def post_processor(self):
+        """
+        A (started) PostProcessor for the work that doesn't have to be done in-step
+        """
+        if self._post_processor is None:
+            self._post_processor = PostProcessor().start()
+        return self._post_processor
+
+    @property
+    def journal(self):
+        """
+        The Journal of finished steps (in the result_location)
+        """
+        if self._journal is None:
+            self._journal = Journal(os.path.join(self.result_location,
+                                                 JournalConstants.filename))
+        return self._journal
+
     @property
     def iperf(self):
         """
@@ -236,7 +309,8 @@ class RateVsRangeTest(object):
             self._iperf = Iperf(dut=self.dut,
                                 traffic_server=self.server,
                 client_settings=self.configuration.traffic.client_settings,
-                server_settings=self.configuration.traffic.server_settings)
+                server_settings=self.configuration.traffic.server_settings,
+                                timer=self.timer)
         return self._iperf
             
     @property
@@ -246,7 +320,7 @@ class RateVsRangeTest(object):
         """
         if self._attenuator is None:
             self.logger.info("Initializing attenuator.")
-            self._attenuator = AttenuatorFactory.GetAttenuator(self.configuration.attenuation.name,
+            self._attenuator = AttenuatorBuilder.GetAttenuator(self.configuration.attenuation.name,
                                                                self.configuration.attenuation.control_ip)
         return self._attenuator
 
@@ -265,12 +339,30 @@ class RateVsRangeTest(object):
                 os.makedirs(self._result_location)
         return self._result_location
 
+    @result_location.setter
+    def result_location(self, folder):
+        """
+        Sends the output to a given folder (e.g. to resume an interrupted test)
+
+        :param:
+
+         - `folder`: path to the folder for the output (created if it isn't there)
+
+        :postcondition: the journal will be in the new folder
+        """
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        self._result_location = folder
+        self._journal = None
+        return
+
+
     @property
     def dump(self):
         """
-        Creates a Composite with command dumps to call after the testing is done
+        Creates the command dumps to call after the testing is done
 
-        :return: Dump Composite or NoOp if configuration.dump was not created
+        :return: TheDumpBatch, TheDumpLoop or NoOp if configuration.dump was not created
         """
         if self._dump is None:
             if self.configuration.dump is not None:
@@ -286,7 +378,11 @@ class RateVsRangeTest(object):
                                               filename=filename,
                                               timeout=self.configuration.dump.timeout)
                     )
-                self._dump = TheComposite(components=components)
+                if self.dut.batched is True:
+                    # one round-trip for all the dumps
+                    self._dump = TheDumpBatch(dumps=components, connection=self.dut)
+                else:
+                    self._dump = TheDumpLoop(dumps=components)
             else:
                 self._dump = NoOp(noop_name='TheDump')
         return self._dump
@@ -304,6 +400,28 @@ class RateVsRangeTest(object):
             self.configuration.configuration.write(writeable_file)
         return
 
+    def recover(self):
+        """
+        Waits for the DUT's connection to the server to come back
+
+        Uses the ping's single attempts (if there is a ping) with a backoff, up
+        to the `recovery_time`
+
+        :return: RecoveryResult
+        """
+        if self.ping:
+            recovery = BackoffRecovery(check=self.ping.probe,
+                                       time_limit=self.configuration.other.recovery_time,
+                                       threshold=self.ping.threshold)
+        else:
+            recovery = BackoffRecovery(check=None,
+                                       time_limit=self.configuration.other.recovery_time)
+        result = recovery()
+        self.logger.info("Recovery took {0:.2f} seconds ({1} attempts, recovered: {2})".format(result.elapsed,
+                                                                                             result.attempts,
+                                                                                             result.recovered))
+        return result
+
     def connected(self, raise_error=False):
         """
         If the user didn't set the [attenuation] ping option to false, client pings server
@@ -334,6 +452,91 @@ class RateVsRangeTest(object):
             raise CameraobscuraError("Connection Between DUT and Server not established")
         return success
 
+    def warm_up(self):
+        """
+        Connects to the hosts and the attenuator in parallel
+
+        Each host is checked (the hosts are kept between repetitions), connected
+        and probed for its facts while the attenuator is built and asked for its
+        maximum attenuation, so the test finds out about anything that's
+        unreachable before it starts instead of part-way through the first step.
+
+        :raise: CameraobscuraError naming everything that couldn't be reached
+        """
+        self.logger.info(BOLD_BLUE_RESET.format("** Connecting to the Hosts and Attenuator **"))
+        probe = HostFactsProbe(cache=HostFactsCache(ttl=min(self.dut.facts_ttl,
+                                                            self.server.facts_ttl)))
+        failures = {}
+
+        def warm_host(host):
+            HostPool.check(host)
+            host.connect()
+            host.facts = probe.facts(host)
+            return
+
+        def warm_attenuator():
+            self.maximum_attenuation
+            return
+
+        def run(name, target, *args):
+            try:
+                target(*args)
+            # the clients and attenuators raise socket, paramiko, telnet and serial errors
+            except Exception as error:
+                failures[name] = error
+            return
+
+        targets = ((WARM_UP_DUT, warm_host, self.dut),
+                   (WARM_UP_SERVER, warm_host, self.server),
+                   (WARM_UP_ATTENUATOR, warm_attenuator))
+        threads = [threading.Thread(target=run, args=arguments,
+                                    name='warm_up_{0}'.format(arguments[0]))
+                   for arguments in targets]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if failures:
+            unreachable = [UNREACHABLE.format(name, type(failures[name]).__name__,
+                                              failures[name])
+                           for name in (arguments[0] for arguments in targets)
+                           if name in failures]
+            for message in unreachable:
+                self.logger.error(BOLD_RED_RESET.format("Couldn't reach the {0}".format(message)))
+            raise CameraobscuraError("Couldn't reach: {0}".format(", ".join(unreachable)))
+        return
+
+    def get_sampler(self, direction):
+        """
+        Creates a QuerySampler for the traffic sessions (on its own connection to the DUT)
+
+        :param:
+
+         - `direction`: token to add to filename
+
+        :return: QuerySampler or None if the query section doesn't set a sample_period
+        """
+        query = self.configuration.query
+        if query is None or not query.sample_period:
+            return None
+        connection = self.dut.clone()
+        builder = QueryBuilder(connection=connection, configuration=query)
+        path = os.path.join(self.result_location, 'compiled_data')
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        filename = os.path.join(path, "{0}_{1}".format(direction,
+                                                       query.sample_filename))
+        return QuerySampler(commands=builder.commands,
+                            fields=query.fields[:],
+                            output_filename=filename,
+                            period=query.sample_period,
+                            size=query.sample_buffer,
+                            extra_fields=[RateVSRangeEnum.attenuation],
+                            connection=connection,
+                            agent=builder.agent)
+
     def get_querier(self, direction):
         """
         Creates a Query object with an file based on filename
@@ -369,6 +572,7 @@ class RateVsRangeTest(object):
             
         # an ugly bit added to let the user add something to the filename
         new_query.output_filename = filename
+        new_query.timer = self.timer
             
         try:
             new_query.check_rep()
@@ -391,31 +595,52 @@ class RateVsRangeTest(object):
         """
         self.save_configuration()
         directions = DIRECTION_MAP[self.configuration.traffic.direction]
+        self.iperf.post_processor = self.post_processor
+        # connect to everything (in parallel) before anything is measured
+        self.warm_up()
+
         # log the iperf version
         for connection in (self.dut, self.server):
             self.logger.info("{0} --  {1}".format(connection, self.iperf.version(connection)))
             
-        for not_first_test, direction in enumerate(directions):
-            print
-            self.attenuations.reset()
-            
-            # *** this next call is where most of the interesting things happen
-            self.RunTest(direction)
-            # ***
-            
-            if 0 < not_first_test < len(directions) - 1:
-                # take a break then check the connection
-                self.logger.info(BOLD_BLUE_RESET.format("Sleeping for {0} seconds to let the system"
-                                                        " recover it's state.".format(self.configuration.other.recovery_time)))
-                time.sleep(self.configuration.other.recovery_time)
-                self.connected(raise_error=True)
+        completed = (self.journal.completed_directions(self.repetition)
+                     if self.resuming else ())
+        try:
+            for not_first_test, direction in enumerate(directions):
+                if direction in completed:
+                    self.logger.info("Skipping {0} -- it was finished before the test stopped".format(direction))
+                    continue
+                print
+                self.attenuations.reset()
+
+                # *** this next call is where most of the interesting things happen
+                if self.configuration.attenuation.ramp:
+                    self.RampTest(direction)
+                else:
+                    self.RunTest(direction)
+                # ***
+                self.journal.direction_complete(self.repetition, direction)
+
+                if 0 < not_first_test < len(directions) - 1:
+                    # take a break then check the connection
+                    self.logger.info(BOLD_BLUE_RESET.format("Sleeping for {0} seconds to let the system"
+                                                            " recover it's state.".format(self.configuration.other.recovery_time)))
+                    time.sleep(self.configuration.other.recovery_time)
+                    self.connected(raise_error=True)
+        finally:
+            # finish whatever was queued (even if the test failed part-way)
+            self.post_processor.close()
+            self._post_processor = None
+            self.iperf.post_processor = None
+            for host, counters in sorted(CircuitBreaker.statistics().items()):
+                self.logger.info("{0} connections -- {1}".format(host,
+                                                                 ", ".join("{0}: {1}".format(name, count)
+                                                                           for name, count in sorted(counters.items()))))
+            self.save_latencies()
 
         # dumps whatever was configured to dump
         self.logger.info(BOLD_BLUE_RESET.format("**** Dumping Device Info ****"))
         self.dump()
-        # close the clients so the files will be closed
-        self.dut.close()
-        self.server.close()
         
         # parse the test results for the average throughput
         traffic_type = 'tcp'
@@ -450,6 +675,7 @@ class RateVsRangeTest(object):
         # this data stuff needs to be separated out, the method is way too long
         # setup csv
         save_device_data = self.get_querier(direction)
+        sampler = self.get_sampler(direction)
         if direction == RateVSRangeEnum.downstream:
             # Server -> DUT
             fields = (RateVSRangeEnum.attenuation,
@@ -465,76 +691,264 @@ class RateVsRangeTest(object):
                               "".format(direction.capitalize())))
 
         lost_connection = False
-        for attenuation_index, attenuation in enumerate(self.attenuations):
-            print()
-            self.logger.info(BOLD_BLUE_RESET.format("*** Setting Attenuation to {0} ***".format(attenuation)))
-            self.attenuator.setAttenuation(attenuation)
-            if lost_connection:
-                lost_connection = False
-                timeout = self.configuration.other.recovery_time
-                self.logger.info("Sleeping for {0} seconds to recover".format(timeout))
-                time.sleep(timeout)
-            # Verify there is a connection between the dut and server
-            if not self.connected(raise_error=attenuation==self.attenuations.start):
-                # aaiiiieeeeeee!
-                lost_connection = True
-                if not self.attenuations.reverse():
-                    message = "Stopping {0} test".format(direction)
+        self.timer.reset()
+        last_step = (self.journal.last_step(self.repetition, direction)
+                     if self.resuming else None)
+        if last_step is not None:
+            # pick up after the last step that was finished
+            self.attenuations.restore(last_step.state)
+            self.attenuations.advance()
+            lost_connection = last_step.lost_connection
+            self.logger.info(BOLD_BLUE_RESET.format("*** Resuming after attenuation {0} ***".format(last_step.attenuation)))
+        try:
+            for attenuation_index, attenuation in enumerate(self.attenuations):
+                print()
+                self.timer.step(direction=direction, attenuation=attenuation)
+                self.logger.info(BOLD_BLUE_RESET.format("*** Setting Attenuation to {0} ***".format(attenuation)))
+                with self.timer.span('setAttenuation'):
+                    self.attenuator.setAttenuation(attenuation)
+                recovered = False
+                if lost_connection:
+                    lost_connection = False
+                    with self.timer.span('recovery'):
+                        recovered = self.recover().recovered
+                if recovered:
+                    # the recovery already saw `threshold` pings in a row
+                    connected = True
                 else:
-                    message = "Reversed Attenuation Direction"
-                self.logger.info(BOLD_RED_RESET.format("**** Lost connection between dut and server --"
-                                                       " {0} ****".format(message)))
-                continue
+                    # Verify there is a connection between the dut and server
+                    with self.timer.span('connected'):
+                        connected = self.connected(raise_error=attenuation==self.attenuations.start)
+                if not connected:
+                    # aaiiiieeeeeee!
+                    lost_connection = True
+                    self.attenuations.record(attenuation, ZERO)
+                    if not self.attenuations.reverse():
+                        message = "Stopping {0} test".format(direction)
+                    else:
+                        message = "Reversed Attenuation Direction"
+                    self.logger.info(BOLD_RED_RESET.format("**** Lost connection between dut and server --"
+                                                           " {0} ****".format(message)))
+                    # after the earlier steps' saves (checkpoints are made in order)
+                    self.post_processor.checkpoint(self.journal.step, self.repetition,
+                                                   direction, attenuation,
+                                                   JournalConstants.no_connection,
+                                                   lost_connection, self.attenuations.state)
+                    continue
+
+                self.logger.info(BOLD_BLUE_RESET.format( "*** Running the Iperf Session ***"))
+                path = os.path.join(self.result_location, 'raw_iperf')
+                if not os.path.isdir(path):
+                    os.makedirs(path)
+                filename = os.path.join(path, "attenuation_{a:03}_dut_{d}{t}.iperf".format(a=attenuation,
+                                                                                           d="{0}@{1}".format(self.dut.username,
+                                                                                                              self.dut.hostname),
+                                                                                                              t=time.strftime(FOLDER_TIMESTAMP)))
+                status = JournalConstants.measured
+                try:
+                    if sampler is not None:
+                        sampler.start()
+                    try:
+                        self.iperf(direction, filename)
+                    finally:
+                        if sampler is not None:
+                            sampler.stop()
+                    self.logger.info(BOLD_BLUE_RESET.format("*** Saving the Device Data ***"))
+                    # fields are attenuation, dut data, server data
+                    if direction == RateVSRangeEnum.downstream:
+                        # DUT (server) <- TPC (client)
+                        data = (attenuation, self.iperf.server_summary,
+                                self.iperf.client_summary)
+                        results = (self.iperf.server_result,
+                                   self.iperf.client_result)
+                    else:
+                        # DUT (client) -> TPC (server)
+                        data = (attenuation, self.iperf.client_summary,
+                                self.iperf.server_summary)
+                        results = (self.iperf.client_result,
+                                   self.iperf.server_result)
+                    # fields defined at the top of this method
+                    save_device_data(dict(zip(fields, data)))
+                    # the statistics only need the parsed values so they can wait
+                    self.post_processor.submit(self.save_statistics, direction,
+                                               attenuation, dict(zip(fields[1:], results)))
+                    # the adaptive iterator picks the next attenuation using the (receiver's) throughput
+                    if self.iperf.server_finished and self.iperf.server_summary is not None:
+                        self.attenuations.record(attenuation, self.iperf.server_summary)
+                    else:
+                        self.logger.warning("No throughput from the iperf server at {0}, recording {1}".format(attenuation,
+                                                                                                              ZERO))
+                        self.attenuations.record(attenuation, ZERO)
+                        status = JournalConstants.no_throughput
+
+                except socket.error as error:
+                    self.logger.info(error)
+                    self.attenuations.record(attenuation, ZERO)
+                    if self.attenuations.reverse():
+                        self.logger.info('socket error reached -- reversing attenuation direction')
+                    lost_connection = True                
+                    status = JournalConstants.socket_error
+                if sampler is not None:
+                    # the samples are taken out now but written in the background
+                    self.post_processor.submit(sampler.write, sampler.drain(),
+                                               {RateVSRangeEnum.attenuation: attenuation})
+                # the state is saved after any reversal so a resume goes the same way
+                # (and journaled only once the step's saves have finished)
+                self.post_processor.checkpoint(self.journal.step, self.repetition,
+                                               direction, attenuation, status,
+                                               lost_connection, self.attenuations.state)
+
+            # Putting attenuation at zero, to help the next test... :)
+            # Why is the AttenuatorError not trapped here?
+            self.attenuator.setAttenuation(ZERO)
+            self.finish_post_processing(direction)
+        finally:
+            if sampler is not None:
+                # its queued writes have to finish before its file is closed
+                self.post_processor.barrier()
+                sampler.close()
+
+        # where did the time go?
+        self.timer.log_summary(label="{0} phases --".format(direction.capitalize()))
+        self.timer.save(os.path.join(self.result_location, 'timing',
+                                     "{0}_phases_trace.json".format(direction)))
 
-            self.logger.info(BOLD_BLUE_RESET.format( "*** Running the Iperf Session ***"))
-            path = os.path.join(self.result_location, 'raw_iperf')
-            if not os.path.isdir(path):
-                os.makedirs(path)
-            filename = os.path.join(path, "attenuation_{a:03}_dut_{d}{t}.iperf".format(a=attenuation,
-                                                                                       d="{0}@{1}".format(self.dut.username,
-                                                                                                          self.dut.hostname),
-                                                                                                          t=time.strftime(FOLDER_TIMESTAMP)))
-            try:
-                self.iperf(direction, filename)                
-                self.logger.info(BOLD_BLUE_RESET.format("*** Saving the Device Data ***"))
-                # fields are attenuation, dut data, server data
-                if direction == RateVSRangeEnum.downstream:
-                    # DUT (server) <- TPC (client)
-                    data = (attenuation, self.iperf.server_summary,
-                            self.iperf.client_summary)
-                else:
-                    # DUT (client) -> TPC (server)
-                    data = (attenuation, self.iperf.client_summary,
-                            self.iperf.server_summary)
-                # fields defined at the top of this method
+        msg = "Completed {0} test.".format(direction)
+        self.logger.info(BOLD_RESET.format("**** " + msg + " ****"))
+        return True, msg
 
-                save_device_data(dict(zip(fields, data)))
+    def RampTest(self, direction):
+        """
+        Runs one iperf session while an AttenuationRamp steps the attenuation
 
-            except socket.error as error:
-                self.logger.info(error)
-                if self.attenuations.reverse():
-                    self.logger.info('socket error reached -- reversing attenuation direction')
-                lost_connection = True                
+        :param:
 
-        # Putting attenuation at zero, to help the next test... :)
-        # Why is the AttenuatorError not trapped here?
-        self.attenuator.setAttenuation(ZERO)
+         - `direction`: direction for the traffic (up or down)
+        """
+        attenuations = list(self.attenuations)
+        ramp = AttenuationRamp(attenuator=self.attenuator,
+                               attenuations=attenuations,
+                               dwell=self.configuration.attenuation.dwell,
+                               start_event=self.iperf.client_started)
+        self.logger.info(BOLD_RESET.format("**** Beginning {0} Ramp ({1} attenuations, {2} seconds) ****".format(direction.capitalize(),
+                                                                                                            len(attenuations),
+                                                                                                            ramp.duration)))
+        self.timer.reset()
+        with self.timer.span('setAttenuation'):
+            self.attenuator.setAttenuation(attenuations[0])
+        with self.timer.span('connected'):
+            self.connected(raise_error=True)
+
+        # the session has to last for the whole ramp and report intervals
+        settings = self.iperf.client_settings
+        time_setting, interval_setting = settings.get('time'), settings.get('interval')
+        settings.set('time', int(math.ceil(ramp.duration)))
+        if interval_setting is None:
+            settings.set('interval', RampConstants.default_interval)
 
-        msg = "Completed {0} test.".format(direction)
+        path = os.path.join(self.result_location, 'raw_iperf')
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        filename = os.path.join(path, "ramp_dut_{d}{t}.iperf".format(d="{0}@{1}".format(self.dut.username,
+                                                                                        self.dut.hostname),
+                                                                    t=time.strftime(FOLDER_TIMESTAMP)))
+        # a failed session shouldn't leave the last session's result behind
+        self.iperf.client_result = None
+        ramp.start()
+        try:
+            self.iperf(direction, filename)
+        except socket.error as error:
+            self.logger.error("Ramp traffic failed: {0}".format(error))
+        finally:
+            ramp.stop()
+            settings.set('time', time_setting)
+            settings.set('interval', interval_setting)
+        self.attenuator.setAttenuation(ZERO)
+        self.finish_post_processing(direction)
+
+        samples = ramp.correlate(self.iperf.client_result) if self.iperf.client_result else []
+        ramp.save(samples, os.path.join(self.result_location, 'compiled_data',
+                                        RampConstants.filename.format(direction)))
+        self.timer.log_summary(label="{0} ramp phases --".format(direction.capitalize()))
+        self.timer.save(os.path.join(self.result_location, 'timing',
+                                     "{0}_ramp_phases_trace.json".format(direction)))
+        msg = "Completed {0} ramp ({1} samples).".format(direction, len(samples))
         self.logger.info(BOLD_RESET.format("**** " + msg + " ****"))
         return True, msg
 
+    def save_latencies(self):
+        """
+        Logs and saves the exec latencies for the run (then clears them for the next one)
+        """
+        for host, name, metric, count, percentiles in EXEC_LATENCY.summary():
+            self.logger.info("{0} '{1}' {2} ({3} commands) -- {4}".format(host, name, metric, count,
+                                                                          ", ".join("p{0}: {1:.1f} ms".format(percentile,
+                                                                                                              percentiles[percentile]/1000.0)
+                                                                                    for percentile in sorted(percentiles))))
+        EXEC_LATENCY.save(os.path.join(self.result_location, 'timing',
+                                       LatencyConstants.filename))
+        EXEC_LATENCY.clear()
+        return
+
+    def save_statistics(self, direction, attenuation, results):
+        """
+        Appends the statistics for a step's bandwidths to the direction's statistics file
+
+        :param:
+
+         - `direction`: direction for the traffic (up or down)
+         - `attenuation`: attenuation for the step
+         - `results`: dict of field:StepResult
+        """
+        filename = os.path.join(self.result_location, 'compiled_data',
+                                STATISTICS_FILENAME.format(direction))
+        rows = []
+        for field, result in sorted(results.iteritems()):
+            bandwidths = result.bandwidths
+            if not len(bandwidths):
+                continue
+            rows.append((attenuation, field, len(bandwidths),
+                         FOUR_DECIMALS.format(numpy.mean(bandwidths)),
+                         FOUR_DECIMALS.format(numpy.median(bandwidths)),
+                         FOUR_DECIMALS.format(numpy.std(bandwidths)),
+                         FOUR_DECIMALS.format(numpy.min(bandwidths)),
+                         FOUR_DECIMALS.format(numpy.max(bandwidths))))
+        with self.statistics_lock:
+            new_file = not os.path.isfile(filename)
+            with open(filename, APPENDABLE) as opened:
+                writer = csv.writer(opened)
+                if new_file:
+                    writer.writerow(STATISTICS_FIELDS)
+                writer.writerows(rows)
+        return
+
+    def finish_post_processing(self, direction):
+        """
+        Waits for the post-processing of a sweep to finish
+
+        :param:
+
+         - `direction`: direction for the traffic (for the error)
+
+        :raise: CameraobscuraError if any of the post-processing failed (the steps from the first failure on weren't journaled)
+        """
+        with self.timer.span('post_processing_barrier'):
+            errors = self.post_processor.barrier()
+        if errors:
+            raise CameraobscuraError("{0} post-processing task(s) failed for the {1} test ({2}) -- 'rvr resume' will re-run the steps that weren't saved".format(len(errors),
+                                                                                                                                                            direction,
+                                                                                                                                                            errors[0]))
+        return
+
     def reset(self):
         """
-        Sets some properties back to None (but not the configuration)
+        Sets the measurement properties back to None
+
+        The hosts, attenuator and ping are kept for the next repetition
+        (see the HostPool).
         """
         self.logger.debug("resetting the properties to None")
         self._attenuations = None
-        self._maximum_attenuation = None
-        self._ping = None
-        self._dut = None
-        self._server = None
-        self._attenuator = None
         self._dump = None
         self._query = None
         return
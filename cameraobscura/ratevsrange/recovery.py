@@ -0,0 +1,113 @@
+
+# python standard library
+from collections import namedtuple
+import logging
+import socket
+import time
+
+# this package
+from cameraobscura import CameraobscuraError
+
+class RecoveryConstants(object):
+    """
+    Constants for the recovery
+    """
+    __slots__ = ()
+    # seconds to wait after the first failed check
+    initial_delay = 0.5
+    # the wait is multiplied by this after each failure
+    factor = 2
+    # the longest to wait between checks
+    maximum_delay = 4
+    default_threshold = 1
+# end class RecoveryConstants
+
+RecoveryResult = namedtuple('RecoveryResult', 'recovered elapsed attempts')
+
+class BackoffRecovery(object):
+    """
+    Waits for the connection to come back, checking it with a backoff
+    """
+    def __init__(self, check, time_limit, threshold=RecoveryConstants.default_threshold,
+                 initial_delay=RecoveryConstants.initial_delay,
+                 factor=RecoveryConstants.factor,
+                 maximum_delay=RecoveryConstants.maximum_delay):
+        """
+        BackoffRecovery constructor
+
+        :param:
+
+         - `check`: callable that returns True if the connection works (or None)
+         - `time_limit`: longest to wait for the connection (seconds)
+         - `threshold`: number of checks in a row that have to pass
+         - `initial_delay`: seconds to wait after the first failure
+         - `factor`: multiplier for the wait after each failure
+         - `maximum_delay`: longest wait between checks
+        """
+        super(BackoffRecovery, self).__init__()
+        self._logger = None
+        self.check = check
+        self.time_limit = time_limit
+        self.threshold = threshold
+        self.initial_delay = initial_delay
+        self.factor = factor
+        self.maximum_delay = maximum_delay
+        return
+
+    @property
+    def logger(self):
+        """
+        :return: A logging object.
+        """
+        if self._logger is None:
+            self._logger = logging.getLogger("{0}.{1}".format(self.__module__,
+                                  self.__class__.__name__))
+        return self._logger
+
+    def attempt(self):
+        """
+        Makes one check
+
+        :return: True if the check passed
+        """
+        try:
+            return bool(self.check())
+        except (socket.error, CameraobscuraError) as error:
+            self.logger.debug("Recovery check failed: {0}".format(error))
+        return False
+
+    def __call__(self):
+        """
+        Checks the connection until it passes `threshold` times in a row or time runs out
+
+        :return: RecoveryResult
+        """
+        start = time.time()
+        if self.check is None:
+            self.logger.info("Sleeping for {0} seconds to recover".format(self.time_limit))
+            time.sleep(self.time_limit)
+            return RecoveryResult(recovered=False, elapsed=time.time() - start,
+                                  attempts=0)
+        deadline = start + self.time_limit
+        delay = self.initial_delay
+        successes = attempts = 0
+        while True:
+            attempts += 1
+            if self.attempt():
+                successes += 1
+                delay = self.initial_delay
+                if successes >= self.threshold:
+                    return RecoveryResult(recovered=True, elapsed=time.time() - start,
+                                          attempts=attempts)
+                wait = self.initial_delay
+            else:
+                successes = 0
+                wait = delay
+                delay = min(delay * self.factor, self.maximum_delay)
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return RecoveryResult(recovered=False, elapsed=time.time() - start,
+                                      attempts=attempts)
+            time.sleep(min(wait, remaining))
+        return
+# end class BackoffRecovery
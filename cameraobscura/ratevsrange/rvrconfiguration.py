@@ -54,6 +54,13 @@ class AttenuationEnum(object):
     reversal_limit = 'reversal_limit'
     step_change_thresholds = 'step_change_thresholds'
     stepchange = 'stepchange'
+    adaptive = 'adaptive'
+    coarse_step = 'coarse_step'
+    resolution = 'resolution'
+    step_budget = 'step_budget'
+    change_threshold = 'change_threshold'
+    ramp = 'ramp'
+    dwell = 'dwell'
     
     # defaults
     default_attenuator = 'WeinschelP'
@@ -61,6 +68,12 @@ class AttenuationEnum(object):
     default_reversal_limit = 0
     default_stop = sys.maxint
     default_step_sizes = [1]
+    default_adaptive = False
+    default_coarse_step = 10
+    default_resolution = 1
+    default_change_threshold = 0.1
+    default_ramp = False
+    default_dwell = 5
 
     # constants
     delimiter = ' '
@@ -319,6 +332,13 @@ class AttenuationConfiguration(BaseConfiguration):
         self._step_change_thresholds = False
         self._step_list = None
         self._reversal_limit = None        
+        self._adaptive = None
+        self._coarse_step = None
+        self._resolution = None
+        self._step_budget = False
+        self._change_threshold = None
+        self._ramp = None
+        self._dwell = None
         return
 
     @property
@@ -376,13 +396,37 @@ class AttenuationConfiguration(BaseConfiguration):
             # e.g. to run only attenuations 10, 20, 30,:
             # step_list = 10 20 30 
             # step_list = 
+
+            # `adaptive` replaces the step_sizes with a search that walks from start
+            # to stop using the `coarse_step` then bisects the attenuations where
+            # the throughput changed the most until no interval wider than the
+            # `resolution` changed by at least the `change_threshold` (a fraction)
+            # or `step_budget` steps have been taken
+            # adaptive = {adaptive}
+            # coarse_step = {coarse_step}
+            # resolution = {resolution}
+            # change_threshold = {change_threshold}
+            # step_budget = 
+
+            # `ramp` runs a single iperf session while the attenuation is changed
+            # every `dwell` seconds (the step_sizes, etc. still set the attenuations)
+            # the interval bandwidths are saved with the attenuation that was set
+            # this is meant for quick screening runs before a full step-test
+            # ramp = {ramp}
+            # dwell = {dwell}
             """.format(section=self.section,
                        start=AttenuationEnum.default_start,
                        attenuators=','.join(attenuation_definitions.keys()),
                 stop=AttenuationEnum.default_stop,
                 step_sizes = AttenuationEnum.default_step_sizes,
                 name=AttenuationEnum.default_attenuator,
-                reversals=AttenuationEnum.default_reversal_limit))
+                reversals=AttenuationEnum.default_reversal_limit,
+                adaptive=AttenuationEnum.default_adaptive,
+                coarse_step=AttenuationEnum.default_coarse_step,
+                resolution=AttenuationEnum.default_resolution,
+                change_threshold=AttenuationEnum.default_change_threshold,
+                ramp=AttenuationEnum.default_ramp,
+                dwell=AttenuationEnum.default_dwell))
         return self._example
 
     @property
@@ -439,6 +483,111 @@ class AttenuationConfiguration(BaseConfiguration):
                                                              optional=True,
                                                              default=AttenuationEnum.default_reversal_limit)
         return self._reversal_limit
+
+    @property
+    def adaptive(self):
+        """
+        If True use the AdaptiveStepRange (step_sizes and step_change_thresholds are ignored)
+
+        :return: boolean
+        :default: False
+        """
+        if self._adaptive is None:
+            self._adaptive = self.configuration.getboolean(section=self.section,
+                                                           option=AttenuationEnum.adaptive,
+                                                           optional=True,
+                                                           default=AttenuationEnum.default_adaptive)
+            self.logger.debug(ATTENUATION_LOG_STRING.format('adaptive', self._adaptive))
+        return self._adaptive
+
+    @property
+    def coarse_step(self):
+        """
+        The step-size for the adaptive search's first walk
+
+        :return: integer
+        :default: 10
+        """
+        if self._coarse_step is None:
+            self._coarse_step = self.configuration.getint(section=self.section,
+                                                          option=AttenuationEnum.coarse_step,
+                                                          optional=True,
+                                                          default=AttenuationEnum.default_coarse_step)
+        return self._coarse_step
+
+    @property
+    def resolution(self):
+        """
+        The smallest attenuation interval the adaptive search will bisect
+
+        :return: integer
+        :default: 1
+        """
+        if self._resolution is None:
+            self._resolution = self.configuration.getint(section=self.section,
+                                                         option=AttenuationEnum.resolution,
+                                                         optional=True,
+                                                         default=AttenuationEnum.default_resolution)
+        return self._resolution
+
+    @property
+    def step_budget(self):
+        """
+        The maximum number of steps for the adaptive search
+
+        :return: integer or None (no limit)
+        """
+        if self._step_budget is False:
+            self._step_budget = self.configuration.getint(section=self.section,
+                                                          option=AttenuationEnum.step_budget,
+                                                          optional=True)
+        return self._step_budget
+
+    @property
+    def change_threshold(self):
+        """
+        The smallest relative change in throughput the adaptive search will bisect
+
+        :return: float
+        :default: 0.1
+        """
+        if self._change_threshold is None:
+            self._change_threshold = self.configuration.getfloat(section=self.section,
+                                                                 option=AttenuationEnum.change_threshold,
+                                                                 optional=True,
+                                                                 default=AttenuationEnum.default_change_threshold)
+        return self._change_threshold
+
+    @property
+    def ramp(self):
+        """
+        If True run one long iperf session while the attenuation is stepped (no per-step setup)
+
+        :return: boolean
+        :default: False
+        """
+        if self._ramp is None:
+            self._ramp = self.configuration.getboolean(section=self.section,
+                                                       option=AttenuationEnum.ramp,
+                                                       optional=True,
+                                                       default=AttenuationEnum.default_ramp)
+            self.logger.debug(ATTENUATION_LOG_STRING.format('ramp', self._ramp))
+        return self._ramp
+
+    @property
+    def dwell(self):
+        """
+        Seconds to leave each attenuation set during a ramp
+
+        :return: float
+        :default: 5
+        """
+        if self._dwell is None:
+            self._dwell = self.configuration.getfloat(section=self.section,
+                                                      option=AttenuationEnum.dwell,
+                                                      optional=True,
+                                                      default=AttenuationEnum.default_dwell)
+        return self._dwell
     
     @property
     def name(self):
@@ -550,6 +699,13 @@ class AttenuationConfiguration(BaseConfiguration):
         self._step_change_thresholds = False
         self._step_list = None
         self._reversal_limit = None
+        self._adaptive = None
+        self._coarse_step = None
+        self._resolution = None
+        self._step_budget = False
+        self._change_threshold = None
+        self._ramp = None
+        self._dwell = None
         return
 
     def check_rep(self):
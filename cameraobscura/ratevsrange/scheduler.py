@@ -0,0 +1,470 @@
+
+# python standard library
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+# this package
+from cameraobscura.set_logger import LOG_FORMAT, LOG_TIMESTAMP
+from cameraobscura.hosts.host import HostEnum
+from cameraobscura.hosts.hostpool import HostPool
+from cameraobscura.utilities.configurationadapter import ConfigurationAdapter
+from rvrconfiguration import RVRConfiguration, AttenuationEnum
+from rvrconfiguration import DutEnum, ServerEnum
+from rate_vs_range import RateVsRangeTest, DIRECTION_MAP
+from journal import Journal, JournalConstants
+
+class SchedulerConstants(object):
+    """
+    Constants for the scheduler
+    """
+    __slots__ = ()
+    # most sweeps to run at the same time
+    default_workers = 2
+    # seconds between checks of the running sweeps
+    poll_interval = 1
+    # seconds between progress reports
+    default_refresh = 60
+
+    # job states
+    waiting = 'waiting'
+    running = 'running'
+    done = 'done'
+    failed = 'failed'
+
+    # resource-name prefixes
+    host = 'host'
+    attenuator = 'attenuator'
+
+    log_folder = 'logs'
+    log_name = '{0}.log'
+    # the loggers a job's process sends to its own log-file
+    loggers = ('cameraobscura', 'theape', 'paramiko')
+# end class SchedulerConstants
+
+def resources(configuration):
+    """
+    Gets the equipment a configuration uses
+
+    :param:
+
+     - `configuration`: ConfigParser with the test's configuration
+
+    :return: set of resource names
+    """
+    found = set()
+    for section in (DutEnum.section, ServerEnum.section):
+        for option in (HostEnum.control_ip, HostEnum.test_ip):
+            if configuration.has_option(section, option):
+                found.add('{0}:{1}'.format(SchedulerConstants.host,
+                                           configuration.get(section, option)))
+                break
+    for option in (AttenuationEnum.control_ip, AttenuationEnum.interface):
+        if configuration.has_option(AttenuationEnum.section, option):
+            found.add('{0}:{1}'.format(SchedulerConstants.attenuator,
+                                       configuration.get(AttenuationEnum.section,
+                                                         option)))
+            break
+    return found
+
+class Job(object):
+    """
+    A configuration's sweep
+    """
+    def __init__(self, filename, configuration, runner):
+        """
+        Job constructor
+
+        :param:
+
+         - `filename`: name of the configuration file
+         - `configuration`: ConfigParser loaded from the file
+         - `runner`: callable that runs a RateVsRangeTest's repetitions
+        """
+        super(Job, self).__init__()
+        self._logger = None
+        self._journal = None
+        self._estimated_steps = None
+        self.filename = filename
+        self.configuration = configuration
+        self.runner = runner
+        self.name = os.path.splitext(os.path.basename(filename))[0]
+        self.rvr_configuration = RVRConfiguration(ConfigurationAdapter(configuration))
+        self.resources = resources(configuration)
+        self.result_location = self.rvr_configuration.other.result_location
+        self.state = SchedulerConstants.waiting
+        self.process = None
+        self.started = None
+        self.finished = None
+        return
+
+    @property
+    def logger(self):
+        """
+        :return: A logging object.
+        """
+        if self._logger is None:
+            self._logger = logging.getLogger("{0}.{1}".format(self.__module__,
+                                  self.__class__.__name__))
+        return self._logger
+
+    @property
+    def log_filename(self):
+        """
+        The job's own log-file
+        """
+        return os.path.join(self.result_location, SchedulerConstants.log_folder,
+                            SchedulerConstants.log_name.format(self.name))
+
+    @property
+    def journal(self):
+        """
+        The journal the job's test writes to
+        """
+        if self._journal is None:
+            self._journal = Journal(os.path.join(self.result_location,
+                                                 JournalConstants.filename))
+        return self._journal
+
+    @property
+    def steps(self):
+        """
+        The number of steps journaled so far
+        """
+        if self.state == SchedulerConstants.waiting:
+            # the journal (if there is one) is from an earlier run
+            return 0
+        return len([entry for entry in self.journal.entries
+                    if entry.kind == JournalConstants.step])
+
+    @property
+    def estimated_steps(self):
+        """
+        Steps in one repetition, estimated from the configuration
+
+        :return: count or None if it can't be known before the test runs
+        """
+        if self._estimated_steps is None:
+            attenuation = self.rvr_configuration.attenuation
+            directions = len(DIRECTION_MAP[self.rvr_configuration.traffic.direction])
+            if attenuation.adaptive:
+                return None
+            if attenuation.step_list is not None:
+                self._estimated_steps = len(attenuation.step_list) * directions
+            elif attenuation.stop != AttenuationEnum.default_stop:
+                self._estimated_steps = len(range(attenuation.start,
+                                                  attenuation.stop + 1,
+                                                  attenuation.step_sizes[0])) * directions
+        return self._estimated_steps
+
+    @property
+    def total_steps(self):
+        """
+        The expected number of steps for all the repetitions
+
+        :return: count or None if it isn't known yet
+        """
+        entries = []
+        if self.state != SchedulerConstants.waiting:
+            entries = self.journal.entries
+        if any(entry.kind == JournalConstants.repetition and entry.repetition == 1
+               for entry in entries):
+            per_repetition = len([entry for entry in entries
+                                  if entry.kind == JournalConstants.step and
+                                  entry.repetition == 1])
+        else:
+            per_repetition = self.estimated_steps
+        if per_repetition is None:
+            return None
+        return per_repetition * self.rvr_configuration.other.repetitions
+
+    @property
+    def elapsed(self):
+        """
+        Seconds the job has been running (or ran)
+        """
+        if self.started is None:
+            return 0
+        return (self.finished or time.time()) - self.started
+
+    def run(self):
+        """
+        Runs the test (this is what the child process runs)
+
+        :raise: SystemExit (exit-code 1) if the runner says the test failed
+        """
+        log_folder = os.path.dirname(self.log_filename)
+        if not os.path.isdir(log_folder):
+            os.makedirs(log_folder)
+        handler = logging.FileHandler(self.log_filename)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=LOG_TIMESTAMP))
+        for name in SchedulerConstants.loggers:
+            logger = logging.getLogger(name)
+            for inherited in logger.handlers[:]:
+                logger.removeHandler(inherited)
+            logger.addHandler(handler)
+        test = RateVsRangeTest(self.configuration)
+        test.result_location = self.result_location
+        test.journal.start()
+        try:
+            succeeded = self.runner(test)
+        finally:
+            HostPool.close_all()
+        if succeeded is False:
+            sys.exit(1)
+        return
+
+    def start(self):
+        """
+        Starts the test in a child process
+        """
+        self.process = multiprocessing.Process(target=self.run, name=self.name)
+        self.process.start()
+        self.state = SchedulerConstants.running
+        self.started = time.time()
+        self.logger.info("Started '{0}' (logging to {1})".format(self.name,
+                                                                 self.log_filename))
+        return
+
+    def poll(self):
+        """
+        Checks if the child process has finished
+
+        :return: True if the job is running
+        """
+        if self.state != SchedulerConstants.running:
+            return False
+        if self.process.is_alive():
+            return True
+        self.process.join()
+        self.finished = time.time()
+        if self.process.exitcode == 0:
+            self.state = SchedulerConstants.done
+            self.logger.info("Finished '{0}'".format(self.name))
+        else:
+            self.state = SchedulerConstants.failed
+            self.logger.error("'{0}' failed (exit code {1}), see {2}".format(self.name,
+                                                                            self.process.exitcode,
+                                                                            self.log_filename))
+        return False
+
+    def terminate(self):
+        """
+        Stops the child process (if it's running)
+        """
+        if self.state == SchedulerConstants.running:
+            self.process.terminate()
+            self.process.join()
+            self.finished = time.time()
+            self.state = SchedulerConstants.failed
+            self.logger.warning("Stopped '{0}' -- use 'rvr resume {1}' to finish it".format(self.name,
+                                                                                           self.result_location))
+        return
+
+    def remaining(self, seconds_per_step=None):
+        """
+        Estimates the seconds the job still needs
+
+        Uses the job's own time per step once it has finished a step.
+
+        :param:
+
+         - `seconds_per_step`: time per step to use if the job hasn't taken one
+
+        :return: seconds or None if it can't be estimated
+        """
+        if self.state in (SchedulerConstants.done, SchedulerConstants.failed):
+            return 0
+        total = self.total_steps
+        steps = self.steps
+        if steps and self.state == SchedulerConstants.running:
+            seconds_per_step = self.elapsed/float(steps)
+        if total is None or seconds_per_step is None:
+            return None
+        return max(total - steps, 0) * seconds_per_step
+# end class Job
+
+class Scheduler(object):
+    """
+    Runs sweeps concurrently when they don't share equipment
+    """
+    def __init__(self, runner, workers=SchedulerConstants.default_workers,
+                 refresh=SchedulerConstants.default_refresh):
+        """
+        Scheduler constructor
+
+        :param:
+
+         - `runner`: callable that runs a RateVsRangeTest's repetitions
+         - `workers`: most sweeps to run at the same time
+         - `refresh`: seconds between progress reports
+        """
+        super(Scheduler, self).__init__()
+        self._logger = None
+        self.runner = runner
+        self.workers = workers
+        self.refresh = refresh
+        self.jobs = []
+        return
+
+    @property
+    def logger(self):
+        """
+        :return: A logging object.
+        """
+        if self._logger is None:
+            self._logger = logging.getLogger("{0}.{1}".format(self.__module__,
+                                  self.__class__.__name__))
+        return self._logger
+
+    def add(self, filename, configuration):
+        """
+        Adds a configuration to the schedule
+
+        If the result location is already used by another job the
+        job's name is added to it so the sweeps don't write to the same files.
+
+        :param:
+
+         - `filename`: name of the configuration file
+         - `configuration`: ConfigParser loaded from the file
+
+        :return: the new Job
+        """
+        job = Job(filename, configuration, self.runner)
+        if job.result_location in [other.result_location for other in self.jobs]:
+            job.result_location = os.path.join(job.result_location, job.name)
+        self.logger.debug("'{0}' uses {1}".format(job.name,
+                                                  ', '.join(sorted(job.resources))))
+        self.jobs.append(job)
+        return job
+
+    def launch(self):
+        """
+        Starts the waiting jobs that don't conflict with earlier jobs
+        """
+        claimed = set()
+        running = 0
+        for job in self.jobs:
+            if job.state == SchedulerConstants.running:
+                claimed.update(job.resources)
+                running += 1
+        for job in self.jobs:
+            if job.state != SchedulerConstants.waiting:
+                continue
+            if running < self.workers and not job.resources & claimed:
+                job.start()
+                running += 1
+            claimed.update(job.resources)
+        return
+
+    @property
+    def seconds_per_step(self):
+        """
+        The average time per step of the jobs that have taken steps
+
+        :return: seconds or None if no steps have been taken
+        """
+        elapsed = steps = 0
+        for job in self.jobs:
+            if job.state == SchedulerConstants.waiting:
+                continue
+            job_steps = job.steps
+            if job_steps:
+                elapsed += job.elapsed
+                steps += job_steps
+        if not steps:
+            return None
+        return elapsed/float(steps)
+
+    def estimated_finish(self):
+        """
+        Plays out the rest of the schedule to estimate when it will finish
+
+        :return: time (seconds since the epoch) or None if it can't be estimated
+        """
+        now = time.time()
+        seconds_per_step = self.seconds_per_step
+        free_at = {}
+        workers = []
+        for job in self.jobs:
+            if job.state == SchedulerConstants.running:
+                remaining = job.remaining(seconds_per_step)
+                if remaining is None:
+                    return None
+                workers.append(now + remaining)
+                for resource in job.resources:
+                    free_at[resource] = now + remaining
+        finish = max(workers + [now])
+        for job in self.jobs:
+            if job.state != SchedulerConstants.waiting:
+                continue
+            duration = job.remaining(seconds_per_step)
+            if duration is None:
+                return None
+            start = max([free_at.get(resource, now) for resource in job.resources] + [now])
+            if len(workers) >= self.workers:
+                workers.sort()
+                start = max(start, workers.pop(0))
+            end = start + duration
+            workers.append(end)
+            for resource in job.resources:
+                free_at[resource] = end
+            finish = max(finish, end)
+        return finish
+
+    def report(self):
+        """
+        Logs the progress of each job and the estimated finish
+        """
+        seconds_per_step = self.seconds_per_step
+        for job in self.jobs:
+            total = job.total_steps
+            remaining = job.remaining(seconds_per_step)
+            if total is None:
+                total = '?'
+            if remaining is None:
+                remaining = '?'
+            else:
+                remaining = time.strftime('%H:%M:%S', time.gmtime(remaining))
+            self.logger.info("{0}: {1}, {2} of {3} steps, {4} remaining".format(job.name,
+                                                                                 job.state,
+                                                                                 job.steps,
+                                                                                 total,
+                                                                                 remaining))
+        finish = self.estimated_finish()
+        if finish is not None:
+            finish = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(finish))
+            self.logger.info("All jobs estimated to finish at {0}".format(finish))
+        return
+
+    def __call__(self):
+        """
+        Runs the jobs until they are all finished
+
+        :return: list of the jobs that failed
+        """
+        last_report = time.time()
+        try:
+            while True:
+                for job in self.jobs:
+                    job.poll()
+                self.launch()
+                if not any(job.state in (SchedulerConstants.waiting,
+                                         SchedulerConstants.running)
+                           for job in self.jobs):
+                    break
+                if time.time() - last_report >= self.refresh:
+                    self.report()
+                    last_report = time.time()
+                time.sleep(SchedulerConstants.poll_interval)
+        except KeyboardInterrupt:
+            self.logger.warning("Stopping the running jobs")
+            for job in self.jobs:
+                job.terminate()
+            raise
+        self.report()
+        return [job for job in self.jobs if job.state == SchedulerConstants.failed]
+# end class Scheduler
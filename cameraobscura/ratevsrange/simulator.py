@@ -0,0 +1,333 @@
+
+# python standard library
+import logging
+import textwrap
+import threading
+import time
+
+# this package
+from cameraobscura import CameraobscuraError
+from cameraobscura.common.baseconfiguration import BaseConfiguration
+from cameraobscura.clients.simulatedclient import ChannelModel, ChannelModelConstants
+from cameraobscura.clients.simulatedclient import SimulatedChannel
+from cameraobscura.hosts.host import HostConstants, HostEnum
+from rvrconfiguration import AttenuationEnum, DutEnum, ServerEnum
+
+class SimulationEnum(object):
+    """
+    Constants for the [simulation] section
+    """
+    __slots__ = ()
+    section = 'simulation'
+
+    # options
+    transmit_power = 'transmit_power'
+    path_loss = 'path_loss'
+    sensitivity = 'sensitivity'
+    saturation = 'saturation'
+    maximum_throughput = 'maximum_throughput'
+    noise = 'noise'
+    seed = 'seed'
+    speedup = 'speedup'
+
+    # defaults
+    default_speedup = 100
+
+    # the equipment
+    attenuator = 'MockAttenuator'
+# end class SimulationEnum
+
+class SimulationConfiguration(BaseConfiguration):
+    """
+    The settings for the simulation
+    """
+    def __init__(self, *args, **kwargs):
+        """
+        SimulationConfiguration constructor
+
+        :param:
+
+         - `configuration`: a loaded configuration adapter
+        """
+        super(SimulationConfiguration, self).__init__(*args, **kwargs)
+        self._model = None
+        self._speedup = None
+        return
+
+    @property
+    def example(self):
+        """
+        An example simulation section
+        """
+        if self._example is None:
+            self._example = textwrap.dedent("""
+            #[{section}]
+            # only used with --simulate
+            # the received signal is transmit_power - path_loss - attenuation (dBm)
+            #{transmit_power} = {transmit_power_default}
+            #{path_loss} = {path_loss_default}
+
+            # the link is lost below the sensitivity (dBm)
+            #{sensitivity} = {sensitivity_default}
+
+            # the throughput is at its maximum (Mbits/sec) above the saturation (dBm)
+            #{saturation} = {saturation_default}
+            #{maximum_throughput} = {maximum_throughput_default}
+
+            # standard deviation of the throughput (fraction of the throughput)
+            #{noise} = {noise_default}
+
+            # set the seed to get the same noise every time
+            #{seed} = 42
+
+            # how many times faster than real-time to run
+            #{speedup} = {speedup_default}
+            """.format(section=self.section,
+                       transmit_power=SimulationEnum.transmit_power,
+                       transmit_power_default=ChannelModelConstants.transmit_power,
+                       path_loss=SimulationEnum.path_loss,
+                       path_loss_default=ChannelModelConstants.path_loss,
+                       sensitivity=SimulationEnum.sensitivity,
+                       sensitivity_default=ChannelModelConstants.sensitivity,
+                       saturation=SimulationEnum.saturation,
+                       saturation_default=ChannelModelConstants.saturation,
+                       maximum_throughput=SimulationEnum.maximum_throughput,
+                       maximum_throughput_default=ChannelModelConstants.maximum_throughput,
+                       noise=SimulationEnum.noise,
+                       noise_default=ChannelModelConstants.noise,
+                       seed=SimulationEnum.seed,
+                       speedup=SimulationEnum.speedup,
+                       speedup_default=SimulationEnum.default_speedup))
+        return self._example
+
+    @property
+    def section(self):
+        """
+        The section name in the configuration file [simulation]
+        """
+        if self._section is None:
+            self._section = SimulationEnum.section
+        return self._section
+
+    @property
+    def model(self):
+        """
+        The ChannelModel built from the section
+        """
+        if self._model is None:
+            def getfloat(option, default):
+                return self.configuration.getfloat(section=self.section,
+                                                   option=option,
+                                                   optional=True,
+                                                   default=default)
+            self._model = ChannelModel(transmit_power=getfloat(SimulationEnum.transmit_power,
+                                                               ChannelModelConstants.transmit_power),
+                                       path_loss=getfloat(SimulationEnum.path_loss,
+                                                          ChannelModelConstants.path_loss),
+                                       sensitivity=getfloat(SimulationEnum.sensitivity,
+                                                            ChannelModelConstants.sensitivity),
+                                       saturation=getfloat(SimulationEnum.saturation,
+                                                           ChannelModelConstants.saturation),
+                                       maximum_throughput=getfloat(SimulationEnum.maximum_throughput,
+                                                                   ChannelModelConstants.maximum_throughput),
+                                       noise=getfloat(SimulationEnum.noise,
+                                                      ChannelModelConstants.noise),
+                                       seed=self.configuration.getint(section=self.section,
+                                                                      option=SimulationEnum.seed,
+                                                                      optional=True))
+        return self._model
+
+    @property
+    def speedup(self):
+        """
+        How many times faster than real-time to run
+        """
+        if self._speedup is None:
+            self._speedup = self.configuration.getfloat(section=self.section,
+                                                        option=SimulationEnum.speedup,
+                                                        optional=True,
+                                                        default=SimulationEnum.default_speedup)
+        return self._speedup
+
+    def reset(self):
+        """
+        Sets the attributes to None
+        """
+        self._model = None
+        self._speedup = None
+        return
+
+    def check_rep(self):
+        """
+        Checks the settings
+
+        :raise: CameraobscuraError if the settings can't work
+        """
+        if self.speedup <= 0:
+            raise CameraobscuraError("speedup must be positive, not {0}".format(self.speedup))
+        if self.model.saturation <= self.model.sensitivity:
+            raise CameraobscuraError("saturation ({0}) has to be above the sensitivity ({1})".format(self.model.saturation,
+                                                                                                  self.model.sensitivity))
+        return
+# end class SimulationConfiguration
+
+class SimulatedClock(object):
+    """
+    A context manager that speeds up time.sleep and time.time
+    """
+    def __init__(self, speedup=SimulationEnum.default_speedup):
+        """
+        SimulatedClock constructor
+
+        :param:
+
+         - `speedup`: how many times faster than real-time to run
+        """
+        super(SimulatedClock, self).__init__()
+        self.speedup = float(speedup)
+        self.real_time = time.time
+        self.real_sleep = time.sleep
+        self.started = None
+        self.slept = 0
+        self.lock = threading.Lock()
+        return
+
+    def time(self):
+        """
+        The simulated time
+
+        :return: seconds since the epoch (running `speedup` times faster since the start)
+        """
+        return self.started + (self.real_time() - self.started) * self.speedup
+
+    def sleep(self, seconds):
+        """
+        Sleeps for the seconds divided by the speedup
+
+        :param:
+
+         - `seconds`: simulated seconds to sleep
+        """
+        with self.lock:
+            self.slept += seconds
+        self.real_sleep(seconds/self.speedup)
+        return
+
+    def __enter__(self):
+        """
+        Replaces time.time and time.sleep
+        """
+        self.real_time, self.real_sleep = time.time, time.sleep
+        self.started = self.real_time()
+        time.time, time.sleep = self.time, self.sleep
+        return self
+
+    def __exit__(self, type, value, traceback):
+        """
+        Puts back the real time.time and time.sleep
+        """
+        time.time, time.sleep = self.real_time, self.real_sleep
+        return
+# end class SimulatedClock
+
+class SimulatedEventTimer(object):
+    """
+    A substitute for the Iperf's event-timer that uses time.sleep
+    """
+    def __init__(self, seconds=1):
+        """
+        SimulatedEventTimer constructor
+
+        :param:
+
+         - `seconds`: (simulated) seconds to wait
+        """
+        self.seconds = seconds
+        return
+
+    def clear(self):
+        """
+        Does nothing (the wait always sleeps)
+        """
+        return
+
+    def wait(self):
+        """
+        Sleeps for the seconds
+        """
+        time.sleep(self.seconds)
+        return
+# end class SimulatedEventTimer
+
+class Simulator(object):
+    """
+    Runs tests on the simulated equipment
+    """
+    def __init__(self, runner, clock=SimulatedClock):
+        """
+        Simulator constructor
+
+        :param:
+
+         - `runner`: callable that runs a RateVsRangeTest (e.g. run_repetitions)
+         - `clock`: class to build the clock from (given the `speedup`)
+        """
+        super(Simulator, self).__init__()
+        self._logger = None
+        self.runner = runner
+        self.clock = clock
+        return
+
+    @property
+    def logger(self):
+        """
+        :return: A logging object.
+        """
+        if self._logger is None:
+            self._logger = logging.getLogger("{0}.{1}".format(self.__module__,
+                                  self.__class__.__name__))
+        return self._logger
+
+    @staticmethod
+    def prepare(configuration):
+        """
+        Points the configuration at the simulated equipment
+
+        :param:
+
+         - `configuration`: ConfigParser with the rate-vs-range configuration
+
+        :return: the configuration (changed in place)
+        """
+        for section in (DutEnum.section, ServerEnum.section):
+            configuration.set(section, HostEnum.connection_type,
+                              HostConstants.simulated)
+        configuration.set(AttenuationEnum.section, AttenuationEnum.name,
+                          SimulationEnum.attenuator)
+        return configuration
+
+    def __call__(self, test, *args, **kwargs):
+        """
+        Runs the test on the simulated equipment
+
+        :param:
+
+         - `test`: RateVsRangeTest built from a prepared configuration
+         - `args`, `kwargs`: anything else the runner takes
+
+        :return: whatever the runner returns
+        """
+        settings = SimulationConfiguration(test.configuration.configuration)
+        settings.check_rep()
+        SimulatedChannel.attach(attenuator=test.attenuator, model=settings.model)
+        test.iperf._event_timer = SimulatedEventTimer()
+        self.logger.info("Simulating at {0} times real-time".format(settings.speedup))
+        with self.clock(speedup=settings.speedup) as clock:
+            outcome = self.runner(test, *args, **kwargs)
+            simulated = clock.time() - clock.started
+            real = clock.real_time() - clock.started
+        self.logger.info("Simulated {0:.1f} seconds in {1:.1f} seconds ({2:.1f} simulated seconds were sleeps)".format(simulated,
+                                                                                                                     real,
+                                                                                                                     clock.slept))
+        return outcome
+# end class Simulator
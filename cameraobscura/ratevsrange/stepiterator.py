@@ -79,6 +79,12 @@ class StepBase(object):
         """        
         return self.reversals < self.reversal_limit
 
+    def record(self, step, throughput):
+        """
+        Does nothing (only the AdaptiveStepRange uses the throughputs)
+        """
+        return
+
 class StepList(StepBase):
     """
     a list-based attenuation generator
@@ -121,7 +127,40 @@ class StepList(StepBase):
         """
         while self.compare(self.current_value, self.stop):
             yield self.step_list[self.current_value]
-            self.current_value += self.direction
+            self.advance()
+        return
+
+    def advance(self):
+        """
+        Moves the current index to the next step
+        """
+        self.current_value += self.direction
+        return
+
+    @property
+    def state(self):
+        """
+        The values needed to restore the iterator's position
+
+        :return: dict of attribute:value
+        """
+        return {'start': self.start,
+                'stop': self.stop,
+                'current_value': self.current_value,
+                'reversals': self.reversals}
+
+    def restore(self, state):
+        """
+        Puts the iterator back in a saved position
+
+        :param:
+
+         - `state`: dict created by `state`
+        """
+        self.start = state['start']
+        self._stop = state['stop']
+        self.current_value = state['current_value']
+        self.reversals = state['reversals']
         return
 
     def reset(self):
@@ -356,7 +395,48 @@ class StepRange(StepBase):
         """
         while self.compare(self.current_value, self.stop):
             yield self.current_value
-            self.current_value += self.step_size * self.direction
+            self.advance()
+        return
+
+    def advance(self):
+        """
+        Adds the step-size to the current value (in the current direction)
+        """
+        self.current_value += self.step_size * self.direction
+        return
+
+    @property
+    def state(self):
+        """
+        The values needed to restore the iterator's position
+
+        :return: dict of attribute:value
+        """
+        return {'start': self.start,
+                'stop': self.stop,
+                'current_value': self.current_value,
+                'reversals': self.reversals,
+                'step_size': self._step_size,
+                'threshold': self._threshold,
+                'current_step_index': self.current_step_index,
+                'current_change_index': self.current_change_index}
+
+    def restore(self, state):
+        """
+        Puts the iterator back in a saved position
+
+        :param:
+
+         - `state`: dict created by `state`
+        """
+        self.start = state['start']
+        self.stop = state['stop']
+        self.current_value = state['current_value']
+        self.reversals = state['reversals']
+        self._step_size = state['step_size']
+        self._threshold = state['threshold']
+        self.current_step_index = state['current_step_index']
+        self.current_change_index = state['current_change_index']
         return
 
     def __str__(self):
@@ -369,11 +449,212 @@ class StepRange(StepBase):
                                                                                             self.step_change_thresholds)
 # end class StepRange
 
+class AdaptiveStepRange(StepBase):
+    """
+    A step-iterator that refines the attenuations where the throughput changes
+    """
+    def __init__(self, coarse_step=10, resolution=1, step_budget=None,
+                 change_threshold=0.1, *args, **kwargs):
+        """
+        AdaptiveStepRange constructor
+
+        :param:
+
+         - `start`: first attenuation
+         - `stop`: last attenuation
+         - `coarse_step`: step-size for the first walk
+         - `resolution`: smallest interval to bisect
+         - `step_budget`: maximum number of steps (None means no limit)
+         - `change_threshold`: smallest relative change in throughput to bisect
+        """
+        super(AdaptiveStepRange, self).__init__(*args, **kwargs)
+        self.coarse_step = abs(coarse_step)
+        self.resolution = abs(resolution)
+        self.step_budget = step_budget
+        self.change_threshold = change_threshold
+        self.reset()
+        return
+
+    @property
+    def coarse_steps(self):
+        """
+        The attenuations for the first walk (including the stop)
+
+        :return: list of attenuations from start to limit
+        """
+        steps = range(self.start, self.limit + self.direction,
+                      self.coarse_step * self.direction)
+        if steps[-1] != self.limit:
+            steps.append(self.limit)
+        return steps
+
+    def record(self, attenuation, throughput):
+        """
+        Keeps the throughput measured at the attenuation
+
+        :param:
+
+         - `attenuation`: the step the throughput was measured at
+         - `throughput`: number (or something float() can convert) or None
+        """
+        try:
+            self.measurements[attenuation] = float(throughput)
+        except (TypeError, ValueError) as error:
+            self.logger.debug("Not recording {0} for {1}: {2}".format(throughput,
+                                                                     attenuation,
+                                                                     error))
+        return
+
+    def score(self, low, high):
+        """
+        The relative change in throughput between two measured attenuations
+
+        :return: change divided by the larger throughput (0 if both are 0)
+        """
+        first, second = self.measurements[low], self.measurements[high]
+        largest = max(abs(first), abs(second))
+        if not largest:
+            return 0
+        return abs(first - second)/largest
+
+    def next_value(self):
+        """
+        Picks the next attenuation to measure
+
+        :return: attenuation or None if the search is done
+        """
+        if self.step_budget is not None and self.steps >= self.step_budget:
+            return None
+        for attenuation in self.coarse_steps:
+            if attenuation not in self.visited:
+                return attenuation
+        # done with the coarse walk, find the interval that changed the most
+        self.refining = True
+        measured = sorted(self.measurements)
+        candidates = []
+        for low, high in zip(measured, measured[1:]):
+            middle = low + (high - low)//2
+            if high - low <= self.resolution or middle in self.visited:
+                continue
+            score = self.score(low, high)
+            if score >= self.change_threshold:
+                candidates.append((score, high - low, middle))
+        if not candidates:
+            return None
+        return max(candidates)[-1]
+
+    def reverse(self):
+        """
+        Turns the search back after a lost connection
+
+        :return: True (the search always goes on)
+        """
+        self.reversals += 1
+        if not self.refining:
+            # nothing past the lost connection needs to be measured
+            self.limit = self.current_value
+        return True
+
+    @property
+    def fixed_grid_steps(self):
+        """
+        The number of steps a StepRange with steps of `resolution` would take
+        """
+        return abs(self.limit - self.start)//self.resolution + 1
+
+    @property
+    def steps_saved(self):
+        """
+        The difference between the fixed-grid steps and the steps taken
+        """
+        return self.fixed_grid_steps - self.steps
+
+    def advance(self):
+        """
+        Does nothing (the next value depends on the measurements, not the last step)
+        """
+        return
+
+    @property
+    def state(self):
+        """
+        The values needed to restore the iterator's position
+
+        :return: dict of attribute:value
+        """
+        return {'start': self.start,
+                'stop': self.stop,
+                'limit': self.limit,
+                'current_value': self.current_value,
+                'reversals': self.reversals,
+                'steps': self.steps,
+                'refining': self.refining,
+                'visited': sorted(self.visited),
+                # a list so the keys stay integers in JSON
+                'measurements': sorted(self.measurements.items())}
+
+    def restore(self, state):
+        """
+        Puts the iterator back in a saved position
+
+        :param:
+
+         - `state`: dict created by `state`
+        """
+        self.start = state['start']
+        self.stop = state['stop']
+        self.limit = state['limit']
+        self.current_value = state['current_value']
+        self.reversals = state['reversals']
+        self.steps = state['steps']
+        self.refining = state['refining']
+        self.visited = set(state['visited'])
+        self.measurements = dict((attenuation, throughput)
+                                 for attenuation, throughput in state['measurements'])
+        return
+
+    def reset(self):
+        """
+        Clears the measurements so the search can be re-run
+        """
+        self.limit = self.stop
+        self.current_value = self.start
+        self.reversals = FIRST_ITEM
+        self.steps = 0
+        self.refining = False
+        self.visited = set()
+        self.measurements = {}
+        return
+
+    def check_rep(self):
+        """
+        Does nothing
+        """
+        return
+
+    def __iter__(self):
+        """
+        Yields the attenuations, logs the steps saved when done
+        """
+        value = self.next_value()
+        while value is not None:
+            self.current_value = value
+            self.visited.add(value)
+            self.steps += 1
+            yield value
+            value = self.next_value()
+        self.logger.info("Adaptive search took {0} steps, a fixed grid of {1} would take {2} ({3} saved)".format(self.steps,
+                                                                                                                 self.resolution,
+                                                                                                                 self.fixed_grid_steps,
+                                                                                                                 self.steps_saved))
+        return
+# end class AdaptiveStepRange
+
 class StepIterator(object):
     """
     An aggregator of step-iterators
     """
-    def __init__(self, step_list=None,
+    def __init__(self, step_list=None, adaptive=False,
                  *args, **kwargs):
         """
         StepIterator constructor
@@ -381,18 +662,20 @@ class StepIterator(object):
         :param:
 
          - ``step_list``: collection of steps
+         - ``adaptive``: if True, use the AdaptiveStepRange
          - ``reversal_limit``: number of reversals allowed
         """
         self.args = args
         self.kwargs = kwargs
         self.step_list = step_list
+        self.adaptive = adaptive
         self._iterator = None
         return
 
     @property
     def iterator(self):
         """
-        StepRange if step_list not set
+        StepList if step_list set, AdaptiveStepRange if adaptive, StepRange otherwise
         """
         if self._iterator is None:
             if self.step_list is not None:
@@ -402,6 +685,8 @@ class StepIterator(object):
                     reversal_limit = 0
                 self._iterator = StepList(step_list=self.step_list,
                                           reversal_limit=reversal_limit)
+            elif self.adaptive:
+                self._iterator = AdaptiveStepRange(*self.args, **self.kwargs)
             else:
                 self._iterator = StepRange(*self.args, **self.kwargs)
         return self._iterator
@@ -0,0 +1,86 @@
+
+# python standard library
+import unittest
+import socket
+from cStringIO import StringIO
+
+# third-party
+from mock import MagicMock
+
+# this package
+from cameraobscura import CameraobscuraError
+from cameraobscura.clients.localclient import LocalClient
+from cameraobscura.hosts.agent import SamplingAgent
+
+COMMANDS = {'rssi': "echo 'Signal level=-64 dBm'",
+            'noise': 'printf -- -92',
+            'missing': 'echo problem >&2',
+            'reader': 'cat'}
+
+class TestSamplingAgent(unittest.TestCase):
+    def setUp(self):
+        self.client = LocalClient(timeout=5)
+        self.addCleanup(self.client.close)
+        self.connection = MagicMock(wraps=self.client)
+        self.agent = SamplingAgent(connection=self.connection, commands=COMMANDS,
+                                   timeout=5)
+        self.addCleanup(self.agent.stop)
+        return
+
+    def test_request(self):
+        """
+        Does it start the agent once and split each sample's output by command?
+        """
+        for sample in range(3):
+            outputs = self.agent.request()
+            self.assertEqual(sorted(COMMANDS), sorted(outputs))
+            self.assertEqual(('Signal level=-64 dBm\n', ''),
+                             tuple(output.read() for output in outputs['rssi']))
+            # output without a newline at the end is kept as it is
+            self.assertEqual(('-92', ''),
+                             tuple(output.read() for output in outputs['noise']))
+            self.assertEqual(('', 'problem\n'),
+                             tuple(output.read() for output in outputs['missing']))
+            # the commands can't read the agent's requests
+            self.assertEqual(('', ''),
+                             tuple(output.read() for output in outputs['reader']))
+        self.assertEqual(1, self.connection.exec_command.call_count)
+        self.assertTrue(self.agent.running)
+        return
+
+    def test_stop(self):
+        """
+        Does stop end the agent so the next request starts a new one?
+        """
+        self.agent.request()
+        process = self.client.client[0]
+        self.agent.stop()
+        self.assertFalse(self.agent.running)
+        self.assertEqual(0, process.wait())
+        self.agent.request()
+        self.assertEqual(2, self.connection.exec_command.call_count)
+        return
+
+    def test_agent_failure(self):
+        """
+        Does output that ends before the end of the sample raise a socket error and stop the agent?
+        """
+        connection = MagicMock()
+        connection.exec_command.return_value = (StringIO(), StringIO('partial\n'), StringIO())
+        agent = SamplingAgent(connection=connection, commands=COMMANDS)
+        with self.assertRaises(socket.error):
+            agent.request()
+        self.assertFalse(agent.running)
+        return
+
+    def test_no_stdin(self):
+        """
+        Does it refuse a connection that can't take requests?
+        """
+        connection = MagicMock()
+        connection.exec_command.return_value = (None, StringIO(), StringIO())
+        agent = SamplingAgent(connection=connection, commands=COMMANDS)
+        with self.assertRaises(CameraobscuraError):
+            agent.request()
+        return
+# end class TestSamplingAgent
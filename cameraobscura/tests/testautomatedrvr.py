@@ -4,6 +4,10 @@ import unittest
 import ConfigParser
 from ConfigParser import SafeConfigParser
 import random
+import socket
+import os
+import shutil
+import tempfile
 from collections import namedtuple
 
 # third-party
@@ -16,6 +20,7 @@ from cameraobscura.ratevsrange.AutomatedRVR import (Test,
 from cameraobscura.utilities.configurationadapter import ConfigurationAdapter
 from cameraobscura.ratevsrange.rvrconfiguration import RVRConfiguration, AttenuationConfiguration
 from cameraobscura.utilities.query import Query
+from cameraobscura.ratevsrange.journal import JournalConstants
 from cameraobscura.attenuators.Attenuator import AttenuatorError
 from cameraobscura import CameraobscuraError
 from cameraobscura import NoOp
@@ -184,9 +189,11 @@ class TestAutomatedRVRTest(unittest.TestCase):
                         ('other', 'result_location'):'home',
                         ('other', 'test_name'):'bill'}
 
-        get_float = {(SECTION, 'timeout'):timeout}
+        get_float = {(SECTION, 'timeout'):timeout,
+                     (SECTION, 'facts_ttl'):3600}
 
         get_int = {(SECTION, 'port'):timeout,
+                   (SECTION, 'max_channels'):4,
                    ('other', 'repetitions'):1}
 
         def getfloat_side_effect(*args):
@@ -207,16 +214,18 @@ class TestAutomatedRVRTest(unittest.TestCase):
         self.parser.getfloat.side_effect = getfloat_side_effect
         self.parser.getint.side_effect = getint_side_effect        
         
-        with patch('cameraobscura.hosts.host', host_ssh):
+        with patch('cameraobscura.ratevsrange.rate_vs_range.HostPool', host_ssh):
             dut = self.tester.dut
-            host_ssh.TheHost.assert_called_with(hostname=hostname,
-                                                username=username,
-                                                password=password,
-                                                test_interface=test_ip,
-                                                prefix=prefix,
-                                                timeout=timeout,
-                                                operating_system=operating_system,
-                                                connection_type=connection_type)
+            host_ssh.get_host.assert_called_with(hostname=hostname,
+                                                 username=username,
+                                                 password=password,
+                                                 test_interface=test_ip,
+                                                 prefix=prefix,
+                                                 timeout=timeout,
+                                                 operating_system=operating_system,
+                                                 connection_type=connection_type,
+                                                 max_channels=4,
+                                                 facts_ttl=3600)
 
         utils_mock = MagicMock()
         return
@@ -244,7 +253,7 @@ class TestAutomatedRVRTest(unittest.TestCase):
             return get_responses[args]
         self.parser.get.side_effect = get_effects
         
-        with patch('cameraobscura.hosts.host', host_ssh):
+        with patch('cameraobscura.ratevsrange.rate_vs_range.HostPool', host_ssh):
             server = self.tester.server
 
         return
@@ -283,6 +292,59 @@ class TestAutomatedRVRTest(unittest.TestCase):
             configadapter.write.assert_called_with(opened_file.__enter__())
         return
 
+    def test_result_location(self):
+        """
+        Can the output be sent to a folder other than the configured one?
+        """
+        path = tempfile.mkdtemp()
+        try:
+            folder = os.path.join(path, 'resumed')
+            self.tester._journal = MagicMock()
+            self.tester.result_location = folder
+            self.assertTrue(os.path.isdir(folder))
+            self.assertEqual(folder, self.tester.result_location)
+            # the journal follows the folder
+            self.assertEqual(os.path.join(folder, JournalConstants.filename),
+                             self.tester.journal.filename)
+        finally:
+            shutil.rmtree(path)
+        return
+
+
+    def test_warm_up(self):
+        """
+        Does it connect everything at once and report all the failures together?
+        """
+        dut, server = MagicMock(), MagicMock()
+        dut.facts_ttl = server.facts_ttl = 0
+        self.tester._dut = dut
+        self.tester._server = server
+        self.tester._maximum_attenuation = 60
+        probe = MagicMock()
+        with patch('cameraobscura.ratevsrange.rate_vs_range.HostPool') as pool:
+            with patch('cameraobscura.ratevsrange.rate_vs_range.HostFactsProbe', probe):
+                self.tester.warm_up()
+                pool.check.assert_any_call(dut)
+                pool.check.assert_any_call(server)
+        dut.connect.assert_called_with()
+        server.connect.assert_called_with()
+        self.assertEqual(probe.return_value.facts.return_value, dut.facts)
+
+        # everything that failed is in the one error
+        dut.connect.side_effect = socket.timeout('timed out')
+        self.tester._maximum_attenuation = None
+        self.attenuator.getAttenMax.side_effect = AttenuatorError('no attenuator')
+        with patch('cameraobscura.ratevsrange.rate_vs_range.HostPool'):
+            with patch('cameraobscura.ratevsrange.rate_vs_range.HostFactsProbe', probe):
+                with self.assertRaises(CameraobscuraError) as context:
+                    self.tester.warm_up()
+        message = str(context.exception)
+        self.assertIn('dut', message)
+        self.assertIn('attenuator', message)
+        self.assertNotIn('server', message)
+        return
+
+
     def test_directon_map(self):
         """
         Does the direction map return the expected directions?
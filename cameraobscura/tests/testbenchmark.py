@@ -0,0 +1,82 @@
+
+# python standard library
+import unittest
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+# third-party
+from mock import MagicMock, patch
+
+# this package
+from cameraobscura.ratevsrange.benchmark import FastForwardClock, LogCounter
+from cameraobscura.ratevsrange.benchmark import Baselines, BenchmarkResult
+
+class TestBenchmark(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        return
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+        return
+
+    def test_clock(self):
+        """
+        Does the clock move forward without sleeping?
+        """
+        sleep = MagicMock()
+        with patch('time.sleep', sleep), patch('time.time', MagicMock(return_value=100)):
+            with FastForwardClock() as clock:
+                time.sleep(5)
+                time.sleep(2.5)
+                self.assertEqual(107.5, time.time())
+            sleep.assert_called_with(0)
+            self.assertEqual(7.5, clock.slept)
+        return
+
+    def test_log_counter(self):
+        """
+        Does it count the records and their bytes?
+        """
+        counter = LogCounter(level=logging.INFO)
+        logger = logging.getLogger('cameraobscura.tests.testbenchmark')
+        logger.setLevel(logging.DEBUG)
+        logger.addHandler(counter)
+        try:
+            logger.info('first')
+            logger.debug('not counted')
+            logger.warning('second')
+        finally:
+            logger.removeHandler(counter)
+        self.assertEqual(2, counter.records)
+        self.assertGreater(counter.bytes, len('firstsecond'))
+        return
+
+    def test_baselines(self):
+        """
+        Does it save the baselines and find the regressions?
+        """
+        filename = os.path.join(self.folder, 'baselines.json')
+        result = BenchmarkResult(steps=2000, cpu_per_step=2.0, objects_per_step=0,
+                                 records_per_step=20, bytes_per_step=2000,
+                                 wall_time=10)
+        baselines = Baselines(filename=filename, tolerance=0.25)
+        self.assertEqual([], baselines.compare('sweep_1000', result))
+        baselines.save('sweep_1000', result)
+
+        baselines = Baselines(filename=filename, tolerance=0.25)
+        # the wall-time and a little growth don't count
+        self.assertEqual([], baselines.compare('sweep_1000',
+                                               result._replace(cpu_per_step=2.9,
+                                                               wall_time=100)))
+        regressions = baselines.compare('sweep_1000',
+                                        result._replace(cpu_per_step=5,
+                                                        objects_per_step=10))
+        self.assertEqual(2, len(regressions))
+        self.assertTrue(regressions[0].startswith('cpu_per_step'))
+        self.assertTrue(regressions[1].startswith('objects_per_step'))
+        return
+# end TestBenchmark
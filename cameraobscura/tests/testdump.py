@@ -5,6 +5,9 @@ from cStringIO import StringIO
 import socket
 import random
 import ConfigParser
+import os
+import shutil
+import tempfile
 
 # third-party
 from mock import Mock, MagicMock, mock_open, patch
@@ -12,7 +15,9 @@ from mock import Mock, MagicMock, mock_open, patch
 # this package
 from cameraobscura import CameraobscuraError
 from cameraobscura.utilities.configurationadapter import ConfigurationAdapter
-from cameraobscura.utilities.dump import TheDump, DumpConstants, DumpConfiguration
+from cameraobscura.utilities.dump import TheDump, TheDumpBatch, DumpConstants, DumpConfiguration
+from cameraobscura.utilities.dump import TheDumpLoop
+from cameraobscura.clients.localclient import LocalClient
 from cameraobscura.tests.helpers import random_string_of_letters
 
 
@@ -95,8 +100,89 @@ class TestDump(unittest.TestCase):
         with patch('__builtin__.open', open_file):
             self.dump()
         return
+
+    def test_submit(self):
+        """
+        Does it submit the command to the loop with write to save the output?
+        """
+        loop = Mock()
+        self.dump._logger = Mock()
+        self.assertEqual(loop.submit.return_value, self.dump.submit(loop))
+        loop.submit.assert_called_with(self.host, self.command, timeout=self.timeout,
+                                       parse=self.dump.write)
+        self.assertFalse(self.host.exec_command.called)
+        return
 # end class TestDump
 
+class TestDumpBatch(unittest.TestCase):
+    def setUp(self):
+        self.host = Mock()
+        self.dumps = [MagicMock(), MagicMock()]
+        for index, dump in enumerate(self.dumps):
+            dump.command = random_string_of_letters(10)
+            dump.timeout = index + 1
+        self.batch = TheDumpBatch(dumps=self.dumps, connection=self.host)
+        self.batch._logger = Mock()
+        return
+
+    def test_call(self):
+        """
+        Does it send the commands in one batch and have each dump save its output?
+        """
+        outputs = [(None, StringIO(random_string_of_letters()), StringIO(''))
+                   for dump in self.dumps]
+        self.host.exec_batch.return_value = outputs
+        self.batch()
+        self.host.exec_batch.assert_called_with([dump.command for dump in self.dumps],
+                                                timeout=2)
+        for dump, (stdin, stdout, stderr) in zip(self.dumps, outputs):
+            dump.write.assert_called_with(stdout, stderr)
+            self.assertFalse(dump.called)
+        return
+
+    def test_timeout(self):
+        """
+        Does it catch socket timeouts and log the error?
+        """
+        self.host.exec_batch.side_effect = socket.timeout
+        self.batch()
+        for dump in self.dumps:
+            self.assertFalse(dump.write.called)
+        return
+# end class TestDumpBatch
+
+class TestDumpLoop(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.client = LocalClient()
+        self.addCleanup(self.client.close)
+        return
+
+    def test_call(self):
+        """
+        Does it run the dumps on an event loop and log the ones that failed?
+        """
+        broken = Mock()
+        broken.exec_command.side_effect = socket.error('No route to host')
+        dumps = [TheDump(command='echo {0}'.format(identifier), connection=connection,
+                         identifier=identifier,
+                         filename=os.path.join(self.folder, identifier))
+                 for identifier, connection in (('dmesg', self.client),
+                                                ('broken', broken),
+                                                ('iwconfig', self.client))]
+        loop = TheDumpLoop(dumps=dumps)
+        loop._logger = Mock()
+        loop()
+        for identifier in ('dmesg', 'iwconfig'):
+            with open(os.path.join(self.folder, identifier)) as output:
+                self.assertEqual(identifier + '\n', output.read())
+        self.assertFalse(os.path.exists(os.path.join(self.folder, 'broken')))
+        self.assertEqual(1, loop.logger.error.call_count)
+        self.assertIn('broken', loop.logger.error.call_args[0][0])
+        return
+# end class TestDumpLoop
+
 
 class TestDumpConfiguration(unittest.TestCase):
     def setUp(self):
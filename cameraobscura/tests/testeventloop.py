@@ -0,0 +1,239 @@
+
+# python standard library
+import unittest
+import socket
+import telnetlib
+import threading
+import time
+from cStringIO import StringIO
+
+# third-party
+from mock import MagicMock
+
+# this package
+from cameraobscura.clients.eventloop import EventLoop, Pending, ChannelReader, OutputReader
+from cameraobscura.clients.localclient import LocalClient
+from cameraobscura.clients.telnetclient import TelnetOutput
+from cameraobscura.clients.telnetbenchmark import FakeTelnetServer, TelnetBenchmarkConstants
+from cameraobscura.commands.command.command import TheCommand
+
+class FakeTelnetConnection(object):
+    """
+    A connection whose exec_command sends the command to the fake telnet server
+    """
+    def __init__(self, port):
+        self.client = telnetlib.Telnet(TelnetBenchmarkConstants.host, port, 5)
+        return
+
+    def exec_command(self, command, timeout):
+        self.client.write(command + TelnetBenchmarkConstants.end_of_line)
+        self.client.read_until(TelnetBenchmarkConstants.end_of_line, timeout)
+        return None, TelnetOutput(client=self.client,
+                                  prompt=TelnetBenchmarkConstants.prompt,
+                                  timeout=timeout), StringIO('')
+# end class FakeTelnetConnection
+
+class TestEventLoop(unittest.TestCase):
+    def setUp(self):
+        self.loop = EventLoop()
+        return
+
+    def client(self):
+        """
+        :return: LocalClient that gets closed after the test
+        """
+        client = LocalClient()
+        self.addCleanup(client.close)
+        return client
+
+    def test_concurrent(self):
+        """
+        Do commands on different connections run at the same time?
+        """
+        pendings = [self.loop.submit(self.client(), 'sleep 0.3; echo {0}'.format(index),
+                                     timeout=5)
+                    for index in range(3)]
+        start = time.time()
+        self.loop.run()
+        self.assertLess(time.time() - start, 0.8)
+        for index, pending in enumerate(pendings):
+            stdin, stdout, stderr = pending.value()
+            self.assertEqual('{0}\n'.format(index), stdout.read())
+        return
+
+    def test_serialized(self):
+        """
+        Do commands on the same (non-multiplexed) connection run one at a time?
+        """
+        client = self.client()
+        pendings = [self.loop.submit(client, 'sleep 0.2; echo {0}'.format(index), timeout=5)
+                    for index in range(2)]
+        start = time.time()
+        self.loop.run()
+        self.assertGreaterEqual(time.time() - start, 0.4)
+        self.assertEqual(['0\n', '1\n'], [pending.result[1].read() for pending in pendings])
+        return
+
+    def test_parse(self):
+        """
+        Does it pass the output to the parse function and each line to the lines function?
+        """
+        lines = []
+        parse = MagicMock(return_value='parsed')
+        pending = self.loop.submit(self.client(), 'printf "a\\nb\\nc"; echo error >&2',
+                                   timeout=5, parse=parse, lines=lines.append)
+        self.loop.run()
+        self.assertEqual('parsed', pending.value())
+        stdout, stderr = parse.call_args[0]
+        self.assertEqual('a\nb\nc', stdout.read())
+        self.assertEqual('error\n', stderr.read())
+        self.assertEqual(['a\n', 'b\n', 'c'], lines)
+
+        # the commands can parse their own output
+        command = TheCommand(connection=self.client(), command='echo',
+                             arguments='Signal level=-64 dBm',
+                             data_expression=r'level=(-\d+)')
+        pending = command.submit(self.loop)
+        self.loop.run()
+        self.assertEqual('-64', pending.value())
+        return
+
+    def test_timeout(self):
+        """
+        Does the output raise a socket.timeout if the command stops sending output?
+        """
+        pending = self.loop.submit(self.client(), 'echo start; sleep 5', timeout=0.2)
+        start = time.time()
+        self.loop.run()
+        self.assertLess(time.time() - start, 2)
+        stdin, stdout, stderr = pending.value()
+        self.assertEqual('start\n', stdout.readline())
+        with self.assertRaises(socket.timeout):
+            stdout.readline()
+
+        # the command traps it the way it does when it's called
+        command = TheCommand(connection=self.client(), command='sleep', arguments='5',
+                             timeout=0.2)
+        pending = command.submit(self.loop)
+        self.loop.run()
+        self.assertEqual(command.not_available, pending.value())
+        return
+
+    def test_start_error(self):
+        """
+        Does an error starting the command become the pending's error?
+        """
+        connection = MagicMock()
+        connection.exec_command.side_effect = socket.error('no route to host')
+        pending = self.loop.submit(connection, 'iwconfig')
+        self.loop.run()
+        self.assertTrue(pending.done)
+        with self.assertRaises(socket.error):
+            pending.value()
+        return
+
+    def test_gather(self):
+        """
+        Does gather collect the results in order (or the first error)?
+        """
+        pendings = [Pending() for index in range(3)]
+        gathered = self.loop.gather(pendings)
+        pendings[2].set_result(2)
+        pendings[0].set_result(0)
+        self.assertFalse(gathered.done)
+        pendings[1].set_result(1)
+        self.assertEqual([0, 1, 2], gathered.value())
+
+        pendings = [Pending(), Pending()]
+        gathered = self.loop.gather(pendings)
+        pendings[1].set_result(error=socket.timeout())
+        self.assertTrue(gathered.done)
+        self.assertIsInstance(gathered.error, socket.timeout)
+
+        self.assertEqual([], self.loop.gather([]).value())
+        return
+
+    def test_callbacks(self):
+        """
+        Are commands submitted by callbacks run before run returns?
+        """
+        client = self.client()
+        outputs = []
+        def next_command(pending):
+            outputs.append(pending.result[1].read())
+            if len(outputs) < 3:
+                self.loop.submit(client, 'echo {0}'.format(len(outputs)),
+                                 timeout=5).add_callback(next_command)
+        self.loop.submit(client, 'echo 0', timeout=5).add_callback(next_command)
+        self.loop.run()
+        self.assertEqual(['0\n', '1\n', '2\n'], outputs)
+        return
+
+    def test_telnet(self):
+        """
+        Does it read telnet output up to the prompt?
+        """
+        servers = [FakeTelnetServer(lines=100, write_size=50) for index in range(2)]
+        for server in servers:
+            thread = threading.Thread(target=server.serve_forever)
+            thread.daemon = True
+            thread.start()
+            self.addCleanup(server.server_close)
+            self.addCleanup(server.shutdown)
+        connections = [FakeTelnetConnection(server.port) for server in servers]
+        for connection in connections:
+            self.addCleanup(connection.client.close)
+        pendings = [self.loop.submit(connection, TelnetBenchmarkConstants.command, timeout=5)
+                    for connection in connections]
+        self.loop.run()
+        for pending in pendings:
+            stdin, stdout, stderr = pending.value()
+            lines = stdout.readlines()
+            self.assertEqual(100, len(lines))
+            self.assertEqual(TelnetBenchmarkConstants.line + TelnetBenchmarkConstants.end_of_line,
+                             lines[-1])
+        return
+
+    def test_channel_reader(self):
+        """
+        Does it read both of the channel's streams and finish at the EOF?
+        """
+        channel = MagicMock()
+        channel.eof_received = False
+        channel.closed = False
+        channel.recv_ready.side_effect = [True, False, False]
+        channel.recv_stderr_ready.side_effect = [True, False, False]
+        channel.recv.return_value = 'out'
+        channel.recv_stderr.return_value = 'error'
+        reader = ChannelReader(channel)
+        self.assertEqual(('out', 'error'), reader.read(3))
+        self.assertFalse(reader.finished)
+
+        channel.eof_received = True
+        channel.recv_ready.side_effect = None
+        channel.recv_ready.return_value = False
+        channel.recv_stderr_ready.side_effect = None
+        channel.recv_stderr_ready.return_value = False
+        self.assertEqual(('', ''), reader.read(3))
+        self.assertTrue(reader.finished)
+        return
+
+    def test_output_reader(self):
+        """
+        Does a reader have to supply its own read?
+        """
+        with self.assertRaises(TypeError):
+            OutputReader()
+
+        class EmptyReader(OutputReader):
+            def read(self, fileno=None):
+                self.finished = True
+                return '', ''
+
+        reader = EmptyReader()
+        self.assertEqual([], reader.filenos)
+        self.assertFalse(reader.buffered)
+        self.assertIsInstance(reader.timeout_error(5), socket.timeout)
+        self.assertEqual(('', ''), reader.read())
+        return
+# end class TestEventLoop
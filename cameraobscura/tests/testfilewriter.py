@@ -0,0 +1,80 @@
+
+# python standard library
+import unittest
+import threading
+from cStringIO import StringIO
+
+# third-party
+from mock import MagicMock
+
+# this package
+from cameraobscura.utilities.file_writer import QueuedLogWriter
+from cameraobscura.tests.helpers import random_string_of_letters
+
+class TestQueuedLogWriter(unittest.TestCase):
+    def setUp(self):
+        self.logger = MagicMock()
+        self.output = StringIO()
+        return
+
+    def test_write(self):
+        """
+        Does it write and log all the lines once it's closed?
+        """
+        lines = ["{0}\n".format(random_string_of_letters()) for line in range(100)]
+        with QueuedLogWriter(logger=self.logger, open_file=self.output,
+                             batch_size=10) as writer:
+            for line in lines:
+                writer.write(line)
+        self.assertEqual(''.join(lines), self.output.getvalue())
+        self.assertEqual(len(lines), self.logger.call_count)
+        statistics = writer.statistics
+        self.assertEqual(len(lines), statistics.lines)
+        self.assertEqual(0, statistics.blocked)
+        self.assertGreaterEqual(statistics.batches, len(lines)/10)
+        self.assertIsNone(writer.thread)
+        return
+
+    def test_blocked(self):
+        """
+        Does it wait for room (and count the waits) instead of dropping lines when the queue is full?
+        """
+        writer = QueuedLogWriter(logger=self.logger, open_file=self.output,
+                                 maximum_size=5)
+        # the thread isn't started so nothing is taken off the queue
+        for line in range(5):
+            writer.write('{0}\n'.format(line))
+        self.assertEqual(5, writer.depth)
+        self.assertEqual(0, writer.statistics.blocked)
+        # the next write has to wait until the thread starts emptying the queue
+        starter = threading.Timer(0.05, writer.start)
+        starter.start()
+        for line in range(5, 8):
+            writer.write('{0}\n'.format(line))
+        starter.join()
+        writer.close()
+        self.assertGreaterEqual(writer.statistics.blocked, 1)
+        self.assertEqual(5, writer.statistics.maximum_depth)
+        self.assertEqual(''.join('{0}\n'.format(line) for line in range(8)),
+                         self.output.getvalue())
+        return
+
+    def test_error(self):
+        """
+        Does it keep emptying the queue after a write fails and raise the error when it's closed?
+        """
+        output = MagicMock()
+        output.write.side_effect = IOError('No space left on device')
+        writer = QueuedLogWriter(logger=self.logger, open_file=output,
+                                 maximum_size=5, batch_size=2).start()
+        # more lines than the queue holds, so this would hang if the thread had stopped
+        for line in range(20):
+            writer.write('{0}\n'.format(line))
+        with self.assertRaises(IOError):
+            writer.close()
+        self.assertEqual(1, output.write.call_count)
+        self.assertIsNone(writer.thread)
+        # the error is only raised once
+        writer.close()
+        return
+# end TestQueuedLogWriter
@@ -2,21 +2,29 @@
 # python standard library
 import unittest
 import random
+import socket
 import ConfigParser
 import textwrap
 import io
+import threading
 
 # third-party
-from mock import MagicMock
+from mock import MagicMock, patch
 
 # this package
 from cameraobscura import CameraobscuraError
-from cameraobscura.hosts.host import TheHost
+from cameraobscura.hosts.host import TheHost, PermitOutput
 from cameraobscura.tests.helpers import random_string_of_letters
-from cameraobscura.clients.simpleclient import SimpleClient
+from cameraobscura.clients.simpleclient import SimpleClient, ChannelOutput, UnreachableError
+from cameraobscura.clients.sshbroker import BrokerClient
+from cameraobscura.clients.reconnect import CircuitBreaker
 from cameraobscura.clients.telnetclient import TelnetClient 
+from cameraobscura.clients.fakeclient import FakeClient
+from cameraobscura.clients.localclient import LocalClient
+from cameraobscura.clients.simulatedclient import SimulatedClient
 from cameraobscura.utilities.configurationadapter import ConfigurationAdapter
 from cameraobscura.hosts.host import HostConfiguration, HostEnum
+from cameraobscura.utilities.latency import LatencyRecorder, TimedOutput
 
 
 class TestHost(unittest.TestCase):
@@ -75,7 +83,9 @@ class TestHost(unittest.TestCase):
         Does it set up the client class dictionary correctly?
         """
         definitions = self.host.client_constructors
-        expected = dict(zip('ssh telnet'.split(), (SimpleClient, TelnetClient)))
+        expected = dict(zip('ssh telnet fake local simulated'.split(), (SimpleClient, TelnetClient,
+                                                                        FakeClient, LocalClient,
+                                                                        SimulatedClient)))
         self.assertDictEqual(definitions, expected)
         return
 
@@ -102,6 +112,193 @@ class TestHost(unittest.TestCase):
         client.close.assert_called_with()
         self.assertIsNone(self.host._client)
         return
+
+    def test_clone(self):
+        """
+        Does the clone have the same parameters but its own connection?
+        """
+        self.host._client = MagicMock()
+        clone = self.host.clone()
+        self.assertIsNot(self.host, clone)
+        self.assertIsNone(clone._client)
+        self.assertIsNot(self.host.lock, clone.lock)
+        for attribute in ('hostname', 'username', 'timeout', 'prefix', 'operating_system',
+                          'connection_type', 'test_interface', 'kwargs'):
+            self.assertEqual(getattr(self.host, attribute), getattr(clone, attribute))
+        return
+
+    def test_multiplexed_exec_command(self):
+        """
+        Do ssh commands run without waiting on the host's lock?
+        """
+        self.host.connection_type = 'ssh'
+        self.host.max_channels = 2
+        self.host._client = MagicMock()
+        self.host._lock = MagicMock()
+        self.host.exec_command('iwconfig', timeout=3)
+        self.host._client.exec_command.assert_called_with("{0} iwconfig".format(self.prefix),
+                                                          timeout=3)
+        # the lock is only held while checking the connection
+        self.assertEqual(1, self.host._lock.__enter__.call_count)
+        # at most `max_channels` commands at once
+        self.assertTrue(self.host.channels.acquire(False))
+        self.assertTrue(self.host.channels.acquire(False))
+        self.assertFalse(self.host.channels.acquire(False))
+
+        for permit in range(2):
+            self.host.channels.release()
+
+        # telnet commands are serialized
+        self.host.connection_type = 'telnet'
+        self.assertFalse(self.host.multiplexed)
+        self.host.exec_command('iwconfig')
+        self.assertEqual(2, self.host._lock.__enter__.call_count)
+        return
+
+    def test_channel_permits(self):
+        """
+        Does a command hold its channel until its output is finished?
+        """
+        self.host.connection_type = 'ssh'
+        self.host.max_channels = 2
+        self.host.latencies = LatencyRecorder()
+        self.host._client = MagicMock()
+        self.host._client.exec_command.side_effect = lambda command, timeout: (MagicMock(),
+                                                                               io.BytesIO(b'iperf output\n'),
+                                                                               MagicMock())
+        running = [self.host.exec_command('iperf -s', timeout=None) for command in range(2)]
+        started = []
+        thread = threading.Thread(target=lambda: started.append(self.host.exec_command('iwconfig')))
+        thread.daemon = True
+        thread.start()
+        thread.join(0.2)
+        # the third command waits for a channel
+        self.assertTrue(thread.is_alive())
+        self.assertEqual([], started)
+
+        # reading an output to the end gives its channel back
+        stdin, stdout, stderr = running[0]
+        self.assertEqual(['iperf output\n'], stdout.readlines())
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(1, len(started))
+
+        # so does closing one (once)
+        stdin, stdout, stderr = running[1]
+        stdout.close()
+        stdout.close()
+        self.assertTrue(self.host.channels.acquire(False))
+        self.assertFalse(self.host.channels.acquire(False))
+        return
+
+    def test_exec_batch(self):
+        """
+        Does it add the prefix and send the batch under the lock?
+        """
+        self.host.connection_type = 'telnet'
+        self.assertTrue(self.host.batched)
+        self.host._client = MagicMock()
+        self.host._lock = MagicMock()
+        self.host.exec_batch(['uname', 'iwconfig'], timeout=2)
+        self.host._client.exec_batch.assert_called_with(["{0} uname".format(self.prefix),
+                                                         "{0} iwconfig".format(self.prefix)],
+                                                        timeout=2)
+        self.assertEqual(1, self.host._lock.__enter__.call_count)
+
+        self.host.connection_type = 'ssh'
+        self.assertFalse(self.host.batched)
+        return
+
+    def test_latency(self):
+        """
+        Does it record the exec latencies under its identity and the command's name?
+        """
+        self.host._client = MagicMock()
+        self.host._client.exec_command.return_value = (None, io.BytesIO(b'wlan0\n'),
+                                                       io.BytesIO(b''))
+        self.host.latencies = LatencyRecorder()
+        stdin, stdout, stderr = self.host.exec_command('iwconfig wlan0')
+        if self.host.multiplexed:
+            self.assertIsInstance(stdout, PermitOutput)
+            stdout = stdout.output
+        self.assertIsInstance(stdout, TimedOutput)
+        self.assertEqual([], self.host.latencies.summary())
+        self.assertEqual(b'wlan0\n', stdout.read())
+        hosts = set(row[:2] for row in self.host.latencies.summary())
+        self.assertEqual(set([(self.host.identity, 'iwconfig')]), hosts)
+        return
+
+    def test_ssh_output(self):
+        """
+        Does an ssh host read its commands' output in chunks from the channel?
+        """
+        self.addCleanup(CircuitBreaker.clear)
+        host = TheHost(hostname=self.hostname, test_interface=self.test_interface,
+                       username=self.username, connection_type='ssh')
+        host.latencies = LatencyRecorder()
+        self.assertIsInstance(host.client, SimpleClient)
+        # don't use a broker even if one is running
+        host.client.broker = BrokerClient(path='')
+        channel = MagicMock()
+        # a line can be split between chunks
+        channel.recv.side_effect = ['Signal level=-64 dBm\nLink Qual', 'ity=70/70\n', '']
+        with patch('paramiko.SSHClient') as ssh_client:
+            ssh_client.return_value.exec_command.return_value = (MagicMock(),
+                                                                 MagicMock(channel=channel),
+                                                                 MagicMock())
+            stdin, stdout, stderr = host.exec_command('iwconfig wlan0', timeout=3)
+        ssh_client.return_value.connect.assert_called_with(hostname=self.hostname,
+                                                           username=self.username,
+                                                           timeout=host.timeout,
+                                                           port=22)
+        ssh_client.return_value.exec_command.assert_called_with('iwconfig wlan0\n', timeout=3)
+        self.assertIsInstance(stdout, PermitOutput)
+        self.assertIsInstance(stdout.output, ChannelOutput)
+        self.assertEqual(['Signal level=-64 dBm\n', 'Link Quality=70/70\n'], list(stdout))
+        self.assertTrue(stdout.released)
+        self.assertEqual(3, channel.recv.call_count)
+        self.assertEqual([(host.identity, 'iwconfig')],
+                         sorted(set(row[:2] for row in host.latencies.summary())))
+        return
+
+    def test_ssh_reconnect(self):
+        """
+        Does an ssh host re-send failed commands and count them in its circuit breaker?
+        """
+        self.addCleanup(CircuitBreaker.clear)
+        host = TheHost(hostname=self.hostname, test_interface=self.test_interface,
+                       username=self.username, connection_type='ssh')
+        host.client.broker = BrokerClient(path='')
+        with patch('paramiko.SSHClient') as ssh_client, patch('cameraobscura.clients.reconnect.time.sleep') as sleep:
+            ssh_client.return_value.connect.side_effect = socket.error('No route to host')
+            with self.assertRaises(UnreachableError):
+                host.exec_command('iwconfig wlan0', timeout=3)
+        self.assertEqual(3, ssh_client.return_value.connect.call_count)
+        self.assertEqual(2, sleep.call_count)
+        counters = CircuitBreaker.statistics()[self.hostname]
+        self.assertEqual(dict(attempts=3, failures=3, retries=2, reconnects=3, trips=1), counters)
+        self.assertEqual(CircuitBreaker.open, host.client.breaker.state)
+        return
+
+    def test_agent(self):
+        """
+        Does it keep one agent for each set of commands and stop them when it closes?
+        """
+        commands = {'rssi': 'iwconfig wlan0'}
+        agent = self.host.agent(commands, timeout=3)
+        self.assertIs(self.host, agent.connection)
+        self.assertEqual(3, agent.timeout)
+        self.assertIs(agent, self.host.agent(dict(commands)))
+        other = self.host.agent({'noise': 'wl noise'})
+        self.assertIsNot(agent, other)
+
+        agent.stop = MagicMock()
+        other.stop = MagicMock()
+        self.host.close()
+        agent.stop.assert_called_with()
+        other.stop.assert_called_with()
+        self.assertIsNot(agent, self.host.agent(commands))
+        return
 # end TestHost    
 
 
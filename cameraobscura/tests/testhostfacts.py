@@ -0,0 +1,158 @@
+
+# python standard library
+import unittest
+import os
+import shutil
+import tempfile
+import time
+import socket
+from StringIO import StringIO
+
+# third-party
+from mock import MagicMock
+
+# this package
+from cameraobscura.hosts.hostfacts import HostFacts, HostFactsCache, HostFactsProbe
+from cameraobscura.hosts.hostfacts import HostFactsError
+from cameraobscura.tests.helpers import random_string_of_letters
+
+OUTPUTS = {'uname': ('Linux\n', ''),
+           'iperf --version': ('', 'iperf version 2.0.10 (11 Aug 2017) pthreads\n'),
+           'iperf --help': ('  -e, --enhancedreports    use enhanced reporting\n', ''),
+           'which pkill': ('/usr/bin/pkill\n', '')}
+
+def fake_exec_command(command, timeout=None):
+    stdout, stderr = OUTPUTS[command]
+    return None, StringIO(stdout), StringIO(stderr)
+
+def fake_host():
+    host = MagicMock()
+    host.identity = random_string_of_letters()
+    host.exec_command.side_effect = fake_exec_command
+    return host
+
+def fake_facts(identity, timestamp=None):
+    return HostFacts(identity=identity, operating_system='linux',
+                     iperf_version='iperf version 2.0.5', iperf3=False,
+                     enhanced_reports=False, pkill=True,
+                     timestamp=time.time() if timestamp is None else timestamp)
+
+class TestHostFactsCache(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.filename = os.path.join(self.path, 'facts', 'host_facts.json')
+        self.cache = HostFactsCache(filename=self.filename, ttl=60)
+        return
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+        return
+
+    def test_get_set(self):
+        """
+        Does it save the facts so another cache can load them?
+        """
+        identity = random_string_of_letters()
+        self.assertIsNone(self.cache.get(identity))
+        facts = fake_facts(identity)
+        self.cache.set(facts)
+        self.assertEqual(facts, self.cache.get(identity))
+        self.assertTrue(os.path.isfile(self.filename))
+
+        # another cache adds a host without losing the first
+        other = HostFactsCache(filename=self.filename, ttl=60)
+        other_facts = fake_facts(random_string_of_letters())
+        other.set(other_facts)
+        loaded = HostFactsCache(filename=self.filename, ttl=60)
+        self.assertEqual(facts, loaded.get(identity))
+        self.assertEqual(other_facts, loaded.get(other_facts.identity))
+        return
+
+    def test_expired(self):
+        """
+        Does it ignore facts that are older than the ttl?
+        """
+        identity = random_string_of_letters()
+        self.cache.set(fake_facts(identity, timestamp=time.time() - 61))
+        self.assertIsNone(self.cache.get(identity))
+        return
+
+    def test_no_cache(self):
+        """
+        Does a ttl of 0 ignore the cache but still save the facts?
+        """
+        cache = HostFactsCache(filename=self.filename, ttl=0)
+        facts = fake_facts(random_string_of_letters())
+        cache.set(facts)
+        self.assertIsNone(cache.get(facts.identity))
+        self.assertEqual(facts, self.cache.get(facts.identity))
+        return
+# end TestHostFactsCache
+
+class TestHostFactsProbe(unittest.TestCase):
+    def setUp(self):
+        self.cache = MagicMock()
+        self.cache.get.return_value = None
+        self.probe = HostFactsProbe(cache=self.cache)
+        return
+
+    def test_probe(self):
+        """
+        Does it get the facts from the command output?
+        """
+        host = fake_host()
+        facts = self.probe.probe(host)
+        self.assertEqual(host.identity, facts.identity)
+        self.assertEqual('linux', facts.operating_system)
+        self.assertEqual('iperf version 2.0.10 (11 Aug 2017) pthreads',
+                         facts.iperf_version)
+        self.assertFalse(facts.iperf3)
+        self.assertTrue(facts.enhanced_reports)
+        self.assertTrue(facts.pkill)
+
+        # missing commands leave the facts empty
+        host.exec_command.side_effect = lambda command, timeout: (None, StringIO(''),
+                                                                  StringIO(''))
+        facts = self.probe.probe(host)
+        self.assertIsNone(facts.operating_system)
+        self.assertIsNone(facts.iperf_version)
+        self.assertFalse(facts.pkill)
+        return
+
+    def test_not_installed(self):
+        """
+        Does the shell's complaint about a missing command leave the facts empty?
+        """
+        outputs = {'uname': ('Linux\n', ''),
+                   'iperf --version': ('', 'bash: iperf: command not found\n'),
+                   'iperf --help': ('', 'bash: iperf: command not found\n'),
+                   'which pkill': ('which: no pkill in (/usr/bin:/bin)\n', '')}
+        host = fake_host()
+        host.exec_command.side_effect = lambda command, timeout: (None,
+                                                                  StringIO(outputs[command][0]),
+                                                                  StringIO(outputs[command][1]))
+        facts = self.probe.facts(host)
+        self.assertIsNone(facts.iperf_version)
+        self.assertFalse(facts.iperf3)
+        self.assertFalse(facts.enhanced_reports)
+        self.assertFalse(facts.pkill)
+        self.cache.set.assert_called_with(facts)
+
+        # iperf 3 is a version too
+        outputs['iperf --version'] = ('iperf 3.1.3\n', '')
+        facts = self.probe.probe(host)
+        self.assertEqual('iperf 3.1.3', facts.iperf_version)
+        self.assertTrue(facts.iperf3)
+        return
+
+    def test_failure(self):
+        """
+        Does a host that can't be reached raise instead of caching empty facts?
+        """
+        host = fake_host()
+        host.exec_command.side_effect = socket.timeout('timed out')
+        with self.assertRaises(HostFactsError):
+            self.probe.facts(host)
+        self.assertFalse(self.cache.set.called)
+        return
+# end TestHostFactsProbe
@@ -0,0 +1,97 @@
+
+# python standard library
+import unittest
+import socket
+import StringIO
+
+# third-party
+from mock import MagicMock
+
+# this package
+from cameraobscura.hosts.hostpool import HostPool, HostPoolConstants
+from cameraobscura.hosts.host import TheHost
+from cameraobscura.tests.helpers import random_string_of_letters
+
+class TestHostPool(unittest.TestCase):
+    def setUp(self):
+        HostPool._hosts.clear()
+        HostPool._logger = MagicMock()
+        self.hostname = random_string_of_letters()
+        self.host = HostPool.get_host(hostname=self.hostname,
+                                      test_interface=random_string_of_letters(),
+                                      username='tester')
+        self.client = MagicMock()
+        self.host._client = self.client
+        return
+
+    def tearDown(self):
+        HostPool._hosts.clear()
+        HostPool._logger = None
+        return
+
+    def test_get_host(self):
+        """
+        Does it give back the same host for the same parameters?
+        """
+        self.assertIsInstance(self.host, TheHost)
+        self.client.exec_command.return_value = (None,
+                                                 StringIO.StringIO(HostPoolConstants.token + '\n'),
+                                                 StringIO.StringIO(''))
+        host = HostPool.get_host(hostname=self.hostname,
+                                 test_interface=self.host.test_interface,
+                                 username='tester')
+        self.assertIs(self.host, host)
+        # it was checked before it was given back
+        self.client.exec_command.assert_called_with(HostPoolConstants.check_command,
+                                                    timeout=HostPoolConstants.timeout)
+
+        other = HostPool.get_host(hostname=self.hostname,
+                                  test_interface=self.host.test_interface,
+                                  username='someone_else')
+        self.assertIsNot(self.host, other)
+        return
+
+    def test_check(self):
+        """
+        Does it only check the connections that were made?
+        """
+        self.client.exec_command.return_value = (None,
+                                                 StringIO.StringIO(HostPoolConstants.token + '\n'),
+                                                 StringIO.StringIO(''))
+        self.assertTrue(HostPool.check(self.host))
+        self.assertIs(self.client, self.host._client)
+
+        self.host._client = None
+        self.client.reset_mock()
+        self.assertTrue(HostPool.check(self.host))
+        self.assertFalse(self.client.exec_command.called)
+        return
+
+    def test_broken_connection(self):
+        """
+        Does it close the client if the check fails?
+        """
+        # no answer
+        self.client.exec_command.return_value = (None, StringIO.StringIO(''),
+                                                 StringIO.StringIO(''))
+        self.assertFalse(HostPool.check(self.host))
+        self.assertTrue(self.client.close.called)
+        self.assertIsNone(self.host._client)
+
+        # the connection raises an error
+        self.host._client = self.client
+        self.client.exec_command.side_effect = socket.error('Broken pipe')
+        self.client.close.side_effect = socket.error('Broken pipe')
+        self.assertFalse(HostPool.check(self.host))
+        self.assertIsNone(self.host._client)
+        return
+
+    def test_close_all(self):
+        """
+        Does it close the hosts and forget them?
+        """
+        HostPool.close_all()
+        self.assertTrue(self.client.close.called)
+        self.assertEqual({}, HostPool._hosts)
+        return
+# end TestHostPool
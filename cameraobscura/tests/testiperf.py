@@ -6,6 +6,7 @@ from cStringIO import StringIO
 import random
 import ConfigParser
 import io
+import threading
 
 # third-party
 from mock import MagicMock, mock_open, patch, call
@@ -110,6 +111,34 @@ class TestIperf(unittest.TestCase):
         self.run_client.assert_called_with(self.dut, expected_filename)
         return
 
+    def test_reset(self):
+        """
+        Does a session that doesn't finish leave the summaries empty (not the last session's)?
+        """
+        self.iperf.run_client = self.run_client
+        self.iperf.client_summary = self.iperf.server_summary = 92.5
+        self.iperf.client_result = self.iperf.server_result = MagicMock()
+        finished = threading.Event()
+
+        def start_server(server, filename):
+            # a server whose output is still being read after the join timeout
+            self.iperf.server_thread = threading.Thread(target=finished.wait)
+            self.iperf.server_thread.daemon = True
+            self.iperf.server_thread.start()
+            return
+
+        self.iperf.start_server = start_server
+        with patch('cameraobscura.commands.iperf.Iperf.time.sleep'):
+            with patch('cameraobscura.commands.iperf.Iperf.SERVER_JOIN_TIMEOUT', 0.01):
+                self.iperf(IperfConstants.down, random_string_of_letters())
+        for attribute in ('client_summary', 'server_summary', 'client_result', 'server_result'):
+            self.assertIsNone(getattr(self.iperf, attribute))
+        self.assertFalse(self.iperf.server_finished)
+        finished.set()
+        self.iperf.server_thread.join()
+        self.assertTrue(self.iperf.server_finished)
+        return
+
     def test_downstream(self):
         """
         Does it run downstream traffic?
@@ -151,6 +180,8 @@ class TestIperf(unittest.TestCase):
         file_writer_definition = MagicMock()
         file_writer_instance = MagicMock()
         file_writer_definition.return_value = file_writer_instance
+        # the writer is used as a context manager
+        file_writer_instance.__enter__.return_value = file_writer_instance
         stdout = random_string_of_letters(10)
         stderr = random_string_of_letters(5)
         host.exec_command.return_value = None, stdout, stderr
@@ -160,7 +191,7 @@ class TestIperf(unittest.TestCase):
         opened_file = MagicMock()
         file_mock.return_value = opened_file
         with patch('__builtin__.open', file_mock):
-            with patch('cameraobscura.utilities.file_writer.LogWriter', file_writer_definition):
+            with patch('cameraobscura.utilities.file_writer.QueuedLogWriter', file_writer_definition):
                 self.iperf.run(host=host,
                                settings=self.server_settings,
                                filename=filename,
@@ -177,7 +208,7 @@ class TestIperf(unittest.TestCase):
         self.logger.reset_mock()
         file_writer_instance.reset_mock()
         with patch('__builtin__.open', file_mock):
-            with patch('cameraobscura.utilities.file_writer.LogWriter', file_writer_definition):
+            with patch('cameraobscura.utilities.file_writer.QueuedLogWriter', file_writer_definition):
                 self.iperf.run(host=host,
                                settings=self.server_settings,
                                filename=filename,
@@ -193,10 +224,17 @@ class TestIperf(unittest.TestCase):
         Does it get the version numbers from the client and server?
         """
         stdout = "iperf version 2.0.5 (08 Jul 2010) pthreads"
+        self.dut.facts = None
         self.dut.exec_command.return_value = None, StringIO(stdout), StringIO('')
         output = self.iperf.version(self.dut)
         self.assertEqual(stdout, output)
         self.dut.exec_command.assert_called_with("iperf --version")
+
+        # the host-facts have it
+        self.dut.reset_mock()
+        self.dut.facts = MagicMock(iperf_version=stdout)
+        self.assertEqual(stdout, self.iperf.version(self.dut))
+        self.assertFalse(self.dut.exec_command.called)
         return
 
 
@@ -0,0 +1,97 @@
+
+# python standard library
+import unittest
+import os
+import shutil
+import tempfile
+
+# third-party
+from mock import MagicMock
+
+# this package
+from cameraobscura.ratevsrange.journal import Journal, JournalConstants
+from cameraobscura.tests.helpers import random_string_of_letters
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.filename = os.path.join(self.path, 'results', JournalConstants.filename)
+        self.journal = Journal(self.filename)
+        self.journal._logger = MagicMock()
+        self.direction = random_string_of_letters()
+        return
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+        return
+
+    def test_step(self):
+        """
+        Does it get the last step for a direction back from the file?
+        """
+        self.assertEqual([], self.journal.entries)
+        self.assertIsNone(self.journal.last_step(1, self.direction))
+        self.journal.start()
+        for attenuation in range(3):
+            self.journal.step(1, self.direction, attenuation,
+                              JournalConstants.measured, False,
+                              {'current_value': attenuation})
+        self.journal.step(1, 'other', 5, JournalConstants.no_connection,
+                          True, {'current_value': 5})
+
+        # a new journal (as in a resumed test) reads what was written
+        step = Journal(self.filename).last_step(1, self.direction)
+        self.assertEqual(JournalConstants.step, step.kind)
+        self.assertEqual(2, step.attenuation)
+        self.assertEqual(JournalConstants.measured, step.status)
+        self.assertFalse(step.lost_connection)
+        self.assertEqual({'current_value': 2}, step.state)
+        self.assertIsNone(self.journal.last_step(2, self.direction))
+        return
+
+    def test_completed(self):
+        """
+        Does it find the finished directions and repetitions?
+        """
+        self.assertEqual((None, False), self.journal.last_repetition)
+        self.journal.start()
+        self.journal.step(1, self.direction, 0, JournalConstants.measured,
+                          False, {})
+        self.assertEqual((1, False), self.journal.last_repetition)
+        self.journal.direction_complete(1, self.direction)
+        self.assertEqual(set([self.direction]),
+                         self.journal.completed_directions(1))
+        self.journal.repetition_complete(1)
+        self.assertEqual((1, True), self.journal.last_repetition)
+        self.journal.step(2, self.direction, 0, JournalConstants.measured,
+                          False, {})
+        self.assertEqual((2, False), self.journal.last_repetition)
+        self.assertEqual(set(), self.journal.completed_directions(2))
+        return
+
+    def test_restart(self):
+        """
+        Does a new (non-resume) start hide the earlier entries?
+        """
+        self.journal.start()
+        self.journal.step(1, self.direction, 0, JournalConstants.measured,
+                          False, {})
+        self.journal.start(resume=True)
+        self.assertIsNotNone(self.journal.last_step(1, self.direction))
+        self.journal.start()
+        self.assertIsNone(self.journal.last_step(1, self.direction))
+        self.assertEqual(1, len(self.journal.entries))
+        return
+
+    def test_broken_line(self):
+        """
+        Does it skip a line that was cut off?
+        """
+        self.journal.step(1, self.direction, 0, JournalConstants.measured,
+                          False, {})
+        with open(self.filename, 'a') as journal:
+            journal.write('{"kind": "step", "repet')
+        self.assertEqual(1, len(self.journal.entries))
+        self.assertTrue(self.journal.logger.warning.called)
+        return
+# end TestJournal
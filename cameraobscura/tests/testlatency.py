@@ -0,0 +1,199 @@
+
+# python standard library
+import unittest
+import os
+import shutil
+import tempfile
+from cStringIO import StringIO
+
+# third-party
+from mock import MagicMock, patch
+
+# this package
+from cameraobscura.utilities.latency import LatencyHistogram, LatencyTimer, TimedOutput
+from cameraobscura.utilities.latency import LatencyRecorder, LatencyConstants
+from cameraobscura.clients.simpleclient import ChannelOutput
+
+class TestLatency(unittest.TestCase):
+    def setUp(self):
+        patcher = patch('cameraobscura.utilities.latency.time.time')
+        self.time = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.time.return_value = 100.0
+        return
+
+    def test_histogram(self):
+        """
+        Are the values kept to two significant digits?
+        """
+        histogram = LatencyHistogram()
+        self.assertEqual(8, histogram.bits)
+        # small values are exact
+        self.assertEqual(255, histogram.lowest(255))
+        # larger ones share buckets no wider than 1% of their values
+        for value in (256, 1000, 123456, 3 * 10**6):
+            lowest, highest = histogram.lowest(value), histogram.highest(value)
+            self.assertTrue(lowest <= value <= highest)
+            self.assertTrue(highest - lowest < value * 0.01)
+        histogram.record(123456)
+        histogram.record(-5)
+        self.assertEqual(2, histogram.total)
+        self.assertEqual(0, histogram.minimum)
+        self.assertEqual(123456, histogram.maximum)
+        self.assertEqual(123456/2.0, histogram.mean)
+        self.assertEqual(2, len(histogram.counts))
+        self.assertIsNone(LatencyHistogram().percentile(50))
+        return
+
+    def test_percentile(self):
+        """
+        Does it get the percentiles to within the precision?
+        """
+        histogram = LatencyHistogram()
+        for value in range(1, 10001):
+            histogram.record(value)
+        for percentile in (50, 90, 99, 99.9, 100):
+            expected = percentile * 100
+            self.assertTrue(expected <= histogram.percentile(percentile) <= expected * 1.01)
+        self.assertEqual(1, histogram.percentile(0))
+        self.assertEqual(10000, histogram.percentile(100))
+        return
+
+    def test_merge(self):
+        """
+        Does merging add the counts (and survive a round-trip through a dict)?
+        """
+        first, second = LatencyHistogram(), LatencyHistogram()
+        for value in (500, 700):
+            first.record(value)
+        second.record(90000, count=2)
+        first.merge(second)
+        first.merge(LatencyHistogram())
+        self.assertEqual(4, first.total)
+        self.assertEqual((500, 90000), (first.minimum, first.maximum))
+        copy = LatencyHistogram.from_dict(first.to_dict())
+        self.assertEqual(first.counts, copy.counts)
+        self.assertEqual(first.percentile(75), copy.percentile(75))
+        self.assertEqual(first.mean, copy.mean)
+        return
+
+    def test_timer(self):
+        """
+        Does it time the first byte and the end (once each)?
+        """
+        callback = MagicMock()
+        timer = LatencyTimer(callback=callback)
+        self.assertIsNone(timer.first_byte_latency)
+        self.time.return_value = 100.25
+        timer.received()
+        self.time.return_value = 101.0
+        timer.received()
+        self.assertEqual(0.25, timer.first_byte_latency)
+        self.assertIsNone(timer.eof_latency)
+        timer.finished()
+        self.time.return_value = 102.0
+        timer.finished()
+        self.assertEqual(1.0, timer.eof_latency)
+        callback.assert_called_once_with(timer)
+
+        # no output means the first byte is the end
+        timer = LatencyTimer()
+        self.time.return_value = 103.0
+        timer.finished()
+        self.assertEqual(1.0, timer.first_byte_latency)
+        return
+
+    def test_timed_output(self):
+        """
+        Does the TimedOutput time the reads and pass everything else through?
+        """
+        for read in (lambda output: output.readlines(), lambda output: output.read(),
+                     lambda output: list(iter(output.readline, ''))):
+            self.time.return_value = 100.0
+            output = StringIO('Signal level=-64 dBm\nNoise level=-92 dBm\n')
+            timed = TimedOutput(output, LatencyTimer())
+            self.time.return_value = 100.5
+            self.assertIn('Noise level=-92 dBm', "".join(read(timed)))
+            self.assertEqual(0.5, timed.timer.eof_latency)
+            # anything else comes from the wrapped output
+            self.assertEqual(output.tell(), timed.tell())
+        return
+
+    def test_channel_output(self):
+        """
+        Does the ChannelOutput tell its timer about the chunks it reads?
+        """
+        channel = MagicMock()
+        times = iter((100.5, 102.0))
+        channel.recv.side_effect = ['Signal level=-64 dBm\n', '']
+        timer = LatencyTimer()
+        self.time.side_effect = lambda: next(times)
+        output = ChannelOutput(channel, timer=timer)
+        self.assertEqual(['Signal level=-64 dBm\n'], output.readlines())
+        self.assertEqual(0.5, timer.first_byte_latency)
+        self.assertEqual(2.0, timer.eof_latency)
+        return
+
+    def test_recorder(self):
+        """
+        Does the recorder keep histograms per host, command and metric?
+        """
+        recorder = LatencyRecorder()
+        self.assertEqual('iwconfig', recorder.name('/sbin/iwconfig wlan0'))
+        self.assertEqual('', recorder.name(''))
+
+        # an output with its own timer
+        output = ChannelOutput(MagicMock(), timer=LatencyTimer())
+        self.assertIs(output, recorder.watch('ssh:tester@dut:22', 'iwconfig', output))
+        self.time.return_value = 100.002
+        output.timer.finished()
+
+        # an output without one is wrapped
+        self.time.return_value = 100.0
+        timed = recorder.watch('telnet:tester@dut:23', 'wl', StringIO('-92\n'))
+        self.assertIsInstance(timed, TimedOutput)
+        self.time.return_value = 100.5
+        timed.read()
+
+        summary = recorder.summary(percentiles=(50,))
+        self.assertEqual(4, len(summary))
+        host, name, metric, count, percentiles = summary[0]
+        self.assertEqual(('ssh:tester@dut:22', 'iwconfig', LatencyConstants.first_byte, 1),
+                         (host, name, metric, count))
+        self.assertEqual(2000, percentiles[50])
+        self.assertEqual(500000, summary[-1][-1][50])
+        recorder.clear()
+        self.assertEqual([], recorder.summary())
+        return
+
+    def test_save_compare(self):
+        """
+        Can a run's histograms be saved, loaded and compared to another run's?
+        """
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+        runs = []
+        for latency in (0.01, 0.03):
+            recorder = LatencyRecorder()
+            self.time.return_value = 100.0
+            timer = LatencyTimer()
+            self.time.return_value = 100.0 + latency
+            timer.finished()
+            recorder.record('ssh:tester@dut:22', 'iwconfig', timer)
+            # a command only the first run had
+            if not runs:
+                recorder.record('ssh:tester@dut:22', 'ping', timer)
+            filename = os.path.join(folder, 'run_{0}'.format(len(runs)),
+                                    LatencyConstants.filename)
+            recorder.save(filename)
+            runs.append(LatencyRecorder.load(filename))
+        comparisons = runs[0].compare(runs[1], percentiles=(99,))
+        self.assertEqual(2, len(comparisons))
+        comparison = comparisons[-1]
+        self.assertEqual(('ssh:tester@dut:22', 'iwconfig', LatencyConstants.eof, 99),
+                         comparison[:4])
+        self.assertTrue(9900 <= comparison.before <= 10000)
+        self.assertTrue(29800 <= comparison.after <= 30000)
+        self.assertAlmostEqual(3, comparison.ratio, places=1)
+        return
+# end class TestLatency
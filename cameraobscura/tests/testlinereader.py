@@ -0,0 +1,85 @@
+
+# python standard library
+import unittest
+import re
+import socket
+
+# third-party
+from mock import MagicMock
+
+# this package
+from cameraobscura.clients.linereader import ChunkedLineReader
+
+class TestChunkedLineReader(unittest.TestCase):
+    def setUp(self):
+        self.read_chunk = MagicMock()
+        self.reader = ChunkedLineReader(read_chunk=self.read_chunk)
+        return
+
+    def test_lines(self):
+        """
+        Does it split the chunks into lines (even if a line is split between chunks)?
+        """
+        self.read_chunk.side_effect = ['one\ntw', 'o\nthree\n', 'four', '']
+        self.assertEqual(['one\n', 'two\n', 'three\n', 'four'], self.reader.readlines())
+        self.assertEqual('', self.reader.readline())
+        self.assertTrue(self.reader.finished)
+        # it doesn't ask for more once the output's finished
+        self.assertEqual(4, self.read_chunk.call_count)
+
+        # None ends the output too
+        reader = ChunkedLineReader(read_chunk=MagicMock(side_effect=['a\nb', None]))
+        self.assertEqual('a\nb', reader.read())
+        self.assertEqual('', reader.read())
+        return
+
+    def test_views(self):
+        """
+        Can the lines be searched without copying them?
+        """
+        self.read_chunk.side_effect = ['rate 10 Mbits/sec\nrate 2', '0 Mbits/sec\n', '']
+        expression = re.compile(r'(\d+) Mbits')
+        rates = [expression.search(line).group(1) for line in self.reader.lines()]
+        self.assertEqual(['10', '20'], rates)
+        # the buffer only keeps the lines that haven't been read
+        self.assertEqual('rate 20 Mbits/sec\n', str(self.reader.buffer))
+        return
+
+    def test_newline(self):
+        """
+        Does a newline longer than one character get found if a chunk splits it?
+        """
+        reader = ChunkedLineReader(read_chunk=MagicMock(side_effect=['one\r', '\ntwo\r\n',
+                                                                     'three', None]),
+                                   newline='\r\n')
+        self.assertEqual(['one\r\n', 'two\r\n', 'three'], reader.readlines())
+        return
+
+    def test_available(self):
+        """
+        Can the output that's already been read be taken without reading more?
+        """
+        self.read_chunk.side_effect = ['a\nbb\nc']
+        self.assertEqual('a\n', self.reader.readline())
+        self.assertTrue(self.reader.buffered)
+        self.assertEqual('bb\nc', self.reader.available())
+        self.assertFalse(self.reader.buffered)
+        self.assertEqual('', self.reader.available())
+        self.assertEqual(1, self.read_chunk.call_count)
+
+        # output read somewhere else can be fed in
+        self.reader.feed('d\n')
+        self.assertEqual('d\n', self.reader.readline())
+        return
+
+    def test_error(self):
+        """
+        Does an error from read_chunk go through (and can it carry on after)?
+        """
+        self.read_chunk.side_effect = ['partial', socket.timeout('timed out'),
+                                       ' line\n', '']
+        with self.assertRaises(socket.timeout):
+            self.reader.readline()
+        self.assertEqual('partial line\n', self.reader.readline())
+        return
+# end class TestChunkedLineReader
@@ -0,0 +1,107 @@
+
+# python standard library
+import unittest
+import socket
+import subprocess
+
+# third-party
+from mock import MagicMock, patch
+
+# this package
+from cameraobscura.clients.localclient import LocalClient, LocalOutput
+from cameraobscura.tests.helpers import random_string_of_letters
+
+class TestLocalClient(unittest.TestCase):
+    def setUp(self):
+        self.client = LocalClient(hostname=random_string_of_letters(),
+                                  username=random_string_of_letters(),
+                                  password=random_string_of_letters())
+        self.client._logger = MagicMock()
+        return
+
+    def test_constructor(self):
+        """
+        Does it build without needing a port or login?
+        """
+        self.assertIsNone(self.client.port)
+        self.assertEqual([], self.client.client)
+        return
+
+    def test_exec_command(self):
+        """
+        Does it run the command in a shell and wrap the output?
+        """
+        popen = MagicMock()
+        process = MagicMock()
+        popen.return_value = process
+        with patch('subprocess.Popen', popen):
+            stdin, stdout, stderr = self.client.exec_command('ps -e | grep iperf\n',
+                                                             timeout=5)
+        self.assertEqual('ps -e | grep iperf', popen.call_args[0][0])
+        self.assertTrue(popen.call_args[1]['shell'])
+        self.assertEqual(process.stdin, stdin)
+        self.assertIsInstance(stdout, LocalOutput)
+        self.assertEqual(process.stdout, stdout.pipe)
+        self.assertEqual(5, stdout.timeout)
+        self.assertEqual(process.stderr, stderr.pipe)
+        self.assertIs(stderr, stdout.partner)
+        self.assertIs(stdout, stderr.partner)
+        self.assertIn(process, self.client.client)
+        return
+
+    def test_close(self):
+        """
+        Does it kill the processes that are still running?
+        """
+        running, finished = MagicMock(), MagicMock()
+        running.poll.return_value = None
+        finished.poll.return_value = 0
+        self.client._client = [running, finished]
+        self.client.close()
+        running.kill.assert_called_with()
+        self.assertFalse(finished.kill.called)
+        self.assertIsNone(self.client._client)
+        return
+# end TestLocalClient
+
+class TestLocalOutput(unittest.TestCase):
+    def test_readline(self):
+        """
+        Does it split the chunks it reads into lines?
+        """
+        process = subprocess.Popen('printf "a\nbb\nccc"', shell=True,
+                                   stdout=subprocess.PIPE)
+        output = LocalOutput(pipe=process.stdout, timeout=5, chunk_size=2)
+        self.assertEqual(['a\n', 'bb\n', 'ccc'], [line for line in output])
+        self.assertEqual('', output.readline())
+        process.wait()
+        return
+
+    def test_partner(self):
+        """
+        Does it drain stderr while it waits for stdout (so the process can't block)?
+        """
+        process = subprocess.Popen('head -c 200000 /dev/zero >&2; echo done', shell=True,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stderr = LocalOutput(pipe=process.stderr, timeout=5)
+        stdout = LocalOutput(pipe=process.stdout, timeout=5, partner=stderr)
+        self.assertEqual('done\n', stdout.readline())
+        self.assertEqual('', stdout.readline())
+        self.assertEqual(200000, len(stderr.read()))
+        self.assertEqual('', stderr.read())
+        process.wait()
+        return
+
+    def test_timeout(self):
+        """
+        Does it raise a socket.timeout if nothing comes out in time?
+        """
+        process = subprocess.Popen('sleep 2', shell=True,
+                                   stdout=subprocess.PIPE)
+        output = LocalOutput(pipe=process.stdout, timeout=0.01)
+        with self.assertRaises(socket.timeout):
+            output.readline()
+        process.kill()
+        process.wait()
+        return
+# end TestLocalOutput
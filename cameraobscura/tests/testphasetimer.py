@@ -0,0 +1,104 @@
+
+# python standard library
+import unittest
+import json
+import os
+import shutil
+import tempfile
+
+# third-party
+from mock import MagicMock, patch
+
+# this package
+from cameraobscura.utilities.phasetimer import PhaseTimer, PhaseConstants
+
+class TestPhaseTimer(unittest.TestCase):
+    def setUp(self):
+        self.timer = PhaseTimer()
+        self.timer._logger = MagicMock()
+        # each call to time.time is one second later
+        self.clock = iter(range(100))
+        self.time = patch('time.time', lambda: float(next(self.clock)))
+        self.time.start()
+        return
+
+    def tearDown(self):
+        self.time.stop()
+        return
+
+    def test_span(self):
+        """
+        Does it record the span with the step's arguments?
+        """
+        self.timer.step(attenuation=10, direction='up')
+        with self.timer.span('setAttenuation', port=2):
+            pass
+        span = self.timer.spans[0]
+        self.assertEqual('setAttenuation', span.name)
+        self.assertEqual(PhaseConstants.overhead, span.category)
+        self.assertEqual(0, span.start)
+        self.assertEqual(1, span.duration)
+        self.assertEqual({'attenuation': 10, 'direction': 'up', 'port': 2},
+                         span.arguments)
+        return
+
+    def test_span_error(self):
+        """
+        Does it record the span even if there's an exception?
+        """
+        with self.assertRaises(RuntimeError):
+            with self.timer.span('connected'):
+                raise RuntimeError('no ping')
+        self.assertEqual('connected', self.timer.spans[0].name)
+        return
+
+    def test_summary(self):
+        """
+        Does it add up the traffic and overhead?
+        """
+        self.assertIsNone(self.timer.summary.ratio)
+        # 0 -> 1
+        with self.timer.span('kill_all'):
+            pass
+        # 2 -> 6
+        with self.timer.span('run_client', category=PhaseConstants.traffic):
+            for tick in range(3):
+                next(self.clock)
+        # 7 -> 8
+        with self.timer.span('kill_all'):
+            pass
+        summary = self.timer.summary
+        self.assertEqual(8, summary.total)
+        self.assertEqual(4, summary.traffic)
+        self.assertEqual(4, summary.overhead)
+        self.assertEqual(1, summary.ratio)
+        self.assertEqual({'kill_all': 2, 'run_client': 4}, summary.phases)
+        self.timer.log_summary('test')
+        self.assertTrue(self.timer.logger.info.called)
+
+        self.timer.reset()
+        self.assertEqual([], self.timer.spans)
+        return
+
+    def test_save(self):
+        """
+        Does it save the spans as trace-events?
+        """
+        with self.timer.span('run_client', category=PhaseConstants.traffic):
+            pass
+        path = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(path, 'timing', 'trace.json')
+            self.timer.save(filename)
+            with open(filename) as trace:
+                events = json.load(trace)['traceEvents']
+        finally:
+            shutil.rmtree(path)
+        self.assertEqual(1, len(events))
+        event = events[0]
+        self.assertEqual('run_client', event['name'])
+        self.assertEqual(PhaseConstants.traffic, event['cat'])
+        self.assertEqual('X', event['ph'])
+        self.assertEqual(10**6, event['dur'])
+        return
+# end TestPhaseTimer
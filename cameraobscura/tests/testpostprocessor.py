@@ -0,0 +1,135 @@
+
+# python standard library
+import unittest
+import threading
+
+# third-party
+from mock import MagicMock
+
+# this package
+from cameraobscura.utilities.postprocessor import PostProcessor
+
+class TestPostProcessor(unittest.TestCase):
+    def setUp(self):
+        self.post_processor = PostProcessor(workers=2)
+        self.post_processor._logger = MagicMock()
+        return
+
+    def tearDown(self):
+        self.post_processor.close()
+        return
+
+    def test_barrier(self):
+        """
+        Does the barrier wait for all the tasks?
+        """
+        done = []
+        release = threading.Event()
+        def task(value):
+            release.wait(5)
+            done.append(value)
+
+        with self.post_processor:
+            for value in range(5):
+                self.post_processor.submit(task, value)
+            self.assertEqual([], done)
+            release.set()
+            self.assertEqual([], self.post_processor.barrier())
+            self.assertEqual(range(5), sorted(done))
+        self.assertEqual(5, self.post_processor.statistics.tasks)
+        self.assertEqual([], self.post_processor.threads)
+        return
+
+    def test_errors(self):
+        """
+        Does a failed task get reported without stopping the others?
+        """
+        done = []
+        def fail():
+            raise IOError('disk full')
+
+        self.post_processor.start()
+        self.post_processor.submit(fail)
+        self.post_processor.submit(done.append, 1)
+        errors = self.post_processor.barrier()
+        self.assertEqual(1, len(errors))
+        self.assertIsInstance(errors[0], IOError)
+        self.assertEqual([1], done)
+        self.assertTrue(self.post_processor.logger.error.called)
+        # the errors are only reported once
+        self.assertEqual([], self.post_processor.barrier())
+        return
+
+    def test_not_started(self):
+        """
+        Does it do the work right away if it wasn't started?
+        """
+        task = MagicMock()
+        self.post_processor.submit(task, 1, value=2)
+        task.assert_called_with(1, value=2)
+        return
+
+    def test_bounded(self):
+        """
+        Does submit block when the queue is full?
+        """
+        post_processor = PostProcessor(workers=1, maximum_size=1).start()
+        started, release = threading.Event(), threading.Event()
+        def task():
+            started.set()
+            release.wait(5)
+
+        # one task running, one waiting in the queue
+        post_processor.submit(task)
+        started.wait(5)
+        post_processor.submit(release.wait, 5)
+        submitter = threading.Thread(target=post_processor.submit,
+                                     args=(release.wait, 5))
+        submitter.start()
+        submitter.join(0.1)
+        self.assertTrue(submitter.is_alive())
+        release.set()
+        submitter.join(5)
+        self.assertFalse(submitter.is_alive())
+        post_processor.close()
+        return
+
+    def test_checkpoint(self):
+        """
+        Are the checkpoints made in order once their tasks are done (and skipped after a failure)?
+        """
+        made = []
+        release = threading.Event()
+        def fail():
+            raise IOError('disk full')
+
+        self.post_processor.start()
+        self.post_processor.submit(release.wait, 5)
+        self.post_processor.checkpoint(made.append, 1)
+        # nothing left in its batch, but it has to wait for the first one
+        self.post_processor.checkpoint(made.append, 2)
+        self.assertEqual([], made)
+        release.set()
+        self.assertEqual([], self.post_processor.barrier())
+        self.assertEqual([1, 2], made)
+
+        # a failed task stops its checkpoint and the ones after it
+        self.post_processor.submit(fail)
+        self.post_processor.checkpoint(made.append, 3)
+        self.post_processor.submit(made.append, 'saved')
+        self.post_processor.checkpoint(made.append, 4)
+        errors = self.post_processor.barrier()
+        self.assertEqual(1, len(errors))
+        self.assertEqual([1, 2, 'saved'], made)
+
+        # the barrier starts over
+        self.post_processor.checkpoint(made.append, 5)
+        self.assertEqual([], self.post_processor.barrier())
+        self.assertEqual(5, made[-1])
+
+        # without the threads it's made right away
+        self.post_processor.close()
+        self.post_processor.checkpoint(made.append, 6)
+        self.assertEqual(6, made[-1])
+        return
+# end TestPostProcessor
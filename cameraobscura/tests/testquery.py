@@ -3,6 +3,8 @@
 import unittest
 import re
 import csv
+import threading
+import socket
 import ConfigParser
 
 # third party
@@ -10,6 +12,7 @@ from mock import MagicMock, call, patch, Mock, mock_open
 
 # this package
 from cameraobscura.utilities.query import Query
+from cameraobscura.clients.eventloop import EventLoop, Pending
 from cameraobscura import CameraobscuraError
 from cameraobscura.clients.simpleclient import ConnectionError
 from cameraobscura.tests.helpers import random_string_of_letters
@@ -61,7 +64,6 @@ class TestQuery(unittest.TestCase):
     def setUp(self):
         self.filename = random_string_of_letters(5)
         self.output_file = MagicMock()
-        self.connection = MagicMock()        
         self.fields = 'rssi hostname'.split()
         self.command_list = 'iwconfig wlan2, ifconfig wlan2'.split(',')
         self.mock_commands = [Mock() for field in self.fields]
@@ -72,7 +74,6 @@ class TestQuery(unittest.TestCase):
 
         self.expressions = dict(zip(self.fields, self.expression_list))
         self.querier = Query(output_filename=self.filename,
-                             connection=self.connection,
                              fields=self.fields,
                              commands=self.commands)
         self.querier._output_file = self.output_file
@@ -202,6 +203,122 @@ class TestQuery(unittest.TestCase):
         self.assertEqual(expected, self.output_file.write.mock_calls)        
 
         return
+
+    def test_concurrent_query(self):
+        """
+        Does it run the commands at the same time if it has workers?
+        """
+        started = threading.Event()
+        def first():
+            started.set()
+            return OUTPUTS[0]
+        def second():
+            # this only returns if the first command ran while it waited
+            self.assertTrue(started.wait(5))
+            return OUTPUTS[1]
+        self.querier.commands = {'rssi': second, 'hostname': first}
+        self.querier.workers = 2
+        self.assertEqual({'rssi': OUTPUTS[1], 'hostname': OUTPUTS[0]},
+                         self.querier.query())
+
+        # errors from the commands are raised
+        def broken():
+            raise CameraobscuraError('broken')
+        self.querier.commands = {'rssi': broken, 'hostname': first}
+        with self.assertRaises(CameraobscuraError):
+            self.querier.query()
+        return
+
+    def test_query_batch(self):
+        """
+        Does it send the commands in one batch and have each command parse its output?
+        """
+        self.querier.batch = MagicMock()
+        for index, command in enumerate(self.mock_commands):
+            command.command_arguments = self.command_list[index]
+            command.timeout = index + 1
+            command.parse.return_value = OUTPUTS[index]
+        self.querier.batch.exec_batch.return_value = [(None, 'stdout', 'stderr')
+                                                      for field in self.fields]
+        self.assertEqual(dict(zip(self.fields, OUTPUTS)), self.querier.query())
+        fields = self.commands.keys()
+        self.querier.batch.exec_batch.assert_called_with([self.commands[field].command_arguments
+                                                          for field in fields],
+                                                         timeout=2)
+        for command in self.mock_commands:
+            command.parse.assert_called_with('stdout', 'stderr')
+            self.assertFalse(command.called)
+
+        # socket errors are only raised if a command doesn't trap them
+        self.querier.batch.exec_batch.side_effect = socket.timeout('timed out')
+        for command in self.mock_commands:
+            command.trap_errors = True
+            command.not_available = 'NA'
+        self.assertEqual(dict((field, 'NA') for field in self.fields),
+                         self.querier.query())
+        self.mock_commands[0].trap_errors = False
+        with self.assertRaises(CameraobscuraError):
+            self.querier.query()
+        return
+
+    def test_query_agent(self):
+        """
+        Does it get the outputs from the agent and have each command parse its own?
+        """
+        self.querier.agent = MagicMock()
+        self.querier.agent.request.return_value = dict((field, ('stdout', 'stderr'))
+                                                       for field in self.fields)
+        for index, command in enumerate(self.mock_commands):
+            command.parse.return_value = OUTPUTS[index]
+        self.assertEqual(dict(zip(self.fields, OUTPUTS)), self.querier.query())
+        for command in self.mock_commands:
+            command.parse.assert_called_with('stdout', 'stderr')
+            self.assertFalse(command.called)
+
+        # socket errors are trapped like the batch's
+        self.querier.agent.request.side_effect = socket.error('agent stopped')
+        for command in self.mock_commands:
+            command.trap_errors = True
+            command.not_available = 'NA'
+        self.assertEqual(dict((field, 'NA') for field in self.fields),
+                         self.querier.query())
+        self.mock_commands[1].trap_errors = False
+        with self.assertRaises(CameraobscuraError):
+            self.querier.query()
+        return
+
+    def test_submit(self):
+        """
+        Does it submit the commands to the loop and write the row once they're done?
+        """
+        loop = EventLoop()
+        pendings = [Pending() for command in self.mock_commands]
+        for command, pending in zip(self.mock_commands, pendings):
+            command.submit.return_value = pending
+        queried = self.querier.submit(loop)
+        for command in self.mock_commands:
+            command.submit.assert_called_with(loop)
+            self.assertFalse(command.called)
+        self.output_file.write.reset_mock()
+
+        for output, pending in zip(OUTPUTS, pendings):
+            pending.set_result(output)
+        self.assertEqual(dict(zip(self.fields, OUTPUTS)), queried.value())
+        row = self.output_file.write.call_args[0][0]
+        for output in OUTPUTS:
+            self.assertIn(output, row)
+
+        # an error is passed on without writing a row
+        pendings = [Pending() for command in self.mock_commands]
+        for command, pending in zip(self.mock_commands, pendings):
+            command.submit.return_value = pending
+        queried = self.querier.submit(loop)
+        self.output_file.write.reset_mock()
+        pendings[0].set_result(error=CameraobscuraError('broken'))
+        with self.assertRaises(CameraobscuraError):
+            queried.value()
+        self.assertFalse(self.output_file.write.called)
+        return
 # end TestQuery        
 
 
@@ -345,6 +462,28 @@ class TestQueryConfiguration(unittest.TestCase):
                                                                         'query')
         self.assertEqual(self.configuration.filename, QueryEnum.default_filename)
         return
+
+    def test_sample_period(self):
+        """
+        Does it get the period for sampling during the traffic?
+        """
+        self.config_parser.getfloat.return_value = 0.5
+        self.assertEqual(0.5, self.configuration.sample_period)
+        self.config_parser.getfloat.assert_called_with('query', 'sample_period')
+
+        # the default is to not sample
+        self.configuration.reset()
+        self.config_parser.getfloat.side_effect = ConfigParser.NoOptionError('sample_period',
+                                                                             'query')
+        self.assertEqual(0, self.configuration.sample_period)
+
+        # negative periods aren't allowed
+        self.configuration.reset()
+        self.config_parser.getfloat.side_effect = None
+        self.config_parser.getfloat.return_value = -1
+        with self.assertRaises(CameraobscuraError):
+            self.configuration.sample_period
+        return
 # end class TestQueryConfiguration    
 
 
@@ -395,4 +534,48 @@ class TestQueryBuilder(unittest.TestCase):
         #        self.assertIsInstance(self.builder.product, Query)
         #self.assertDictEqual(expected, self.builder.product.commands)
         return
+
+    def test_workers(self):
+        """
+        Does it only run the commands at the same time on a multiplexed connection?
+        """
+        self.assertEqual(1, self.builder.workers)
+        self.connection.multiplexed = True
+        self.connection.max_channels = 4
+        self.assertEqual(4, self.builder.workers)
+        self.connection.multiplexed = False
+        self.assertEqual(1, self.builder.workers)
+        return
+
+    def test_batch(self):
+        """
+        Does it only batch the commands on a batched connection?
+        """
+        self.assertIsNone(self.builder.batch)
+        self.connection.batched = True
+        self.assertIs(self.connection, self.builder.batch)
+        self.connection.batched = False
+        self.assertIsNone(self.builder.batch)
+        return
+
+    def test_agent(self):
+        """
+        Does it only get the connection's agent if the configuration asks for one?
+        """
+        self.configuration.agent = False
+        self.assertIsNone(self.builder.agent)
+        self.assertFalse(self.connection.agent.called)
+
+        command = Mock()
+        command.command_arguments = 'iwconfig wlan0\n'
+        self.builder._commands = {'rssi': command}
+        self.configuration.agent = True
+        self.configuration.timeout = 5
+        self.assertEqual(self.connection.agent.return_value, self.builder.agent)
+        self.connection.agent.assert_called_with({'rssi': 'iwconfig wlan0\n'}, timeout=5)
+
+        # telnet connections are batched instead
+        self.connection.batched = True
+        self.assertIsNone(self.builder.agent)
+        return
 # end TestQueryBuilder    
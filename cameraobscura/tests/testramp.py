@@ -0,0 +1,105 @@
+
+# python standard library
+import unittest
+import csv
+import os
+import shutil
+import tempfile
+import threading
+
+# third-party
+from mock import MagicMock, patch
+
+# this package
+from cameraobscura.ratevsrange.ramp import AttenuationRamp, AttenuationChange, RampConstants
+from cameraobscura.commands.iperf.stepresult import StepResult
+
+class TestAttenuationRamp(unittest.TestCase):
+    def setUp(self):
+        self.attenuator = MagicMock()
+        self.ramp = AttenuationRamp(attenuator=self.attenuator,
+                                    attenuations=[0, 10, 20], dwell=0)
+        self.ramp._logger = MagicMock()
+        return
+
+    def test_run(self):
+        """
+        Does it set each attenuation and time-stamp the changes?
+        """
+        self.assertEqual(0, self.ramp.duration)
+        self.ramp.start()
+        self.ramp.thread.join()
+        self.assertEqual([0, 10, 20], [call[0][0] for call in
+                                       self.attenuator.setAttenuation.call_args_list])
+        self.assertEqual([0, 10, 20], [change.attenuation for change in self.ramp.changes])
+
+        # stopping it ends it early
+        self.attenuator.reset_mock()
+        ramp = AttenuationRamp(attenuator=self.attenuator,
+                               attenuations=[0, 10, 20], dwell=60)
+        ramp.start()
+        ramp.stop()
+        self.assertTrue(self.attenuator.setAttenuation.call_count < 3)
+        self.assertEqual(180, ramp.duration)
+        return
+
+    def test_start_event(self):
+        """
+        Does it wait for the traffic to start?
+        """
+        event = threading.Event()
+        self.ramp.start_event = event
+        with patch('cameraobscura.ratevsrange.ramp.RampConstants.start_timeout', 0.01):
+            self.ramp.start()
+            self.ramp.thread.join()
+        self.assertFalse(self.attenuator.setAttenuation.called)
+        self.assertTrue(self.ramp.logger.error.called)
+
+        event.set()
+        self.ramp.start()
+        self.ramp.thread.join()
+        self.assertEqual(3, len(self.ramp.changes))
+        return
+
+    def test_attenuation_at(self):
+        """
+        Does it find the attenuation that was set at a time?
+        """
+        self.ramp.changes = [AttenuationChange(timestamp=100, attenuation=0),
+                             AttenuationChange(timestamp=105, attenuation=10)]
+        self.assertIsNone(self.ramp.attenuation_at(99))
+        self.assertEqual(0, self.ramp.attenuation_at(100))
+        self.assertEqual(0, self.ramp.attenuation_at(104.9))
+        self.assertEqual(10, self.ramp.attenuation_at(200))
+        return
+
+    def test_correlate(self):
+        """
+        Does it match the interval bandwidths to the attenuations and save them?
+        """
+        self.ramp.changes = [AttenuationChange(timestamp=100, attenuation=0),
+                             AttenuationChange(timestamp=102.5, attenuation=10)]
+        result = StepResult(name='ramp', intervals=[0, 1, 2, 3],
+                            bandwidths=[50, 51, 30, 20], started=100)
+        samples = self.ramp.correlate(result)
+        self.assertEqual([0, 0, 10, 10], [sample.attenuation for sample in samples])
+        self.assertEqual([False, False, True, False], [sample.mixed for sample in samples])
+        self.assertEqual(102, samples[2].timestamp)
+        self.assertEqual(30, samples[2].bandwidth)
+
+        path = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(path, 'compiled_data', RampConstants.filename.format('upstream'))
+            self.ramp.save(samples, filename)
+            with open(filename) as opened:
+                rows = list(csv.reader(opened))
+        finally:
+            shutil.rmtree(path)
+        self.assertEqual(list(RampConstants.fields), rows[0])
+        self.assertEqual(5, len(rows))
+
+        # no start time, no samples
+        result.started = None
+        self.assertEqual([], self.ramp.correlate(result))
+        return
+# end TestAttenuationRamp
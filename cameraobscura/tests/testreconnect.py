@@ -0,0 +1,111 @@
+
+# python standard library
+import unittest
+import socket
+
+# third-party
+from mock import MagicMock, patch
+
+# this package
+from cameraobscura.clients.reconnect import ReconnectPolicy, CircuitBreaker
+from cameraobscura.clients.reconnect import CircuitOpenError
+
+class TestReconnect(unittest.TestCase):
+    def setUp(self):
+        patcher = patch('cameraobscura.clients.reconnect.time.sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(CircuitBreaker.clear)
+        self.breaker = CircuitBreaker.get('dut')
+        self.policy = ReconnectPolicy(retries=2)
+        self.send = MagicMock()
+        self.disconnect = MagicMock()
+        return
+
+    def call(self):
+        return self.policy(self.breaker, send=self.send, errors=(socket.error,),
+                           disconnect=self.disconnect)
+
+    def test_retry(self):
+        """
+        Does it disconnect and re-send after a connection error?
+        """
+        self.send.side_effect = [socket.error('Broken pipe'), socket.timeout('timed out'), 'output']
+        self.assertEqual('output', self.call())
+        self.assertEqual(3, self.send.call_count)
+        self.assertEqual(2, self.disconnect.call_count)
+        self.assertEqual(2, self.sleep.call_count)
+        self.assertEqual(dict(attempts=3, failures=2, retries=2, reconnects=2),
+                         CircuitBreaker.statistics()['dut'])
+        self.assertEqual(0, self.breaker.consecutive_failures)
+        self.assertIs(self.breaker, CircuitBreaker.get('dut'))
+        return
+
+    def test_give_up(self):
+        """
+        Does it raise the last error once the re-sends are used up?
+        """
+        self.breaker.threshold = 10
+        self.send.side_effect = [socket.error('first'), socket.error('second'), socket.error('last')]
+        with self.assertRaises(socket.error) as context:
+            self.call()
+        self.assertEqual('last', str(context.exception))
+        self.assertEqual(3, self.disconnect.call_count)
+        self.assertEqual(CircuitBreaker.closed, self.breaker.state)
+        return
+
+    def test_other_errors(self):
+        """
+        Does it leave errors that aren't connection errors alone?
+        """
+        self.send.side_effect = ValueError('not a connection problem')
+        with self.assertRaises(ValueError):
+            self.call()
+        self.assertEqual(1, self.send.call_count)
+        self.assertEqual(0, self.disconnect.call_count)
+        self.assertEqual(0, self.breaker.consecutive_failures)
+        return
+
+    def test_circuit(self):
+        """
+        Does the circuit open after too many failures and close again once the host is back?
+        """
+        self.send.side_effect = socket.error('No route to host')
+        with self.assertRaises(socket.error):
+            self.call()
+        # the third failure opened it so it didn't re-send again
+        self.assertEqual(3, self.send.call_count)
+        self.assertEqual(CircuitBreaker.open, self.breaker.state)
+        with self.assertRaises(CircuitOpenError):
+            self.call()
+        self.assertEqual(3, self.send.call_count)
+        self.assertEqual(1, self.breaker.counters['rejected'])
+        self.assertEqual(1, self.breaker.counters['trips'])
+
+        # after the cool-down one command is let through and a failure re-opens it
+        self.breaker.opened -= self.breaker.cool_down
+        self.assertEqual(CircuitBreaker.half_open, self.breaker.state)
+        with self.assertRaises(socket.error):
+            self.call()
+        self.assertEqual(4, self.send.call_count)
+        self.assertEqual(CircuitBreaker.open, self.breaker.state)
+        self.assertEqual(2, self.breaker.counters['trips'])
+
+        # a success closes it
+        self.breaker.opened -= self.breaker.cool_down
+        self.send.side_effect = None
+        self.send.return_value = 'output'
+        self.assertEqual('output', self.call())
+        self.assertEqual(CircuitBreaker.closed, self.breaker.state)
+        return
+
+    def test_delay(self):
+        """
+        Does the wait double (with jitter) up to the maximum?
+        """
+        policy = ReconnectPolicy(initial_delay=0.5, maximum_delay=4)
+        for retry, delay in enumerate((0.5, 1, 2, 4, 4)):
+            for trial in range(20):
+                self.assertTrue(delay/2.0 <= policy.delay(retry) <= delay)
+        return
+# end class TestReconnect
@@ -0,0 +1,83 @@
+
+# python standard library
+import unittest
+import socket
+
+# third-party
+from mock import MagicMock, patch
+
+# this package
+from cameraobscura.ratevsrange.recovery import BackoffRecovery
+
+class TestBackoffRecovery(unittest.TestCase):
+    def setUp(self):
+        self.check = MagicMock()
+        self.recovery = BackoffRecovery(check=self.check, time_limit=20,
+                                        threshold=2, initial_delay=0.5,
+                                        factor=2, maximum_delay=4)
+        self.recovery._logger = MagicMock()
+        # a clock that only moves when something sleeps
+        self.now = [0]
+        self.sleeps = []
+        def sleep(seconds):
+            self.sleeps.append(seconds)
+            self.now[0] += seconds
+        self.time_patch = patch('time.time', lambda: self.now[0])
+        self.sleep_patch = patch('time.sleep', sleep)
+        self.time_patch.start()
+        self.sleep_patch.start()
+        return
+
+    def tearDown(self):
+        self.time_patch.stop()
+        self.sleep_patch.stop()
+        return
+
+    def test_recovered(self):
+        """
+        Does it stop as soon as the threshold is reached?
+        """
+        self.check.return_value = True
+        result = self.recovery()
+        self.assertTrue(result.recovered)
+        self.assertEqual(2, result.attempts)
+        self.assertEqual(0.5, result.elapsed)
+        return
+
+    def test_backoff(self):
+        """
+        Does the wait grow after failures and reset after a success?
+        """
+        self.check.side_effect = [False, socket.error('unreachable'), False,
+                                  True, False, True, True]
+        result = self.recovery()
+        self.assertTrue(result.recovered)
+        self.assertEqual(7, result.attempts)
+        self.assertEqual([0.5, 1, 2, 0.5, 0.5, 0.5], self.sleeps)
+        self.assertEqual(sum(self.sleeps), result.elapsed)
+        return
+
+    def test_timeout(self):
+        """
+        Does it give up at the time limit?
+        """
+        self.check.return_value = False
+        result = self.recovery()
+        self.assertFalse(result.recovered)
+        self.assertEqual(20, result.elapsed)
+        # never waits more than the maximum or past the time limit
+        self.assertEqual(4, max(self.sleeps))
+        self.assertEqual(20, sum(self.sleeps))
+        return
+
+    def test_no_check(self):
+        """
+        Does it sleep the whole time if there's no check?
+        """
+        self.recovery.check = None
+        result = self.recovery()
+        self.assertFalse(result.recovered)
+        self.assertEqual(0, result.attempts)
+        self.assertEqual([20], self.sleeps)
+        return
+# end TestBackoffRecovery
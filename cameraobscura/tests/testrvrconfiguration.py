@@ -568,6 +568,37 @@ class TestAttenuationConfigurationConfiguration(unittest.TestCase):
         self.configuration.reset()
         self.assertIs(False, self.configuration._step_change_thresholds)
         return
+
+    def test_adaptive(self):
+        """
+        Does it get the adaptive-search options (or their defaults)?
+        """
+        self.config_parser.getboolean.return_value = True
+        self.config_parser.getint.return_value = 5
+        self.config_parser.getfloat.return_value = 0.25
+        self.assertTrue(self.configuration.adaptive)
+        self.config_parser.getboolean.assert_called_with('attenuation', 'adaptive')
+        self.assertEqual(5, self.configuration.coarse_step)
+        self.config_parser.getint.assert_called_with('attenuation', 'coarse_step')
+        self.assertEqual(5, self.configuration.step_budget)
+        self.config_parser.getint.assert_called_with('attenuation', 'step_budget')
+        self.assertEqual(0.25, self.configuration.change_threshold)
+
+        # user didn't set them
+        self.configuration.reset()
+        error = ConfigParser.NoOptionError('option', 'attenuation')
+        self.config_parser.getboolean.side_effect = error
+        self.config_parser.getint.side_effect = error
+        self.config_parser.getfloat.side_effect = error
+        self.assertFalse(self.configuration.adaptive)
+        self.assertEqual(AttenuationEnum.default_coarse_step,
+                         self.configuration.coarse_step)
+        self.assertEqual(AttenuationEnum.default_resolution,
+                         self.configuration.resolution)
+        self.assertIsNone(self.configuration.step_budget)
+        self.assertEqual(AttenuationEnum.default_change_threshold,
+                         self.configuration.change_threshold)
+        return
 # end TestAttenuationConfiguration
 
 
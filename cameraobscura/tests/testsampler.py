@@ -0,0 +1,127 @@
+
+# python standard library
+import unittest
+import csv
+import os
+import shutil
+import socket
+import tempfile
+import threading
+
+# third-party
+from mock import MagicMock
+
+# this package
+from cameraobscura.utilities.sampler import QuerySampler
+
+class TestQuerySampler(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder, 'downstream_samples.csv')
+        self.rssi = MagicMock(return_value='-40 dBm')
+        self.connection = MagicMock()
+        self.sampler = QuerySampler(commands={'rssi': self.rssi},
+                                    fields=['rssi'],
+                                    output_filename=self.filename,
+                                    period=0.01, size=3,
+                                    extra_fields=['attenuation'],
+                                    connection=self.connection)
+        self.sampler._logger = MagicMock()
+        self.sampler.started = 0
+        return
+
+    def tearDown(self):
+        self.sampler.close()
+        shutil.rmtree(self.folder)
+        return
+
+    def test_sample(self):
+        """
+        Does a sample add a timestamped row to the buffer?
+        """
+        self.sampler.sample()
+        rows = self.sampler.drain()
+        self.assertEqual(1, len(rows))
+        self.assertEqual('-40 dBm', rows[0]['rssi'])
+        self.assertIn('timestamp', rows[0])
+        self.assertIn('offset', rows[0])
+        # the buffer is empty after the drain
+        self.assertEqual([], self.sampler.drain())
+        return
+
+    def test_ring_buffer(self):
+        """
+        Are the oldest samples dropped when the buffer is full?
+        """
+        self.rssi.side_effect = [str(value) for value in range(5)]
+        for sample in range(5):
+            self.sampler.sample()
+        rows = self.sampler.drain()
+        self.assertEqual(['2', '3', '4'], [row['rssi'] for row in rows])
+        self.assertTrue(self.sampler.logger.warning.called)
+        self.assertEqual(0, self.sampler.dropped)
+        return
+
+    def test_failed_sample(self):
+        """
+        Is a sample with a socket error skipped?
+        """
+        self.rssi.side_effect = socket.timeout('timed out')
+        self.sampler.sample()
+        self.assertEqual([], self.sampler.drain())
+        self.assertTrue(self.sampler.logger.warning.called)
+        return
+
+    def test_agent_sample(self):
+        """
+        With an agent, does a sample make one request and have the commands parse it?
+        """
+        agent = MagicMock()
+        agent.request.return_value = {'rssi': ('stdout', 'stderr')}
+        self.rssi.parse.return_value = '-41 dBm'
+        self.sampler.agent = agent
+        self.sampler.sample()
+        self.assertEqual('-41 dBm', self.sampler.drain()[0]['rssi'])
+        self.rssi.parse.assert_called_with('stdout', 'stderr')
+        self.assertFalse(self.rssi.called)
+
+        # an agent failure is skipped like any other
+        agent.request.side_effect = socket.error('agent stopped')
+        self.sampler.sample()
+        self.assertEqual([], self.sampler.drain())
+        return
+
+    def test_thread(self):
+        """
+        Does it sample in the background until it's stopped?
+        """
+        sampled = threading.Event()
+        def rssi():
+            sampled.set()
+            return '-50 dBm'
+        self.sampler.commands = {'rssi': rssi}
+        self.sampler.start()
+        self.assertTrue(sampled.wait(5))
+        self.sampler.stop()
+        self.assertIsNone(self.sampler.thread)
+        count = len(self.sampler.buffer)
+        self.assertGreater(count, 0)
+        self.assertEqual(count, len(self.sampler.buffer))
+        return
+
+    def test_write(self):
+        """
+        Does it write the rows with the extra data and close the connection?
+        """
+        self.sampler.sample()
+        self.sampler.write(self.sampler.drain(), {'attenuation': 10})
+        self.sampler.sample()
+        self.sampler.write(self.sampler.drain(), {'attenuation': 11})
+        self.sampler.close()
+        self.connection.close.assert_called_with()
+        with open(self.filename) as opened:
+            rows = list(csv.DictReader(opened))
+        self.assertEqual(['10', '11'], [row['attenuation'] for row in rows])
+        self.assertEqual(['-40 dBm'] * 2, [row['rssi'] for row in rows])
+        return
+# end TestQuerySampler
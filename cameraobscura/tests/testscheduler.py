@@ -0,0 +1,191 @@
+
+# python standard library
+import unittest
+import ConfigParser
+import os
+import shutil
+import tempfile
+
+# third-party
+from mock import MagicMock, patch
+
+# this package
+from cameraobscura.ratevsrange.scheduler import Scheduler, SchedulerConstants
+from cameraobscura.ratevsrange.scheduler import resources
+from cameraobscura.ratevsrange.journal import JournalConstants
+from cameraobscura.tests.helpers import random_string_of_letters
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.runner = MagicMock()
+        self.scheduler = Scheduler(runner=self.runner, workers=2)
+        self.scheduler._logger = MagicMock()
+        return
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+        return
+
+    def configuration(self, dut, server, attenuator, location=None):
+        """
+        Builds a configuration that uses the given equipment
+        """
+        configuration = ConfigParser.SafeConfigParser()
+        for section, option, value in (('dut', 'control_ip', dut),
+                                       ('server', 'test_ip', server),
+                                       ('attenuation', 'control_ip', attenuator),
+                                       ('attenuation', 'name', 'MockAttenuator'),
+                                       ('attenuation', 'step_list', '0,10,20'),
+                                       ('iperf', 'direction', 'both'),
+                                       ('other', 'repetitions', '2'),
+                                       ('other', 'result_location',
+                                        location or os.path.join(self.path,
+                                                                 random_string_of_letters()))):
+            if not configuration.has_section(section):
+                configuration.add_section(section)
+            configuration.set(section, option, value)
+        return configuration
+
+    def add(self, *equipment):
+        """
+        Adds a job (with its own result location) to the scheduler
+        """
+        job = self.scheduler.add(random_string_of_letters() + '.ini',
+                                 self.configuration(*equipment))
+        job._logger = MagicMock()
+        return job
+
+    def test_resources(self):
+        """
+        Does it get the hosts and attenuator the configuration uses?
+        """
+        configuration = self.configuration('192.168.10.1', '192.168.10.50',
+                                           '192.168.20.5')
+        self.assertEqual(set(['host:192.168.10.1', 'host:192.168.10.50',
+                              'attenuator:192.168.20.5']),
+                         resources(configuration))
+
+        # the control_ip is used instead of the test_ip if both are set
+        configuration.set('server', 'control_ip', '10.0.0.2')
+        self.assertIn('host:10.0.0.2', resources(configuration))
+        self.assertNotIn('host:192.168.10.50', resources(configuration))
+        return
+
+    def test_result_location(self):
+        """
+        Does it keep the jobs from writing to the same folder?
+        """
+        location = os.path.join(self.path, 'output_folder')
+        first = self.scheduler.add('chamber_1.ini',
+                                   self.configuration('a', 'b', 'c', location))
+        second = self.scheduler.add('chamber_2.ini',
+                                    self.configuration('d', 'e', 'f', location))
+        self.assertEqual(location, first.result_location)
+        self.assertEqual(os.path.join(location, 'chamber_2'),
+                         second.result_location)
+        self.assertEqual(os.path.join(location, 'chamber_2', 'logs', 'chamber_2.log'),
+                         second.log_filename)
+        return
+
+    def test_launch(self):
+        """
+        Does it run the jobs that don't share equipment together?
+        """
+        chamber_1 = self.add('dut1', 'server1', 'attenuator1')
+        chamber_2 = self.add('dut2', 'server2', 'attenuator2')
+        chamber_1_again = self.add('dut1', 'server1', 'attenuator1')
+        # shares the second chamber's server with the third chamber
+        chamber_3 = self.add('dut3', 'server2', 'attenuator3')
+        chamber_4 = self.add('dut4', 'server4', 'attenuator4')
+
+        with patch('multiprocessing.Process') as process:
+            self.scheduler.launch()
+            self.assertEqual(2, process.return_value.start.call_count)
+        states = [job.state for job in self.scheduler.jobs]
+        self.assertEqual([SchedulerConstants.running] * 2 +
+                         [SchedulerConstants.waiting] * 3, states)
+
+        # the first chamber finishes
+        chamber_1.state = SchedulerConstants.done
+        self.scheduler.workers = 3
+        with patch('multiprocessing.Process'):
+            self.scheduler.launch()
+        self.assertEqual(SchedulerConstants.running, chamber_1_again.state)
+        self.assertEqual(SchedulerConstants.waiting, chamber_3.state)
+        self.assertEqual(SchedulerConstants.running, chamber_4.state)
+
+        # nothing starts while the workers are all busy
+        chamber_2.state = SchedulerConstants.done
+        self.scheduler.workers = 2
+        with patch('multiprocessing.Process'):
+            self.scheduler.launch()
+        self.assertEqual(SchedulerConstants.waiting, chamber_3.state)
+        return
+
+    def test_progress(self):
+        """
+        Does it estimate the time remaining from the journal?
+        """
+        job = self.add('dut1', 'server1', 'attenuator1')
+        waiting = self.add('dut1', 'server2', 'attenuator2')
+        # 3 attenuations in 2 directions for 2 repetitions
+        self.assertEqual(12, job.total_steps)
+        self.assertIsNone(self.scheduler.seconds_per_step)
+
+        job.state = SchedulerConstants.running
+        job.journal.start()
+        for attenuation in (0, 10, 20):
+            job.journal.step(1, 'upstream', attenuation,
+                             JournalConstants.measured, False, {})
+        with patch('time.time', lambda: 1000.0):
+            job.started = 1000.0 - 60
+            self.assertEqual(3, job.steps)
+            self.assertEqual(20, self.scheduler.seconds_per_step)
+            self.assertEqual(9 * 20, job.remaining())
+            self.assertEqual(12 * 20, waiting.remaining(20))
+            # the waiting job has to wait for the first job's DUT
+            self.assertEqual(1000 + 9 * 20 + 12 * 20,
+                             self.scheduler.estimated_finish())
+            self.scheduler.report()
+        self.assertTrue(self.scheduler.logger.info.called)
+        return
+
+    def test_failure(self):
+        """
+        Does a job whose test failed exit with 1 and get marked as failed?
+        """
+        job = self.add('dut1', 'server1', 'attenuator1')
+        self.runner.return_value = False
+        with patch('cameraobscura.ratevsrange.scheduler.RateVsRangeTest') as test, \
+             patch('cameraobscura.ratevsrange.scheduler.HostPool') as pool, \
+             patch('cameraobscura.ratevsrange.scheduler.logging'):
+            with self.assertRaises(SystemExit) as context:
+                job.run()
+        self.assertEqual(1, context.exception.code)
+        # the test writes to the job's folder
+        self.assertEqual(job.result_location, test.return_value.result_location)
+        pool.close_all.assert_called_with()
+
+        # the scheduler sees the exit-code
+        job.state = SchedulerConstants.running
+        job.process = MagicMock(exitcode=1)
+        job.process.is_alive.return_value = False
+        self.assertFalse(job.poll())
+        self.assertEqual(SchedulerConstants.failed, job.state)
+        return
+
+    def test_close(self):
+        """
+        Are the pooled hosts closed even if the runner raises?
+        """
+        job = self.add('dut1', 'server1', 'attenuator1')
+        self.runner.side_effect = KeyboardInterrupt
+        with patch('cameraobscura.ratevsrange.scheduler.RateVsRangeTest'), \
+             patch('cameraobscura.ratevsrange.scheduler.HostPool') as pool, \
+             patch('cameraobscura.ratevsrange.scheduler.logging'):
+            with self.assertRaises(KeyboardInterrupt):
+                job.run()
+        pool.close_all.assert_called_with()
+        return
+# end TestScheduler
@@ -3,6 +3,8 @@
 import unittest
 import random
 import socket
+import threading
+import time
 
 # third-party
 from mock import MagicMock, patch
@@ -11,6 +13,10 @@ import paramiko
 # this package
 from cameraobscura import CameraobscuraError
 from cameraobscura.clients.simpleclient import SimpleClient, PORT, TIMEOUT, ConnectionError
+from cameraobscura.clients.simpleclient import UnreachableError
+from cameraobscura.clients.simpleclient import ChannelOutput
+from cameraobscura.clients.sshbroker import BrokerClient
+from cameraobscura.clients.reconnect import ReconnectPolicy, CircuitBreaker, CircuitOpenError
 
 
 class TestSimpleClient(unittest.TestCase):
@@ -27,6 +33,11 @@ class TestSimpleClient(unittest.TestCase):
                                    port=self.port,
                                    timeout=self.timeout)
         self.client._client = self.p_client
+        # don't use a broker even if one is running
+        self.client.broker = BrokerClient(path='')
+        # fail on the first error (and forget the failures afterwards)
+        self.client.policy = ReconnectPolicy(retries=0)
+        self.addCleanup(CircuitBreaker.clear)
         return
     
     def test_constructor(self):
@@ -60,8 +71,16 @@ class TestSimpleClient(unittest.TestCase):
         Does it call the exec_command correctly?
         """
         command = 'arrrgh'
-        self.client.exec_command(command)
+        stdin, stdout, stderr = MagicMock(), MagicMock(), MagicMock()
+        self.p_client.exec_command.return_value = stdin, stdout, stderr
+        outputs = self.client.exec_command(command)
         self.p_client.exec_command.assert_called_with(command + '\n', timeout=TIMEOUT)
+        # the outputs are read straight from the channel
+        self.assertIs(stdin, outputs[0])
+        self.assertIsInstance(outputs[1], ChannelOutput)
+        self.assertIs(stdout.channel, outputs[1].channel)
+        self.assertFalse(outputs[1].stderr)
+        self.assertTrue(outputs[2].stderr)
 
         # what if there's an error?
         self.p_client.exec_command.side_effect = paramiko.SSHException("oops")
@@ -140,6 +159,70 @@ class TestSimpleClient(unittest.TestCase):
         except ConnectionError:
             pass
 
+    def test_reconnect(self):
+        """
+        Does it reconnect and re-send a command that couldn't be sent?
+        """
+        self.client.policy = ReconnectPolicy(retries=2, initial_delay=0, maximum_delay=0)
+        stdin, stdout, stderr = MagicMock(), MagicMock(), MagicMock()
+
+        # a channel that couldn't be opened on a working transport leaves the transport alone
+        self.p_client.exec_command.side_effect = [paramiko.SSHException('ChannelException(1, Administratively prohibited)'),
+                                                  (stdin, stdout, stderr)]
+        self.assertIs(stdin, self.client.exec_command('iwconfig')[0])
+        self.assertFalse(self.p_client.close.called)
+        self.assertIs(self.p_client, self.client._client)
+
+        # a dead transport is replaced
+        self.p_client.get_transport.return_value.is_active.return_value = False
+        self.p_client.exec_command.reset_mock()
+        self.p_client.exec_command.side_effect = [socket.error('Broken pipe'),
+                                                  (stdin, stdout, stderr)]
+        with patch('paramiko.SSHClient', return_value=self.p_client):
+            outputs = self.client.exec_command('iwconfig')
+        self.assertIs(stdin, outputs[0])
+        self.assertEqual(2, self.p_client.exec_command.call_count)
+        # the broken connection was closed
+        self.p_client.close.assert_called_with()
+        counters = CircuitBreaker.statistics()[self.hostname]
+        self.assertEqual(2, counters['retries'])
+        self.assertEqual(0, self.client.breaker.consecutive_failures)
+
+        # a host that can't be reached opens the circuit
+        self.client._client = None
+        self.p_client.connect.side_effect = socket.timeout('timed out')
+        with patch('paramiko.SSHClient', return_value=self.p_client):
+            with self.assertRaises(UnreachableError):
+                self.client.exec_command('iwconfig')
+            self.assertEqual(CircuitBreaker.open, self.client.breaker.state)
+            with self.assertRaises(CircuitOpenError):
+                self.client.exec_command('iwconfig')
+        self.assertEqual(4, self.p_client.connect.call_count)
+        return
+
+    def test_rebuild(self):
+        """
+        Do threads that find the connection gone share one new one?
+        """
+        self.client._client = None
+        built = []
+
+        def build():
+            built.append(MagicMock())
+            # give the other threads time to get to the lock
+            time.sleep(0.05)
+            return built[-1]
+
+        with patch('paramiko.SSHClient', side_effect=build):
+            threads = [threading.Thread(target=lambda: self.client.client) for thread in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(1, len(built))
+        self.assertIs(built[0], self.client._client)
+        return
+
     def test_close(self):
         """
         Does it close and delete the client?
@@ -156,4 +239,36 @@ class TestSimpleClient(unittest.TestCase):
         self.client.invoke_shell()
         self.p_client.invoke_shell.assert_called_with()
         return
-# end TestSimpleClient    
+# end TestSimpleClient
+
+class TestChannelOutput(unittest.TestCase):
+    def setUp(self):
+        self.channel = MagicMock()
+        self.output = ChannelOutput(self.channel, chunk_size=8)
+        return
+
+    def test_read_chunk(self):
+        """
+        Does it read the channel in chunks and tell the timer?
+        """
+        self.channel.recv.side_effect = ['one\ntw', 'o\n', '']
+        self.output.timer = MagicMock()
+        self.assertEqual(['one\n', 'two\n'], self.output.readlines())
+        self.channel.recv.assert_called_with(8)
+        self.assertEqual(2, self.output.timer.received.call_count)
+        self.output.timer.finished.assert_called_once_with()
+
+        # the stderr comes from the same channel
+        self.channel.recv_stderr.side_effect = ['error\n', '']
+        self.assertEqual('error\n', ChannelOutput(self.channel, stderr=True).read())
+        return
+
+    def test_timeout(self):
+        """
+        Does a timeout on the channel come through as a socket.timeout?
+        """
+        self.channel.recv.side_effect = ['partial', socket.timeout('timed out')]
+        with self.assertRaises(socket.timeout):
+            self.output.readline()
+        return
+# end TestChannelOutput    
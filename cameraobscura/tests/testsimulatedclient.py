@@ -0,0 +1,109 @@
+
+# python standard library
+import unittest
+import socket
+import threading
+
+# third-party
+from mock import MagicMock, patch
+import iperflexer.iperfparser
+
+# this package
+from cameraobscura.clients.simulatedclient import ChannelModel, SimulatedChannel
+from cameraobscura.clients.simulatedclient import SimulatedClient
+
+class TestSimulatedClient(unittest.TestCase):
+    def setUp(self):
+        self.attenuator = MagicMock()
+        self.attenuator.attenuation = 0
+        self.model = ChannelModel(transmit_power=20, path_loss=40, sensitivity=-80,
+                                  saturation=-40, maximum_throughput=100, noise=0,
+                                  seed=1)
+        SimulatedChannel.attach(self.attenuator, self.model)
+        self.client = SimulatedClient(hostname='dut')
+        self.sleep_patch = patch('time.sleep')
+        self.sleep = self.sleep_patch.start()
+        return
+
+    def tearDown(self):
+        self.sleep_patch.stop()
+        SimulatedChannel.attach(None)
+        return
+
+    def test_channel_model(self):
+        """
+        Does the throughput fall off with the attenuation?
+        """
+        self.assertEqual(-20, self.model.rssi(0))
+        self.assertEqual(100, self.model.throughput(0))
+        self.assertEqual(100, self.model.throughput(20))
+        self.assertEqual(50, self.model.throughput(40))
+        self.assertTrue(self.model.connected(60))
+        self.assertFalse(self.model.connected(61))
+        self.assertEqual(0, self.model.throughput(61))
+        self.assertEqual(0, self.model.sample(61))
+
+        noisy = ChannelModel(noise=0.1, seed=2)
+        samples = [noisy.sample(0) for sample in range(10)]
+        self.assertNotEqual(1, len(set(samples)))
+        repeated = ChannelModel(noise=0.1, seed=2)
+        self.assertEqual(samples, [repeated.sample(0) for sample in range(10)])
+        return
+
+    def test_iperf(self):
+        """
+        Can the iperf output be parsed and does the server get the same bandwidths?
+        """
+        self.attenuator.attenuation = 40
+        stdin, server_output, stderr = self.client.exec_command('iperf --server')
+        lines = []
+        reader = threading.Thread(target=lambda: lines.extend(server_output))
+        reader.start()
+        stdin, stdout, stderr = self.client.exec_command('iperf --client 10.0.0.1 --time 5 --interval 1 --parallel 2')
+        parser = iperflexer.iperfparser.IperfParser(units='Mbits', threads=2)
+        for line in stdout:
+            parser(line)
+        reader.join(5)
+        self.assertEqual([50.0] * 5, list(parser.bandwidths))
+        # the session is paced by the interval
+        self.assertEqual(5, self.sleep.call_count)
+
+        server_parser = iperflexer.iperfparser.IperfParser(units='Mbits', threads=2)
+        for line in lines:
+            server_parser(line)
+        self.assertEqual(list(parser.bandwidths), list(server_parser.bandwidths))
+        self.assertEqual('', stderr.read())
+        return
+
+    def test_lost_link(self):
+        """
+        Does the client time out when the link is lost?
+        """
+        self.attenuator.attenuation = 61
+        stdin, server_output, stderr = self.client.exec_command('iperf --server')
+        stdin, stdout, stderr = self.client.exec_command('iperf --client 10.0.0.1 --time 5 --interval 1')
+        with self.assertRaises(socket.timeout):
+            stdout.readlines()
+        # the server stops when the client does
+        self.assertEqual(5, len(server_output.readlines()))
+
+        stdin, stdout, stderr = self.client.exec_command('ping -c 1 -W 1 10.0.0.1')
+        self.assertNotIn('time=', stdout.read())
+        self.sleep.assert_called_with(1)
+        return
+
+    def test_commands(self):
+        """
+        Does it answer the host-fact and query commands?
+        """
+        def output(command):
+            stdin, stdout, stderr = self.client.exec_command(command)
+            return stdout.read()
+        self.assertEqual('Linux\n', output('uname'))
+        self.assertEqual('/usr/bin/pkill\n', output('which pkill'))
+        self.assertEqual('token\n', output('echo token'))
+        self.assertIn('time=', output('ping -c 1 -W 1 10.0.0.1'))
+        self.assertIn('Signal level=-20 dBm', output('iwconfig wlan0'))
+        self.assertEqual('', output('wl counters'))
+        return
+# end TestSimulatedClient
@@ -0,0 +1,64 @@
+
+# python standard library
+import unittest
+import time
+from ConfigParser import SafeConfigParser
+
+# third-party
+from mock import MagicMock, patch
+
+# this package
+from cameraobscura.ratevsrange.simulator import SimulatedClock, Simulator
+from cameraobscura.ratevsrange.simulator import SimulationConfiguration
+from cameraobscura.utilities.configurationadapter import ConfigurationAdapter
+
+class TestSimulator(unittest.TestCase):
+    def test_clock(self):
+        """
+        Does the clock speed up time.sleep and time.time?
+        """
+        real_time, real_sleep = time.time, time.sleep
+        sleep = MagicMock()
+        with patch('time.sleep', sleep), patch('time.time', MagicMock(side_effect=[100, 101, 102])):
+            with SimulatedClock(speedup=10) as clock:
+                time.sleep(5)
+                sleep.assert_called_with(0.5)
+                # started at 100, one real second later
+                self.assertEqual(110, time.time())
+                self.assertEqual(120, clock.time())
+            self.assertEqual(5, clock.slept)
+            self.assertIs(sleep, time.sleep)
+        self.assertIs(real_time, time.time)
+        self.assertIs(real_sleep, time.sleep)
+        return
+
+    def test_prepare(self):
+        """
+        Does it point the configuration at the simulated equipment?
+        """
+        configuration = SafeConfigParser()
+        for section in ('dut', 'server', 'attenuation'):
+            configuration.add_section(section)
+        configuration.set('dut', 'connection_type', 'ssh')
+        Simulator.prepare(configuration)
+        self.assertEqual('simulated', configuration.get('dut', 'connection_type'))
+        self.assertEqual('simulated', configuration.get('server', 'connection_type'))
+        self.assertEqual('MockAttenuator', configuration.get('attenuation', 'name'))
+        return
+
+    def test_configuration(self):
+        """
+        Does the simulation section set up the channel model?
+        """
+        configuration = SafeConfigParser()
+        settings = SimulationConfiguration(ConfigurationAdapter(configuration))
+        self.assertEqual(100, settings.speedup)
+        configuration.add_section('simulation')
+        configuration.set('simulation', 'path_loss', '50')
+        configuration.set('simulation', 'speedup', '20')
+        settings = SimulationConfiguration(ConfigurationAdapter(configuration))
+        settings.check_rep()
+        self.assertEqual(20, settings.speedup)
+        self.assertEqual(50, settings.model.path_loss)
+        return
+# end TestSimulator
@@ -0,0 +1,287 @@
+
+# python standard library
+import unittest
+import os
+import shutil
+import socket
+import tempfile
+import threading
+
+# third-party
+from mock import MagicMock, patch
+
+# this package
+from cameraobscura import CameraobscuraError
+from cameraobscura.clients.sshbroker import SSHBroker, BrokerClient, BrokeredStdin, broker_path
+from cameraobscura.clients.simpleclient import SimpleClient, ChannelOutput
+from cameraobscura.clients.sshconnection import SSHConnection
+from cameraobscura.hosts.host import TheHost
+from cameraobscura.utilities.latency import LatencyRecorder
+
+class FakeChannel(object):
+    """
+    A channel that sends canned output
+    """
+    def __init__(self, stdout='', stderr='', status=0):
+        self.stdout = stdout
+        self.stderr = stderr
+        self.status = status
+        self.received = []
+        self.command = None
+        self.read_pipe, self.write_pipe = os.pipe()
+        os.write(self.write_pipe, 'x')
+        return
+
+    def fileno(self):
+        return self.read_pipe
+
+    def exec_command(self, command):
+        self.command = command
+        return
+
+    def get_pty(self):
+        return
+
+    def recv_ready(self):
+        return bool(self.stdout)
+
+    def recv_stderr_ready(self):
+        return bool(self.stderr)
+
+    def recv(self, size):
+        data, self.stdout = self.stdout[:size], self.stdout[size:]
+        return data
+
+    def recv_stderr(self, size):
+        data, self.stderr = self.stderr[:size], self.stderr[size:]
+        return data
+
+    @property
+    def eof_received(self):
+        # the output is only finished once the command has had its input
+        return not (self.stdout or self.stderr) and self.command != 'cat'
+
+    def recv_exit_status(self):
+        return self.status
+
+    def sendall(self, data):
+        self.received.append(data)
+        self.stdout += data
+        return
+
+    def shutdown_write(self):
+        self.command = None
+        return
+
+    def close(self):
+        for pipe in (self.read_pipe, self.write_pipe):
+            try:
+                os.close(pipe)
+            except OSError:
+                pass
+        return
+# end class FakeChannel
+
+class TestSSHBroker(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.path = os.path.join(self.folder, 'broker.sock')
+        patcher = patch('cameraobscura.clients.sshbroker.paramiko.SSHClient')
+        self.ssh_client = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.channels = []
+        self.ssh_client.return_value.get_transport.return_value.open_session.side_effect = self.open_session
+        self.broker = SSHBroker(path=self.path)
+        thread = threading.Thread(target=self.broker.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.broker.close)
+        self.addCleanup(self.broker.shutdown)
+        self.client = BrokerClient(path=self.path)
+        self.output = dict(stdout='', stderr='', status=0)
+        return
+
+    def open_session(self):
+        channel = FakeChannel(**self.output)
+        self.channels.append(channel)
+        return channel
+
+    def run_command(self, command='iwconfig', hostname='dut'):
+        channel = self.client.exec_command(command, hostname=hostname, username='tester',
+                                           port=22, timeout=5)
+        self.addCleanup(channel.close)
+        return channel
+
+    def test_exec_command(self):
+        """
+        Does it run the command and send back both streams and the exit status?
+        """
+        self.output = dict(stdout='Signal level=-64 dBm\n' * 1000, stderr='warning\n',
+                           status=3)
+        channel = self.run_command()
+        self.assertEqual('iwconfig', self.channels[0].command)
+        self.assertEqual(['Signal level=-64 dBm\n'] * 1000, ChannelOutput(channel).readlines())
+        self.assertEqual('warning\n', ChannelOutput(channel, stderr=True).read())
+        self.assertEqual(3, channel.recv_exit_status())
+        return
+
+    def test_shared_transport(self):
+        """
+        Do the commands for a host share one connection?
+        """
+        for command in range(3):
+            self.run_command().recv_exit_status()
+        self.run_command(hostname='server').recv_exit_status()
+        self.assertEqual(2, self.ssh_client.call_count)
+        self.assertEqual(2, self.broker.transports)
+        self.assertEqual(4, self.broker.channels)
+        host, port, user = sorted(self.broker.clients)[0]
+        self.assertEqual(('dut', 22, 'tester'), (host, port, user))
+
+        # a transport that died is replaced
+        self.ssh_client.return_value.get_transport.return_value.is_active.return_value = False
+        self.run_command().recv_exit_status()
+        self.assertEqual(3, self.broker.transports)
+        return
+
+    def test_stdin(self):
+        """
+        Is the standard input passed to the command?
+        """
+        channel = self.run_command(command='cat')
+        stdin = BrokeredStdin(channel)
+        stdin.write('sample\n')
+        stdin.flush()
+        output = ChannelOutput(channel)
+        self.assertEqual('sample\n', output.readline())
+        stdin.close()
+        self.assertEqual('', output.readline())
+        self.assertEqual(['sample\n'], self.channels[0].received)
+        return
+
+    def test_error(self):
+        """
+        Does a connection failure come back as a socket error?
+        """
+        self.ssh_client.return_value.connect.side_effect = socket.error('No route to host')
+        with self.assertRaises(socket.error) as context:
+            self.run_command()
+        self.assertIn('No route to host', str(context.exception))
+        return
+
+    def test_not_running(self):
+        """
+        Does the client return None if there's no broker?
+        """
+        self.assertIsNone(BrokerClient(path=os.path.join(self.folder, 'none')).exec_command('ls', hostname='dut',
+                                                                                           username='tester',
+                                                                                           port=22))
+        # a socket file that nothing is listening on
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale_path = os.path.join(self.folder, 'stale.sock')
+        stale.bind(stale_path)
+        stale.close()
+        self.assertIsNone(BrokerClient(path=stale_path).exec_command('ls', hostname='dut',
+                                                                     username='tester',
+                                                                     port=22))
+        self.assertFalse(BrokerClient(path='').available)
+        return
+
+    def test_simple_client(self):
+        """
+        Does the SimpleClient use the broker instead of connecting?
+        """
+        self.output = dict(stdout='ok\n', stderr='', status=0)
+        client = SimpleClient(hostname='dut', username='tester', key_filename='id_rsa')
+        client.broker = self.client
+        self.assertTrue(client.brokered)
+        stdin, stdout, stderr = client.exec_command('echo ok', timeout=5)
+        self.assertEqual('ok\n', stdout.read())
+        self.assertEqual('echo ok\n', self.channels[0].command)
+        self.assertEqual('id_rsa', self.ssh_client.return_value.connect.call_args[1]['key_filename'])
+        self.assertNotIn('password', self.ssh_client.return_value.connect.call_args[1])
+        self.assertIsNone(client._client)
+
+        # a password is never sent to the broker
+        client = SimpleClient(hostname='dut', username='tester', password='secret')
+        client.broker = self.client
+        self.assertFalse(client.brokered)
+        return
+
+    def test_private(self):
+        """
+        Is the socket only used (or replaced) if no other user can get to it?
+        """
+        self.assertEqual(0600, os.stat(self.path).st_mode & 0777)
+        self.assertTrue(self.client.available)
+        os.chmod(self.path, 0666)
+        self.assertFalse(self.client.available)
+        os.chmod(self.path, 0600)
+        os.chmod(self.folder, 0755)
+        self.assertFalse(self.client.available)
+        with self.assertRaises(CameraobscuraError):
+            SSHBroker(path=os.path.join(self.folder, 'shared.sock'))
+        os.chmod(self.folder, 0700)
+
+        # someone else's socket
+        with patch('cameraobscura.clients.sshbroker.os.getuid', return_value=os.getuid() + 1):
+            self.assertFalse(self.client.available)
+
+        # something that isn't a socket isn't removed
+        path = os.path.join(self.folder, 'notes.txt')
+        with open(path, 'w') as notes:
+            notes.write('keep')
+        with self.assertRaises(CameraobscuraError):
+            SSHBroker(path=path)
+        self.assertTrue(os.path.isfile(path))
+
+        # the default directory is created with only the user's permissions
+        with patch.dict(os.environ, {'XDG_RUNTIME_DIR': self.folder}):
+            os.environ.pop('CAMERAOBSCURA_SSH_BROKER', None)
+            path = broker_path()
+            self.assertEqual(os.path.join(self.folder, '.cameraobscura', 'ssh_broker.sock'), path)
+            broker = SSHBroker(path=path)
+            broker.server_close()
+            self.assertEqual(0700, os.stat(os.path.dirname(path)).st_mode & 0777)
+        return
+
+    def test_host(self):
+        """
+        Does an ssh TheHost run its commands through the broker instead of connecting?
+        """
+        self.output = dict(stdout='Signal level=-64 dBm\n', stderr='', status=0)
+        host = TheHost(hostname='dut', test_interface='192.168.10.2', username='tester',
+                       connection_type='ssh', prefix='sudo')
+        host.latencies = LatencyRecorder()
+        host.client.broker = self.client
+        host.connect()
+        stdin, stdout, stderr = host.exec_command('iwconfig wlan0', timeout=5)
+        self.assertEqual(['Signal level=-64 dBm\n'], stdout.readlines())
+        self.assertEqual('sudo iwconfig wlan0\n', self.channels[0].command)
+        # the host's own client never connected
+        self.assertIsNone(host.client._client)
+        self.assertEqual(1, self.broker.transports)
+        return
+
+    def test_ssh_connection(self):
+        """
+        Does the SSHConnection use the broker (unless it's compressed)?
+        """
+        self.output = dict(stdout='ok\n', stderr='', status=0)
+        connection = SSHConnection(hostname='server', username='tester', prefix='sudo')
+        connection.broker = self.client
+        in_out_error = connection.echo('ok', timeout=5)
+        self.assertEqual(['ok\n'], in_out_error.output.readlines())
+        self.assertEqual('sudo echo ok', self.channels[0].command)
+        self.assertIsNone(connection._client)
+
+        connection = SSHConnection(hostname='server', username='tester', compress=True)
+        connection.broker = self.client
+        connection._client = MagicMock()
+        connection._client.exec_command.return_value = None, MagicMock(), MagicMock()
+        connection('ls')
+        connection._client.exec_command.assert_called_with('ls', bufsize=-1, timeout=None,
+                                                           get_pty=False)
+        return
+# end class TestSSHBroker
@@ -2,6 +2,7 @@
 # python standard library
 import unittest
 import random
+import json
 
 # third party
 from mock import MagicMock
@@ -177,6 +178,40 @@ class TestStepIterator(unittest.TestCase):
 
         return
 
+    def test_state_restore(self):
+        """
+        Can a new iterator pick up where an interrupted one stopped?
+        """
+        def make_iterator():
+            return StepIterator(start=0, stop=10, step_sizes=[1, 2],
+                                step_change_thresholds=[5], reversal_limit=1)
+
+        # the uninterrupted sweep (reversing at 7)
+        iterator = make_iterator()
+        expected = []
+        for item in iterator:
+            expected.append(item)
+            if item == 7 and not iterator.reversals:
+                iterator.reverse()
+
+        # interrupted after the reversal
+        iterator = make_iterator()
+        actual = []
+        for item in iterator:
+            actual.append(item)
+            if item == 7 and not iterator.reversals:
+                iterator.reverse()
+                break
+        state = iterator.state
+
+        resumed = make_iterator()
+        resumed.restore(state)
+        resumed.advance()
+        actual.extend(item for item in resumed)
+        self.assertEqual(expected, actual)
+        self.assertEqual(1, resumed.reversals)
+        return
+
     def test_check_rep(self):
         """
         Does it raise assertion errors when mis-configured?
@@ -200,3 +235,93 @@ class TestStepIterator(unittest.TestCase):
         self.iterator.step_change_thresholds = None
         self.iterator.check_rep()
         return
+
+def throughput(attenuation):
+    if attenuation <= 43:
+        return 100.
+    return max(0., 100. - 25 * (attenuation - 43))
+
+class TestAdaptiveStepRange(unittest.TestCase):
+    def setUp(self):
+        self.iterator = StepIterator(adaptive=True, start=0, stop=90,
+                                     coarse_step=10, resolution=1)
+        self.iterator.iterator._logger = MagicMock()
+        return
+
+    def sweep(self, iterator, connection_limit=None):
+        steps = []
+        for attenuation in iterator:
+            steps.append(attenuation)
+            if connection_limit is not None and attenuation >= connection_limit:
+                iterator.record(attenuation, 0)
+                iterator.reverse()
+                continue
+            iterator.record(attenuation, throughput(attenuation))
+        return steps
+
+    def test_cliff(self):
+        """
+        Does it refine the attenuations around the drop in throughput?
+        """
+        steps = self.sweep(self.iterator)
+        self.assertEqual(range(0, 100, 10), steps[:10])
+        refined = sorted(steps[10:])
+        self.assertTrue(all(40 < step < 50 for step in refined))
+        for attenuation in range(43, 48):
+            self.assertIn(attenuation, steps)
+        # the plateau and the tail aren't refined
+        self.assertNotIn(20, refined)
+        self.assertEqual(91, self.iterator.fixed_grid_steps)
+        self.assertEqual(91 - len(steps), self.iterator.steps_saved)
+        self.assertTrue(self.iterator.logger.info.called)
+        return
+
+    def test_reverse(self):
+        """
+        Does a lost connection end the coarse walk but not the search?
+        """
+        steps = self.sweep(self.iterator, connection_limit=45)
+        self.assertEqual(range(0, 60, 10), steps[:6])
+        self.assertNotIn(60, steps)
+        self.assertEqual(50, self.iterator.limit)
+        self.assertIn(44, steps)
+        self.assertTrue(self.iterator.reversals > 0)
+        self.assertEqual(51, self.iterator.fixed_grid_steps)
+        return
+
+    def test_budget(self):
+        """
+        Does it stop when the step-budget is used up?
+        """
+        self.iterator.iterator.step_budget = 12
+        self.assertEqual(12, len(self.sweep(self.iterator)))
+
+        # reset lets it search again
+        self.iterator.reset()
+        self.iterator.iterator.step_budget = None
+        self.assertTrue(len(self.sweep(self.iterator)) > 12)
+        return
+
+    def test_state_restore(self):
+        """
+        Does a resumed search take the same steps as an uninterrupted one?
+        """
+        expected = self.sweep(self.iterator)
+        iterator = StepIterator(adaptive=True, start=0, stop=90,
+                                coarse_step=10, resolution=1)
+        actual = []
+        for attenuation in iterator:
+            actual.append(attenuation)
+            iterator.record(attenuation, throughput(attenuation))
+            if len(actual) == 12:
+                break
+        # the journal saves the state as JSON
+        state = json.loads(json.dumps(iterator.state))
+        resumed = StepIterator(adaptive=True, start=0, stop=90,
+                               coarse_step=10, resolution=1)
+        resumed.restore(state)
+        resumed.advance()
+        actual.extend(self.sweep(resumed))
+        self.assertEqual(expected, actual)
+        return
+# end TestAdaptiveStepRange
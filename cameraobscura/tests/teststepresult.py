@@ -0,0 +1,99 @@
+
+# python standard library
+import unittest
+import os
+import shutil
+import tempfile
+
+# third-party
+import numpy
+import iperflexer.iperfparser
+
+# this package
+from cameraobscura.commands.iperf.stepresult import StepResult
+from cameraobscura.tests.helpers import random_string_of_letters
+
+OUTPUT = """
+[  3] local 192.168.1.2 port 5001 connected with 192.168.1.3 port 4000
+[  4] local 192.168.1.2 port 5001 connected with 192.168.1.3 port 4001
+[ ID] Interval       Transfer     Bandwidth
+[  3]  0.0- 1.0 sec  1.25 MBytes  10.5 Mbits/sec
+[  4]  0.0- 1.0 sec  1.50 MBytes  12.6 Mbits/sec
+[SUM]  0.0- 1.0 sec  2.75 MBytes  23.1 Mbits/sec
+[  3]  1.0- 2.0 sec  1.00 MBytes  8.39 Mbits/sec
+[  4]  1.0- 2.0 sec  2.00 MBytes  16.8 Mbits/sec
+[SUM]  1.0- 2.0 sec  3.00 MBytes  25.2 Mbits/sec
+""".splitlines()
+
+class TestStepResult(unittest.TestCase):
+    def setUp(self):
+        self.name = random_string_of_letters()
+        self.parser = iperflexer.iperfparser.IperfParser(units='Mbits',
+                                                         threads=2)
+        self.result = StepResult(name=self.name)
+        for line in OUTPUT:
+            self.parser(line)
+            self.result.add_thread(self.parser, self.parser.search(line))
+        self.result = StepResult.from_parser(name=self.name,
+                                             parser=self.parser,
+                                             summary=24.0,
+                                             result=self.result)
+        return
+
+    def test_constructor(self):
+        """
+        Does it start out empty?
+        """
+        result = StepResult(name=self.name)
+        self.assertEqual(self.name, result.name)
+        self.assertEqual('Mbits', result.units)
+        self.assertIsNone(result.summary)
+        self.assertEqual(0, len(result.bandwidths))
+        self.assertEqual({}, result.threads)
+        self.assertEqual(0, result.statistics.count)
+        return
+
+    def test_from_parser(self):
+        """
+        Does it get the sums from the parser and keep the thread values?
+        """
+        self.assertEqual(24.0, self.result.summary)
+        self.assertEqual([0.0, 1.0], self.result.intervals.tolist())
+        self.assertTrue(numpy.allclose([23.1, 25.19], self.result.bandwidths))
+        self.assertEqual([3, 4], sorted(self.result.threads))
+        self.assertTrue(numpy.allclose([10.5, 8.39], self.result.threads[3]))
+        self.assertTrue(numpy.allclose([12.6, 16.8], self.result.threads[4]))
+        return
+
+    def test_statistics(self):
+        """
+        Does it calculate the summary statistics for the bandwidths?
+        """
+        statistics = self.result.statistics
+        self.assertEqual(2, statistics.count)
+        self.assertAlmostEqual(23.1, statistics.minimum)
+        self.assertAlmostEqual(25.19, statistics.maximum)
+        self.assertAlmostEqual(24.145, statistics.mean)
+        self.assertAlmostEqual(24.145, statistics.median)
+        return
+
+    def test_save_load(self):
+        """
+        Does it save everything to one file and load it back?
+        """
+        self.result.started = 1234567890.5
+        path = tempfile.mkdtemp()
+        try:
+            filename = self.result.save(os.path.join(path, self.name))
+            self.assertEqual([self.name + '.npz'], os.listdir(path))
+            loaded = StepResult.load(filename)
+        finally:
+            shutil.rmtree(path)
+        self.assertEqual(self.name, loaded.name)
+        self.assertEqual(24.0, loaded.summary)
+        self.assertTrue(numpy.allclose(self.result.bandwidths, loaded.bandwidths))
+        self.assertTrue(numpy.allclose(self.result.transfers, loaded.transfers))
+        self.assertTrue(numpy.allclose(self.result.threads[4], loaded.threads[4]))
+        self.assertEqual(1234567890.5, loaded.started)
+        return
+# end TestStepResult
@@ -0,0 +1,85 @@
+
+# python standard library
+import unittest
+import telnetlib
+import threading
+
+# this package
+from cameraobscura.clients.telnetclient import TelnetOutput
+from cameraobscura.clients.telnetbenchmark import TelnetBenchmark, FakeTelnetServer
+from cameraobscura.clients.telnetbenchmark import TelnetBenchmarkConstants
+
+class NegotiatingServer(FakeTelnetServer):
+    """
+    A fake server whose output has telnet commands and a line with the prompt in it
+    """
+    def output(self, command):
+        return ''.join([command, '\r\n',
+                        'one\r\n',
+                        telnetlib.IAC, telnetlib.WILL, telnetlib.ECHO,
+                        't\x00wo\r\n',
+                        'not a {0}\r\n'.format(TelnetBenchmarkConstants.prompt),
+                        'three\r\n',
+                        TelnetBenchmarkConstants.prompt])
+# end class NegotiatingServer
+
+class TestTelnetBenchmark(unittest.TestCase):
+    def start(self, server):
+        """
+        Serves in a thread until the test is finished
+        """
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def connect(self, server):
+        """
+        :return: telnet client with the command's echo read
+        """
+        client = telnetlib.Telnet(TelnetBenchmarkConstants.host, server.port, 5)
+        self.addCleanup(client.close)
+        client.write('iperf\r\n')
+        client.read_until('\r\n', 5)
+        return client
+
+    def test_readers(self):
+        """
+        Do both readers read all the lines?
+        """
+        results = TelnetBenchmark(lines=500, write_size=7)()
+        for name in (TelnetBenchmarkConstants.expect, TelnetBenchmarkConstants.chunked):
+            self.assertEqual(500, results[name].lines)
+            self.assertGreater(results[name].lines_per_second, 0)
+        return
+
+    def test_telnet_commands(self):
+        """
+        Are the telnet commands taken out of the output (even if split between writes)?
+        """
+        server = self.start(NegotiatingServer(write_size=1))
+        output = TelnetOutput(client=self.connect(server),
+                              prompt=TelnetBenchmarkConstants.prompt,
+                              timeout=5)
+        expected = ['one\r\n', 'two\r\n',
+                    'not a {0}\r\n'.format(TelnetBenchmarkConstants.prompt),
+                    'three\r\n', '']
+        self.assertEqual(expected, output.readlines())
+        # it stays finished
+        self.assertEqual('', output.readline())
+        return
+
+    def test_timeout(self):
+        """
+        Does it stop if the prompt never comes?
+        """
+        server = self.start(FakeTelnetServer(lines=3))
+        output = TelnetOutput(client=self.connect(server), prompt='never seen',
+                              timeout=0.1)
+        lines = output.readlines()
+        self.assertEqual(3, len([line for line in lines if line]))
+        self.assertTrue(output.finished)
+        return
+# end class TestTelnetBenchmark
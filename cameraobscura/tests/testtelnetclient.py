@@ -203,4 +203,35 @@ class TestTelnetClient(unittest.TestCase):
         telnet.close.assert_called_with()
         self.assertIsNone(self.client._client)
         return
+
+    def test_exec_batch(self):
+        """
+        Does it send the commands as one line and split the output at the sentinels?
+        """
+        def device(line, timeout):
+            # runs the commands and echoes the sentinels (without the split quotes)
+            output = []
+            for command in line.split('; '):
+                if command.startswith('echo '):
+                    output.append(command.split()[1].replace("''", '').strip("'") + '\r\n')
+                else:
+                    output.append(command + ' output\r\n')
+            return None, output + [''], None
+        exec_command = MagicMock(side_effect=device)
+        self.client.exec_command = exec_command
+        outputs = self.client.exec_batch(['uname\n', 'iwconfig wlan0'], timeout=3)
+        self.assertEqual(1, exec_command.call_count)
+        self.assertEqual(3, exec_command.call_args[1]['timeout'])
+        self.assertEqual(['uname output\r\n', 'iwconfig wlan0 output\r\n'],
+                         [stdout.read() for stdin, stdout, stderr in outputs])
+        self.assertEqual(['', ''], [stderr.read() for stdin, stdout, stderr in outputs])
+
+        # if a sentinel is missing the rest of the output goes to the unfinished command
+        self.client._logger = MagicMock()
+        exec_command.side_effect = lambda line, timeout: (None, ['uname output\r\n', ''], None)
+        outputs = self.client.exec_batch(['uname', 'iwconfig wlan0'])
+        self.assertEqual(['uname output\r\n', ''],
+                         [stdout.read() for stdin, stdout, stderr in outputs])
+        self.assertTrue(self.client.logger.warning.called)
+        return
 # end class TestTelnetClient    
@@ -9,6 +9,7 @@ from theape.parts.connections.clientbase import suppresssocketerrors
 
 # this package
 from cameraobscura import  CameraobscuraError
+from cameraobscura.clients.eventloop import EventLoop
 
 from cameraobscura.common.baseconfiguration import BaseConfiguration
 
@@ -120,21 +121,132 @@ class TheDump(object):
         """
         runs the command and saves it to the file
         """
+        stdin, stdout, stderr = self.connection.exec_command(self.command,
+                                                             timeout=self.timeout)
+        self.write(stdout, stderr)
+        return
+
+    def submit(self, loop):
+        """
+        Submits the command to an event loop instead of waiting for it
+
+        :param:
+
+         - `loop`: EventLoop to run the command on
+
+        :return: Pending for the saved output
+        """
+        self.logger.info('Submitting Dump: {0}'.format(self))
+        return loop.submit(self.connection, self.command, timeout=self.timeout,
+                           parse=self.write)
+
+    @suppresssocketerrors
+    def write(self, stdout, stderr):
+        """
+        Saves the command's output to the file (e.g. from a batch of commands)
+
+        :param:
+
+         - `stdout`: file-like iterator of output lines
+         - `stderr`: file-like iterator of error lines
+        """
         with open(self.filename, WRITEABLE) as output_file:
-            stdin, stdout, stderr = self.connection.exec_command(self.command,
-                                                                 timeout=self.timeout)
             for line in stdout:
                 output_file.write(line)
                 
-            for line in stderr:
-                if line:
-                    self.logger.error(line)
+        for line in stderr:
+            if line:
+                self.logger.error(line)
         return
 
     def __str__(self):
         return "{0}: {1}".format(self.identifier, self.command)
 # end class TheDump
 
+class TheDumpBatch(object):
+    """
+    Runs the dumps' commands in one batch (for batched connections)
+    """
+    def __init__(self, dumps, connection):
+        """
+        TheDumpBatch constructor
+
+        :param:
+
+         - `dumps`: list of TheDump objects
+         - `connection`: connection with an `exec_batch` method
+        """
+        super(TheDumpBatch, self).__init__()
+        self._logger = None
+        self.dumps = dumps
+        self.connection = connection
+        return
+
+    @property
+    def logger(self):
+        """
+        :return: A logging object.
+        """
+        if self._logger is None:
+            self._logger = logging.getLogger("{0}.{1}".format(self.__module__,
+                                  self.__class__.__name__))
+        return self._logger
+
+    @suppresssocketerrors
+    def __call__(self):
+        """
+        Sends the commands in one batch and has each dump save its output
+        """
+        outputs = self.connection.exec_batch([dump.command for dump in self.dumps],
+                                             timeout=max(dump.timeout for dump in self.dumps))
+        for dump, (stdin, stdout, stderr) in zip(self.dumps, outputs):
+            self.logger.info('Saving Dump: {0}'.format(dump))
+            dump.write(stdout, stderr)
+        return
+# end class TheDumpBatch
+
+class TheDumpLoop(object):
+    """
+    Runs the dumps' commands on an event loop
+    """
+    def __init__(self, dumps):
+        """
+        TheDumpLoop constructor
+
+        :param:
+
+         - `dumps`: list of TheDump objects
+        """
+        super(TheDumpLoop, self).__init__()
+        self._logger = None
+        self.dumps = dumps
+        return
+
+    @property
+    def logger(self):
+        """
+        :return: A logging object.
+        """
+        if self._logger is None:
+            self._logger = logging.getLogger("{0}.{1}".format(self.__module__,
+                                  self.__class__.__name__))
+        return self._logger
+
+    def __call__(self):
+        """
+        Submits all the dumps, runs the loop and logs the ones that failed
+        """
+        loop = EventLoop()
+        pendings = [dump.submit(loop) for dump in self.dumps]
+        loop.run()
+        for dump, pending in zip(self.dumps, pendings):
+            if pending.error is not None:
+                self.logger.error("{0}: Error dumping '{1}' ({2})".format(type(pending.error),
+                                                                        dump,
+                                                                        pending.error))
+        return
+# end class TheDumpLoop
+
 class DumpConfiguration(BaseConfiguration):
     """
     A configuration for the dump
@@ -2,8 +2,25 @@
 # python standard library
 import datetime
 import re
+import threading
+import Queue
+from collections import namedtuple
 now = datetime.datetime.now
 
+# this package
+from cameraobscura import CameraobscuraError
+
+# lines the queue will hold before the reader has to wait for the writer
+QUEUE_SIZE = 10000
+# most lines to write to the file at once
+BATCH_SIZE = 256
+# seconds to wait for the thread to finish writing when closing
+CLOSE_TIMEOUT = 60
+EMPTY_STRING = ''
+STOP = object()
+
+WriterStatistics = namedtuple('WriterStatistics', 'lines blocked maximum_depth batches'.split())
+
 class TimestampWriter(object):
     """
     A class to add timestamps to lines being written to files
@@ -87,4 +104,164 @@ class LogWriter(object):
         #self.open_file.write("{0},{1}".format(now().isoformat(), line))
         self.open_file.write(line)
         return
-# end class LogWriter
\ No newline at end of file
+# end class LogWriter
+
+class QueuedLogWriter(LogWriter):
+    """
+    A LogWriter that logs and writes in a separate thread
+    """
+    def __init__(self, logger, open_file, expression=None,
+                 maximum_size=QUEUE_SIZE, batch_size=BATCH_SIZE,
+                 close_timeout=CLOSE_TIMEOUT):
+        """
+        QueuedLogWriter Constructor
+
+        :param:
+
+         - `logger`: a callable writer (e.g. logger.debug)
+         - `open_file`: something that looks like a writeable file
+         - `expression`: an (uncompiled) regular expression to match the lines to log
+         - `maximum_size`: number of lines the queue can hold
+         - `batch_size`: maximum lines to write to the file at once
+         - `close_timeout`: seconds to wait for the thread when closing
+        """
+        super(QueuedLogWriter, self).__init__(logger=logger,
+                                              open_file=open_file,
+                                              expression=expression)
+        self.queue = Queue.Queue(maxsize=maximum_size)
+        self.batch_size = batch_size
+        self.close_timeout = close_timeout
+        self.thread = None
+        self.error = None
+        self.lines = 0
+        self.blocked = 0
+        self.maximum_depth = 0
+        self.batches = 0
+        return
+
+    @property
+    def depth(self):
+        """
+        The number of lines waiting to be written
+        """
+        return self.queue.qsize()
+
+    @property
+    def statistics(self):
+        """
+        The counts for this writer
+
+        :rtype: WriterStatistics
+        """
+        return WriterStatistics(lines=self.lines,
+                                blocked=self.blocked,
+                                maximum_depth=self.maximum_depth,
+                                batches=self.batches)
+
+    def start(self):
+        """
+        Starts the writing thread
+
+        :return: self (so it can be used in a `with` statement)
+        """
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run,
+                                           name='log_writer_thread')
+            self.thread.daemon = True
+            self.thread.start()
+        return self
+
+    def write(self, line):
+        """
+        Puts the line on the queue (waits for room if the queue is full)
+
+        :param:
+
+         - `line`: string to log and write to the file
+        """
+        try:
+            self.queue.put_nowait(line)
+        except Queue.Full:
+            self.blocked += 1
+            self.queue.put(line)
+        self.maximum_depth = max(self.maximum_depth, self.queue.qsize())
+        return
+
+    def run(self):
+        """
+        Takes lines off the queue and writes them until the stop-sentinel is found
+
+        If a write fails the error is kept (for `close`) and the rest of the lines are discarded
+        """
+        finished = False
+        while not finished:
+            lines = [self.queue.get()]
+            while len(lines) < self.batch_size:
+                try:
+                    lines.append(self.queue.get_nowait())
+                except Queue.Empty:
+                    break
+            if STOP in lines:
+                lines = lines[:lines.index(STOP)]
+                finished = True
+            if self.error is not None:
+                continue
+            try:
+                self.write_lines(lines)
+            # the logger and the file can raise anything -- it's re-raised by close
+            except Exception as error:
+                self.error = error
+        return
+
+    def write_lines(self, lines):
+        """
+        Logs the lines (if they match the expression) and writes them to the file
+
+        :param:
+
+         - `lines`: list of strings
+        """
+        if not lines:
+            return
+        for line in lines:
+            if self.expression.search(line):
+                self.logger(line.rstrip('\n'))
+        self.open_file.write(EMPTY_STRING.join(lines))
+        self.lines += len(lines)
+        self.batches += 1
+        return
+
+    def close(self):
+        """
+        Stops the thread after the queued lines have been written
+
+        :raise: the thread's error if a write failed, CameraobscuraError if the thread didn't finish
+        """
+        if self.thread is not None:
+            thread, self.thread = self.thread, None
+            try:
+                # this one blocks so the sentinel isn't dropped
+                self.queue.put(STOP, timeout=self.close_timeout)
+            except Queue.Full:
+                pass
+            thread.join(self.close_timeout)
+            if thread.is_alive():
+                raise CameraobscuraError("The log writer didn't finish writing within {0} seconds".format(self.close_timeout))
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+        return
+
+    def __enter__(self):
+        """
+        Starts the thread
+        """
+        return self.start()
+
+    def __exit__(self, type, value, traceback):
+        """
+        Stops the thread
+        """
+        self.close()
+        return
+# end class QueuedLogWriter
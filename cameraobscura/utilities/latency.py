@@ -0,0 +1,474 @@
+
+# python standard library
+from collections import Counter, namedtuple
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+class LatencyConstants(object):
+    """
+    Constants for the exec latencies
+    """
+    __slots__ = ()
+    # the histograms keep values to within 1% (two significant digits)
+    significant_digits = 2
+    # the values are recorded as whole microseconds
+    microseconds = 10**6
+    first_byte = 'first_byte'
+    eof = 'eof'
+    metrics = (first_byte, eof)
+    percentiles = (50, 90, 99, 99.9)
+    filename = 'exec_latency.json'
+# end class LatencyConstants
+
+class LatencyHistogram(object):
+    """
+    A log-linear histogram of whole-number values
+    """
+    def __init__(self, significant_digits=LatencyConstants.significant_digits):
+        """
+        LatencyHistogram constructor
+
+        :param:
+
+         - `significant_digits`: the precision to keep the values to
+        """
+        super(LatencyHistogram, self).__init__()
+        self.significant_digits = significant_digits
+        # bits for the sub-buckets in each power of two
+        self.bits = int(math.ceil(math.log(2 * 10**significant_digits, 2)))
+        self.counts = Counter()
+        self.total = 0
+        self.minimum = None
+        self.maximum = None
+        self.sum = 0
+        return
+
+    def lowest(self, value):
+        """
+        The lowest value in the value's bucket
+
+        :param:
+
+         - `value`: non-negative integer
+
+        :return: the bucket's lowest value (its key in the counts)
+        """
+        shift = max(0, value.bit_length() - self.bits)
+        return (value >> shift) << shift
+
+    def highest(self, value):
+        """
+        The highest value in the value's bucket
+        """
+        shift = max(0, value.bit_length() - self.bits)
+        return self.lowest(value) + (1 << shift) - 1
+
+    def record(self, value, count=1):
+        """
+        Adds a value to the histogram
+
+        :param:
+
+         - `value`: the value (negative values are recorded as 0)
+         - `count`: how many times to add it
+        """
+        value = max(0, int(value))
+        self.counts[self.lowest(value)] += count
+        self.total += count
+        self.sum += value * count
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+        return
+
+    def merge(self, other):
+        """
+        Adds another histogram's counts to this one
+
+        :param:
+
+         - `other`: LatencyHistogram with the same significant digits
+        """
+        if other.total:
+            self.counts.update(other.counts)
+            self.total += other.total
+            self.sum += other.sum
+            self.minimum = (other.minimum if self.minimum is None
+                            else min(self.minimum, other.minimum))
+            self.maximum = (other.maximum if self.maximum is None
+                            else max(self.maximum, other.maximum))
+        return
+
+    @property
+    def mean(self):
+        """
+        The mean of the values (None if there aren't any)
+        """
+        if not self.total:
+            return None
+        return self.sum/float(self.total)
+
+    def percentile(self, percentile):
+        """
+        The value that `percentile` percent of the values are less than or equal to
+
+        :param:
+
+         - `percentile`: number from 0 to 100
+
+        :return: the highest value in the percentile's bucket (None if the histogram is empty)
+        """
+        if not self.total:
+            return None
+        target = max(1, int(math.ceil(percentile/100.0 * self.total)))
+        seen = 0
+        for value in sorted(self.counts):
+            seen += self.counts[value]
+            if seen >= target:
+                return min(self.highest(value), self.maximum)
+        return self.maximum
+
+    def to_dict(self):
+        """
+        The histogram as a JSON-friendly dict
+        """
+        return dict(significant_digits=self.significant_digits,
+                    minimum=self.minimum,
+                    maximum=self.maximum,
+                    sum=self.sum,
+                    counts=dict((str(value), count)
+                                for value, count in self.counts.iteritems()))
+
+    @classmethod
+    def from_dict(cls, values):
+        """
+        Builds a histogram from a dict made by `to_dict`
+
+        :param:
+
+         - `values`: dict with significant_digits, minimum, maximum, sum and counts
+
+        :return: LatencyHistogram
+        """
+        histogram = cls(significant_digits=values['significant_digits'])
+        histogram.counts.update(dict((int(value), count)
+                                     for value, count in values['counts'].iteritems()))
+        histogram.total = sum(histogram.counts.values())
+        histogram.minimum = values['minimum']
+        histogram.maximum = values['maximum']
+        histogram.sum = values['sum']
+        return histogram
+# end class LatencyHistogram
+
+class LatencyTimer(object):
+    """
+    Times a command's output from the send to its first byte and its end
+    """
+    def __init__(self, callback=None):
+        """
+        LatencyTimer constructor (the command is assumed to be sent now)
+
+        :param:
+
+         - `callback`: function to call with the timer once the output has finished
+        """
+        super(LatencyTimer, self).__init__()
+        self.callback = callback
+        self.start = time.time()
+        self.first_byte = None
+        self.end = None
+        return
+
+    def received(self):
+        """
+        Records the arrival of output (if it's the first to arrive)
+        """
+        if self.first_byte is None:
+            self.first_byte = time.time()
+        return
+
+    def finished(self):
+        """
+        Records the end of the output (once) and calls the callback
+        """
+        if self.end is not None:
+            return
+        self.end = time.time()
+        if self.first_byte is None:
+            self.first_byte = self.end
+        if self.callback is not None:
+            self.callback(self)
+        return
+
+    @property
+    def first_byte_latency(self):
+        """
+        Seconds from the send to the first output (None if none has arrived)
+        """
+        if self.first_byte is None:
+            return None
+        return self.first_byte - self.start
+
+    @property
+    def eof_latency(self):
+        """
+        Seconds from the send to the end of the output (None if it hasn't ended)
+        """
+        if self.end is None:
+            return None
+        return self.end - self.start
+# end class LatencyTimer
+
+class TimedOutput(object):
+    """
+    A file-like output that times the reads of another output
+    """
+    def __init__(self, output, timer):
+        """
+        TimedOutput constructor
+
+        :param:
+
+         - `output`: the file-like output to read
+         - `timer`: LatencyTimer for the output
+        """
+        self.output = output
+        self.timer = timer
+        return
+
+    def readline(self):
+        """
+        Reads a line
+
+        :return: the next line (EMPTY_STRING at the end of the output)
+        """
+        line = self.output.readline()
+        if line:
+            self.timer.received()
+        else:
+            self.timer.finished()
+        return line
+
+    def readlines(self):
+        """
+        Reads all the lines
+        """
+        return list(self)
+
+    def read(self):
+        """
+        Reads all of the output
+        """
+        output = self.output.read()
+        if output:
+            self.timer.received()
+        self.timer.finished()
+        return output
+
+    def __iter__(self):
+        """
+        Traverses the output line by line
+        """
+        for line in self.output:
+            self.timer.received()
+            yield line
+        self.timer.finished()
+        return
+
+    def __getattr__(self, attribute):
+        """
+        Gets anything else from the wrapped output
+        """
+        return getattr(self.output, attribute)
+# end class TimedOutput
+
+LatencyComparison = namedtuple('LatencyComparison', 'host command metric percentile before after ratio')
+
+class LatencyRecorder(object):
+    """
+    Histograms of the exec latencies for each host and command
+    """
+    def __init__(self, significant_digits=LatencyConstants.significant_digits):
+        """
+        LatencyRecorder constructor
+
+        :param:
+
+         - `significant_digits`: the precision of the histograms
+        """
+        super(LatencyRecorder, self).__init__()
+        self._logger = None
+        self.significant_digits = significant_digits
+        # (host, command name): {metric: LatencyHistogram}
+        self.histograms = {}
+        self.lock = threading.Lock()
+        return
+
+    @property
+    def logger(self):
+        """
+        :return: A logging object.
+        """
+        if self._logger is None:
+            self._logger = logging.getLogger("{0}.{1}".format(self.__module__,
+                                  self.__class__.__name__))
+        return self._logger
+
+    @staticmethod
+    def name(command):
+        """
+        The command's name (the first word without its path)
+
+        :param:
+
+         - `command`: the command string
+
+        :return: name to group the command's latencies under
+        """
+        words = command.split()
+        if not words:
+            return ''
+        return os.path.basename(words[0])
+
+    def watch(self, host, name, output, timer=None):
+        """
+        Records the output's latencies once it's been read
+
+        :param:
+
+         - `host`: the host's identity
+         - `name`: the command's name
+         - `output`: the command's stdout
+         - `timer`: LatencyTimer started when the command was sent (used if the output has no timer)
+
+        :return: the output (or a TimedOutput wrapping it)
+        """
+        callback = lambda finished: self.record(host, name, finished)
+        output_timer = getattr(output, 'timer', None)
+        if isinstance(output_timer, LatencyTimer):
+            output_timer.callback = callback
+            # the output may have been read to the end already
+            if output_timer.end is not None:
+                callback(output_timer)
+            return output
+        if timer is None:
+            timer = LatencyTimer()
+        timer.callback = callback
+        return TimedOutput(output, timer)
+
+    def record(self, host, name, timer):
+        """
+        Adds a finished timer's latencies to the histograms
+
+        :param:
+
+         - `host`: the host's identity
+         - `name`: the command's name
+         - `timer`: a finished LatencyTimer
+        """
+        latencies = zip(LatencyConstants.metrics, (timer.first_byte_latency, timer.eof_latency))
+        with self.lock:
+            histograms = self.histograms.setdefault((host, name), {})
+            for metric, latency in latencies:
+                if metric not in histograms:
+                    histograms[metric] = LatencyHistogram(self.significant_digits)
+                histograms[metric].record(round(latency * LatencyConstants.microseconds))
+        return
+
+    def summary(self, percentiles=LatencyConstants.percentiles):
+        """
+        The percentiles of each histogram
+
+        :param:
+
+         - `percentiles`: the percentiles to get
+
+        :return: list of (host, command, metric, count, {percentile: microseconds}) tuples
+        """
+        with self.lock:
+            return [(host, name, metric, histograms[metric].total,
+                     dict((percentile, histograms[metric].percentile(percentile))
+                          for percentile in percentiles))
+                    for (host, name), histograms in sorted(self.histograms.items())
+                    for metric in LatencyConstants.metrics if metric in histograms]
+
+    def compare(self, other, percentiles=LatencyConstants.percentiles):
+        """
+        Compares this recorder's percentiles to another's
+
+        :param:
+
+         - `other`: the LatencyRecorder to compare to (the 'after')
+         - `percentiles`: the percentiles to compare
+
+        :return: list of LatencyComparison (only for what both recorders have)
+        """
+        comparisons = []
+        for (host, name), histograms in sorted(self.histograms.items()):
+            other_histograms = other.histograms.get((host, name), {})
+            for metric in LatencyConstants.metrics:
+                if metric not in histograms or metric not in other_histograms:
+                    continue
+                for percentile in percentiles:
+                    before = histograms[metric].percentile(percentile)
+                    after = other_histograms[metric].percentile(percentile)
+                    ratio = after/float(before) if before else None
+                    comparisons.append(LatencyComparison(host, name, metric, percentile,
+                                                         before, after, ratio))
+        return comparisons
+
+    def save(self, filename):
+        """
+        Saves the histograms as JSON
+
+        :param:
+
+         - `filename`: path to the output file
+        """
+        folder = os.path.dirname(filename)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+        output = {}
+        with self.lock:
+            for (host, name), histograms in self.histograms.items():
+                output.setdefault(host, {})[name] = dict((metric, histogram.to_dict())
+                                                         for metric, histogram in histograms.items())
+        with open(filename, 'w') as json_file:
+            json.dump(output, json_file, indent=1, sort_keys=True)
+        self.logger.info("Exec latencies saved to {0}".format(filename))
+        return
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Loads histograms saved by `save`
+
+        :param:
+
+         - `filename`: path to the JSON file
+
+        :return: LatencyRecorder
+        """
+        with open(filename) as json_file:
+            saved = json.load(json_file)
+        recorder = cls()
+        for host, names in saved.items():
+            for name, histograms in names.items():
+                recorder.histograms[(host, name)] = dict((metric, LatencyHistogram.from_dict(values))
+                                                         for metric, values in histograms.items())
+        return recorder
+
+    def clear(self):
+        """
+        Removes all the histograms
+        """
+        with self.lock:
+            self.histograms = {}
+        return
+# end class LatencyRecorder
+
+# the recorder for the process
+EXEC_LATENCY = LatencyRecorder()
@@ -0,0 +1,186 @@
+
+# python standard library
+from collections import namedtuple, defaultdict
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+
+class PhaseConstants(object):
+    """
+    Constants for the phase timer
+    """
+    __slots__ = ()
+    # categories
+    traffic = 'traffic'
+    overhead = 'overhead'
+
+    # trace-event values
+    complete_event = 'X'
+    microseconds = 10**6
+    display_unit = 'ms'
+# end class PhaseConstants
+
+PhaseSpan = namedtuple('PhaseSpan', 'name category start duration thread arguments')
+PhaseSummary = namedtuple('PhaseSummary', 'total traffic overhead ratio phases')
+
+class PhaseTimer(object):
+    """
+    A recorder of timed phases
+    """
+    def __init__(self):
+        """
+        PhaseTimer constructor
+        """
+        super(PhaseTimer, self).__init__()
+        self._logger = None
+        self.spans = []
+        self.arguments = {}
+        self.lock = threading.Lock()
+        return
+
+    @property
+    def logger(self):
+        """
+        :return: A logging object.
+        """
+        if self._logger is None:
+            self._logger = logging.getLogger("{0}.{1}".format(self.__module__,
+                                  self.__class__.__name__))
+        return self._logger
+
+    def step(self, **arguments):
+        """
+        Sets the arguments that get added to the spans that follow
+
+        :param:
+
+         - `arguments`: name=value pairs to identify the step (e.g. attenuation=10)
+        """
+        self.arguments = arguments
+        return
+
+    @contextlib.contextmanager
+    def span(self, name, category=PhaseConstants.overhead, **arguments):
+        """
+        Times the code in the with-block
+
+        :param:
+
+         - `name`: identifier for the phase
+         - `category`: PhaseConstants.traffic or PhaseConstants.overhead
+         - `arguments`: extra name=value pairs to keep with this span
+        """
+        span_arguments = self.arguments.copy()
+        span_arguments.update(arguments)
+        start = time.time()
+        try:
+            yield
+        finally:
+            span = PhaseSpan(name=name, category=category, start=start,
+                             duration=time.time() - start,
+                             thread=threading.current_thread().name,
+                             arguments=span_arguments)
+            with self.lock:
+                self.spans.append(span)
+        return
+
+    @property
+    def summary(self):
+        """
+        The totals for the spans recorded so far
+
+        :rtype: PhaseSummary
+        :return: total, traffic and overhead seconds, overhead/traffic ratio and phase totals
+        """
+        with self.lock:
+            spans = list(self.spans)
+        phases = defaultdict(float)
+        for span in spans:
+            phases[span.name] += span.duration
+        if not spans:
+            return PhaseSummary(total=0, traffic=0, overhead=0, ratio=None,
+                                phases={})
+        total = (max(span.start + span.duration for span in spans)
+                 - min(span.start for span in spans))
+        traffic = sum(span.duration for span in spans
+                      if span.category == PhaseConstants.traffic)
+        overhead = total - traffic
+        ratio = overhead/traffic if traffic else None
+        return PhaseSummary(total=total, traffic=traffic, overhead=overhead,
+                            ratio=ratio, phases=dict(phases))
+
+    def log_summary(self, label=''):
+        """
+        Logs the summary (at the info level)
+
+        :param:
+
+         - `label`: identifier to add to the message (e.g. the direction)
+        """
+        summary = self.summary
+        if not summary.total:
+            self.logger.info("{0} no phases were timed".format(label))
+            return
+        ratio = ('{0:.2f}'.format(summary.ratio) if summary.ratio is not None
+                 else 'no traffic')
+        self.logger.info("{0} total: {1:.1f} s, traffic: {2:.1f} s, overhead: {3:.1f} s "
+                         "({4:.0%} of the total), overhead/traffic: {5}".format(label,
+                                                                            summary.total,
+                                                                            summary.traffic,
+                                                                            summary.overhead,
+                                                                            summary.overhead/summary.total,
+                                                                            ratio))
+        for name, seconds in sorted(summary.phases.iteritems(),
+                                    key=lambda item: item[1], reverse=True):
+            self.logger.info("{0}   {1}: {2:.2f} s".format(label, name, seconds))
+        return
+
+    @property
+    def trace_events(self):
+        """
+        The spans as Chrome trace-events
+
+        :return: list of 'complete' event dictionaries (times in microseconds)
+        """
+        process_id = os.getpid()
+        with self.lock:
+            spans = list(self.spans)
+        return [{'name': span.name,
+                 'cat': span.category,
+                 'ph': PhaseConstants.complete_event,
+                 'ts': int(span.start * PhaseConstants.microseconds),
+                 'dur': int(span.duration * PhaseConstants.microseconds),
+                 'pid': process_id,
+                 'tid': span.thread,
+                 'args': span.arguments} for span in spans]
+
+    def save(self, filename):
+        """
+        Saves the spans as a Chrome trace-event (JSON) file
+
+        :param:
+
+         - `filename`: path to the output file
+        """
+        folder = os.path.dirname(filename)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+        with open(filename, 'w') as trace:
+            json.dump({'traceEvents': self.trace_events,
+                       'displayTimeUnit': PhaseConstants.display_unit},
+                      trace)
+        self.logger.info("Phase timings saved to {0}".format(filename))
+        return
+
+    def reset(self):
+        """
+        Removes the recorded spans and step arguments
+        """
+        with self.lock:
+            self.spans = []
+        self.arguments = {}
+        return
+# end class PhaseTimer
@@ -0,0 +1,231 @@
+
+# python standard library
+from collections import namedtuple, deque
+import logging
+import threading
+import Queue
+
+class PostProcessorConstants(object):
+    """
+    Constants for the post-processor
+    """
+    __slots__ = ()
+    default_workers = 2
+    # tasks that can wait before submit blocks
+    queue_size = 32
+    thread_name = 'post_processor_{0}'
+# end class PostProcessorConstants
+
+STOP = object()
+PostProcessorStatistics = namedtuple('PostProcessorStatistics',
+                                     'tasks errors maximum_depth'.split())
+
+class PostProcessor(object):
+    """
+    A bounded pool of threads to do work in the background
+    """
+    def __init__(self, workers=PostProcessorConstants.default_workers,
+                 maximum_size=PostProcessorConstants.queue_size):
+        """
+        PostProcessor constructor
+
+        :param:
+
+         - `workers`: number of threads doing the work
+         - `maximum_size`: number of tasks that can wait in the queue
+        """
+        super(PostProcessor, self).__init__()
+        self._logger = None
+        self.workers = workers
+        self.queue = Queue.Queue(maxsize=maximum_size)
+        self.threads = []
+        self.errors = []
+        self.tasks = 0
+        self.maximum_depth = 0
+        self.lock = threading.Lock()
+        # the tasks submitted between two checkpoints are a batch
+        self.batch = 0
+        # batch: tasks not finished yet
+        self.outstanding = {}
+        self.failed_batches = set()
+        self.checkpoints = deque()
+        self.checkpoint_lock = threading.Lock()
+        # set once a batch fails (the later checkpoints are skipped until the barrier)
+        self.broken = False
+        return
+
+    @property
+    def logger(self):
+        """
+        :return: A logging object.
+        """
+        if self._logger is None:
+            self._logger = logging.getLogger("{0}.{1}".format(self.__module__,
+                                  self.__class__.__name__))
+        return self._logger
+
+    @property
+    def statistics(self):
+        """
+        The counts for this post-processor
+
+        :rtype: PostProcessorStatistics
+        """
+        return PostProcessorStatistics(tasks=self.tasks,
+                                       errors=len(self.errors),
+                                       maximum_depth=self.maximum_depth)
+
+    def start(self):
+        """
+        Starts the worker threads
+
+        :return: self (so it can be used in a `with` statement)
+        """
+        if not self.threads:
+            for index in xrange(self.workers):
+                thread = threading.Thread(target=self.run,
+                                          name=PostProcessorConstants.thread_name.format(index))
+                thread.daemon = True
+                thread.start()
+                self.threads.append(thread)
+        return self
+
+    def submit(self, function, *args, **kwargs):
+        """
+        Queues a function call (blocks if the queue is full)
+
+        :param:
+
+         - `function`: callable to run in a worker thread
+         - `args`, `kwargs`: arguments for the function
+        """
+        if not self.threads:
+            function(*args, **kwargs)
+            return
+        with self.lock:
+            batch = self.batch
+            self.outstanding[batch] = self.outstanding.get(batch, 0) + 1
+        self.queue.put((function, args, kwargs, batch))
+        with self.lock:
+            self.tasks += 1
+            self.maximum_depth = max(self.maximum_depth, self.queue.qsize())
+        return
+
+    def checkpoint(self, function, *args, **kwargs):
+        """
+        Queues a call to make once all the tasks submitted before it have succeeded
+
+        The checkpoints are made in the order they were queued. If one of
+        their tasks failed, the checkpoint (and the ones after it, until the
+        next barrier) is skipped.
+
+        :param:
+
+         - `function`: callable that records the checkpoint (e.g. a journal entry)
+         - `args`, `kwargs`: arguments for the function
+        """
+        if not self.threads:
+            function(*args, **kwargs)
+            return
+        with self.lock:
+            self.checkpoints.append((self.batch, function, args, kwargs))
+            self.batch += 1
+        self.run_checkpoints()
+        return
+
+    def run_checkpoints(self):
+        """
+        Makes the queued checkpoints whose tasks are all finished
+        """
+        # one thread at a time so they're made in order
+        with self.checkpoint_lock:
+            while True:
+                with self.lock:
+                    if not self.checkpoints or self.outstanding.get(self.checkpoints[0][0]):
+                        return
+                    batch, function, args, kwargs = self.checkpoints.popleft()
+                    self.outstanding.pop(batch, None)
+                    if batch in self.failed_batches:
+                        self.broken = True
+                    skip = self.broken
+                name = getattr(function, '__name__', function)
+                if skip:
+                    self.logger.warning("Skipping checkpoint ({0}) after a post-processing failure".format(name))
+                    continue
+                try:
+                    function(*args, **kwargs)
+                except Exception as error:
+                    self.logger.error("Checkpoint ({0}) failed: {1}".format(name, error))
+                    with self.lock:
+                        self.errors.append(error)
+                        self.broken = True
+        return
+
+
+    def run(self):
+        """
+        Takes tasks off the queue and runs them until the stop-sentinel is found
+        """
+        while True:
+            task = self.queue.get()
+            try:
+                if task is STOP:
+                    return
+                function, args, kwargs, batch = task
+                try:
+                    function(*args, **kwargs)
+                except Exception as error:
+                    self.logger.error("Post-processing ({0}) failed: {1}".format(getattr(function, '__name__', function),
+                                                                               error))
+                    with self.lock:
+                        self.errors.append(error)
+                        self.failed_batches.add(batch)
+                with self.lock:
+                    self.outstanding[batch] -= 1
+                # before task_done so the barrier also waits for the checkpoints
+                self.run_checkpoints()
+            finally:
+                self.queue.task_done()
+        return
+
+    def barrier(self):
+        """
+        Waits until all the submitted tasks (and their checkpoints) are done
+
+        :return: list of exceptions raised by the tasks and checkpoints since the last barrier
+        """
+        self.queue.join()
+        with self.lock:
+            errors, self.errors = self.errors, []
+            self.failed_batches.clear()
+            self.broken = False
+        self.logger.debug("Post-processing -- tasks: {0}, errors: {1}, maximum queue depth: {2}".format(self.tasks,
+                                                                                                      len(errors),
+                                                                                                      self.maximum_depth))
+        return errors
+
+    def close(self):
+        """
+        Finishes the queued tasks and stops the threads
+        """
+        for thread in self.threads:
+            # this one blocks so the sentinel isn't dropped
+            self.queue.put(STOP)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        return
+
+    def __enter__(self):
+        """
+        Starts the threads
+        """
+        return self.start()
+
+    def __exit__(self, type, value, traceback):
+        """
+        Stops the threads
+        """
+        self.close()
+        return
+# end class PostProcessor
@@ -7,15 +7,16 @@ import datetime
 import socket
 import textwrap
 import os
-
-# third party
-from theape.parts.connections.simpleclient import ConnectionError
-from theape.parts.command.command import TheCommand
+from multiprocessing.pool import ThreadPool
 
 # this package
 from cameraobscura import CameraobscuraError
+from cameraobscura.clients.simpleclient import ConnectionError
 
 from cameraobscura.common.baseconfiguration import BaseConfiguration
+from cameraobscura.commands.command.command import TheCommand
+from cameraobscura.clients.eventloop import Pending
+from cameraobscura.utilities.phasetimer import PhaseTimer
 
 TIMESTAMP = 'timestamp'
 UNDERSCORE = '_'
@@ -29,7 +30,8 @@ class Query(object):
     """
     A querier of devices
     """
-    def __init__(self, output_filename, fields, commands):
+    def __init__(self, output_filename, fields, commands, workers=1, batch=None,
+                 agent=None):
         """
         Query constructor
 
@@ -38,6 +40,9 @@ class Query(object):
          - `output_filename`: name of file to use to save data
          - `fields`: list of fields for headers (and keys to 'commands' dict)
          - `commands`: dict of field:command where commands are strings to send to connection
+         - `workers`: most commands to run at the same time
+         - `batch`: connection with an `exec_batch` to send all the commands at once (or None)
+         - `agent`: SamplingAgent to get the commands' output from (or None)
         """
         super(Query, self).__init__()
         self._logger = None
@@ -46,8 +51,12 @@ class Query(object):
         self.output_filename = output_filename
         self.fields = fields
         self.commands = commands
+        self.workers = workers
+        self.batch = batch
+        self.agent = agent
         self.new_file = True
         self._writer = None
+        self._timer = None
         return        
 
     @property
@@ -116,6 +125,23 @@ class Query(object):
         self._output_file = None
         return
 
+    @property
+    def timer(self):
+        """
+        A PhaseTimer to record the time spent querying and writing
+        """
+        if self._timer is None:
+            self._timer = PhaseTimer()
+        return self._timer
+
+    @timer.setter
+    def timer(self, timer):
+        """
+        Sets the timer (so it can be shared with the caller)
+        """
+        self._timer = timer
+        return
+
     @property
     def writer(self):
         """
@@ -156,18 +182,139 @@ class Query(object):
 
         :raise: CameraobscuraError if the regular expressions matches but there's no group
         """
-        output = {TIMESTAMP:datetime.datetime.now().isoformat()}
+        timestamp = datetime.datetime.now().isoformat()
+        with self.timer.span('query'):
+            data = self.query()
+        self.write_row(data, timestamp, extra_data)
+        return
+
+    def submit(self, loop, extra_data=None):
+        """
+        Submits the commands to an event loop and saves the row once they're all done
+
+        :param:
+
+         - `loop`: EventLoop to run the commands on
+         - `extra_data`: extra data to add to the csv (keys have to already be added to the `fields` list)
+
+        :return: Pending whose result is the dict of field:output
+        """
+        timestamp = datetime.datetime.now().isoformat()
+        fields = self.commands.keys()
+        queried = Pending("query ({0})".format(self.output_filename))
+
+        def write(gathered):
+            if gathered.error is not None:
+                queried.set_result(error=gathered.error)
+                return
+            data = dict(zip(fields, gathered.result))
+            self.write_row(data, timestamp, extra_data)
+            queried.set_result(data)
+            return
+        loop.gather(self.commands[field].submit(loop) for field in fields).add_callback(write)
+        return queried
+
+    def write_row(self, data, timestamp, extra_data=None):
+        """
+        Writes the queried data to the csv
+
+        :param:
+
+         - `data`: dict of field:output
+         - `timestamp`: the time the query started
+         - `extra_data`: extra data to add to the csv
+        """
+        output = {TIMESTAMP:timestamp}
         if extra_data is not None:
             output.update(extra_data)
-                
-        for field, command in self.commands.iteritems():
-            self.logger.debug("Checking field {0}".format(field))
-            output[field] = command()
+        output.update(data)
 
         self.logger.info(output)
-        self.writer.writerow(output)
+        with self.timer.span('write_csv'):
+            self.writer.writerow(output)
         return
 
+    def query(self):
+        """
+        Runs the commands (at the same time if there is more than one worker)
+
+        :return: dict of field:output
+        """
+        fields = self.commands.keys()
+        if self.agent is not None and fields:
+            return self.query_agent()
+        if self.batch is not None and len(fields) > 1:
+            return self.query_batch()
+        if self.workers < 2 or len(fields) < 2:
+            output = {}
+            for field in fields:
+                self.logger.debug("Checking field {0}".format(field))
+                output[field] = self.commands[field]()
+            return output
+
+        def check(field):
+            self.logger.debug("Checking field {0}".format(field))
+            return self.commands[field]()
+
+        pool = ThreadPool(min(self.workers, len(fields)))
+        try:
+            # map re-raises the first exception a command raised
+            outputs = pool.map(check, fields)
+        finally:
+            pool.close()
+            pool.join()
+        return dict(zip(fields, outputs))
+
+    def query_batch(self):
+        """
+        Sends the commands in one batch and has each command parse its own output
+
+        :return: dict of field:output
+        :raise: CameraobscuraError on a socket error if any of the commands don't trap errors
+        """
+        fields = self.commands.keys()
+        commands = [self.commands[field] for field in fields]
+        try:
+            outputs = self.batch.exec_batch([command.command_arguments for command in commands],
+                                            timeout=max(command.timeout for command in commands))
+        except socket.error as error:
+            return self.trap(error, self.batch)
+        return dict((field, command.parse(stdout, stderr))
+                    for field, command, (stdin, stdout, stderr) in zip(fields, commands, outputs))
+
+    def query_agent(self):
+        """
+        Gets the commands' output from the sampling agent and has each command parse its own
+
+        :return: dict of field:output
+        :raise: CameraobscuraError on a socket error if any of the commands don't trap errors
+        """
+        try:
+            outputs = self.agent.request()
+        except socket.error as error:
+            return self.trap(error, self.agent.connection)
+        return dict((field, self.commands[field].parse(*outputs[field]))
+                    for field in self.commands)
+
+    def trap(self, error, connection):
+        """
+        Handles a socket error from sending all the commands at once
+
+        :param:
+
+         - `error`: the socket error
+         - `connection`: the connection the commands were sent to (for the log)
+
+        :return: dict of field:not_available
+        :raise: CameraobscuraError if any of the commands don't trap errors
+        """
+        self.logger.error("{0}: Error with connection to {1}".format(type(error),
+                                                                    connection))
+        if not all(command.trap_errors for command in self.commands.values()):
+            raise CameraobscuraError("Problem with connection executing the query commands")
+        return dict((field, command.not_available)
+                    for field, command in self.commands.iteritems())
+
     def check_rep(self):
         """
         Checks that
@@ -198,10 +345,15 @@ class QueryEnum(object):
     filename = 'filename'
     timeout = 'timeout'
     trap_errors = 'trap_errors'
+    sample_period = 'sample_period'
+    sample_buffer = 'sample_buffer'
+    sample_filename = 'sample_filename'
+    agent = 'agent'
 
     # reserved names
     reserved = (delimiter, not_available, filename, timeout,
-                trap_errors)
+                trap_errors, sample_period, sample_buffer, sample_filename,
+                agent)
     
     # defaults
     default_delimiter = ','
@@ -209,6 +361,11 @@ class QueryEnum(object):
     default_filename = 'query.csv'
     default_timeout = 10
     default_trap_errors = True
+    # 0 means don't sample during the traffic
+    default_sample_period = 0
+    default_sample_buffer = 1024
+    default_sample_filename = 'samples.csv'
+    default_agent = False
 
 class QueryConfiguration(BaseConfiguration):
     """
@@ -227,6 +384,10 @@ class QueryConfiguration(BaseConfiguration):
         self._filename = None
         self._timeout = None
         self._trap_errors = None
+        self._sample_period = None
+        self._sample_buffer = None
+        self._sample_filename = None
+        self._agent = None
         return
 
     @property
@@ -257,6 +418,19 @@ class QueryConfiguration(BaseConfiguration):
             # to have it crash instead of trap socket errors
             # trap_errors = {trap_errors}
 
+            # to also run the commands every `sample_period` seconds while iperf runs
+            # (on their own connection) set the period (e.g. 0.5)
+            # the samples go to <direction>_{sample_filename}
+            # sample_buffer is the most samples kept for one step
+            # sample_period = {sample_period}
+            # sample_buffer = {sample_buffer}
+
+            # to run the commands with an agent started once on the DUT
+            # (instead of a new channel for every command) set agent to True
+            # this needs a connection with a stdin (ssh or local, not telnet)
+            # agent = {agent}
+
+
             # everything else is of the format:
             # <column-header> = <command><delimiter><regular expression>
             # the column-header will be used in the csv-file
@@ -273,7 +447,11 @@ class QueryConfiguration(BaseConfiguration):
                        delimiter=QueryEnum.default_delimiter,
                        timeout=QueryEnum.default_timeout,
                        filename=QueryEnum.default_filename,
-                       trap_errors=QueryEnum.trap_errors))
+                       trap_errors=QueryEnum.trap_errors,
+                       sample_period=QueryEnum.default_sample_period,
+                       sample_buffer=QueryEnum.default_sample_buffer,
+                       sample_filename=QueryEnum.default_sample_filename,
+                       agent=QueryEnum.default_agent))
         return self._example
     
     @property
@@ -386,6 +564,58 @@ class QueryConfiguration(BaseConfiguration):
                 default=QueryEnum.default_trap_errors)
         return self._trap_errors
 
+    @property
+    def sample_period(self):
+        """
+        Seconds between samples while the traffic runs (0 means don't sample)
+
+        :raise: CameraobscuraError if the period is negative
+        """
+        if self._sample_period is None:
+            self._sample_period = self.configuration.getfloat(self.section,
+                                                              QueryEnum.sample_period,
+                                                              optional=True,
+                                                              default=QueryEnum.default_sample_period)
+            if self._sample_period < 0:
+                raise CameraobscuraError("sample_period can't be negative ({0})".format(self._sample_period))
+        return self._sample_period
+
+    @property
+    def sample_buffer(self):
+        """
+        The most samples to keep for one step (the oldest are dropped)
+        """
+        if self._sample_buffer is None:
+            self._sample_buffer = self.configuration.getint(self.section,
+                                                            QueryEnum.sample_buffer,
+                                                            optional=True,
+                                                            default=QueryEnum.default_sample_buffer)
+        return self._sample_buffer
+
+    @property
+    def sample_filename(self):
+        """
+        The name of the csv-file for the samples
+        """
+        if self._sample_filename is None:
+            self._sample_filename = self.configuration.get(self.section,
+                                                           QueryEnum.sample_filename,
+                                                           optional=True,
+                                                           default=QueryEnum.default_sample_filename)
+        return self._sample_filename
+
+    @property
+    def agent(self):
+        """
+        True if the commands should be run by a sampling agent on the device
+        """
+        if self._agent is None:
+            self._agent = self.configuration.getboolean(self.section,
+                                                        QueryEnum.agent,
+                                                        optional=True,
+                                                        default=QueryEnum.default_agent)
+        return self._agent
+
     def reset(self):
         """
         Resets the options to None
@@ -395,6 +625,10 @@ class QueryConfiguration(BaseConfiguration):
         self._expressions = None
         self._delimiter = None
         self._not_available = None
+        self._sample_period = None
+        self._sample_buffer = None
+        self._sample_filename = None
+        self._agent = None
         return        
         
     def check_rep(self):
@@ -447,6 +681,35 @@ class QueryBuilder(object):
                                       commands))
         return self._commands
 
+    @property
+    def workers(self):
+        """
+        The most commands the query runs at once (1 unless the connection is multiplexed)
+        """
+        if getattr(self.connection, 'multiplexed', False) is True:
+            return self.connection.max_channels
+        return 1
+
+    @property
+    def batch(self):
+        """
+        The connection if it can send all the commands in one batch (otherwise None)
+        """
+        if getattr(self.connection, 'batched', False) is True:
+            return self.connection
+        return None
+
+    @property
+    def agent(self):
+        """
+        The connection's sampling agent for the commands if the configuration wants one (otherwise None)
+        """
+        if self.configuration.agent is True and self.batch is None:
+            commands = dict((field, command.command_arguments)
+                            for field, command in self.commands.iteritems())
+            return self.connection.agent(commands, timeout=self.configuration.timeout)
+        return None
+
     @property
     def product(self):
         """
@@ -455,6 +718,9 @@ class QueryBuilder(object):
         if self._product is None:
             self._product = Query(output_filename=self.configuration.filename,
                                   fields=self.configuration.fields[:],
-                                  commands=self.commands)
+                                  commands=self.commands,
+                                  workers=self.workers,
+                                  batch=self.batch,
+                                  agent=self.agent)
         return self._product        
 # end QueryBuilder
\ No newline at end of file
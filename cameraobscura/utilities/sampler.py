@@ -0,0 +1,197 @@
+
+# python standard library
+from collections import deque
+import csv
+import datetime
+import logging
+import os
+import socket
+import threading
+import time
+
+# this package
+from cameraobscura import CameraobscuraError
+
+class SamplerConstants(object):
+    """
+    Constants for the query sampler
+    """
+    __slots__ = ()
+    default_period = 0.5
+    default_size = 1024
+    thread_name = 'query_sampler'
+    # the columns every row has
+    timestamp = 'timestamp'
+    offset = 'offset'
+# end class SamplerConstants
+
+class QuerySampler(object):
+    """
+    Runs the query commands in a background thread while the traffic runs
+    """
+    def __init__(self, commands, fields, output_filename,
+                 period=SamplerConstants.default_period,
+                 size=SamplerConstants.default_size,
+                 extra_fields=None, connection=None, agent=None):
+        """
+        QuerySampler constructor
+
+        :param:
+
+         - `commands`: dict of field: callable that returns the value (e.g. TheCommand)
+         - `fields`: the fields (in the order of the csv columns)
+         - `output_filename`: name of the csv-file for the samples
+         - `period`: seconds between the starts of the samples
+         - `size`: the most samples to keep in the buffer
+         - `extra_fields`: fields for the `extra_data` given to `write` (e.g. attenuation)
+         - `connection`: the commands' connection (closed by `close`)
+         - `agent`: SamplingAgent to get the commands' output from (or None)
+        """
+        super(QuerySampler, self).__init__()
+        self._logger = None
+        self._writer = None
+        self.commands = commands
+        self.fields = fields
+        self.output_filename = output_filename
+        self.period = period
+        self.extra_fields = extra_fields or []
+        self.connection = connection
+        self.agent = agent
+        self.buffer = deque(maxlen=size)
+        self.dropped = 0
+        self.started = None
+        self.thread = None
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.output_file = None
+        return
+
+    @property
+    def logger(self):
+        """
+        :return: A logging object.
+        """
+        if self._logger is None:
+            self._logger = logging.getLogger("{0}.{1}".format(self.__module__,
+                                  self.__class__.__name__))
+        return self._logger
+
+    @property
+    def writer(self):
+        """
+        A DictWriter for the samples (writes the header if the file is new)
+        """
+        if self._writer is None:
+            new_file = not os.path.isfile(self.output_filename)
+            self.output_file = open(self.output_filename, 'a')
+            self._writer = csv.DictWriter(self.output_file,
+                                          fieldnames=([SamplerConstants.timestamp,
+                                                       SamplerConstants.offset] +
+                                                      self.extra_fields + self.fields))
+            if new_file:
+                self._writer.writeheader()
+        return self._writer
+
+    def sample(self):
+        """
+        Runs the commands once and adds the row to the buffer
+        """
+        now = time.time()
+        row = {SamplerConstants.timestamp: datetime.datetime.fromtimestamp(now).isoformat(),
+               SamplerConstants.offset: round(now - self.started, 3)}
+        try:
+            if self.agent is not None:
+                outputs = self.agent.request()
+                for field, command in self.commands.iteritems():
+                    row[field] = command.parse(*outputs[field])
+            else:
+                for field, command in self.commands.iteritems():
+                    row[field] = command()
+        except (socket.error, CameraobscuraError) as error:
+            self.logger.warning("Sample failed: {0}".format(error))
+            return
+        with self.lock:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1
+            self.buffer.append(row)
+        return
+
+    def run(self):
+        """
+        Samples every `period` seconds until stopped
+        """
+        while not self.stopped.is_set():
+            start = time.time()
+            self.sample()
+            self.stopped.wait(max(0, self.period - (time.time() - start)))
+        return
+
+    def start(self):
+        """
+        Starts sampling in a thread
+        """
+        self.stopped.clear()
+        self.started = time.time()
+        self.thread = threading.Thread(target=self.run,
+                                       name=SamplerConstants.thread_name)
+        self.thread.daemon = True
+        self.thread.start()
+        return
+
+    def stop(self):
+        """
+        Stops sampling (waits for the sample in progress)
+        """
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        return
+
+    def drain(self):
+        """
+        Takes the samples out of the buffer
+
+        :return: list of row dicts (oldest first)
+        """
+        with self.lock:
+            rows = list(self.buffer)
+            self.buffer.clear()
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            self.logger.warning("{0} samples were dropped (the buffer holds {1})".format(dropped,
+                                                                                       self.buffer.maxlen))
+        return rows
+
+    def write(self, rows, extra_data=None):
+        """
+        Writes the rows to the csv-file
+
+        :param:
+
+         - `rows`: rows from `drain`
+         - `extra_data`: dict to add to every row (keys have to be in `extra_fields`)
+        """
+        with self.write_lock:
+            for row in rows:
+                if extra_data is not None:
+                    row.update(extra_data)
+                self.writer.writerow(row)
+            self.output_file.flush()
+        self.logger.debug("Wrote {0} samples".format(len(rows)))
+        return
+
+    def close(self):
+        """
+        Stops sampling and closes the file and the connection
+        """
+        self.stop()
+        if self.output_file is not None:
+            self.output_file.close()
+            self.output_file = None
+            self._writer = None
+        if self.connection is not None:
+            self.connection.close()
+        return
+# end class QuerySampler